@@ -0,0 +1,108 @@
+"""Call analytics over a transcript export (see transcript_export), vectorized with pandas/NumPy.
+
+Reports, across all exported calls:
+  conversion   share of calls where the customer showed interest (a reply to
+               the "interested" intent)
+  hang-up      share of calls that ended without converting
+  turns        customer turns per call
+  fallbacks    which canned rule-based replies were given, by intent
+               ("default" when no intent matched)
+  latency      customer message -> reply ready, per responder (rules vs RAG)
+
+Usage:
+    python -m analytics calls.parquet
+    python -m analytics export.ndjson --json report.json
+"""
+import argparse
+import json
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Columns the analysis needs; the transcript text is never loaded
+COLUMNS = ["call_id", "call_active", "sender", "responder", "intent", "latency_ms"]
+CONVERSION_INTENTS = ("interested",)
+RULE_RESPONDER = "RuleResponder"
+
+
+def load(path: str, chunk_rows: int = 500000) -> pd.DataFrame:
+    """Read the analysis columns of a Parquet or NDJSON export"""
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path, columns=COLUMNS)
+    else:
+        # NDJSON has no column projection, so read it in chunks and keep only what is needed
+        df = pd.concat(
+            (chunk.reindex(columns=COLUMNS) for chunk in pd.read_json(path, lines=True, chunksize=chunk_rows)),
+            ignore_index=True
+        )
+    for column in ("sender", "responder", "intent"):
+        df[column] = df[column].astype("category")
+    return df
+
+
+def _summary(values: np.ndarray) -> dict:
+    if len(values) == 0:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"count": int(len(values)), "mean": round(float(values.mean()), 3), "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3), "p99": round(float(p99), 3), "max": round(float(values.max()), 3)}
+
+
+def analyze(df: pd.DataFrame, conversion_intents: Sequence[str] = CONVERSION_INTENTS) -> dict:
+    """Conversion and hang-up rates, turn counts, fallback intents and latency per responder"""
+    codes, call_ids = pd.factorize(df["call_id"])
+    calls = len(call_ids)
+    customer = (df["sender"] == "customer").to_numpy()
+    agent = (df["sender"] == "agent").to_numpy()
+
+    turns = np.bincount(codes[customer], minlength=calls)
+    converted = np.zeros(calls, dtype=bool)
+    converted[codes[agent & df["intent"].isin(conversion_intents).to_numpy()]] = True
+    ended = np.zeros(calls, dtype=bool)
+    ended[codes] = ~df["call_active"].to_numpy(dtype=bool)
+    hung_up = ended & ~converted
+
+    rules = agent & (df["responder"] == RULE_RESPONDER).to_numpy()
+    intents = df["intent"][rules].astype(object).fillna("default").value_counts()
+
+    latency = {}
+    timed = df[agent & df["latency_ms"].notna().to_numpy()]
+    for responder, values in timed.groupby("responder", observed=True)["latency_ms"]:
+        latency[responder] = _summary(values.to_numpy(dtype=float))
+
+    return {
+        "calls": calls,
+        "turns": int(turns.sum()),
+        "conversion_rate": round(float(converted.mean()), 4) if calls else 0.0,
+        "hang_up_rate": round(float(hung_up.mean()), 4) if calls else 0.0,
+        "ended_calls": int(ended.sum()),
+        "turns_per_call": _summary(turns),
+        "fallback_intents": {intent: int(count) for intent, count in intents.items()},
+        "latency_ms": latency,
+    }
+
+
+def main_cli(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="a .parquet or .ndjson transcript export")
+    parser.add_argument("--json", help="also write the report here")
+    args = parser.parse_args(argv)
+
+    report = analyze(load(args.path))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    t = report["turns_per_call"]
+    print(f"{report['calls']} calls, {report['turns']} customer turns "
+          f"(per call: mean {t.get('mean', 0)}, p50 {t.get('p50', 0)}, max {t.get('max', 0)})")
+    print(f"conversion {report['conversion_rate']:.1%}, hang-up {report['hang_up_rate']:.1%} "
+          f"({report['ended_calls']} calls ended)")
+    print("rule-based replies by intent: " + ", ".join(f"{k} {v}" for k, v in report["fallback_intents"].items()))
+    for responder, s in report["latency_ms"].items():
+        print(f"latency {responder:<20} p50 {s['p50']:8.1f} ms  p95 {s['p95']:8.1f} ms  p99 {s['p99']:8.1f} ms  "
+              f"({s['count']} replies)")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,361 @@
+import asyncio
+import audioop
+import contextvars
+import io
+import json
+import logging
+import os
+import threading
+import time
+import wave
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Tuple
+
+import speech_recognition as sr
+
+from turn_pipeline import CallEndedError, CallNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# Audio is handled internally as 16-bit little-endian mono PCM at this rate
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+
+class RecognizerBusyError(RuntimeError):
+    """The recognition pool already has its maximum backlog"""
+
+
+class VADEvent(NamedTuple):
+    kind: str  # "speech_start", "utterance" (audio holds the PCM) or "discarded" (too short to be speech)
+    audio: Optional[bytes] = None
+
+
+class VoiceActivityDetector:
+    """Energy-based voice activity detection that cuts a PCM stream into utterances.
+
+    Frames louder than `noise_ratio` times the running noise floor (and at
+    least `min_energy`) count as voiced. Speech starts after `start_ms` of
+    voiced frames and ends after `end_silence_ms` of quiet; each utterance
+    keeps `padding_ms` of audio on both sides so word onsets are not clipped.
+    Bursts shorter than `min_speech_ms` (clicks, coughs) are discarded.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, frame_ms: int = 30, min_energy: float = 300.0,
+                 noise_ratio: float = 3.0, start_ms: int = 90, end_silence_ms: int = 700,
+                 min_speech_ms: int = 250, max_utterance_ms: int = 15000, padding_ms: int = 300):
+        self.frame_ms = frame_ms
+        self.frame_bytes = sample_rate * frame_ms // 1000 * SAMPLE_WIDTH
+        self.min_energy = min_energy
+        self.noise_ratio = noise_ratio
+        self.start_ms = start_ms
+        self.end_silence_ms = end_silence_ms
+        self.min_speech_ms = min_speech_ms
+        self.max_utterance_bytes = sample_rate * max_utterance_ms // 1000 * SAMPLE_WIDTH
+        self.padding_ms = padding_ms
+        self.noise: Optional[float] = None
+        self._pending = bytearray()
+        self._preroll: deque = deque(maxlen=max(1, (padding_ms + start_ms) // frame_ms))
+        self._voiced_ms = 0
+        self._speech: Optional[bytearray] = None
+        self._speech_ms = 0
+        self._silence_ms = 0
+
+    @property
+    def threshold(self) -> float:
+        return max(self.min_energy, (self.noise or 0.0) * self.noise_ratio)
+
+    @property
+    def in_speech(self) -> bool:
+        return self._speech is not None
+
+    def feed(self, pcm: bytes) -> List[VADEvent]:
+        """Process 16-bit mono PCM; returns the events it completed"""
+        self._pending += pcm
+        events = []
+        size = self.frame_bytes
+        while len(self._pending) >= size:
+            frame = bytes(self._pending[:size])
+            del self._pending[:size]
+            event = self._frame(frame, audioop.rms(frame, SAMPLE_WIDTH))
+            if event is not None:
+                events.append(event)
+        return events
+
+    def flush(self) -> Optional[VADEvent]:
+        """End the utterance in progress (the caller stopped streaming)"""
+        self._pending.clear()
+        return self._finish() if self._speech is not None else None
+
+    def _frame(self, frame: bytes, energy: float) -> Optional[VADEvent]:
+        if self._speech is None:
+            self._preroll.append(frame)
+            if energy > self.threshold:
+                self._voiced_ms += self.frame_ms
+                if self._voiced_ms >= self.start_ms:
+                    self._speech = bytearray(b"".join(self._preroll))
+                    self._preroll.clear()
+                    self._speech_ms = self._voiced_ms
+                    self._silence_ms = 0
+                    return VADEvent("speech_start")
+            else:
+                self._voiced_ms = 0
+                # Only quiet frames move the noise floor, so speech never raises it
+                self.noise = energy if self.noise is None else self.noise * 0.95 + energy * 0.05
+            return None
+
+        self._speech += frame
+        # A lower bar to stay in speech than to enter it, so trailing syllables are kept
+        if energy > self.threshold * 0.6:
+            self._speech_ms += self.frame_ms
+            self._silence_ms = 0
+        else:
+            self._silence_ms += self.frame_ms
+        if self._silence_ms >= self.end_silence_ms or len(self._speech) >= self.max_utterance_bytes:
+            return self._finish()
+        return None
+
+    def _finish(self) -> VADEvent:
+        speech, speech_ms = self._speech, self._speech_ms
+        # Keep padding_ms of the trailing silence
+        trailing = max(0, self._silence_ms - self.padding_ms) // self.frame_ms * self.frame_bytes
+        self._speech = None
+        self._voiced_ms = self._speech_ms = self._silence_ms = 0
+        if speech_ms < self.min_speech_ms:
+            return VADEvent("discarded")
+        return VADEvent("utterance", bytes(speech[:len(speech) - trailing]))
+
+
+class PCMResampler:
+    """Incremental conversion of streamed 16-bit mono PCM to SAMPLE_RATE (state carries across chunks)"""
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self._state = None
+        self._odd = b""
+
+    def convert(self, chunk: bytes) -> bytes:
+        chunk = self._odd + chunk
+        # A chunk split mid-sample keeps its odd byte for the next one
+        cut = len(chunk) - len(chunk) % SAMPLE_WIDTH
+        chunk, self._odd = chunk[:cut], chunk[cut:]
+        if self.sample_rate == SAMPLE_RATE or not chunk:
+            return chunk
+        converted, self._state = audioop.ratecv(chunk, SAMPLE_WIDTH, 1, self.sample_rate, SAMPLE_RATE, self._state)
+        return converted
+
+
+def decode_wav(data: bytes) -> bytes:
+    """PCM (16-bit mono, SAMPLE_RATE) of an uploaded WAV file; ValueError if it is not one"""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            pcm = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"not a PCM WAV file: {e}") from e
+    if width == 1:
+        # 8-bit WAV samples are unsigned; every other width is signed
+        pcm = audioop.bias(pcm, 1, -128)
+    if width != SAMPLE_WIDTH:
+        pcm = audioop.lin2lin(pcm, width, SAMPLE_WIDTH)
+    if channels == 2:
+        pcm = audioop.tomono(pcm, SAMPLE_WIDTH, 0.5, 0.5)
+    elif channels != 1:
+        raise ValueError(f"unsupported channel count: {channels}")
+    if rate != SAMPLE_RATE:
+        pcm, _ = audioop.ratecv(pcm, SAMPLE_WIDTH, 1, rate, SAMPLE_RATE, None)
+    return pcm
+
+
+class RecognitionPool:
+    """Speech recognition on a bounded thread pool shared by every caller.
+
+    Recognition (a network call or a CPU-bound local model) never runs on the
+    event loop. Beyond `max_pending` queued utterances new ones are rejected
+    with RecognizerBusyError rather than queueing without bound.
+    """
+
+    def __init__(self, transcribe: Callable[[sr.AudioData], str], max_workers: int = 4, max_pending: int = 64):
+        self._transcribe = transcribe
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stt")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def transcribe(self, pcm: bytes, sample_rate: int = SAMPLE_RATE) -> str:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise RecognizerBusyError(f"{self.pending} utterances already waiting for recognition")
+            self.pending += 1
+        try:
+            audio = sr.AudioData(pcm, sample_rate, SAMPLE_WIDTH)
+            # The worker runs in the request's context so its stage timing lands in the request's trace
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, context.run, self._transcribe, audio
+            )
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+
+
+def create_recognition_pool(transcribe: Callable[[sr.AudioData], str]) -> RecognitionPool:
+    """Build the recognition pool from environment settings"""
+    return RecognitionPool(
+        transcribe,
+        max_workers=int(os.getenv("STT_WORKERS", "4")),
+        max_pending=int(os.getenv("STT_MAX_PENDING", "64")),
+    )
+
+
+class AudioSession:
+    """One caller's audio WebSocket: VAD on arriving PCM, recognition in the pool, one turn per utterance.
+
+    Binary messages carry 16-bit little-endian mono PCM at `sample_rate`; a
+    {"type": "stop"} text message ends the stream (speech in progress is still
+    answered). Utterances are answered in the order they were spoken while
+    more audio keeps arriving. The session sends JSON events: speech_start,
+    speech_end, transcript, reply (the turn result), not_understood, error and
+    call_ended.
+    """
+
+    def __init__(self, pool: RecognitionPool, respond: Callable[[str], Awaitable[dict]],
+                 send: Callable[[dict], Awaitable[None]], sample_rate: int = SAMPLE_RATE,
+                 vad: Optional[VoiceActivityDetector] = None):
+        self.pool = pool
+        self.respond = respond
+        self._send = send
+        self.resampler = PCMResampler(sample_rate)
+        self.vad = vad or VoiceActivityDetector()
+        self._utterances: "asyncio.Queue[Optional[Tuple[bytes, float]]]" = asyncio.Queue()
+        self.ended = False
+        self.disconnected = False
+        self.turns = 0
+
+    async def serve(self, websocket):
+        """Pump the socket into the session until the caller stops, hangs up or the call ends"""
+        worker = asyncio.ensure_future(self.answer())
+        receiver = asyncio.ensure_future(self._receive(websocket))
+        try:
+            await asyncio.wait({worker, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver.done():
+                # Stopped or hung up: still answer what was already said (replies land in the history)
+                self.stop()
+                await worker
+            else:
+                receiver.cancel()
+        finally:
+            for task in (worker, receiver):
+                if not task.done():
+                    task.cancel()
+
+    async def feed(self, chunk: bytes):
+        # Resampling and VAD are CPU work; chunks are fed one at a time, so the per-session state is never shared
+        for event in await asyncio.to_thread(self._detect, chunk):
+            await self._event(event)
+
+    def _detect(self, chunk: bytes) -> List[VADEvent]:
+        return self.vad.feed(self.resampler.convert(chunk))
+
+    async def answer(self):
+        """Transcribe and answer queued utterances until the stream stops or the call ends"""
+        while True:
+            utterance = await self._utterances.get()
+            if utterance is None:
+                return
+            pcm, ended_at = utterance
+            text = await self._recognize(pcm)
+            if text is None:
+                continue
+            await self.send({"type": "transcript", "text": text})
+            result = await self._respond(text, ended_at)
+            if result is not None:
+                self.turns += 1
+            if result is None or result.get("should_end_call"):
+                self.ended = True
+                await self.send({"type": "call_ended"})
+                return
+
+    async def _recognize(self, pcm: bytes) -> Optional[str]:
+        try:
+            return await self.pool.transcribe(pcm)
+        except sr.UnknownValueError:
+            await self.send({"type": "not_understood"})
+        except (RecognizerBusyError, sr.RequestError) as e:
+            logger.warning("Speech recognition failed: %s", e)
+            await self.send({"type": "error", "detail": "speech recognition unavailable"})
+        return None
+
+    async def _respond(self, text: str, ended_at: float) -> Optional[dict]:
+        """Run the turn; None when the call is gone or already over"""
+        try:
+            result = await self.respond(text)
+        except (CallEndedError, CallNotFoundError):
+            return None
+        await self.send({"type": "reply", **result})
+        return result
+
+    async def send(self, event: dict):
+        if self.disconnected:
+            return
+        try:
+            await self._send(event)
+        except Exception:
+            # The caller hung up; turns already queued still run
+            self.disconnected = True
+
+    async def _receive(self, websocket):
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                self.disconnected = True
+                return
+            if message.get("bytes"):
+                await self.feed(message["bytes"])
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    continue
+                if self.control(control):
+                    return
+
+    def control(self, message: dict) -> bool:
+        """Handle a JSON control message from the client; True ends the audio stream"""
+        return message.get("type") == "stop"
+
+    def stop(self):
+        """End of the caller's audio: queue speech in progress, then let answer() finish"""
+        event = self.vad.flush()
+        if event is not None and event.kind == "utterance":
+            self._utterances.put_nowait((event.audio, time.perf_counter()))
+        self._utterances.put_nowait(None)
+
+    async def _event(self, event: VADEvent):
+        if event.kind == "speech_start":
+            await self.send({"type": "speech_start"})
+        elif event.kind == "utterance":
+            # Queued with the moment speech ended, to measure how soon the reply follows
+            self._utterances.put_nowait((event.audio, time.perf_counter()))
+            await self.send({"type": "speech_end"})
+        else:
+            await self.send({"type": "speech_end", "discarded": True})
@@ -0,0 +1,131 @@
+"""Many concurrent browser-audio callers through the audio session path.
+
+Each of --callers sessions, started at random offsets, streams a WAV fixture (speech, a pause, speech) in
+20ms chunks at real-time pace (--speed to go faster) into an AudioSession
+that runs the real VAD and the real turn pipeline (rule-based replies, stand-in
+voice service). Recognition is a stand-in that holds a pool worker for
+--stt-ms per utterance, like a network or local-model recognizer would.
+
+Reports end-of-speech -> reply latency, how late a 10ms ticker on the event
+loop ran (VAD runs on the loop, recognition does not) and the VAD's CPU cost
+per second of audio.
+
+Usage:
+    python -m benchmarks.bench_audio_sessions --callers 200 --stt-ms 300 --stt-workers 16
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+import main
+from audio_stream import SAMPLE_RATE, AudioSession, RecognitionPool, VoiceActivityDetector, decode_wav
+from benchmarks.common import FakeVoiceService, summarize
+from speech_pipeline import SpeechPipeline
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "stt", "utterance_3s.wav")
+CHUNK_S = 0.02
+TICK_S = 0.01
+
+
+def recognizer(stt_seconds: float):
+    def transcribe(audio):
+        time.sleep(stt_seconds)
+        return "How much does it cost?"
+    return transcribe
+
+
+async def caller(index: int, pcm: bytes, pool: RecognitionPool, speed: float, latencies: list):
+    # Callers do not all stop talking at the same instant
+    await asyncio.sleep(random.Random(index).uniform(0, len(pcm) / (2 * SAMPLE_RATE)) / speed)
+    call = await start_call(index)
+    ended_speech = []
+
+    async def send(event):
+        if event["type"] == "speech_end" and not event.get("discarded"):
+            ended_speech.append(time.perf_counter())
+        elif event["type"] == "reply" and ended_speech:
+            latencies.append(time.perf_counter() - ended_speech.pop(0))
+
+    session = AudioSession(
+        pool, respond=lambda text: main.turn_pipeline.run(call, text, main.responders["rules"]), send=send
+    )
+    answering = asyncio.ensure_future(session.answer())
+    chunk = int(CHUNK_S * SAMPLE_RATE) * 2
+    for i in range(0, len(pcm), chunk):
+        await session.feed(pcm[i:i + chunk])
+        await asyncio.sleep(CHUNK_S / speed)
+    session.stop()
+    await answering
+
+
+async def start_call(index: int) -> str:
+    result = await main.start_call(main.CallStart(customer_name=f"Lead {index}", phone_number=str(index)))
+    return result["call_id"]
+
+
+async def probe_lag(lags: list, stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK_S
+        await asyncio.sleep(TICK_S)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def run(args) -> dict:
+    with open(FIXTURE, "rb") as f:
+        speech = decode_wav(f.read())
+    pause = b"\0\0" * SAMPLE_RATE
+    pcm = pause[:SAMPLE_RATE] + speech + pause + speech + pause
+
+    main.speech_pipeline = SpeechPipeline(FakeVoiceService(0.0), max_workers=2, max_pending=args.callers * 10)
+    pool = RecognitionPool(recognizer(args.stt_ms / 1000.0), max_workers=args.stt_workers,
+                           max_pending=args.callers * 2)
+    latencies, lags = [], []
+    stop = asyncio.Event()
+    probe = asyncio.ensure_future(probe_lag(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(caller(i, pcm, pool, args.speed, latencies) for i in range(args.callers)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    pool.shutdown()
+    main.speech_pipeline.shutdown(wait=True)
+    return {"seconds": elapsed, "audio_s": len(pcm) / (2 * SAMPLE_RATE), "latencies": latencies,
+            "lags": lags, "pool": pool.stats()}
+
+
+def vad_cost(pcm: bytes, rounds: int = 20) -> float:
+    """CPU seconds of VAD per second of audio"""
+    chunk = int(CHUNK_S * SAMPLE_RATE) * 2
+    started = time.perf_counter()
+    for _ in range(rounds):
+        vad = VoiceActivityDetector()
+        for i in range(0, len(pcm), chunk):
+            vad.feed(pcm[i:i + chunk])
+    return (time.perf_counter() - started) / (rounds * len(pcm) / (2 * SAMPLE_RATE))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callers", type=int, default=200)
+    parser.add_argument("--stt-ms", type=float, default=300)
+    parser.add_argument("--stt-workers", type=int, default=16)
+    parser.add_argument("--speed", type=float, default=1.0, help="audio pace relative to real time")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    latency, lag = summarize(result["latencies"]), summarize(result["lags"])
+    print(f"{args.callers} callers x {result['audio_s']:.1f}s of audio in {result['seconds']:.2f}s "
+          f"(recognizer {args.stt_ms:.0f}ms, {args.stt_workers} workers)")
+    print(f"end of speech -> reply  p50 {latency['p50_ms']:.1f} ms  p95 {latency['p95_ms']:.1f} ms  "
+          f"p99 {latency['p99_ms']:.1f} ms  ({latency['count']} replies)")
+    print(f"event-loop lag          p50 {lag['p50_ms']:.1f} ms  p99 {lag['p99_ms']:.1f} ms  max {lag['max_ms']:.1f} ms")
+    with open(FIXTURE, "rb") as f:
+        print(f"VAD cost: {vad_cost(decode_wav(f.read())) * 1000:.2f} ms CPU per second of audio")
+    print(f"recognition pool: {result['pool']}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,115 @@
+"""Memory and throughput of the call-store backends at 100k calls.
+
+Each simulated call gets a greeting plus a few customer/agent turns, then is
+ended. Reports write and read throughput, Python heap growth (tracemalloc)
+and, for SQLite, the database size on disk. The "dict" row is the old
+unbounded calls_db for comparison.
+
+Usage:
+    python -m benchmarks.bench_call_store --calls 100000 --turns 2
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from call_store import MemoryCallStore, SQLiteCallStore
+from models import Call, CallHistory
+
+
+class DictStore:
+    """The original module-level dict, kept here as the baseline"""
+
+    def __init__(self):
+        self.calls = {}
+
+    def create(self, call):
+        self.calls[call.call_id] = call
+
+    def get(self, call_id):
+        return self.calls.get(call_id)
+
+    def append_history(self, call_id, entries):
+        self.calls[call_id].history.extend(entries)
+
+    def end_call(self, call_id, end_time=None):
+        self.calls[call_id].is_active = False
+
+    def count(self):
+        return len(self.calls)
+
+
+def make_turn(i):
+    now = datetime.now()
+    return [
+        CallHistory(sender="customer", text=f"How much does the bootcamp cost? ({i})", timestamp=now),
+        CallHistory(sender="agent", text="We're offering the AI Mastery Bootcamp at $299 instead of $499.", timestamp=now),
+    ]
+
+
+def run(name, store, calls, turns):
+    tracemalloc.start()
+    started = time.perf_counter()
+    for i in range(calls):
+        call_id = f"call-{i:08d}"
+        store.create(Call(
+            call_id=call_id,
+            customer_name=f"Lead {i}",
+            phone_number=f"+1555{i:07d}",
+            start_time=datetime.now(),
+            history=[CallHistory(sender="agent", text=f"Hi Lead {i}, this is your AI assistant.", timestamp=datetime.now())],
+        ))
+        for t in range(turns):
+            store.append_history(call_id, make_turn(t))
+        store.end_call(call_id)
+    write_s = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    lookups = min(calls, 20000)
+    step = max(1, calls // lookups)
+    for i in range(0, calls, step):
+        store.get(f"call-{i:08d}")
+    read_s = time.perf_counter() - started
+
+    return {
+        "backend": name,
+        "held": store.count(),
+        "calls_per_s": calls / write_s,
+        "gets_per_s": (calls // step) / read_s,
+        "heap_mb": current / 1e6,
+        "peak_mb": peak / 1e6,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--turns", type=int, default=2)
+    parser.add_argument("--max-calls", type=int, default=10000, help="cap for the bounded memory store")
+    args = parser.parse_args()
+
+    results = [
+        run("dict", DictStore(), args.calls, args.turns),
+        run("memory", MemoryCallStore(max_calls=args.max_calls), args.calls, args.turns),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "calls.db")
+        store = SQLiteCallStore(path)
+        result = run("sqlite", store, args.calls, args.turns)
+        store.close()
+        result["disk_mb"] = os.path.getsize(path) / 1e6
+        results.append(result)
+
+    print(f"{'backend':<10}{'held':>10}{'calls/s':>12}{'gets/s':>12}{'heap MB':>10}{'peak MB':>10}{'disk MB':>10}")
+    for r in results:
+        disk = f"{r['disk_mb']:.1f}" if "disk_mb" in r else "-"
+        print(f"{r['backend']:<10}{r['held']:>10}{r['calls_per_s']:>12.0f}{r['gets_per_s']:>12.0f}"
+              f"{r['heap_mb']:>10.1f}{r['peak_mb']:>10.1f}{disk:>10}")
+
+
+if __name__ == "__main__":
+    main_cli()
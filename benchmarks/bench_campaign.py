@@ -0,0 +1,154 @@
+"""Outbound campaign throughput and memory at 100k leads, with stubbed telephony, voice and LLM.
+
+Writes a --leads row CSV lead file and runs a CampaignRunner over it
+(streamed, --concurrency dials at once, --calls-per-second 0 for no rate
+limit). The dialer stands in for a telephony provider: a call rings for
+--ring-ms, then --no-answer-share of attempts get no answer and
+--busy-share are busy (retried after --retry-ms with backoff, up to
+--max-attempts). Answered calls run through the app for real: main.start_call
+opens the session and the customer says --turns scripted lines through the
+turn pipeline (rule replies, so no LLM; speech is a stand-in), the last one
+ending the call. --no-sessions leaves the app out, to see the runner's own cost.
+
+With --crash-after N the run is cancelled once N leads are finished and a new
+runner resumes it from the checkpoint and outcomes log, as after a crash.
+
+Reports calls/sec (dial attempts and finished leads), outcome counts, resume
+time and memory: RSS before and after, and how many leads the runner's state
+keeps individually (it only tracks leads in flight or awaiting a retry).
+
+Usage:
+    python -m benchmarks.bench_campaign --leads 100000 --concurrency 500
+    python -m benchmarks.bench_campaign --leads 100000 --crash-after 50000
+"""
+import argparse
+import asyncio
+import csv
+import gc
+import os
+import random
+import tempfile
+import time
+
+import main
+from benchmarks.common import FakeVoiceService, rss_mb
+from campaign import CampaignRunner, DialResult, read_leads
+from speech_pipeline import SpeechPipeline
+
+SCRIPT = ["How much does it cost?", "Is there a certificate?", "No thanks, goodbye"]
+
+
+def write_leads(path: str, count: int):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["customer_name", "phone_number"])
+        for i in range(count):
+            writer.writerow([f"Lead {i}", f"+1555{i:07d}"])
+
+
+def telephony(args):
+    """A dialer with a stand-in telephony provider in front of the real call sessions"""
+    attempts = {}
+
+    async def dial(lead) -> DialResult:
+        attempt = attempts[lead.index] = attempts.get(lead.index, 0) + 1
+        await asyncio.sleep(args.ring_ms / 1000.0)
+        roll = random.Random(lead.index * 31 + attempt).random()
+        if roll < args.no_answer_share:
+            return DialResult("no_answer")
+        if roll < args.no_answer_share + args.busy_share:
+            return DialResult("busy")
+        attempts.pop(lead.index)
+        if args.no_sessions:
+            return DialResult("answered")
+        call_id = await main.open_campaign_call(lead)
+        for line in SCRIPT[-args.turns:]:
+            await main.turn_pipeline.run(call_id, line, main.responders["rules"])
+        # The last line ended the call
+        return await main.wait_for_call_end(call_id, main.CAMPAIGN_CALL_IDLE_SECONDS)
+    return dial
+
+
+def runner(path: str, outcomes: str, args) -> CampaignRunner:
+    return CampaignRunner(read_leads(path), telephony(args), outcomes, concurrency=args.concurrency,
+                          calls_per_second=args.calls_per_second, max_attempts=args.max_attempts,
+                          retry_delay=args.retry_ms / 1000.0, checkpoint_every=args.checkpoint_every)
+
+
+async def run(args, directory: str) -> dict:
+    leads, outcomes = os.path.join(directory, "leads.csv"), os.path.join(directory, "outcomes.jsonl")
+    write_leads(leads, args.leads)
+    main.speech_pipeline = SpeechPipeline(FakeVoiceService(0.0), max_workers=2, max_pending=args.concurrency * 4)
+
+    gc.collect()
+    rss_before = rss_mb()
+    peak_tracked = 0
+    result = {}
+    started = time.perf_counter()
+    first = runner(leads, outcomes, args)
+    task = asyncio.ensure_future(first.run())
+    while not task.done():
+        await asyncio.sleep(0.2)
+        peak_tracked = max(peak_tracked, len(first.state.finished) + len(first.state.pending))
+        if args.crash_after and sum(first.state.counts.values()) >= args.crash_after:
+            task.cancel()
+            await asyncio.wait({task})
+            restore_started = time.perf_counter()
+            second = runner(leads, outcomes, args)
+            task = asyncio.ensure_future(second.run())
+            await asyncio.sleep(0)
+            result["resume_s"] = time.perf_counter() - restore_started
+            result["dialed_before_crash"] = first.dialed
+            first, args.crash_after = second, 0
+    stats = task.result()
+    elapsed = time.perf_counter() - started
+    main.speech_pipeline.shutdown(wait=True)
+
+    gc.collect()
+    result.update(
+        seconds=elapsed,
+        stats=stats,
+        attempts_per_s=stats["attempts"] / elapsed,
+        leads_per_s=stats["finished"] / elapsed,
+        rss_before_mb=rss_before,
+        rss_after_mb=rss_mb(),
+        peak_tracked_leads=peak_tracked,
+        outcomes_mb=os.path.getsize(outcomes) / 2**20,
+    )
+    return result
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leads", type=int, default=100000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--calls-per-second", type=float, default=0, help="0: no rate limit")
+    parser.add_argument("--ring-ms", type=float, default=20)
+    parser.add_argument("--no-answer-share", type=float, default=0.25)
+    parser.add_argument("--busy-share", type=float, default=0.05)
+    parser.add_argument("--retry-ms", type=float, default=200)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=2, choices=range(1, len(SCRIPT) + 1))
+    parser.add_argument("--no-sessions", action="store_true",
+                        help="answered calls skip the app, to measure the campaign runner on its own")
+    parser.add_argument("--checkpoint-every", type=int, default=1000)
+    parser.add_argument("--crash-after", type=int, default=0, help="cancel and resume after this many leads")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        result = asyncio.run(run(args, directory))
+    stats = result["stats"]
+    print(f"{args.leads} leads, concurrency {args.concurrency}, {args.turns} turns per answered call")
+    print(f"finished in {result['seconds']:.1f}s: {result['leads_per_s']:.0f} leads/s, "
+          f"{result['attempts_per_s']:.0f} dial attempts/s ({stats['attempts']} attempts)")
+    print(f"outcomes: {stats['outcomes']}")
+    if "resume_s" in result:
+        print(f"crashed after {result['dialed_before_crash']} dials; resumed in {result['resume_s'] * 1000:.0f} ms")
+    scope = "runner only" if args.no_sessions else "call sessions included"
+    print(f"memory: RSS {result['rss_before_mb']:.0f} MB -> {result['rss_after_mb']:.0f} MB ({scope}); "
+          f"runner tracked at most {result['peak_tracked_leads']} leads individually; "
+          f"outcomes log {result['outcomes_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    main_cli()
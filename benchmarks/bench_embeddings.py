@@ -0,0 +1,200 @@
+"""Embedding backends compared: throughput, query latency, memory, import time and retrieval recall.
+
+Each backend in --backends (torch, onnx, onnx-int8; see embedding_backends)
+runs in a fresh interpreter, so its import time and memory are its own:
+
+  import     seconds to import the backend's libraries (torch pulls in seconds of them)
+  load       seconds for create_embeddings() to load the model
+  RSS        resident memory growth from importing and loading
+  emb/s      embed_documents() throughput over the knowledge-base chunks (--texts texts)
+  query p50  embed_query() latency on the fixed recall query set
+  recall@k   share of the reference backend's FAISS top-k chunks this backend
+             also returns for embedding_backends.RECALL_QUERIES (the reference
+             is torch, or onnx when torch is not measured)
+
+The ONNX backends read ONNX_MODEL_DIR (--model-dir); prepare it with
+`python -m embedding_backends --quantize`. Without the model download,
+--stand-in builds a randomly initialised encoder with MiniLM's shape (30522 x
+384 embeddings, 6 layers of single-head attention and a 1536-wide MLP) and a
+word-level tokenizer, and quantizes it. Its speed, size and memory are
+representative; its recall is only a check of int8 against fp32 on the same
+weights.
+
+Usage:
+    python -m benchmarks.bench_embeddings --backends torch onnx onnx-int8 --threads 4
+    python -m benchmarks.bench_embeddings --stand-in --backends onnx onnx-int8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import rss_mb, summarize
+from knowledge_index import KNOWLEDGE_DIR
+
+BACKEND_IMPORTS = {"torch": ["sentence_transformers"], "onnx": ["onnxruntime", "tokenizers"],
+                   "onnx-int8": ["onnxruntime", "tokenizers"]}
+
+
+def knowledge_chunks() -> list:
+    """The knowledge base split the way the production index is"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    chunks = []
+    for name in sorted(os.listdir(KNOWLEDGE_DIR)):
+        with open(os.path.join(KNOWLEDGE_DIR, name), encoding="utf-8") as f:
+            chunks.extend(splitter.split_text(f.read()))
+    return chunks
+
+
+def build_stand_in(directory: str, vocab_size: int = 30522, dim: int = 384, layers: int = 6, seed: int = 0):
+    """MiniLM-shaped encoder with random weights plus a word-level tokenizer over the knowledge base"""
+    import numpy as np
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+    from tokenizers import Tokenizer, models, pre_tokenizers
+
+    from embedding_backends import FP32_FILE, RECALL_QUERIES, TOKENIZER_FILE, quantize_model
+
+    words = sorted({w.lower() for text in knowledge_chunks() + RECALL_QUERIES for w in text.split()})
+    vocab = {"[PAD]": 0, "[UNK]": 1, **{w: i + 2 for i, w in enumerate(words[:vocab_size - 2])}}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.save(os.path.join(directory, TOKENIZER_FILE))
+
+    rng = np.random.default_rng(seed)
+    weights, nodes = [], [helper.make_node("Gather", ["embeddings", "input_ids"], ["h0"])]
+
+    def weight(name, *shape):
+        weights.append(numpy_helper.from_array(
+            (rng.standard_normal(shape) / np.sqrt(shape[0])).astype(np.float32), name))
+        return name
+
+    weight("embeddings", vocab_size, dim)
+    weights.append(numpy_helper.from_array(np.ones(dim, np.float32), "gamma"))
+    weights.append(numpy_helper.from_array(np.zeros(dim, np.float32), "beta"))
+    weights.append(numpy_helper.from_array(np.array(dim ** -0.5, np.float32), "scale"))
+    for n in range(layers):
+        x, p = f"h{n}", f"l{n}_"
+        nodes += [
+            helper.make_node("MatMul", [x, weight(p + "wq", dim, dim)], [p + "q"]),
+            helper.make_node("MatMul", [x, weight(p + "wk", dim, dim)], [p + "k"]),
+            helper.make_node("MatMul", [x, weight(p + "wv", dim, dim)], [p + "v"]),
+            helper.make_node("Transpose", [p + "k"], [p + "kt"], perm=[0, 2, 1]),
+            helper.make_node("MatMul", [p + "q", p + "kt"], [p + "scores"]),
+            helper.make_node("Mul", [p + "scores", "scale"], [p + "scaled"]),
+            helper.make_node("Softmax", [p + "scaled"], [p + "attn"], axis=-1),
+            helper.make_node("MatMul", [p + "attn", p + "v"], [p + "mixed"]),
+            helper.make_node("MatMul", [p + "mixed", weight(p + "wo", dim, dim)], [p + "o"]),
+            helper.make_node("Add", [x, p + "o"], [p + "r1"]),
+            helper.make_node("LayerNormalization", [p + "r1", "gamma", "beta"], [p + "n1"], axis=-1),
+            helper.make_node("MatMul", [p + "n1", weight(p + "w1", dim, 4 * dim)], [p + "up"]),
+            helper.make_node("Relu", [p + "up"], [p + "act"]),
+            helper.make_node("MatMul", [p + "act", weight(p + "w2", 4 * dim, dim)], [p + "down"]),
+            helper.make_node("Add", [p + "n1", p + "down"], [p + "r2"]),
+            helper.make_node("LayerNormalization", [p + "r2", "gamma", "beta"],
+                             ["last_hidden_state" if n == layers - 1 else f"h{n + 1}"], axis=-1),
+        ]
+    graph = helper.make_graph(
+        nodes, "stand_in_minilm",
+        [helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["batch", "seq"]),
+         helper.make_tensor_value_info("attention_mask", TensorProto.INT64, ["batch", "seq"])],
+        [helper.make_tensor_value_info("last_hidden_state", TensorProto.FLOAT, ["batch", "seq", dim])],
+        weights,
+    )
+    onnx.save(helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)], ir_version=8),
+              os.path.join(directory, FP32_FILE))
+    quantize_model(directory)
+
+
+def child(backend: str, texts: int, k: int):
+    """Measure one backend in this (fresh) interpreter and print the results as JSON"""
+    import importlib
+
+    from embedding_backends import RECALL_QUERIES, create_embeddings, top_k
+
+    chunks = knowledge_chunks()
+    baseline = rss_mb()
+    started = time.perf_counter()
+    for module in BACKEND_IMPORTS[backend]:
+        importlib.import_module(module)
+    import_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    loaded, embeddings = create_embeddings()
+    load_s = time.perf_counter() - started
+    if loaded != backend:
+        raise SystemExit(f"{backend} could not be loaded")
+    rss = rss_mb() - baseline
+
+    embeddings.embed_documents(chunks[:4])  # warm-up
+    corpus = (chunks * (texts // len(chunks) + 1))[:texts]
+    started = time.perf_counter()
+    embeddings.embed_documents(corpus)
+    per_second = len(corpus) / (time.perf_counter() - started)
+    latencies = []
+    for query in RECALL_QUERIES:
+        started = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append(time.perf_counter() - started)
+
+    print(json.dumps({"import_s": import_s, "load_s": load_s, "rss_mb": rss, "per_second": per_second,
+                      "query": summarize(latencies), "top_k": top_k(embeddings, chunks, k=k)}))
+
+
+def run_backend(backend: str, args, model_dir: str) -> dict:
+    env = dict(os.environ, EMBEDDING_BACKEND=backend, ONNX_MODEL_DIR=model_dir,
+               EMBEDDING_THREADS=str(args.threads), EMBEDDING_WORKERS=str(args.workers))
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_embeddings", "--child", backend,
+                          "--texts", str(args.texts), "--k", str(args.k)],
+                         capture_output=True, text=True, env=env)
+    if out.returncode != 0:
+        lines = (out.stderr or out.stdout).strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit code {out.returncode}"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=("torch", "onnx", "onnx-int8"),
+                        default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--model-dir", default=os.getenv("ONNX_MODEL_DIR", "models/all-MiniLM-L6-v2-onnx"))
+    parser.add_argument("--stand-in", action="store_true", help="build and use a MiniLM-shaped random encoder")
+    parser.add_argument("--threads", type=int, default=0, help="EMBEDDING_THREADS (ONNX Runtime intra-op threads)")
+    parser.add_argument("--workers", type=int, default=1, help="EMBEDDING_WORKERS")
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child, args.texts, args.k)
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_dir = args.model_dir
+        if args.stand_in:
+            build_stand_in(directory)
+            model_dir = directory
+            args.backends = [b for b in args.backends if b != "torch"]
+            print("stand-in MiniLM-shaped encoder (random weights); torch skipped")
+        results = {backend: run_backend(backend, args, model_dir) for backend in args.backends}
+
+    from embedding_backends import recall
+    reference = next((b for b in ("torch", "onnx") if "top_k" in results.get(b, {})), None)
+    print(f"{args.texts} texts, EMBEDDING_THREADS={args.threads}, EMBEDDING_WORKERS={args.workers}, "
+          f"recall@{args.k} against {reference or 'nothing'}")
+    print(f"{'backend':<10} {'import':>8} {'load':>8} {'RSS':>8} {'emb/s':>8} {'query p50':>10} {'recall':>7}")
+    for backend, r in results.items():
+        if "error" in r:
+            print(f"{backend:<10} unavailable: {r['error']}")
+            continue
+        score = recall(results[reference]["top_k"], r["top_k"]) if reference else float("nan")
+        print(f"{backend:<10} {r['import_s']:>7.2f}s {r['load_s']:>7.2f}s {r['rss_mb']:>6.0f}MB "
+              f"{r['per_second']:>8.0f} {r['query']['p50_ms']:>8.2f}ms {score:>7.2f}")
+
+
+if __name__ == "__main__":
+    main_cli()
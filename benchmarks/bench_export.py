@@ -0,0 +1,120 @@
+"""Transcript export throughput to NDJSON and Parquet, and the analytics job over the result.
+
+Fills a call store (--store memory or sqlite) with --calls synthetic calls
+of --turns customer/agent turns each (rule and RAG replies with latencies
+and intents, as the turn pipeline records them). Then it exports every call
+with transcript_export to NDJSON and to Parquet and reports rows/s, file size
+and peak RSS growth while exporting (it should stay flat: rows are written in
+chunks and never all held at once). Finally analytics.analyze runs over the
+Parquet file.
+
+Usage:
+    python -m benchmarks.bench_export --calls 200000 --turns 5
+    python -m benchmarks.bench_export --calls 50000 --store sqlite
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import rss_mb
+from call_store import MemoryCallStore, SQLiteCallStore
+from models import Call, CallHistory
+from transcript_export import export, iter_rows
+
+QUESTIONS = [("How much does it cost?", "price"), ("How long does it take?", "time"),
+             ("I'm interested, how do I sign up?", "interested"), ("Do I get a certificate?", "certificate"),
+             ("What does the curriculum cover in the MLOps module?", None), ("Not interested, thanks", "not_interested")]
+
+
+def fill(store, calls: int, turns: int, seed: int = 7):
+    rng = random.Random(seed)
+    start = datetime(2024, 5, 1, 9, 0, 0)
+    for i in range(calls):
+        call_id = f"call-{i:08d}"
+        store.create(Call(call_id=call_id, customer_name=f"Lead {i}", phone_number=f"+1555{i:07d}",
+                          start_time=start, history=[CallHistory(sender="agent", text="Hi!", timestamp=start)]))
+        entries = []
+        for t in range(rng.randint(1, turns)):
+            question, intent = rng.choice(QUESTIONS)
+            rag = intent is None or rng.random() < 0.3
+            entries.append(CallHistory(sender="customer", text=question, timestamp=start + timedelta(seconds=t)))
+            entries.append(CallHistory(
+                sender="agent", text="Here is what you asked about: " + question, timestamp=start + timedelta(seconds=t),
+                responder="RagResponder" if rag else "RuleResponder", intent=intent,
+                latency_ms=rng.lognormvariate(6.5, 0.4) if rag else rng.uniform(0.2, 2.0)
+            ))
+        store.append_history(call_id, entries)
+        if rng.random() < 0.8:
+            store.end_call(call_id, start + timedelta(minutes=2))
+
+
+class PeakRss:
+    """Samples RSS on a background thread while a block runs"""
+
+    def __enter__(self):
+        self.before = self.peak = rss_mb()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._done.wait(0.05):
+            self.peak = max(self.peak, rss_mb())
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--turns", type=int, default=5, help="at most this many turns per call (uniform 1..N)")
+    parser.add_argument("--store", choices=("memory", "sqlite"), default="memory")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = MemoryCallStore(max_calls=args.calls) if args.store == "memory" else \
+            SQLiteCallStore(os.path.join(directory, "calls.db"))
+        started = time.perf_counter()
+        fill(store, args.calls, args.turns)
+        print(f"{args.store} store: {args.calls} calls filled in {time.perf_counter() - started:.1f}s")
+
+        try:
+            import pyarrow.parquet  # noqa: F401  (imported up front so its libraries are not counted as export memory)
+        except ImportError:
+            pass
+        for fmt in ("ndjson", "parquet"):
+            path = os.path.join(directory, f"calls.{fmt}")
+            with PeakRss() as rss:
+                started = time.perf_counter()
+                rows = export(iter_rows(store), path)
+                elapsed = time.perf_counter() - started
+            print(f"  {fmt:<8} {rows} rows in {elapsed:.1f}s: {rows / elapsed:,.0f} rows/s, "
+                  f"{os.path.getsize(path) / 2**20:.1f} MB, RSS +{rss.peak - rss.before:.0f} MB while exporting")
+
+        try:
+            from analytics import analyze, load
+        except ImportError:
+            print("analytics skipped (needs pandas)")
+        else:
+            started = time.perf_counter()
+            df = load(os.path.join(directory, "calls.parquet"))
+            loaded = time.perf_counter() - started
+            report = analyze(df)
+            analyzed = time.perf_counter() - started - loaded
+            print(f"analytics over {len(df)} rows: load {loaded:.2f}s, analyze {analyzed:.2f}s; "
+                  f"conversion {report['conversion_rate']:.1%}, hang-up {report['hang_up_rate']:.1%}")
+            for responder, s in report["latency_ms"].items():
+                print(f"  {responder:<14} p50 {s['p50']:7.1f} ms  p95 {s['p95']:7.1f} ms  ({s['count']} replies)")
+        store.close()
+
+
+if __name__ == "__main__":
+    main_cli()
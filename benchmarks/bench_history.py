@@ -0,0 +1,130 @@
+"""Call-history memory per 1k turns and /conversation poll latency, pydantic models versus HistoryLog.
+
+Memory: --calls calls each get --turns customer/agent turns (two entries per
+turn, texts shared with the baseline so only the per-entry overhead counts),
+held once as lists of CallHistory models (the old MemoryCallStore) and once as
+HistoryLogs. Python heap growth is measured with tracemalloc.
+
+Export: building the rows of a whole --turns transcript, the old way (a dict
+and isoformat string per CallHistory model) versus HistoryLog.rows().
+
+Polling: one call with --turns turns is polled --polls times through the
+real endpoint (in-process, TestClient) after every new turn:
+
+  full     the old way: every poll fetches the first page (offset=0)
+  since    each poll passes the previous cursor, so it only gets new entries
+  304      nothing changed since the last poll (If-None-Match)
+
+Usage:
+    python -m benchmarks.bench_history --calls 1000 --turns 50 --polls 200
+"""
+import argparse
+import logging
+import time
+import tracemalloc
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.common import FakeVoiceService, summarize
+from history_log import HistoryLog
+from models import CallHistory
+from speech_pipeline import SpeechPipeline
+
+QUESTION = "How much does the bootcamp cost and what does it cover?"
+ANSWER = ("The AI Mastery Bootcamp is a 12-week program covering machine learning, LLMs and MLOps. "
+          "Today it is $299 with a 30-day money-back guarantee.")
+
+
+def turn() -> list:
+    return [CallHistory(sender="customer", text=QUESTION, timestamp=datetime.now()),
+            CallHistory(sender="agent", text=ANSWER, timestamp=datetime.now())]
+
+
+def heap_per_1k_turns(build, calls: int, turns: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [build(turns) for _ in range(calls)]
+    grown = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del held
+    return grown / (calls * turns) * 1000
+
+
+def model_history(turns: int) -> list:
+    history = []
+    for _ in range(turns):
+        history.extend(turn())
+    return history
+
+
+def log_history(turns: int) -> HistoryLog:
+    log = HistoryLog()
+    for _ in range(turns):
+        log.extend(turn())
+    return log
+
+
+def export_seconds(export, repeat: int = 200) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        export()
+    return (time.perf_counter() - started) / repeat
+
+
+def poll(client, call_id: str, mode: str, polls: int) -> dict:
+    latencies, sizes = [], []
+    cursor, etag = 0, None
+    for _ in range(polls):
+        if mode != "304":
+            main.call_store.append_history(call_id, turn())
+        params = {"since": cursor} if mode != "full" else {"offset": 0, "limit": 1000}
+        headers = {"If-None-Match": etag} if etag and mode == "304" else {}
+        started = time.perf_counter()
+        response = client.get(f"/conversation/{call_id}", params=params, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        sizes.append(len(response.content))
+        if response.status_code == 200:
+            cursor, etag = response.json()["cursor"], response.headers["etag"]
+    return {**summarize(latencies), "bytes": sum(sizes) / len(sizes)}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--polls", type=int, default=200)
+    args = parser.parse_args()
+
+    models = heap_per_1k_turns(model_history, args.calls, args.turns)
+    compact = heap_per_1k_turns(log_history, args.calls, args.turns)
+    print(f"{args.calls} calls x {args.turns} turns: heap per 1k turns (2k entries, texts shared)")
+    print(f"  CallHistory models  {models / 1024:8.1f} KB")
+    print(f"  HistoryLog          {compact / 1024:8.1f} KB  ({models / compact:.1f}x smaller)")
+
+    history = model_history(args.turns)
+    log = HistoryLog(history)
+    old = export_seconds(lambda: [
+        {"sender": h.sender, "text": h.text, "timestamp": h.timestamp.isoformat()} for h in history
+    ])
+    new = export_seconds(log.rows)
+    print(f"export of a {args.turns}-turn transcript: models {old * 1000:.3f} ms, HistoryLog {new * 1000:.3f} ms")
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    main.speech_pipeline = SpeechPipeline(FakeVoiceService(0.0), max_workers=1)
+    client = TestClient(main.app)
+    print(f"/conversation polls on a call with {args.turns} turns already, one new turn per poll")
+    for mode in ("full", "since", "304"):
+        call_id = client.post("/start-call", json={"customer_name": "Bench", "phone_number": "1"}).json()["call_id"]
+        for _ in range(args.turns):
+            main.call_store.append_history(call_id, turn())
+        if mode == "304":
+            poll(client, call_id, "since", 1)  # catch up once
+        s = poll(client, call_id, mode, args.polls)
+        print(f"  {mode:<6} p50 {s['p50_ms']:7.3f} ms  p95 {s['p95_ms']:7.3f} ms  {s['bytes'] / 1024:8.1f} KB/poll")
+    main.speech_pipeline.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    main_cli()
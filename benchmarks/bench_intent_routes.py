@@ -0,0 +1,133 @@
+"""Per-request CPU time and latency of intent-routed RAG answers versus full retrieval.
+
+Builds the real RAG chain (LLMService._install_vector_store) over the bundled
+knowledge base, split as in production. The embedding model is the stand-in
+from bench_query_batching, which burns --call-ms of CPU per forward pass plus
+--item-ms per text (pass --model for all-MiniLM-L6-v2). The LLM is a fake
+that takes --llm-ms. Each request asks a distinct question, so the query
+batcher's vector cache never answers from memory, and the response cache is
+off. Requests run one at a time, so process CPU time per request is that
+request's own:
+
+  routed     questions about price, schedule, curriculum, career or
+             certificate, answered from the precomputed intent contexts
+  retrieval  the same questions with RAG_INTENT_ROUTES=off: embedding plus
+             FAISS search per request
+  unrouted   questions that match no routed intent (full retrieval, plus the
+             cost of trying to route them)
+
+Also counts the distinct prompt prefixes (everything before the conversation)
+sent to the LLM: a provider-side prompt cache can only reuse a shared prefix.
+
+Usage:
+    python -m benchmarks.bench_intent_routes --requests 200 --llm-ms 50
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from langchain.prompts import ChatPromptTemplate
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.chat_models.fake import FakeListChatModel
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.bench_query_batching import StandInEncoder
+from benchmarks.common import summarize
+from knowledge_index import KNOWLEDGE_DIR
+from llm_service import LLMService
+from query_batcher import QueryBatcher
+
+ROUTED = ["How much does it cost", "Can I afford the price", "How many hours a week, I'm busy",
+          "What topics are in the curriculum", "Will you help me find a job", "Do I get a certificate"]
+UNROUTED = ["Who are the mentors", "Is there a student community", "Which programming language do you use",
+            "Can I pause and resume later"]
+
+
+class SlowFakeChat(FakeListChatModel):
+    """Fake chat model that waits like a remote LLM and keeps the prompt prefixes it saw"""
+
+    delay: float = 0.05
+    prefixes: set = set()
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prefixes.add(messages[0].content.split("CONVERSATION SO FAR:")[0])
+        time.sleep(self.delay)
+        return super()._call(messages, stop, run_manager, **kwargs)
+
+
+def build_service(embeddings, llm) -> LLMService:
+    documents = []
+    for name in sorted(os.listdir(KNOWLEDGE_DIR)):
+        with open(os.path.join(KNOWLEDGE_DIR, name), encoding="utf-8") as f:
+            documents.append(f.read())
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    chunks = splitter.create_documents(documents)
+    vector_store = FAISS.from_documents(chunks, embeddings)
+
+    service = LLMService()
+    service.llm = llm
+    service.prompt = ChatPromptTemplate.from_template(service.RAG_PROMPT_TEMPLATE)
+    service.response_cache = None
+    service.query_batcher = QueryBatcher(embeddings.embed_documents)
+    service._install_vector_store(vector_store)
+    service.rag_enabled = True
+    service.rag_state = "ready"
+    return service
+
+
+async def run_mode(service: LLMService, llm, questions, requests: int, tag: str) -> dict:
+    llm.prefixes.clear()
+    cpu, latencies = [], []
+    for i in range(requests):
+        question = f"{questions[i % len(questions)]} ({tag} caller {i})?"
+        cpu_started, started = time.process_time(), time.perf_counter()
+        await service.aget_rag_response(question)
+        latencies.append(time.perf_counter() - started)
+        cpu.append(time.process_time() - cpu_started)
+    return {"cpu": summarize(cpu), "latency": summarize(latencies), "prefixes": len(llm.prefixes)}
+
+
+async def run(args) -> dict:
+    if args.model:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2", model_kwargs={"device": "cpu"},
+                                           encode_kwargs={"normalize_embeddings": True})
+    else:
+        embeddings = StandInEncoder(args.call_ms / 1000.0, args.item_ms / 1000.0)
+    llm = SlowFakeChat(responses=["The bootcamp costs $299 today."], delay=args.llm_ms / 1000.0)
+    service = build_service(embeddings, llm)
+    routes = service.intent_routes
+
+    results = {"routed": await run_mode(service, llm, ROUTED, args.requests, "routed")}
+    service.intent_routes = None
+    results["retrieval"] = await run_mode(service, llm, ROUTED, args.requests, "retrieval")
+    service.intent_routes = routes
+    results["unrouted"] = await run_mode(service, llm, UNROUTED, args.requests, "unrouted")
+    results["routes"] = routes.stats()
+    service.query_batcher.close()
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--llm-ms", type=float, default=50)
+    parser.add_argument("--call-ms", type=float, default=4.0)
+    parser.add_argument("--item-ms", type=float, default=0.5)
+    parser.add_argument("--model", action="store_true", help="use all-MiniLM-L6-v2 instead of the stand-in")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    encoder = "all-MiniLM-L6-v2" if args.model else f"stand-in encoder ({args.call_ms:g}+{args.item_ms:g} ms)"
+    print(f"{args.requests} requests per mode, {encoder}, LLM {args.llm_ms:.0f} ms")
+    print(f"{'mode':<10} {'cpu p50':>9} {'cpu mean':>9} {'lat p50':>9} {'lat p95':>9} {'prefixes':>9}")
+    for mode in ("routed", "retrieval", "unrouted"):
+        cpu, latency = results[mode]["cpu"], results[mode]["latency"]
+        print(f"{mode:<10} {cpu['p50_ms']:>7.2f}ms {cpu['mean_ms']:>7.2f}ms {latency['p50_ms']:>7.1f}ms "
+              f"{latency['p95_ms']:>7.1f}ms {results[mode]['prefixes']:>9}")
+    print(f"routed share over all modes: {results['routes']['routed_share']:.0%}")
+
+
+if __name__ == "__main__":
+    main_cli()
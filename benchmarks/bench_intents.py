@@ -0,0 +1,111 @@
+"""Per-message cost of the rule-based intent matcher.
+
+Compares the original chain of `any(word in message_lower ...)` scans
+(fallback reply plus a separate should_end_call scan) with the compiled
+IntentMatcher, which does both in one regex pass, over a synthetic corpus of
+caller utterances. Also reports how often the two pick the same reply.
+
+The legacy cost grows with every keyword added to the rules, while the
+compiled matcher's cost depends only on message length; --scale repeats the
+run with the intent table padded by extra synthetic intents.
+
+Usage:
+    python -m benchmarks.bench_intents --messages 200000 --scale 1 4 16
+"""
+import argparse
+import random
+import time
+
+from intent_matcher import IntentMatcher
+from llm_service import INTENTS_FILE, LLMService
+
+LEGACY_RULES = [
+    ("price", ["expensive", "cost", "price", "money", "afford"]),
+    ("time", ["time", "busy", "schedule", "work"]),
+    ("experience", ["already", "took", "course", "learned", "experience"]),
+    ("not_interested", ["not interested", "no thanks", "goodbye", "not now"]),
+    ("interested", ["tell me more", "details", "interested", "yes", "learn", "course"]),
+    ("career", ["job", "career", "employment", "hire", "work"]),
+    ("certificate", ["certificate", "certification", "credential"]),
+    ("curriculum", ["curriculum", "syllabus", "topics", "learn", "cover"]),
+]
+LEGACY_END_PHRASES = [
+    "not interested", "no thanks", "goodbye", "stop calling",
+    "remove me", "don't call", "not now", "maybe later"
+]
+
+FILLER = ("i", "the", "a", "well", "so", "um", "really", "you", "know", "about", "this", "program",
+          "what", "is", "it", "my", "for", "me", "can", "we", "maybe", "python", "data", "team")
+PHRASES = [k for _, words in LEGACY_RULES for k in words] + LEGACY_END_PHRASES
+
+
+def legacy_reply_and_end(message, rules=LEGACY_RULES):
+    message_lower = message.lower()
+    intent = "default"
+    for name, words in rules:
+        if any(word in message_lower for word in words):
+            intent = name
+            break
+    ends = any(phrase in message.lower() for phrase in LEGACY_END_PHRASES)
+    return intent, ends
+
+
+def padded_rules(scale, seed=11):
+    """The real rules plus (scale - 1) times as many synthetic intents that never match"""
+    rng = random.Random(seed)
+    rules = list(LEGACY_RULES)
+    for i in range((scale - 1) * len(LEGACY_RULES)):
+        keywords = ["".join(rng.choice("bcdfghjklmnpqrstvwxz") for _ in range(rng.randint(5, 9))) for _ in range(6)]
+        rules.append((f"synthetic_{i}", keywords))
+    return rules
+
+
+def make_corpus(n, seed=7):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(4, 20))]
+        for _ in range(rng.choice((0, 0, 1, 1, 2))):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(PHRASES))
+        corpus.append(" ".join(words).capitalize() + rng.choice((".", "?", "!")))
+    return corpus
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.messages)
+    replies = LLMService.FALLBACK_RESPONSES
+
+    print(f"{'matcher':<12}{'keywords':>10}{'us/message':>12}{'messages/s':>14}")
+    for scale in args.scale:
+        rules = padded_rules(scale)
+        if scale == 1:
+            matcher = IntentMatcher.from_file(INTENTS_FILE)
+        else:
+            intents = [{"name": name, "priority": -i, "keywords": words} for i, (name, words) in enumerate(rules)]
+            matcher = IntentMatcher(intents, LEGACY_END_PHRASES)
+        keywords = sum(len(words) for _, words in rules) + len(LEGACY_END_PHRASES)
+
+        started = time.perf_counter()
+        legacy = [legacy_reply_and_end(m, rules) for m in corpus]
+        legacy_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        compiled = [matcher.match(m) for m in corpus]
+        compiled_s = time.perf_counter() - started
+
+        print(f"{'legacy':<12}{keywords:>10}{legacy_s / len(corpus) * 1e6:>12.2f}{len(corpus) / legacy_s:>14.0f}")
+        print(f"{'compiled':<12}{keywords:>10}{compiled_s / len(corpus) * 1e6:>12.2f}{len(corpus) / compiled_s:>14.0f}")
+        if scale == 1:
+            same = sum(
+                replies.get(old[0]) == replies.get(new.top or "default") and old[1] == new.ends_call
+                for old, new in zip(legacy, compiled)
+            )
+            print(f"same reply and end-call decision: {same / len(corpus):.1%}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,128 @@
+"""Cost of a knowledge-base update: full rebuild vs incremental re-index.
+
+Builds a synthetic knowledge directory of --docs program documents, then
+applies three edits (add one document, edit one, delete one) and times:
+
+  full         rebuild the whole index from scratch (what a restart did before)
+  incremental  KnowledgeBase.refresh(), which only re-embeds the touched documents
+
+The embedding model is replaced by a fake that sleeps --embed-ms per chunk,
+so the numbers reflect how many chunks each strategy embeds rather than the
+speed of this machine's CPU. While the incremental update runs, a reader
+thread keeps searching the published index to show it is never blocked.
+
+Usage:
+    python -m benchmarks.bench_knowledge_reload --docs 40 --embed-ms 5
+"""
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from knowledge_index import KnowledgeBase
+from benchmarks.common import summarize
+
+CONFIG = {"chunk_size": 400, "chunk_overlap": 40, "embedding_model": "bench"}
+
+
+class SlowEmbedding(DeterministicFakeEmbedding):
+    """Deterministic embeddings that cost embed_seconds per chunk, like a real model"""
+    embed_seconds: float = 0.005
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        time.sleep(self.embed_seconds * len(texts))
+        return super().embed_documents(texts)
+
+
+def program_document(i: int, revision: int = 0) -> str:
+    paragraphs = [
+        f"Program {i} (revision {revision}) is a {4 + i % 12}-week course in topic {i}. "
+        f"The regular price is ${199 + i} and the current offer is ${149 + i}."
+    ]
+    for week in range(1, 13):
+        paragraphs.append(
+            f"Week {week} of program {i} covers module {week}: lectures, a graded project, "
+            f"mentor office hours and a quiz on the material from the previous weeks."
+        )
+    return "\n\n".join(paragraphs)
+
+
+def make_kb(docs_dir, index_dir, embed_seconds):
+    embeddings = SlowEmbedding(size=64, embed_seconds=embed_seconds)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CONFIG["chunk_size"], chunk_overlap=CONFIG["chunk_overlap"])
+    kb = KnowledgeBase(embeddings, CONFIG, docs_dir=str(docs_dir), index_dir=str(index_dir),
+                       splitter=splitter, use_embedding_cache=False)
+    return kb, embeddings
+
+
+def apply_edits(docs_dir: Path, n_docs: int):
+    (docs_dir / f"program_{n_docs}.txt").write_text(program_document(n_docs))
+    (docs_dir / "program_1.txt").write_text(program_document(1, revision=1))
+    (docs_dir / "program_2.txt").unlink()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=40)
+    parser.add_argument("--embed-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    embed_seconds = args.embed_ms / 1000.0
+
+    work = Path(tempfile.mkdtemp(prefix="kb-bench-"))
+    try:
+        docs_dir = work / "docs"
+        docs_dir.mkdir()
+        for i in range(args.docs):
+            (docs_dir / f"program_{i}.txt").write_text(program_document(i))
+
+        kb, embeddings = make_kb(docs_dir, work / "index", embed_seconds)
+        kb.load_or_build()
+        print(f"Knowledge base: {args.docs} documents, {kb.vector_store.index.ntotal} chunks, "
+              f"{args.embed_ms}ms per embedded chunk")
+
+        apply_edits(docs_dir, args.docs)
+
+        # Incremental, with a reader searching whatever index is currently published
+        latencies = []
+        stop = threading.Event()
+
+        def reader():
+            while not stop.is_set():
+                started = time.perf_counter()
+                kb.vector_store.similarity_search("price of program 7", k=2)
+                latencies.append(time.perf_counter() - started)
+
+        thread = threading.Thread(target=reader, daemon=True)
+        thread.start()
+        embeddings.embedded = 0
+        result = kb.refresh()
+        stop.set()
+        thread.join()
+        incremental = {"seconds": result["seconds"], "embedded": embeddings.embedded}
+
+        # Full rebuild of the same edited directory from an empty index
+        full_kb, full_embeddings = make_kb(docs_dir, work / "index-full", embed_seconds)
+        started = time.perf_counter()
+        full_kb.load_or_build()
+        full = {"seconds": round(time.perf_counter() - started, 3), "embedded": full_embeddings.embedded}
+
+        assert full_kb.vector_store.index.ntotal == kb.vector_store.index.ntotal
+        print(f"{'strategy':<12} {'seconds':>9} {'chunks embedded':>16}")
+        print(f"{'full':<12} {full['seconds']:>9.3f} {full['embedded']:>16}")
+        print(f"{'incremental':<12} {incremental['seconds']:>9.3f} {incremental['embedded']:>16}")
+        if incremental["seconds"] > 0:
+            print(f"Speedup: {full['seconds'] / incremental['seconds']:.1f}x")
+        print(f"Searches during the incremental update: {summarize(latencies)}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main_cli()
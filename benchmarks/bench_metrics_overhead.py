@@ -0,0 +1,79 @@
+"""Overhead of metrics, tracing and request IDs on the rule-based /respond path.
+
+Runs main.app in-process (stand-in voice service, no audio) and sends
+--turns rule-based turns per round, alternating rounds with instrumentation
+on and off (metrics.set_enabled) so drift affects both equally. Reports the
+per-turn latency of each and the relative overhead, plus the raw cost of one
+stage() timer.
+
+Usage:
+    python -m benchmarks.bench_metrics_overhead --rounds 10 --turns 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+import main
+import metrics
+from benchmarks.common import FakeVoiceService, summarize
+from speech_pipeline import SpeechPipeline
+
+MESSAGES = ["How much does it cost?", "I don't have time", "Tell me about the curriculum",
+            "Do I get a certificate?", "What about job placement?"]
+
+
+async def run_round(client, turns):
+    r = await client.post("/start-call", json={"customer_name": "Bench", "phone_number": "1"})
+    call_id = r.json()["call_id"]
+    latencies = []
+    for i in range(turns):
+        started = time.perf_counter()
+        r = await client.post(f"/respond/{call_id}", json={"message": MESSAGES[i % len(MESSAGES)]})
+        latencies.append(time.perf_counter() - started)
+        r.raise_for_status()
+    return latencies
+
+
+async def run(args):
+    main.speech_pipeline = SpeechPipeline(FakeVoiceService(0.0), max_workers=2, max_pending=100000)
+    results = {True: [], False: []}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await run_round(client, args.turns)  # warm-up
+        for i in range(args.rounds * 2):
+            enabled = i % 2 == 0
+            metrics.set_enabled(enabled)
+            results[enabled] += await run_round(client, args.turns)
+    metrics.set_enabled(True)
+    main.speech_pipeline.shutdown(wait=True)
+    return results
+
+
+def stage_cost(iterations=200000) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with metrics.stage("bench"):
+            pass
+    return (time.perf_counter() - started) / iterations
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    on, off = summarize(results[True]), summarize(results[False])
+    print(f"{'metrics':<8} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    print(f"{'off':<8} {off['mean_ms']:>9.3f} {off['p50_ms']:>9.3f} {off['p99_ms']:>9.3f}")
+    print(f"{'on':<8} {on['mean_ms']:>9.3f} {on['p50_ms']:>9.3f} {on['p99_ms']:>9.3f}")
+    overhead = (statistics.median(results[True]) / statistics.median(results[False]) - 1) * 100
+    print(f"Overhead (p50): {overhead:+.1f}%   one stage() timer: {stage_cost() * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main_cli()
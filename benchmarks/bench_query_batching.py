@@ -0,0 +1,124 @@
+"""Throughput and latency of RAG retrieval with and without query micro-batching.
+
+Searches a FAISS index of --chunks synthetic chunks with --queries distinct
+questions at each concurrency level in --concurrency and compares:
+
+  unbatched  one embed + one FAISS search per query on the default thread pool
+             (what the LangChain retriever's ainvoke() does)
+  batched    QueryBatcher.asearch(): queries arriving within --window-ms share
+             one embed_documents() call and one FAISS search
+
+The embedding model is replaced by a stand-in that burns CPU for --call-ms
+per forward pass plus --item-ms per query, which is the shape of a small
+transformer like all-MiniLM-L6-v2 on CPU: a fixed cost per call that
+batching amortizes. Pass --model to use the real HuggingFace model instead
+(needs sentence-transformers and the model download).
+
+Usage:
+    python -m benchmarks.bench_query_batching --concurrency 1 8 64 --queries 256
+"""
+import argparse
+import asyncio
+import hashlib
+import time
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.common import summarize
+from query_batcher import QueryBatcher
+
+
+class StandInEncoder(Embeddings):
+    """Deterministic 384-d unit vectors that cost call_s per call plus item_s per text of CPU time"""
+
+    def __init__(self, call_s: float, item_s: float, dim: int = 384):
+        self.call_s = call_s
+        self.item_s = item_s
+        self.dim = dim
+        self.calls = 0
+
+    def _vector(self, text: str) -> list:
+        seed = int.from_bytes(hashlib.sha1(text.encode()).digest()[:4], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        deadline = time.perf_counter() + self.call_s + self.item_s * len(texts)
+        while time.perf_counter() < deadline:  # CPU-bound like a forward pass, unlike sleep()
+            pass
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+async def run_level(search, questions, concurrency):
+    latencies = []
+    pending = iter(questions)
+
+    async def worker():
+        for question in pending:
+            started = time.perf_counter()
+            docs = await search(question)
+            latencies.append(time.perf_counter() - started)
+            assert docs
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"qps": len(questions) / elapsed, **summarize(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--window-ms", type=float, default=3.0)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--call-ms", type=float, default=4.0)
+    parser.add_argument("--item-ms", type=float, default=0.5)
+    parser.add_argument("--model", action="store_true", help="use all-MiniLM-L6-v2 instead of the stand-in")
+    args = parser.parse_args()
+
+    if args.model:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2", model_kwargs={"device": "cpu"},
+                                           encode_kwargs={"normalize_embeddings": True})
+    else:
+        embeddings = StandInEncoder(args.call_ms / 1000.0, args.item_ms / 1000.0)
+
+    texts = [f"Program {i} covers topic {i % 37} over {4 + i % 12} weeks for ${99 + i % 400}." for i in range(args.chunks)]
+    # The index itself is built without the per-call cost; only query-time embedding is measured
+    indexer = embeddings if args.model else StandInEncoder(0, 0)
+    store = FAISS.from_embeddings(list(zip(texts, indexer.embed_documents(texts))), embeddings)
+    print(f"Index: {store.index.ntotal} chunks, {'all-MiniLM-L6-v2' if args.model else 'stand-in encoder'}, "
+          f"k={args.k}, {args.queries} queries per level")
+
+    async def unbatched(question):
+        return await asyncio.to_thread(store.similarity_search, question, args.k)
+
+    print(f"{'mode':<10} {'conc':>5} {'qps':>9} {'p50 ms':>9} {'p99 ms':>9} {'mean batch':>11}")
+    for concurrency in args.concurrency:
+        # Distinct questions per run, so the batcher's vector LRU never answers from memory
+        questions = [f"c{concurrency} question {i}: which program covers topic {i % 37}?"
+                     for i in range(args.queries)]
+        result = asyncio.run(run_level(unbatched, questions, concurrency))
+        print(f"{'unbatched':<10} {concurrency:>5} {result['qps']:>9.1f} {result['p50_ms']:>9.2f} "
+              f"{result['p99_ms']:>9.2f} {1.0:>11.2f}")
+
+        batcher = QueryBatcher(embeddings.embed_documents, window_ms=args.window_ms, max_batch=args.max_batch)
+        batcher.vector_store = store
+        questions = [f"b{q}" for q in questions]
+        result = asyncio.run(run_level(lambda q: batcher.asearch(q, args.k), questions, concurrency))
+        batcher.close()
+        print(f"{'batched':<10} {concurrency:>5} {result['qps']:>9.1f} {result['p50_ms']:>9.2f} "
+              f"{result['p99_ms']:>9.2f} {batcher.stats()['mean_batch']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
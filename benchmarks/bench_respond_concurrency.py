@@ -0,0 +1,66 @@
+"""Concurrency benchmark for POST /respond/{call_id}.
+
+Runs main.app in-process with a stand-in voice service whose text-to-speech
+sleeps for a fixed time, fires N simultaneous calls and reports latency
+percentiles for background speech versus the old inline behaviour.
+
+Usage:
+    python -m benchmarks.bench_respond_concurrency --calls 1 8 32 --tts-seconds 0.5
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+import main
+from benchmarks.common import FakeVoiceService, summarize
+from speech_pipeline import SpeechPipeline
+
+
+async def run_round(concurrency: int) -> list:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        call_ids = []
+        for i in range(concurrency):
+            r = await client.post("/start-call", json={"customer_name": f"Lead {i}", "phone_number": str(i)})
+            call_ids.append(r.json()["call_id"])
+
+        # All requests arrive together, so latency is measured from the burst start
+        started = time.perf_counter()
+
+        async def one(call_id):
+            r = await client.post(f"/respond/{call_id}", json={"message": "Tell me more about the price"})
+            r.raise_for_status()
+            return time.perf_counter() - started
+
+        return await asyncio.gather(*(one(c) for c in call_ids))
+
+
+def bench(mode: str, concurrency: int, tts_seconds: float, workers: int) -> dict:
+    voice = FakeVoiceService(tts_seconds)
+    pipeline = SpeechPipeline(voice, max_workers=0 if mode == "inline" else workers, max_pending=10000)
+    main.speech_pipeline = pipeline
+    try:
+        latencies = asyncio.run(run_round(concurrency))
+    finally:
+        pipeline.shutdown(wait=False)
+    return summarize(latencies)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--tts-seconds", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'calls':>7}{'p50 ms':>12}{'p99 ms':>12}{'max ms':>12}")
+    for concurrency in args.calls:
+        for mode in ("inline", "background"):
+            result = bench(mode, concurrency, args.tts_seconds, args.workers)
+            print(f"{mode:<10}{concurrency:>7}{result['p50_ms']:>12.1f}{result['p99_ms']:>12.1f}{result['max_ms']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,94 @@
+"""Startup-time benchmark for CI: import time and time-to-first-200.
+
+Measures how long `import main` takes in a fresh interpreter, how long after
+spawning uvicorn the first request to /api succeeds, and (with --wait-rag)
+how long until /rag-status leaves the warming state. Results are printed and
+optionally written as JSON; --max-first-200 fails the run when startup
+regresses past a budget.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 3 --json startup.json --max-first-200 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import free_port
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def measure_import() -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def measure_first_200(wait_rag: bool, timeout: float = 300) -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    result = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            deadline = started + timeout
+            while "first_200_s" not in result and time.perf_counter() < deadline:
+                try:
+                    if client.get("/api").status_code == 200:
+                        result["first_200_s"] = time.perf_counter() - started
+                except httpx.HTTPError:
+                    time.sleep(0.02)
+
+            while wait_rag and time.perf_counter() < deadline:
+                status = client.get("/rag-status").json()
+                if status.get("state") not in ("idle", "warming"):
+                    result["rag_state"] = status.get("state")
+                    result["rag_ready_s"] = time.perf_counter() - started
+                    break
+                time.sleep(0.1)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return result
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--wait-rag", action="store_true", help="also time until RAG warm-up finishes")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--max-first-200", type=float, help="fail if median time-to-first-200 exceeds this (s)")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    servers = [measure_first_200(args.wait_rag) for _ in range(args.runs)]
+    first_200 = [s["first_200_s"] for s in servers if "first_200_s" in s]
+
+    results = {
+        "import_s": {"median": statistics.median(imports), "min": min(imports)},
+        "first_200_s": {"median": statistics.median(first_200), "min": min(first_200)} if first_200 else None,
+    }
+    rag_ready = [s["rag_ready_s"] for s in servers if "rag_ready_s" in s]
+    if rag_ready:
+        results["rag_ready_s"] = {"median": statistics.median(rag_ready), "state": servers[-1]["rag_state"]}
+
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if not first_200:
+        sys.exit("server never answered")
+    if args.max_first_200 is not None and results["first_200_s"]["median"] > args.max_first_200:
+        sys.exit(f"time-to-first-200 {results['first_200_s']['median']:.2f}s exceeds budget {args.max_first_200}s")
+
+
+if __name__ == "__main__":
+    main_cli()
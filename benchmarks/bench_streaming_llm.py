@@ -0,0 +1,146 @@
+"""Time-to-first-token and event-loop lag of the RAG reply paths.
+
+Serves main.app with uvicorn on the benchmark's own event loop, replaces the
+retrieval chain with a fake LLM (--first-token-ms, then one token every
+--token-ms) and sends N simultaneous RAG turns through:
+
+  blocking  the old handler: synchronous retrieval_chain.invoke() inside async def
+  async     POST /respond-rag/{call_id} awaiting retrieval_chain.ainvoke()
+  stream    POST /respond-rag/{call_id}/stream (server-sent events from astream())
+
+For each mode it reports when the first token (or, for the non-streaming
+modes, the whole reply) reached the client and how late a 10ms ticker on the
+server's event loop ran while the turns were in flight.
+
+Usage:
+    python -m benchmarks.bench_streaming_llm --calls 8 --first-token-ms 300 --token-ms 20
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+import uvicorn
+
+import main
+from benchmarks.common import FakeStreamingChain, FakeVoiceService, free_port, summarize
+from speech_pipeline import SpeechPipeline
+
+ANSWER = ("The AI Mastery Bootcamp is a 12-week program covering machine learning, LLMs and MLOps. "
+          "The regular price is $499, but today it is $299 with a 30-day money-back guarantee. "
+          "Would you like to hear about the curriculum?")
+TICK_S = 0.01
+
+
+async def probe_lag(lags: list, stop: asyncio.Event):
+    """Record how late each TICK_S sleep wakes up; large values mean the loop was blocked"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK_S
+        await asyncio.sleep(TICK_S)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def one_turn(client: httpx.AsyncClient, mode: str, started: asyncio.Event) -> dict:
+    r = await client.post("/start-call", json={"customer_name": "Lead", "phone_number": "1"})
+    call_id = r.json()["call_id"]
+    body = {"message": "How much does the bootcamp cost?"}
+    await started.wait()
+    begin = time.perf_counter()
+
+    if mode != "stream":
+        r = await client.post(f"/respond-rag/{call_id}", json=body)
+        r.raise_for_status()
+        done = time.perf_counter() - begin
+        return {"first": done, "total": done, "reply": r.json()["reply"]}
+
+    first = None
+    reply = None
+    async with client.stream("POST", f"/respond-rag/{call_id}/stream", json=body) as r:
+        r.raise_for_status()
+        event = None
+        async for line in r.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                if event == "token" and first is None:
+                    first = time.perf_counter() - begin
+                elif event == "done":
+                    reply = json.loads(line[6:])["reply"]
+    return {"first": first, "total": time.perf_counter() - begin, "reply": reply}
+
+
+async def _as_coroutine(value):
+    return value
+
+
+async def run_mode(mode: str, calls: int, port: int) -> dict:
+    started = asyncio.Event()
+    if mode == "blocking":
+        # What the handlers did before: the sync chain call runs on the event loop
+        main.llm_service.aget_rag_response = lambda message, context=None: _as_coroutine(
+            main.llm_service.get_rag_response(message, context))
+    else:
+        main.llm_service.__dict__.pop("aget_rag_response", None)
+
+    lags = []
+    stop = asyncio.Event()
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+        turns = [asyncio.create_task(one_turn(client, mode, started)) for _ in range(calls)]
+        await asyncio.sleep(0.2)  # let every call start before the burst
+        ticker = asyncio.create_task(probe_lag(lags, stop))
+        started.set()
+        results = await asyncio.gather(*turns)
+        stop.set()
+        await ticker
+
+    assert all(r["reply"] == ANSWER for r in results), "unexpected reply"
+    return {
+        "first": summarize([r["first"] for r in results]),
+        "total": summarize([r["total"] for r in results]),
+        "lag": summarize(lags),
+    }
+
+
+async def run(args) -> dict:
+    chain = FakeStreamingChain(ANSWER, args.first_token_ms / 1000.0, args.token_ms / 1000.0)
+    service = main.llm_service
+    service.rag_enabled = True
+    service.rag_state = "ready"
+    service.retrieval_chain = chain
+    service.response_cache = None  # every turn goes to the (fake) LLM
+    main.voice_service = FakeVoiceService(0.0)
+    main.speech_pipeline = SpeechPipeline(main.voice_service, max_workers=2, max_pending=10000)
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning",
+                                           timeout_keep_alive=120))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        return {mode: await run_mode(mode, args.calls, port) for mode in ("blocking", "async", "stream")}
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=8)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{args.calls} simultaneous RAG turns, fake LLM: {args.first_token_ms:.0f}ms to first token, "
+          f"{args.token_ms:.0f}ms per token")
+    print(f"{'mode':<10}{'first p50':>11}{'first p99':>11}{'total p99':>11}{'lag p99':>10}{'lag max':>10}  (ms)")
+    for mode, r in results.items():
+        print(f"{mode:<10}{r['first']['p50_ms']:>11.1f}{r['first']['p99_ms']:>11.1f}{r['total']['p99_ms']:>11.1f}"
+              f"{r['lag']['p99_ms']:>10.1f}{r['lag']['max_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,71 @@
+"""Time-to-first-audio for whole-utterance vs sentence-streamed text-to-speech.
+
+Uses a local stand-in synthesizer (fixed round-trip plus per-character cost)
+and a stand-in player (sleeps for the clip's spoken duration), so it runs
+offline. Replies are the canned rule-based answers; the token-stream rows feed
+the same replies through a fake LLM that emits a few characters at a time.
+
+Usage:
+    python -m benchmarks.bench_streaming_tts --speedup 10
+"""
+import argparse
+import statistics
+import time
+
+from llm_service import LLMService
+from speech_streaming import sentences_from_tokens, speak_pipelined, split_sentences
+
+
+def make_stand_ins(args):
+    def synthesize(text):
+        time.sleep((args.synth_overhead + args.synth_per_char * len(text)) / args.speedup)
+        return text.encode("utf-8")
+
+    def play(audio):
+        time.sleep(len(audio) / args.chars_per_second / args.speedup)
+        return True
+
+    return synthesize, play
+
+
+def fake_tokens(text, args):
+    for i in range(0, len(text), 4):
+        time.sleep(args.token_seconds / args.speedup)
+        yield text[i:i + 4]
+
+
+def whole_reply(text, args):
+    # Wait for the last token before synthesizing anything, like the current RAG path
+    yield "".join(fake_tokens(text, args))
+
+
+def run(label, runs, args):
+    ttfa = [r["first_audio_s"] * args.speedup for r in runs]
+    total = [r["total_s"] * args.speedup for r in runs]
+    print(f"{label:<28}{statistics.fmean(ttfa):>12.2f}{max(ttfa):>12.2f}{statistics.fmean(total):>12.2f}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--speedup", type=float, default=10.0, help="divide all sleeps by this factor")
+    parser.add_argument("--synth-overhead", type=float, default=0.25, help="seconds per synthesis request")
+    parser.add_argument("--synth-per-char", type=float, default=0.004, help="seconds per character synthesized")
+    parser.add_argument("--chars-per-second", type=float, default=15.0, help="speaking rate")
+    parser.add_argument("--token-seconds", type=float, default=0.02, help="delay between streamed tokens")
+    args = parser.parse_args()
+
+    synthesize, play = make_stand_ins(args)
+    replies = list(LLMService.FALLBACK_RESPONSES.values())
+
+    print("Times in seconds, scaled back to real time")
+    print(f"{'path':<28}{'ttfa mean':>12}{'ttfa max':>12}{'total mean':>12}")
+    run("whole utterance", [speak_pipelined([r], synthesize, play) for r in replies], args)
+    run("sentence streamed", [speak_pipelined(split_sentences(r), synthesize, play) for r in replies], args)
+    run("tokens -> whole utterance",
+        [speak_pipelined(whole_reply(r, args), synthesize, play) for r in replies], args)
+    run("tokens -> sentence streamed",
+        [speak_pipelined(sentences_from_tokens(fake_tokens(r, args)), synthesize, play) for r in replies], args)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,213 @@
+"""Speech-to-text latency per second of audio on CPU, plus ambient-calibration cost.
+
+Transcribes the WAV fixtures in benchmarks/fixtures/stt (16 kHz mono) with
+each engine in --engines and reports load time and recognition time per
+second of audio (a real-time factor below 1 means faster than real time).
+Engines whose package or model is missing are skipped. A fixture with a
+matching .txt transcript also gets a word error rate.
+
+The bundled fixtures are synthetic, speech-shaped signals (voiced syllables
+over a noise floor) so they can be regenerated exactly with --write-fixtures
+and need no licensing; they exercise the full decoding path but have no
+words to get right. Point --fixtures at a directory of real recordings with
+.txt transcripts to measure accuracy too.
+
+The calibration section counts how much listening time ambient-noise
+calibration costs over --turns turns spaced --turn-seconds apart, calibrating
+before every turn (the old behaviour) versus reusing it for
+STT_CALIBRATION_REFRESH_SECONDS.
+
+Usage:
+    python -m benchmarks.bench_stt --engines vosk whisper --repeats 3 --json stt.json
+    VOSK_MODEL_PATH=models/vosk-model-small-en-us-0.15 python -m benchmarks.bench_stt --engines vosk
+    python -m benchmarks.bench_stt --write-fixtures
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+import wave
+
+import speech_recognition as sr
+
+from stt_engines import SAMPLE_RATE, AmbientCalibration, GoogleSTT, VoskSTT, WhisperSTT
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "stt")
+FIXTURE_SECONDS = {"utterance_1s": 1.0, "utterance_3s": 3.0, "utterance_8s": 8.0}
+
+
+def write_fixtures(directory: str = FIXTURE_DIR, seed: int = 7):
+    """Write the synthetic fixtures: syllable-like voiced bursts with formants, pauses and a noise floor"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    for name, seconds in FIXTURE_SECONDS.items():
+        n = int(seconds * SAMPLE_RATE)
+        signal = rng.normal(0, 0.003, n)  # room noise
+        t = 0.25  # lead-in silence, like the start of a real recording
+        while t < seconds - 0.3:
+            length = rng.uniform(0.12, 0.26)
+            start, end = int(t * SAMPLE_RATE), int(min(t + length, seconds) * SAMPLE_RATE)
+            times = np.arange(end - start) / SAMPLE_RATE
+            f0 = rng.uniform(105, 145) * (1 + 0.08 * np.sin(2 * np.pi * 3 * times))
+            phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+            formants = (rng.uniform(350, 850), rng.uniform(900, 2300), rng.uniform(2400, 3200))
+            voiced = np.zeros_like(times)
+            for harmonic in range(1, 30):
+                frequency = harmonic * f0.mean()
+                gain = sum(np.exp(-((frequency - f) / 120.0) ** 2) for f in formants) + 0.02
+                voiced += gain / harmonic * np.sin(harmonic * phase)
+            envelope = np.sin(np.pi * np.linspace(0, 1, len(times))) ** 0.6
+            signal[start:end] += 0.25 * voiced / np.abs(voiced).max() * envelope
+            # Short gaps between syllables, longer ones between words
+            t += length + (rng.uniform(0.15, 0.35) if rng.random() < 0.3 else rng.uniform(0.02, 0.06))
+        pcm = (np.clip(signal, -1, 1) * 32767).astype("<i2").tobytes()
+        with wave.open(os.path.join(directory, f"{name}.wav"), "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(SAMPLE_RATE)
+            out.writeframes(pcm)
+    print(f"wrote {len(FIXTURE_SECONDS)} fixtures to {directory}")
+
+
+def load_fixture(path: str):
+    """AudioData of the whole file and its duration in seconds"""
+    with sr.AudioFile(path) as source:
+        audio = sr.Recognizer().record(source)
+        return audio, source.DURATION
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref, hyp = reference.lower().split(), hypothesis.lower().split()
+    distances = list(range(len(hyp) + 1))
+    for i, word in enumerate(ref, 1):
+        previous, distances[0] = distances[0], i
+        for j, guess in enumerate(hyp, 1):
+            previous, distances[j] = distances[j], min(distances[j] + 1, distances[j - 1] + 1,
+                                                       previous + (word != guess))
+    return distances[-1] / max(1, len(ref))
+
+
+def build_engine(name: str):
+    if name == "google":
+        return GoogleSTT()
+    if name == "vosk":
+        return VoskSTT(os.getenv("VOSK_MODEL_PATH", "models/vosk-model-small-en-us-0.15"))
+    if name == "whisper":
+        return WhisperSTT(os.getenv("WHISPER_MODEL", "tiny.en"), os.getenv("WHISPER_COMPUTE_TYPE", "int8"))
+    raise ValueError(f"Unknown engine: {name}")
+
+
+def bench_engine(name: str, fixtures: list, repeats: int) -> dict:
+    started = time.perf_counter()
+    try:
+        engine = build_engine(name)
+    except Exception as e:
+        return {"engine": name, "skipped": f"{type(e).__name__}: {e}"}
+    result = {"engine": name, "load_s": round(time.perf_counter() - started, 3), "fixtures": []}
+
+    for path in fixtures:
+        audio, duration = load_fixture(path)
+        timings, text, error = [], "", None
+        for _ in range(repeats):
+            started = time.perf_counter()
+            try:
+                text = engine.transcribe(audio)
+            except sr.UnknownValueError:
+                text = ""  # nothing recognized still costs a full decode
+            except sr.RequestError as e:
+                error = str(e)
+                break
+            timings.append(time.perf_counter() - started)
+        entry = {"fixture": os.path.basename(path), "audio_s": round(duration, 2), "text": text}
+        if error:
+            entry["error"] = error
+        if timings:
+            seconds = statistics.median(timings)
+            entry.update(decode_ms=round(seconds * 1000, 1), ms_per_audio_s=round(seconds * 1000 / duration, 1),
+                         rtf=round(seconds / duration, 3))
+        transcript = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(transcript):
+            with open(transcript) as f:
+                entry["wer"] = round(word_error_rate(f.read(), text), 3)
+        result["fixtures"].append(entry)
+    return result
+
+
+def bench_calibration(path: str, turns: int, turn_seconds: float, refresh_seconds: float, duration: float) -> dict:
+    """Listening time spent calibrating over a call, simulated on a fixture with a fake clock"""
+    counts = {}
+    for label, refresh in (("every_turn", 0.0), ("cached", refresh_seconds)):
+        now = [0.0]
+        calibration = AmbientCalibration(sr.Recognizer(), refresh_seconds=refresh, duration=duration,
+                                         clock=lambda: now[0])
+        for _ in range(turns):
+            with sr.AudioFile(path) as source:
+                calibration.calibrate(source)
+            now[0] += turn_seconds
+        counts[label] = calibration.calibrations
+    return {
+        "turns": turns,
+        "turn_seconds": turn_seconds,
+        "refresh_seconds": refresh_seconds,
+        "every_turn_s": round(counts["every_turn"] * duration, 2),
+        "cached_s": round(counts["cached"] * duration, 2),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", nargs="+", default=["vosk", "whisper"],
+                        help="google needs network access, so it only runs when listed")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--turn-seconds", type=float, default=20.0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--write-fixtures", action="store_true", help="regenerate the bundled fixtures and exit")
+    args = parser.parse_args()
+
+    if args.write_fixtures:
+        write_fixtures()
+        return
+
+    fixtures = sorted(glob.glob(os.path.join(args.fixtures, "*.wav")))
+    if not fixtures:
+        raise SystemExit(f"No .wav fixtures in {args.fixtures}")
+
+    results = {"engines": [bench_engine(name, fixtures, args.repeats) for name in args.engines]}
+    print(f"{'engine':<9}{'fixture':<20}{'audio s':>8}{'decode ms':>11}{'ms/audio s':>12}{'RTF':>8}  text")
+    for result in results["engines"]:
+        if "skipped" in result:
+            print(f"{result['engine']:<9}skipped ({result['skipped']})")
+            continue
+        print(f"{result['engine']:<9}(model load {result['load_s']}s)")
+        for entry in result["fixtures"]:
+            if "decode_ms" not in entry:
+                print(f"{'':<9}{entry['fixture']:<20}{entry['audio_s']:>8}  error: {entry.get('error')}")
+                continue
+            wer = f"  WER {entry['wer']:.2f}" if "wer" in entry else ""
+            print(f"{'':<9}{entry['fixture']:<20}{entry['audio_s']:>8}{entry['decode_ms']:>11}"
+                  f"{entry['ms_per_audio_s']:>12}{entry['rtf']:>8}  {entry['text'][:40]!r}{wer}")
+
+    calibration = bench_calibration(
+        fixtures[-1], args.turns, args.turn_seconds,
+        refresh_seconds=float(os.getenv("STT_CALIBRATION_REFRESH_SECONDS", "300")),
+        duration=float(os.getenv("STT_CALIBRATION_SECONDS", "1.0")),
+    )
+    results["calibration"] = calibration
+    print(f"\nAmbient calibration over {calibration['turns']} turns {calibration['turn_seconds']}s apart: "
+          f"{calibration['every_turn_s']}s of listening when redone every turn, "
+          f"{calibration['cached_s']}s when refreshed every {calibration['refresh_seconds']}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main_cli()
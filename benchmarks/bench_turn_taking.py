@@ -0,0 +1,232 @@
+"""Turn-taking latency of the full-duplex call session versus request/response turns, and barge-in reaction.
+
+--callers concurrent callers each speak --turns utterances (the WAV fixture
+followed by a second of silence, fed in 20ms chunks at real-time pace) into
+the real VAD and the real turn pipeline with RAG replies from a fake LLM
+(--first-token-ms, then one token every --token-ms). Synthesis is a stand-in
+that takes --tts-ms per sentence, recognition one that takes --stt-ms.
+
+  request  the request/response flow: the whole reply is generated, then its
+           first sentence synthesized (best case for server-side playback)
+  duplex   CallSession: tokens stream out and each sentence is synthesized as
+           soon as it is complete
+
+Both measure from the moment the VAD declares the end of the caller's speech
+(its end-of-speech silence is the same in both) to the first agent audio,
+in-process, so the per-turn HTTP request the old flow also pays is left out.
+
+The barge-in run has every caller start talking again --barge-ms after the
+first agent audio and reports how long it takes from the audio chunk in which
+the VAD detects that speech to the "barge_in" event (the reply's LLM stream
+and synthesis already cancelled). Detection itself needs the VAD's start_ms
+of voiced audio on top.
+
+Usage:
+    python -m benchmarks.bench_turn_taking --callers 50 --turns 2 --first-token-ms 300 --token-ms 20 --tts-ms 150
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+import main
+from audio_stream import SAMPLE_RATE, AudioSession, RecognitionPool, VoiceActivityDetector, decode_wav
+from benchmarks.common import FakeStreamingChain, FakeVoiceService, summarize
+from call_session import CallSession
+from speech_pipeline import SpeechPipeline
+from speech_streaming import split_sentences
+
+ANSWER = ("The AI Mastery Bootcamp is a 12-week program covering machine learning, LLMs and MLOps. "
+          "The regular price is $499, but today it is $299 with a 30-day money-back guarantee. "
+          "Would you like to hear about the curriculum?")
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "stt", "utterance_3s.wav")
+CHUNK_S = 0.02
+CHUNK = int(CHUNK_S * SAMPLE_RATE) * 2
+
+
+class Caller:
+    def __init__(self):
+        self.events = []
+        self.latencies = []
+        self.reactions = []
+        self._ended_speech = []
+        self._fed_at = None
+        self.first_audio = asyncio.Event()
+
+    async def send(self, event):
+        now = time.perf_counter()
+        self.events.append(event["type"])
+        if event["type"] == "speech_end" and not event.get("discarded"):
+            self._ended_speech.append(now)
+        elif event["type"] == "audio":
+            self.first_audio.set()
+        elif event["type"] == "barge_in":
+            self.reactions.append(now - self._fed_at)
+
+    async def send_audio(self, audio):
+        pass
+
+    def first_audio_at(self, at: float):
+        if self._ended_speech:
+            self.latencies.append(at - self._ended_speech.pop(0))
+
+    async def speak(self, session, pcm: bytes):
+        for i in range(0, len(pcm), CHUNK):
+            self._fed_at = time.perf_counter()
+            await session.feed(pcm[i:i + CHUNK])
+            await asyncio.sleep(CHUNK_S)
+
+
+def synthesizer(tts_seconds: float):
+    def synthesize(text):
+        time.sleep(tts_seconds)
+        return b"\xff\xf3" + text.encode()
+    return synthesize
+
+
+def recognizer(stt_seconds: float):
+    def transcribe(audio):
+        time.sleep(stt_seconds)
+        return "How much does the bootcamp cost and what does it cover?"
+    return transcribe
+
+
+async def start_call(index: int) -> str:
+    result = await main.start_call(main.CallStart(customer_name=f"Lead {index}", phone_number=str(index)))
+    return result["call_id"]
+
+
+async def request_caller(index: int, pcm: bytes, pool: RecognitionPool, args) -> Caller:
+    caller = Caller()
+    call_id = await start_call(index)
+    synthesize = synthesizer(args.tts_ms / 1000.0)
+
+    async def respond(text):
+        result = await main.turn_pipeline.run(call_id, text, main.responders["rag"])
+        await asyncio.get_running_loop().run_in_executor(
+            main.call_synthesis, synthesize, split_sentences(result["reply"])[0])
+        caller.first_audio_at(time.perf_counter())
+        return result
+
+    session = AudioSession(pool, respond=respond, send=caller.send)
+    answering = asyncio.ensure_future(session.answer())
+    await asyncio.sleep(random.Random(index).uniform(0, 1.0))
+    for turn in range(args.turns):
+        await caller.speak(session, pcm)
+        while caller.events.count("reply") <= turn and not answering.done():
+            await asyncio.sleep(0.01)
+    session.stop()
+    await answering
+    return caller
+
+
+def call_session(call_id: str, pool: RecognitionPool, caller: Caller, args) -> CallSession:
+    responder = main.responders["rag"]
+    return CallSession(
+        pool,
+        stream_turn=lambda text: main.turn_pipeline.stream(call_id, text, responder, server_speech=False),
+        record_interrupted=lambda text, partial: main.turn_pipeline.record_interrupted(
+            call_id, text, partial, responder),
+        synthesize=synthesizer(args.tts_ms / 1000.0),
+        send=caller.send,
+        send_audio=caller.send_audio,
+        executor=main.call_synthesis
+    )
+
+
+async def duplex_caller(index: int, pcm: bytes, pool: RecognitionPool, args) -> Caller:
+    caller = Caller()
+    call_id = await start_call(index)
+    session = call_session(call_id, pool, caller, args)
+    answering = asyncio.ensure_future(session.answer())
+    await asyncio.sleep(random.Random(index).uniform(0, 1.0))
+    for turn in range(args.turns):
+        await caller.speak(session, pcm)
+        while session.turns <= turn and not answering.done():
+            await asyncio.sleep(0.01)
+        session.control({"type": "playback_done"})
+    session.stop()
+    await answering
+    caller.latencies = session.turn_taking
+    return caller
+
+
+async def barge_in_caller(index: int, pcm: bytes, pool: RecognitionPool, args) -> Caller:
+    caller = Caller()
+    call_id = await start_call(index)
+    session = call_session(call_id, pool, caller, args)
+    answering = asyncio.ensure_future(session.answer())
+    await asyncio.sleep(random.Random(index).uniform(0, 1.0))
+    await caller.speak(session, pcm)
+    await caller.first_audio.wait()
+    await asyncio.sleep(args.barge_ms / 1000.0)
+    await caller.speak(session, pcm)
+    session.stop()
+    await answering
+    return caller
+
+
+async def run_flow(flow, pcm: bytes, args) -> dict:
+    pool = RecognitionPool(recognizer(args.stt_ms / 1000.0), max_workers=args.stt_workers,
+                           max_pending=args.callers * 2)
+    started = time.perf_counter()
+    callers = await asyncio.gather(*(flow(i, pcm, pool, args) for i in range(args.callers)))
+    elapsed = time.perf_counter() - started
+    pool.shutdown()
+    return {
+        "seconds": elapsed,
+        "first_audio": summarize([x for c in callers for x in c.latencies]),
+        "barge_in": summarize([x for c in callers for x in c.reactions]),
+    }
+
+
+async def run(args) -> dict:
+    chain = FakeStreamingChain(ANSWER, args.first_token_ms / 1000.0, args.token_ms / 1000.0)
+    main.llm_service.rag_enabled = True
+    main.llm_service.rag_state = "ready"
+    main.llm_service.retrieval_chain = chain
+    main.llm_service.response_cache = None  # every turn goes to the (fake) LLM
+    main.speech_pipeline = SpeechPipeline(FakeVoiceService(0.0), max_workers=2, max_pending=args.callers * 10)
+
+    with open(FIXTURE, "rb") as f:
+        pcm = decode_wav(f.read()) + b"\0\0" * SAMPLE_RATE
+    try:
+        return {
+            "request": await run_flow(request_caller, pcm, args),
+            "duplex": await run_flow(duplex_caller, pcm, args),
+            "barge_in": await run_flow(barge_in_caller, pcm, args),
+        }
+    finally:
+        main.speech_pipeline.shutdown(wait=True)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callers", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=2)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--tts-ms", type=float, default=150)
+    parser.add_argument("--stt-ms", type=float, default=100)
+    parser.add_argument("--stt-workers", type=int, default=16)
+    parser.add_argument("--barge-ms", type=float, default=300, help="caller talks over the reply this long "
+                                                                     "after its first audio")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print(f"{args.callers} callers x {args.turns} turns; LLM first token {args.first_token_ms:.0f}ms + "
+          f"{args.token_ms:.0f}ms/token, TTS {args.tts_ms:.0f}ms/sentence, STT {args.stt_ms:.0f}ms")
+    print("end of speech -> first agent audio")
+    for flow in ("request", "duplex"):
+        s = result[flow]["first_audio"]
+        print(f"  {flow:<8} p50 {s['p50_ms']:7.1f} ms  p95 {s['p95_ms']:7.1f} ms  p99 {s['p99_ms']:7.1f} ms  "
+              f"({s['count']} turns)")
+    s = result["barge_in"]["barge_in"]
+    print(f"barge-in: speech detected -> reply cancelled  p50 {s['p50_ms']:.2f} ms  p95 {s['p95_ms']:.2f} ms  "
+          f"max {s['max_ms']:.2f} ms  ({s['count']} interruptions; detection takes "
+          f"{VoiceActivityDetector().start_ms} ms of voiced audio)")
+
+
+if __name__ == "__main__":
+    main_cli()
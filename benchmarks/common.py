@@ -0,0 +1,113 @@
+"""Shared helpers for the offline benchmarks"""
+import asyncio
+import os
+import re
+import socket
+import statistics
+import time
+from typing import List
+
+
+def free_port() -> int:
+    """Pick an unused local TCP port"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb() -> float:
+    """Resident memory of this process in MB (peak RSS where the current value is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if os.uname().sysname == "Darwin" else peak / 1024
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies: List[float]) -> dict:
+    """Summarize latencies (seconds) as milliseconds"""
+    return {
+        "count": len(latencies),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+class FakeVoiceService:
+    """Stand-in for VoiceService that sleeps instead of synthesizing and playing audio"""
+
+    def __init__(self, tts_seconds: float = 0.5):
+        self.tts_seconds = tts_seconds
+        self.spoken = 0
+
+    def text_to_speech(self, text: str) -> bool:
+        time.sleep(self.tts_seconds)
+        self.spoken += 1
+        return True
+
+    def speak_token_stream(self, tokens) -> bool:
+        return self.text_to_speech("".join(tokens))
+
+    def fallback_tts(self, text: str) -> bool:
+        return True
+
+    def warm_cache(self, texts) -> int:
+        return 0
+
+
+class FakeStreamingChain:
+    """Stand-in for the RAG retrieval chain with LLM-like timing.
+
+    The first answer token arrives after `first_token_s` (retrieval plus the
+    model's time to first token), then one token every `token_s`. invoke()
+    blocks for the whole answer, like the synchronous Groq client.
+    """
+
+    def __init__(self, answer: str, first_token_s: float = 0.3, token_s: float = 0.02):
+        self.answer = answer
+        self.first_token_s = first_token_s
+        self.token_s = token_s
+        self.tokens = re.findall(r"\S+\s*", answer)
+        self.calls = 0
+
+    @property
+    def total_s(self) -> float:
+        return self.first_token_s + self.token_s * len(self.tokens)
+
+    def invoke(self, inputs: dict) -> dict:
+        self.calls += 1
+        time.sleep(self.total_s)
+        return {"input": inputs["input"], "context": [], "answer": self.answer}
+
+    async def ainvoke(self, inputs: dict) -> dict:
+        self.calls += 1
+        await asyncio.sleep(self.total_s)
+        return {"input": inputs["input"], "context": [], "answer": self.answer}
+
+    async def astream(self, inputs: dict):
+        self.calls += 1
+        yield {"input": inputs["input"]}
+        yield {"context": []}
+        await asyncio.sleep(self.first_token_s)
+        for i, token in enumerate(self.tokens):
+            if i:
+                await asyncio.sleep(self.token_s)
+            yield {"answer": token}
@@ -0,0 +1,326 @@
+"""Offline load test: thousands of concurrent multi-turn sales calls against main.app.
+
+Runs main.app in-process (httpx ASGI transport) with a stand-in voice service
+and a fake LLM behind the RAG endpoints, so it needs no server, microphone,
+network or API key. Each of --calls callers starts a call and follows a
+scripted conversation until the script runs out or the agent ends the call:
+
+  interested  asks about the curriculum, certificate, jobs and price
+  objection   pushes back on price, time and prior experience, then says "maybe later"
+  hang_up     says "no thanks, goodbye" on the second turn
+
+Scripts are picked per call from --mix. A --rag-share of calls talk to
+/respond-rag and a --stream-share to /respond-rag/{call_id}/stream, the rest to
+the rule-based /respond. Every call finishes by reading /speech-status and
+/conversation, and its history is checked against the turns it sent.
+
+Callers pause --think-ms (+/-50%) before each turn and at most --concurrency
+calls are in flight; client and server share one process, so with no pauses
+the run measures how long requests queue behind each other rather than how
+long they take.
+
+Reports throughput, p50/p95/p99 latency per endpoint, errors and memory
+growth. --json writes the results, tagged with the git commit, so runs can be
+compared; --baseline compares against an earlier file and exits non-zero when
+p95 latency or throughput regressed by more than --max-regression percent.
+
+Usage:
+    python -m benchmarks.load_calls --calls 2000 --json load.json
+    python -m benchmarks.load_calls --calls 2000 --baseline load.json --max-regression 15
+"""
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import random
+import subprocess
+import time
+from collections import defaultdict
+
+import httpx
+
+import main
+from benchmarks.common import FakeStreamingChain, FakeVoiceService, rss_mb, summarize
+from speech_pipeline import SpeechPipeline
+
+SCRIPTS = {
+    "interested": [
+        "Hi, tell me more about the course",
+        "What topics does the curriculum cover?",
+        "Do I get a certificate at the end?",
+        "Will it help me get a job in AI?",
+        "How much does it cost?",
+        "Sounds good, I'm interested",
+    ],
+    "objection": [
+        "How much does it cost?",
+        "That's too expensive for me",
+        "I'm really busy with my schedule",
+        "I already took a machine learning course",
+        "Hmm, what does the syllabus cover?",
+        "Maybe later",
+    ],
+    "hang_up": [
+        "Who is this?",
+        "No thanks, goodbye",
+    ],
+}
+
+ANSWER = ("The AI Mastery Bootcamp is a 12-week program covering machine learning, LLMs and MLOps. "
+          "Today it is $299 instead of $499. Would you like to hear about the curriculum?")
+
+RESPOND = {
+    "rule": "POST /respond/{call_id}",
+    "rag": "POST /respond-rag/{call_id}",
+    "stream": "POST /respond-rag/{call_id}/stream",
+}
+
+
+def parse_mix(text: str) -> dict:
+    """"interested=0.4,objection=0.4,hang_up=0.2" -> weights per script"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCRIPTS:
+            raise argparse.ArgumentTypeError(f"unknown script {name!r} (choose from {', '.join(SCRIPTS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Recorder:
+    """Latencies and failures per endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, client, endpoint: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            r = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[endpoint] += 1
+            return None
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        if r.status_code >= 400:
+            self.errors[endpoint] += 1
+            return None
+        return r
+
+    async def stream_turn(self, client, call_id: str, message: str):
+        """One streamed RAG turn; returns the `done` event's data.
+
+        The ASGI transport hands over the body only once the response is
+        complete, so time to first token is not observable in-process (see
+        bench_streaming_llm for that).
+        """
+        endpoint = RESPOND["stream"]
+        started = time.perf_counter()
+        done = None
+        try:
+            async with client.stream("POST", f"/respond-rag/{call_id}/stream", json={"message": message}) as r:
+                if r.status_code >= 400:
+                    self.errors[endpoint] += 1
+                    return None
+                event = None
+                async for line in r.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[7:]
+                    elif line.startswith("data: ") and event == "done":
+                        done = json.loads(line[6:])
+        except httpx.HTTPError:
+            self.errors[endpoint] += 1
+            return None
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        if done is None:
+            self.errors[endpoint] += 1
+        return done
+
+
+async def caller(client, index: int, args, recorder: Recorder, outcomes: dict, limit: asyncio.Semaphore):
+    rng = random.Random(f"{args.seed}-{index}")
+    script = rng.choices(list(args.mix), weights=list(args.mix.values()))[0]
+    roll = rng.random()
+    mode = "rag" if roll < args.rag_share else "stream" if roll < args.rag_share + args.stream_share else "rule"
+
+    async with limit:
+        r = await recorder.request(client, "POST /start-call", "POST", "/start-call",
+                                   json={"customer_name": f"Lead {index}", "phone_number": str(index)})
+        if r is None:
+            outcomes["failed_calls"] += 1
+            return
+        call_id = r.json()["call_id"]
+
+        sent = 0
+        ended = False
+        for message in SCRIPTS[script]:
+            if args.think_ms:
+                await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think_ms / 1000.0)
+            if mode == "stream":
+                result = await recorder.stream_turn(client, call_id, message)
+            else:
+                path = RESPOND[mode].split(" ")[1].format(call_id=call_id)
+                r = await recorder.request(client, RESPOND[mode], "POST", path, json={"message": message})
+                result = r.json() if r is not None else None
+            if result is None:
+                break
+            sent += 1
+            if result.get("should_end_call"):
+                ended = True
+                break
+
+        await recorder.request(client, "GET /speech-status/{call_id}", "GET", f"/speech-status/{call_id}")
+        r = await recorder.request(client, "GET /conversation/{call_id}", "GET", f"/conversation/{call_id}",
+                                   params={"limit": 100})
+        # The greeting, then each customer message followed by the agent's reply
+        if r is None or len(r.json()["history"]) != 1 + 2 * sent:
+            outcomes["bad_history"] += 1
+        outcomes["turns"] += sent
+        outcomes[f"script_{script}"] += 1
+        outcomes[f"mode_{mode}"] += 1
+        outcomes["ended_by_agent"] += ended
+
+
+async def run(args) -> dict:
+    chain = FakeStreamingChain(ANSWER, first_token_s=args.llm_ms / 1000.0, token_s=args.token_ms / 1000.0)
+    main.llm_service.rag_enabled = True
+    main.llm_service.rag_state = "ready"
+    main.llm_service.retrieval_chain = chain
+    main.llm_service.response_cache = None
+    voice = FakeVoiceService(args.tts_ms / 1000.0)
+    main.speech_pipeline = SpeechPipeline(voice, max_workers=args.tts_workers, max_pending=args.calls * 10)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=300) as client:
+        warm = Recorder()
+        await caller(client, -1, args, warm, defaultdict(int), asyncio.Semaphore(1))
+        chain.calls = 0
+
+        gc.collect()
+        rss_before = rss_mb()
+        recorder = Recorder()
+        outcomes = defaultdict(int)
+        limit = asyncio.Semaphore(args.concurrency or args.calls)
+        started = time.perf_counter()
+        await asyncio.gather(*(caller(client, i, args, recorder, outcomes, limit) for i in range(args.calls)))
+        elapsed = time.perf_counter() - started
+    main.speech_pipeline.shutdown(wait=True)
+    gc.collect()
+    rss_after = rss_mb()
+
+    requests = sum(len(v) for v in recorder.latencies.values())
+    return {
+        "benchmark": "load_calls",
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")},
+        "seconds": round(elapsed, 3),
+        "calls": args.calls,
+        "turns": outcomes["turns"],
+        "outcomes": dict(sorted(outcomes.items())),
+        "llm_calls": chain.calls,
+        "throughput": {
+            "requests_per_s": round(requests / elapsed, 1),
+            "turns_per_s": round(outcomes["turns"] / elapsed, 1),
+            "calls_per_s": round(args.calls / elapsed, 1),
+        },
+        "endpoints": {
+            endpoint: {**summarize(latencies), "errors": recorder.errors.get(endpoint, 0)}
+            for endpoint, latencies in sorted(recorder.latencies.items())
+        },
+        "errors": sum(recorder.errors.values()),
+        "memory": {
+            "rss_before_mb": round(rss_before, 1),
+            "rss_after_mb": round(rss_after, 1),
+            "growth_mb": round(rss_after - rss_before, 1),
+            "growth_per_call_kb": round((rss_after - rss_before) * 1024 / args.calls, 2),
+        },
+    }
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def compare(result: dict, baseline: dict, max_regression: float) -> list:
+    """Print p95 and throughput changes against a baseline; returns the regressions"""
+    regressions = []
+    print(f"\nvs {baseline.get('commit', '?')} ({baseline.get('timestamp', '?')})")
+    changed = sorted(k for k, v in result["config"].items() if baseline.get("config", {}).get(k, v) != v)
+    if changed:
+        print(f"note: the baseline ran with different settings ({', '.join(changed)})")
+    print(f"{'endpoint':<38}{'p95 ms':>10}{'was':>10}{'change':>9}")
+    for endpoint, stats in result["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(endpoint)
+        if not old or not old["p95_ms"]:
+            continue
+        change = (stats["p95_ms"] / old["p95_ms"] - 1) * 100
+        print(f"{endpoint:<38}{stats['p95_ms']:>10.2f}{old['p95_ms']:>10.2f}{change:>+8.1f}%")
+        if change > max_regression:
+            regressions.append(f"{endpoint} p95 {change:+.1f}%")
+    now, was = result["throughput"]["requests_per_s"], baseline["throughput"]["requests_per_s"]
+    change = (now / was - 1) * 100 if was else 0.0
+    print(f"{'throughput (requests/s)':<38}{now:>10.1f}{was:>10.1f}{change:>+8.1f}%")
+    if change < -max_regression:
+        regressions.append(f"throughput {change:+.1f}%")
+    return regressions
+
+
+def print_result(result: dict):
+    print(f"{result['calls']} calls, {result['turns']} turns in {result['seconds']}s "
+          f"({result['throughput']['requests_per_s']} requests/s, {result['throughput']['turns_per_s']} turns/s)")
+    print(f"{'endpoint':<38}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for endpoint, stats in result["endpoints"].items():
+        print(f"{endpoint:<38}{stats['count']:>8}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['errors']:>8}")
+    memory = result["memory"]
+    print(f"memory: {memory['rss_before_mb']} -> {memory['rss_after_mb']} MB RSS "
+          f"({memory['growth_per_call_kb']} KB per call)")
+    print(f"outcomes: {result['outcomes']}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200, help="calls in flight at once (0: all)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("interested=0.4,objection=0.4,hang_up=0.2"))
+    parser.add_argument("--rag-share", type=float, default=0.2)
+    parser.add_argument("--stream-share", type=float, default=0.1)
+    parser.add_argument("--think-ms", type=float, default=200, help="mean pause before each of a caller's turns")
+    parser.add_argument("--llm-ms", type=float, default=50, help="fake LLM time to first token")
+    parser.add_argument("--token-ms", type=float, default=0, help="fake LLM time per further token")
+    parser.add_argument("--tts-ms", type=float, default=0, help="stand-in speech time per reply")
+    parser.add_argument("--tts-workers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results written by an earlier --json run")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="percent")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_result(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"wrote {args.json}")
+
+    failed = result["errors"] or result["outcomes"].get("bad_history") or result["outcomes"].get("failed_calls")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.max_regression)
+        if regressions:
+            print("REGRESSION: " + ", ".join(regressions))
+            failed = True
+    print("FAIL" if failed else "PASS")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,135 @@
+"""Multi-worker load test for the shared Redis call store.
+
+Starts an in-process fake Redis server (fakeredis) unless --redis-url is given,
+launches `uvicorn main:app --workers N` against it, then drives many callers
+through start-call -> several turns (two of them sent concurrently on the same
+call) -> goodbye. Connections are not reused, so consecutive requests for one
+call land on different workers. Every transcript is checked afterwards; with a
+per-process store this test fails with 404s.
+
+Usage:
+    python -m benchmarks.load_multiworker --workers 4 --callers 200 --turns 3
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+from benchmarks.common import free_port, summarize
+
+
+def start_fake_redis() -> str:
+    from fakeredis import TcpFakeServer
+
+    port = free_port()
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"redis://127.0.0.1:{port}/0"
+
+
+def start_api(workers: int, redis_url: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, CALL_STORE="redis", REDIS_URL=redis_url, TTS_CACHE="off")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--workers", str(workers),
+         "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/api")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError("API did not start in time")
+
+
+async def caller(client, i, turns, latencies, errors):
+    async def post(path, payload):
+        started = time.perf_counter()
+        r = await client.post(path, json=payload)
+        latencies.append(time.perf_counter() - started)
+        if r.status_code != 200:
+            errors.append(f"{path} -> {r.status_code}")
+        return r
+
+    r = await post("/start-call", {"customer_name": f"Lead {i}", "phone_number": f"+1555{i:07d}"})
+    if r.status_code != 200:
+        return
+    call_id = r.json()["call_id"]
+
+    for t in range(turns):
+        if t == 1:
+            # Two overlapping turns on the same call
+            await asyncio.gather(
+                post(f"/respond/{call_id}", {"message": "What is the price?"}),
+                post(f"/respond/{call_id}", {"message": "Do I get a certificate?"}),
+            )
+        else:
+            await post(f"/respond/{call_id}", {"message": "Tell me more about the curriculum"})
+    await post(f"/respond/{call_id}", {"message": "Not interested, goodbye"})
+
+    expected = 1 + 2 * (turns + 1 + (1 if turns > 1 else 0))
+    conversation = (await client.get(f"/conversation/{call_id}")).json()
+    if conversation.get("total") != expected or conversation.get("is_active"):
+        errors.append(f"{call_id}: expected {expected} entries, got {conversation.get('total')}")
+
+
+async def drive(base_url, callers, turns, concurrency):
+    latencies, errors = [], []
+    # No keep-alive, so the OS spreads requests across worker processes
+    limits = httpx.Limits(max_keepalive_connections=0, max_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def one(i):
+            async with semaphore:
+                await caller(client, i, turns, latencies, errors)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(callers)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--callers", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--redis-url", help="use a real Redis server instead of fakeredis")
+    args = parser.parse_args()
+
+    redis_url = args.redis_url or start_fake_redis()
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    api = start_api(args.workers, redis_url, port)
+    try:
+        asyncio.run(wait_ready(base_url))
+        latencies, errors, elapsed = asyncio.run(drive(base_url, args.callers, args.turns, args.concurrency))
+    finally:
+        api.terminate()
+        api.wait(timeout=30)
+
+    stats = summarize(latencies)
+    print(f"workers={args.workers} callers={args.callers} requests={stats['count']} "
+          f"throughput={stats['count'] / elapsed:.0f} req/s")
+    print(f"latency p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms")
+    print(f"errors={len(errors)}")
+    for error in errors[:10]:
+        print(f"  {error}")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
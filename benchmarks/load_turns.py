@@ -0,0 +1,132 @@
+"""Load test of the turn pipeline with client retries mixed into concurrent calls.
+
+Runs main.app in-process with a fake LLM behind /respond-rag and a stand-in
+voice service. Each of --calls callers sends --turns turns; every turn carries
+an Idempotency-Key, a --retry-rate share of turns is re-sent with the same key
+while the original is still running (a client that timed out on a slow LLM),
+and a --burst-rate share is sent together with the caller's next turn without
+waiting for the reply. Afterwards it checks that:
+
+  - the LLM ran exactly once per distinct turn
+  - each reply was spoken exactly once
+  - every retry got the same reply as the original
+  - each call's history holds every turn once, each question followed by its answer
+
+Usage:
+    python -m benchmarks.load_turns --calls 50 --turns 6 --retry-rate 0.3
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+import httpx
+
+import main
+from benchmarks.common import FakeStreamingChain, FakeVoiceService, summarize
+from speech_pipeline import SpeechPipeline
+
+
+class EchoChain(FakeStreamingChain):
+    """Fake LLM whose answer names the question, so misrouted replies are detectable"""
+
+    async def ainvoke(self, inputs: dict) -> dict:
+        result = await super().ainvoke(inputs)
+        return {**result, "answer": f"Answer to: {inputs['input']}"}
+
+
+async def caller(client, index, args, rng, latencies, mismatches):
+    r = await client.post("/start-call", json={"customer_name": f"Lead {index}", "phone_number": str(index)})
+    call_id = r.json()["call_id"]
+
+    async def send(message, key):
+        started = time.perf_counter()
+        r = await client.post(f"/respond-rag/{call_id}", json={"message": message},
+                              headers={"Idempotency-Key": key})
+        r.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        return r.json()
+
+    pending = []
+    for turn in range(args.turns):
+        key = uuid.uuid4().hex
+        message = f"caller {index} question {turn}"
+        requests = [send(message, key)]
+        if rng.random() < args.retry_rate:
+            requests += [send(message, key) for _ in range(rng.randint(1, 2))]
+        pending.append(asyncio.gather(*requests))
+        if rng.random() >= args.burst_rate:
+            for results in await asyncio.gather(*pending):
+                if len({r["reply"] for r in results}) != 1:
+                    mismatches.append(call_id)
+            pending = []
+    for results in await asyncio.gather(*pending):
+        if len({r["reply"] for r in results}) != 1:
+            mismatches.append(call_id)
+    return call_id
+
+
+async def run(args):
+    chain = EchoChain("", first_token_s=args.llm_ms / 1000.0, token_s=0.0)
+    main.llm_service.rag_enabled = True
+    main.llm_service.rag_state = "ready"
+    main.llm_service.retrieval_chain = chain
+    main.llm_service.response_cache = None
+    voice = FakeVoiceService(0.0)
+    main.speech_pipeline = SpeechPipeline(voice, max_workers=4, max_pending=100000)
+    replays_before = main.turn_pipeline.replays
+
+    rng = random.Random(args.seed)
+    latencies, mismatches = [], []
+    transport = httpx.ASGITransport(app=main.app)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=120) as client:
+        call_ids = await asyncio.gather(*(
+            caller(client, i, args, rng, latencies, mismatches) for i in range(args.calls)
+        ))
+    elapsed = time.perf_counter() - started
+    main.speech_pipeline.shutdown(wait=True)
+
+    expected_turns = args.calls * args.turns
+    history_ok = True
+    for call_id in call_ids:
+        texts = [h.text for h in main.call_store.get_history(call_id)][1:]
+        questions, answers = texts[::2], texts[1::2]
+        if len(questions) != args.turns or any(a != f"Answer to: {q}" for q, a in zip(questions, answers)):
+            history_ok = False
+
+    return {
+        "requests": len(latencies),
+        "distinct_turns": expected_turns,
+        "replays": main.turn_pipeline.replays - replays_before,
+        "llm_calls": chain.calls,
+        "spoken": voice.spoken - args.calls,  # minus each call's greeting
+        "mismatched_retries": len(mismatches),
+        "history_ok": history_ok,
+        "seconds": round(elapsed, 3),
+        "latency": summarize(latencies),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--retry-rate", type=float, default=0.3)
+    parser.add_argument("--burst-rate", type=float, default=0.3)
+    parser.add_argument("--llm-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    for key, value in result.items():
+        print(f"{key:<20} {value}")
+    ok = (result["llm_calls"] == result["distinct_turns"] == result["spoken"]
+          and not result["mismatched_retries"] and result["history_ok"])
+    print("PASS" if ok else "FAIL")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,168 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+from audio_stream import SAMPLE_RATE, AudioSession, RecognitionPool, VADEvent, VoiceActivityDetector
+from metrics import REGISTRY, record_stage
+from speech_streaming import SentenceSplitter, split_sentences
+from turn_pipeline import CallEndedError, CallNotFoundError
+
+BARGE_INS = REGISTRY.counter("voice_agent_barge_ins_total", "Agent replies cut off by caller speech")
+
+
+class CallSession(AudioSession):
+    """A full-duplex call over one WebSocket: caller audio in, agent text and audio out, with barge-in.
+
+    Replies stream out as "token" events while the LLM generates them. Each
+    sentence is synthesized as soon as it is complete and sent as an "audio"
+    event ({"text", "format": "mp3"}) followed by one binary message with the
+    MP3, so the caller hears the first sentence while the rest is still being
+    generated. The client sends {"type": "playback_done"} once it has played
+    everything it was sent.
+
+    Caller audio is monitored the whole time. Speech that starts while the
+    agent is generating or still playing (barge-in) cancels the reply - the
+    LLM stream and any pending synthesis - and sends "barge_in" so the client
+    stops playback; the interrupted turn is recorded with the reply as far as
+    it got. The time from the end of the caller's speech to the first agent
+    audio is recorded as the "turn_taking" stage.
+    """
+
+    def __init__(self, pool: RecognitionPool, stream_turn: Callable[[str], AsyncIterator[Tuple[str, dict]]],
+                 record_interrupted: Callable[[str, str], Awaitable[None]],
+                 synthesize: Callable[[str], Optional[bytes]],
+                 send: Callable[[dict], Awaitable[None]], send_audio: Callable[[bytes], Awaitable[None]],
+                 sample_rate: int = SAMPLE_RATE, vad: Optional[VoiceActivityDetector] = None,
+                 executor: Optional[Executor] = None):
+        super().__init__(pool, respond=None, send=send, sample_rate=sample_rate, vad=vad)
+        self.stream_turn = stream_turn
+        self.record_interrupted = record_interrupted
+        self.synthesize = synthesize
+        self.executor = executor  # None: the event loop's default executor
+        self._send_audio = send_audio
+        self.playing = False  # the client has agent audio it has not finished playing
+        self.barge_ins = 0
+        self.turn_taking: List[float] = []  # end of caller speech -> first agent audio, seconds
+        self._reply: Optional[asyncio.Task] = None
+
+    @property
+    def agent_speaking(self) -> bool:
+        return self.playing or (self._reply is not None and not self._reply.done())
+
+    async def serve(self, websocket):
+        try:
+            await super().serve(websocket)
+        finally:
+            if self._reply is not None and not self._reply.done():
+                self._reply.cancel()
+
+    def greet(self, text: str):
+        """Speak the opening line; the caller can talk over it like any reply"""
+        self._reply = asyncio.ensure_future(self._say(text))
+
+    async def barge_in(self):
+        """Cut the agent off: cancel generation and synthesis, tell the client to stop playback"""
+        self.barge_ins += 1
+        BARGE_INS.inc()
+        self.playing = False
+        reply = self._reply
+        if reply is not None and not reply.done():
+            reply.cancel()
+            await asyncio.wait({reply})
+        await self.send({"type": "barge_in"})
+
+    async def _respond(self, text: str, ended_at: float) -> Optional[dict]:
+        self._reply = asyncio.ensure_future(self._stream_reply(text, ended_at))
+        await asyncio.wait({self._reply})
+        if self._reply.cancelled():
+            return {"interrupted": True, "should_end_call": False}
+        return self._reply.result()
+
+    async def _stream_reply(self, text: str, ended_at: float) -> Optional[dict]:
+        turn = self.stream_turn(text)
+        sentences: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        speaker = asyncio.ensure_future(self._speak(sentences, ended_at))
+        splitter = SentenceSplitter()
+        parts, result = [], None
+        try:
+            async for event, data in turn:
+                if event == "token":
+                    parts.append(data["text"])
+                    await self.send({"type": "token", "text": data["text"]})
+                    for sentence in splitter.push(data["text"]):
+                        sentences.put_nowait(sentence)
+                else:
+                    result = data
+                    await self.send({"type": "reply", **result})
+            rest = splitter.flush()
+            if rest:
+                sentences.put_nowait(rest)
+            sentences.put_nowait(None)
+            await speaker
+            return result
+        except asyncio.CancelledError:
+            # Barge-in: close the LLM stream (releasing the call lock) before recording what was said
+            await turn.aclose()
+            if result is None:
+                await self.record_interrupted(text, "".join(parts))
+            raise
+        except (CallEndedError, CallNotFoundError):
+            return None
+        finally:
+            speaker.cancel()
+
+    async def _say(self, text: str):
+        sentences: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        for sentence in split_sentences(text):
+            sentences.put_nowait(sentence)
+        sentences.put_nowait(None)
+        await self._speak(sentences)
+
+    async def _speak(self, sentences: "asyncio.Queue[Optional[str]]", ended_at: Optional[float] = None):
+        """Synthesize queued sentences in order, off the event loop, and send each as it is ready"""
+        while True:
+            sentence = await sentences.get()
+            if sentence is None:
+                return
+            # In this turn's context, so synthesis timing lands in its trace
+            context = contextvars.copy_context()
+            audio = await asyncio.get_running_loop().run_in_executor(
+                self.executor, context.run, self.synthesize, sentence
+            )
+            if audio is None:
+                continue  # the text already went out as tokens
+            self.playing = True
+            await self.send({"type": "audio", "text": sentence, "format": "mp3"})
+            await self.send_audio(audio)
+            if ended_at is not None:
+                latency = time.perf_counter() - ended_at
+                self.turn_taking.append(latency)
+                record_stage("turn_taking", latency)
+                ended_at = None
+
+    async def send_audio(self, audio: bytes):
+        if self.disconnected:
+            return
+        try:
+            await self._send_audio(audio)
+        except Exception:
+            self.disconnected = True
+
+    def control(self, message: dict) -> bool:
+        if message.get("type") == "playback_done":
+            self.playing = False
+            return False
+        return super().control(message)
+
+    async def _event(self, event: VADEvent):
+        if event.kind == "speech_start" and self.agent_speaking:
+            await self.barge_in()
+        await super()._event(event)
+
+
+def create_synthesis_executor() -> ThreadPoolExecutor:
+    """Threads for call-session synthesis, sized from environment settings (each gTTS call is a network round trip)"""
+    return ThreadPoolExecutor(max_workers=int(os.getenv("CALL_TTS_WORKERS", "16")), thread_name_prefix="call-tts")
@@ -0,0 +1,590 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from history_log import HistoryLog, epoch_ms, history_row
+from models import Call, CallHistory
+
+
+class CallStore(ABC):
+    """Storage for call sessions and their conversation history.
+
+    Calls returned by get() carry metadata only; history is read separately
+    (and page by page) through get_history() so large transcripts are never
+    copied just to check whether a call is active.
+    """
+
+    @abstractmethod
+    def create(self, call: Call) -> None:
+        """Store a new call, including any initial history"""
+
+    @abstractmethod
+    def get(self, call_id: str) -> Optional[Call]:
+        """Get call metadata (without history), or None if unknown"""
+
+    @abstractmethod
+    def append_history(self, call_id: str, entries: List[CallHistory]) -> None:
+        """Append conversation turns to a call"""
+
+    @abstractmethod
+    def get_history(self, call_id: str, offset: int = 0, limit: Optional[int] = None) -> List[CallHistory]:
+        """Get a page of conversation history, oldest first"""
+
+    def history_rows(self, call_id: str, offset: int = 0, limit: Optional[int] = None) -> List[dict]:
+        """A page of history as the JSON-ready dicts /conversation returns"""
+        return [history_row(h.sender, h.text, h.timestamp) for h in self.get_history(call_id, offset, limit)]
+
+    def history_records(self, call_id: str, offset: int = 0, limit: Optional[int] = None) -> List[tuple]:
+        """A page of history as (sender, text, epoch ms, responder, intent, latency_ms) tuples, for bulk export"""
+        return [(h.sender, h.text, epoch_ms(h.timestamp), h.responder, h.intent, h.latency_ms)
+                for h in self.get_history(call_id, offset, limit)]
+
+    @abstractmethod
+    def history_length(self, call_id: str) -> int:
+        """Number of history entries stored for a call"""
+
+    @abstractmethod
+    def end_call(self, call_id: str, end_time: Optional[datetime] = None) -> bool:
+        """Mark a call inactive; returns True only for the request that ended it"""
+
+    @abstractmethod
+    def get_turn(self, call_id: str, turn_key: str) -> Optional[dict]:
+        """Get the stored result of a turn recorded under an idempotency key"""
+
+    @abstractmethod
+    def append_turn(self, call_id: str, turn_key: str, entries: List[CallHistory],
+                    result: dict) -> Tuple[dict, bool]:
+        """Append a turn's history and remember its result under turn_key, atomically.
+
+        If the key was already recorded nothing is appended and the earlier
+        result is returned; the flag is True only when this call stored it.
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of calls currently held"""
+
+    @abstractmethod
+    def call_ids(self, batch_size: int = 1000) -> Iterator[str]:
+        """IDs of all calls held, fetched batch_size at a time (for bulk export)"""
+
+    def evict_expired(self) -> int:
+        """Drop calls past their retention; returns how many were removed"""
+        return 0
+
+    def close(self) -> None:
+        pass
+
+    def __contains__(self, call_id: str) -> bool:
+        return self.get(call_id) is not None
+
+
+class MemoryCallStore(CallStore):
+    """In-process call store with TTL and size-bounded eviction.
+
+    Calls are kept in least-recently-active order, so expiring idle calls and
+    enforcing max_calls only ever looks at the front of the dict. History is
+    held in a compact HistoryLog per call rather than as CallHistory models.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_calls: int = 100000):
+        self.ttl_seconds = ttl_seconds
+        self.max_calls = max_calls
+        self._calls: "OrderedDict[str, Call]" = OrderedDict()
+        self._history: Dict[str, HistoryLog] = {}
+        self._last_activity = {}
+        self._turns = {}  # call_id -> {turn_key: result}
+        self._lock = threading.RLock()
+        self.evictions = 0
+
+    def create(self, call: Call) -> None:
+        with self._lock:
+            self._calls[call.call_id] = call.model_copy(update={"history": []})
+            self._history[call.call_id] = HistoryLog(call.history)
+            self._touch(call.call_id)
+            self._evict()
+
+    def get(self, call_id: str) -> Optional[Call]:
+        with self._lock:
+            if not self._live(call_id):
+                return None
+            return self._calls[call_id].model_copy(update={"history": []})
+
+    def append_history(self, call_id: str, entries: List[CallHistory]) -> None:
+        with self._lock:
+            if not self._live(call_id):
+                raise KeyError(call_id)
+            self._history[call_id].extend(entries)
+            self._touch(call_id)
+
+    def get_history(self, call_id: str, offset: int = 0, limit: Optional[int] = None) -> List[CallHistory]:
+        with self._lock:
+            history = self._live_history(call_id)
+            return history.entries(offset, limit) if history is not None else []
+
+    def history_rows(self, call_id: str, offset: int = 0, limit: Optional[int] = None) -> List[dict]:
+        with self._lock:
+            history = self._live_history(call_id)
+            return history.rows(offset, limit) if history is not None else []
+
+    def history_records(self, call_id: str, offset: int = 0, limit: Optional[int] = None) -> List[tuple]:
+        with self._lock:
+            history = self._live_history(call_id)
+            return history.records(offset, limit) if history is not None else []
+
+    def history_length(self, call_id: str) -> int:
+        with self._lock:
+            history = self._live_history(call_id)
+            return len(history) if history is not None else 0
+
+    def end_call(self, call_id: str, end_time: Optional[datetime] = None) -> bool:
+        with self._lock:
+            call = self._calls[call_id] if self._live(call_id) else None
+            if call is None or not call.is_active:
+                return False
+            call.is_active = False
+            call.end_time = end_time or datetime.now()
+            self._touch(call_id)
+            return True
+
+    def get_turn(self, call_id: str, turn_key: str) -> Optional[dict]:
+        with self._lock:
+            if not self._live(call_id):
+                return None
+            return self._turns.get(call_id, {}).get(turn_key)
+
+    def append_turn(self, call_id: str, turn_key: str, entries: List[CallHistory],
+                    result: dict) -> Tuple[dict, bool]:
+        with self._lock:
+            existing = self.get_turn(call_id, turn_key)
+            if existing is not None:
+                return existing, False
+            self.append_history(call_id, entries)
+            self._turns.setdefault(call_id, {})[turn_key] = result
+            return result, True
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def call_ids(self, batch_size: int = 1000) -> Iterator[str]:
+        with self._lock:
+            call_ids = list(self._calls)
+        return iter(call_ids)
+
+    def evict_expired(self) -> int:
+        with self._lock:
+            before = self.evictions
+            self._evict()
+            return self.evictions - before
+
+    def _touch(self, call_id: str):
+        self._last_activity[call_id] = time.monotonic()
+        self._calls.move_to_end(call_id)
+
+    def _live(self, call_id: str) -> bool:
+        # Calls past their TTL are gone as soon as they expire, not only once _evict sweeps them
+        return call_id in self._calls and not self._expired(call_id)
+
+    def _live_history(self, call_id: str) -> Optional[HistoryLog]:
+        return self._history[call_id] if self._live(call_id) else None
+
+    def _expired(self, call_id: str) -> bool:
+        return time.monotonic() - self._last_activity[call_id] > self.ttl_seconds
+
+    def _evict(self):
+        while self._calls:
+            oldest = next(iter(self._calls))
+            if len(self._calls) <= self.max_calls and not self._expired(oldest):
+                break
+            del self._calls[oldest]
+            del self._history[oldest]
+            del self._last_activity[oldest]
+            self._turns.pop(oldest, None)
+            self.evictions += 1
+
+
+class SQLiteCallStore(CallStore):
+    """Durable call store backed by SQLite in WAL mode.
+
+    History is append-only: each turn is one indexed row, so a turn never
+    rewrites the rest of the conversation.
+    """
+
+    def __init__(self, path: str = "calls.db", retention_seconds: Optional[float] = None):
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS calls (
+                call_id TEXT PRIMARY KEY,
+                customer_name TEXT NOT NULL,
+                phone_number TEXT NOT NULL,
+                is_active INTEGER NOT NULL DEFAULT 1,
+                start_time TEXT NOT NULL,
+                end_time TEXT,
+                last_activity REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                call_id TEXT NOT NULL,
+                sender TEXT NOT NULL,
+                text TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                responder TEXT,
+                intent TEXT,
+                latency_ms REAL
+            );
+            CREATE TABLE IF NOT EXISTS turns (
+                call_id TEXT NOT NULL,
+                turn_key TEXT NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (call_id, turn_key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_history_call ON history (call_id, id);
+            CREATE INDEX IF NOT EXISTS idx_calls_activity ON calls (last_activity);
+        """)
+        # Databases created before replies carried analytics metadata
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(history)")}
+        for column, kind in (("responder", "TEXT"), ("intent", "TEXT"), ("latency_ms", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE history ADD COLUMN {column} {kind}")
+        self._conn.commit()
+
+    def create(self, call: Call) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO calls (call_id, customer_name, phone_number, is_active, start_time, end_time, last_activity) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (call.call_id, call.customer_name, call.phone_number, int(call.is_active),
+                 call.start_time.isoformat(), call.end_time.isoformat() if call.end_time else None, time.time())
+            )
+            self._insert_history(call.call_id, call.history)
+
+    def get(self, call_id: str) -> Optional[Call]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT call_id, customer_name, phone_number, is_active, start_time, end_time "
+                "FROM calls WHERE call_id = ?", (call_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return Call(
+            call_id=row[0],
+            customer_name=row[1],
+            phone_number=row[2],
+            is_active=bool(row[3]),
+            start_time=datetime.fromisoformat(row[4]),
+            end_time=datetime.fromisoformat(row[5]) if row[5] else None,
+        )
+
+    def append_history(self, call_id: str, entries: List[CallHistory]) -> None:
+        with self._lock, self._conn:
+            updated = self._conn.execute(
+                "UPDATE calls SET last_activity = ? WHERE call_id = ?", (time.time(), call_id)
+            ).rowcount
+            if not updated:
+                raise KeyError(call_id)
+            self._insert_history(call_id, entries)
+
+    def get_history(self, call_id: str, offset: int = 0, limit: Optional[int] = None) -> List[CallHistory]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT sender, text, timestamp, responder, intent, latency_ms FROM history "
+                "WHERE call_id = ? ORDER BY id LIMIT ? OFFSET ?",
+                (call_id, -1 if limit is None else limit, offset)
+            ).fetchall()
+        return [
+            CallHistory(sender=sender, text=text, timestamp=datetime.fromisoformat(timestamp),
+                        responder=responder, intent=intent, latency_ms=latency_ms)
+            for sender, text, timestamp, responder, intent, latency_ms in rows
+        ]
+
+    def history_length(self, call_id: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM history WHERE call_id = ?", (call_id,)
+            ).fetchone()[0]
+
+    def end_call(self, call_id: str, end_time: Optional[datetime] = None) -> bool:
+        end_time = end_time or datetime.now()
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE calls SET is_active = 0, end_time = ?, last_activity = ? "
+                "WHERE call_id = ? AND is_active = 1",
+                (end_time.isoformat(), time.time(), call_id)
+            ).rowcount == 1
+
+    def get_turn(self, call_id: str, turn_key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM turns WHERE call_id = ? AND turn_key = ?", (call_id, turn_key)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def append_turn(self, call_id: str, turn_key: str, entries: List[CallHistory],
+                    result: dict) -> Tuple[dict, bool]:
+        with self._lock, self._conn:
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO turns (call_id, turn_key, result) VALUES (?, ?, ?)",
+                (call_id, turn_key, json.dumps(result))
+            ).rowcount
+            if not inserted:
+                row = self._conn.execute(
+                    "SELECT result FROM turns WHERE call_id = ? AND turn_key = ?", (call_id, turn_key)
+                ).fetchone()
+                return json.loads(row[0]), False
+            updated = self._conn.execute(
+                "UPDATE calls SET last_activity = ? WHERE call_id = ?", (time.time(), call_id)
+            ).rowcount
+            if not updated:
+                raise KeyError(call_id)  # rolls back the turns row too
+            self._insert_history(call_id, entries)
+            return result, True
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM calls").fetchone()[0]
+
+    def call_ids(self, batch_size: int = 1000) -> Iterator[str]:
+        after = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT call_id FROM calls WHERE call_id > ? ORDER BY call_id LIMIT ?", (after, batch_size)
+                ).fetchall()
+            for (call_id,) in rows:
+                yield call_id
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][0]
+
+    def evict_expired(self, batch_size: int = 500) -> int:
+        """Delete calls idle for longer than retention_seconds, batch_size calls per transaction.
+
+        The lock is released between batches, so a large backlog never
+        stalls live turns for the whole sweep.
+        """
+        if self.retention_seconds is None:
+            return 0
+        cutoff = time.time() - self.retention_seconds
+        removed = 0
+        while True:
+            with self._lock, self._conn:
+                call_ids = [row[0] for row in self._conn.execute(
+                    "SELECT call_id FROM calls WHERE last_activity < ? LIMIT ?", (cutoff, batch_size)
+                )]
+                if not call_ids:
+                    return removed
+                marks = ",".join("?" * len(call_ids))
+                for table in ("history", "turns", "calls"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE call_id IN ({marks})", call_ids)
+            removed += len(call_ids)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _insert_history(self, call_id: str, entries: List[CallHistory]):
+        self._conn.executemany(
+            "INSERT INTO history (call_id, sender, text, timestamp, responder, intent, latency_ms) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(call_id, h.sender, h.text, h.timestamp.isoformat(), h.responder, h.intent, h.latency_ms)
+             for h in entries]
+        )
+
+
+class RedisCallStore(CallStore):
+    """Call store shared by every worker process through Redis.
+
+    Each call is a hash plus a history list. History appends are a single
+    RPUSH and the active -> ended transition is a WATCH/MULTI transaction, so
+    concurrent turns handled by different workers never lose updates. Keys
+    expire after ttl_seconds of inactivity, like the in-memory store.
+    """
+
+    def __init__(self, client=None, url: str = "redis://localhost:6379/0", prefix: str = "voice-agent:",
+                 ttl_seconds: float = 3600):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self._activity_key = f"{prefix}activity"
+
+    def _call_key(self, call_id: str) -> str:
+        return f"{self.prefix}call:{call_id}"
+
+    def _history_key(self, call_id: str) -> str:
+        return f"{self.prefix}call:{call_id}:history"
+
+    def _turns_key(self, call_id: str) -> str:
+        return f"{self.prefix}call:{call_id}:turns"
+
+    def create(self, call: Call) -> None:
+        call_key, history_key = self._call_key(call.call_id), self._history_key(call.call_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(history_key, self._turns_key(call.call_id))
+        pipe.hset(call_key, mapping={
+            "customer_name": call.customer_name,
+            "phone_number": call.phone_number,
+            "is_active": "1" if call.is_active else "0",
+            "start_time": call.start_time.isoformat(),
+            "end_time": call.end_time.isoformat() if call.end_time else "",
+        })
+        if call.history:
+            pipe.rpush(history_key, *[self._dump(h) for h in call.history])
+        self._touch(pipe, call.call_id)
+        pipe.execute()
+
+    def get(self, call_id: str) -> Optional[Call]:
+        data = self.client.hgetall(self._call_key(call_id))
+        if not data:
+            return None
+        data = {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v
+                for k, v in data.items()}
+        return Call(
+            call_id=call_id,
+            customer_name=data["customer_name"],
+            phone_number=data["phone_number"],
+            is_active=data["is_active"] == "1",
+            start_time=datetime.fromisoformat(data["start_time"]),
+            end_time=datetime.fromisoformat(data["end_time"]) if data.get("end_time") else None,
+        )
+
+    def append_history(self, call_id: str, entries: List[CallHistory]) -> None:
+        call_key = self._call_key(call_id)
+
+        def append(pipe):
+            # Abort if the call expired or was removed while we were generating the reply
+            if not pipe.exists(call_key):
+                raise KeyError(call_id)
+            pipe.multi()
+            pipe.rpush(self._history_key(call_id), *[self._dump(h) for h in entries])
+            self._touch(pipe, call_id)
+
+        self.client.transaction(append, call_key)
+
+    def get_history(self, call_id: str, offset: int = 0, limit: Optional[int] = None) -> List[CallHistory]:
+        end = -1 if limit is None else offset + limit - 1
+        return [self._load(raw) for raw in self.client.lrange(self._history_key(call_id), offset, end)]
+
+    def history_length(self, call_id: str) -> int:
+        return self.client.llen(self._history_key(call_id))
+
+    def end_call(self, call_id: str, end_time: Optional[datetime] = None) -> bool:
+        call_key = self._call_key(call_id)
+        end_time = end_time or datetime.now()
+
+        def transition(pipe) -> bool:
+            active = pipe.hget(call_key, "is_active")
+            if active not in (b"1", "1"):
+                pipe.multi()
+                return False
+            pipe.multi()
+            pipe.hset(call_key, mapping={"is_active": "0", "end_time": end_time.isoformat()})
+            self._touch(pipe, call_id)
+            return True
+
+        # Retried automatically if another worker touches the call mid-transition
+        return self.client.transaction(transition, call_key, value_from_callable=True)
+
+    def get_turn(self, call_id: str, turn_key: str) -> Optional[dict]:
+        raw = self.client.hget(self._turns_key(call_id), turn_key)
+        return json.loads(raw) if raw is not None else None
+
+    def append_turn(self, call_id: str, turn_key: str, entries: List[CallHistory],
+                    result: dict) -> Tuple[dict, bool]:
+        call_key, turns_key = self._call_key(call_id), self._turns_key(call_id)
+
+        def append(pipe):
+            # A retry handled by another worker may have recorded this turn already
+            existing = pipe.hget(turns_key, turn_key)
+            if existing is not None:
+                pipe.multi()
+                return json.loads(existing), False
+            if not pipe.exists(call_key):
+                raise KeyError(call_id)
+            pipe.multi()
+            pipe.rpush(self._history_key(call_id), *[self._dump(h) for h in entries])
+            pipe.hset(turns_key, turn_key, json.dumps(result))
+            self._touch(pipe, call_id)
+            return result, True
+
+        return self.client.transaction(append, call_key, turns_key, value_from_callable=True)
+
+    def count(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        return self.client.zcount(self._activity_key, cutoff, "+inf")
+
+    def call_ids(self, batch_size: int = 1000) -> Iterator[str]:
+        # Index entries outlive their call until the next evict_expired(); skip those
+        cutoff = time.time() - self.ttl_seconds
+        for call_id, last_activity in self.client.zscan_iter(self._activity_key, count=batch_size):
+            if last_activity >= cutoff:
+                yield call_id.decode() if isinstance(call_id, bytes) else call_id
+
+    def evict_expired(self) -> int:
+        # The call keys expire on their own; this trims the activity index (run periodically by main.py)
+        cutoff = time.time() - self.ttl_seconds
+        return self.client.zremrangebyscore(self._activity_key, "-inf", f"({cutoff}")
+
+    def close(self) -> None:
+        self.client.close()
+
+    def _touch(self, pipe, call_id: str):
+        ttl = max(1, int(self.ttl_seconds))
+        pipe.expire(self._call_key(call_id), ttl)
+        pipe.expire(self._history_key(call_id), ttl)
+        pipe.expire(self._turns_key(call_id), ttl)
+        pipe.zadd(self._activity_key, {call_id: time.time()})
+
+    @staticmethod
+    def _dump(entry: CallHistory) -> str:
+        data = {"sender": entry.sender, "text": entry.text, "timestamp": entry.timestamp.isoformat()}
+        for field in ("responder", "intent", "latency_ms"):
+            value = getattr(entry, field)
+            if value is not None:
+                data[field] = value
+        return json.dumps(data)
+
+    @staticmethod
+    def _load(raw) -> CallHistory:
+        data = json.loads(raw)
+        return CallHistory(
+            sender=data["sender"], text=data["text"], timestamp=datetime.fromisoformat(data["timestamp"]),
+            responder=data.get("responder"), intent=data.get("intent"), latency_ms=data.get("latency_ms")
+        )
+
+
+def create_call_store() -> CallStore:
+    """Build the call store selected by the CALL_STORE environment variable"""
+    backend = os.getenv("CALL_STORE", "memory").lower()
+    if backend == "redis":
+        return RedisCallStore(
+            url=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            prefix=os.getenv("REDIS_PREFIX", "voice-agent:"),
+            ttl_seconds=float(os.getenv("CALL_TTL_SECONDS", "3600")),
+        )
+    if backend == "sqlite":
+        retention = os.getenv("CALL_RETENTION_SECONDS")
+        return SQLiteCallStore(
+            path=os.getenv("CALL_STORE_PATH", "calls.db"),
+            retention_seconds=float(retention) if retention else None,
+        )
+    if backend == "memory":
+        return MemoryCallStore(
+            ttl_seconds=float(os.getenv("CALL_TTL_SECONDS", "3600")),
+            max_calls=int(os.getenv("CALL_STORE_MAX_CALLS", "100000")),
+        )
+    raise ValueError(f"Unknown CALL_STORE backend: {backend}")
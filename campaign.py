@@ -0,0 +1,419 @@
+import asyncio
+import csv
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CAMPAIGN_CALLS = REGISTRY.counter("voice_agent_campaign_calls_total", "Campaign dial attempts by result", ("status",))
+
+# Results worth another attempt later; anything else is the lead's final outcome
+RETRY_STATUSES = frozenset({"no_answer", "busy", "failed"})
+
+
+class Lead(NamedTuple):
+    index: int  # position in the lead file, the lead's identity across restarts
+    phone_number: str
+    customer_name: str
+
+
+class DialResult(NamedTuple):
+    status: str  # e.g. "started", "answered", "no_answer", "busy", "failed"
+    call_id: Optional[str] = None
+    detail: Optional[str] = None
+
+
+def read_leads(path: str) -> Iterator[Lead]:
+    """Stream leads from a CSV (with a header row) or JSONL file, one at a time.
+
+    Both need phone_number and customer_name. A row that lacks them is still
+    yielded (with empty fields) so it gets an "invalid" outcome and keeps its
+    index; a JSONL line that is not JSON counts as such a row. Raises
+    ValueError right away for any other kind of file.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return _read_csv(path)
+    if extension in (".jsonl", ".ndjson"):
+        return _read_jsonl(path)
+    raise ValueError(f"Lead file must be .csv or .jsonl, got {path}")
+
+
+def _read_csv(path: str) -> Iterator[Lead]:
+    with open(path, newline="", encoding="utf-8") as f:
+        for index, row in enumerate(csv.DictReader(f)):
+            yield Lead(index, (row.get("phone_number") or "").strip(), (row.get("customer_name") or "").strip())
+
+
+def _read_jsonl(path: str) -> Iterator[Lead]:
+    with open(path, encoding="utf-8") as f:
+        index = 0
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            if not isinstance(row, dict):
+                row = {}
+            yield Lead(index, str(row.get("phone_number") or "").strip(), str(row.get("customer_name") or "").strip())
+            index += 1
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second, in bursts of up to `burst` (rate <= 0: unlimited)"""
+
+    def __init__(self, rate: float, burst: int = 1, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class CampaignState:
+    """Which leads are done, which wait for a retry, and outcome counts.
+
+    Leads below `watermark` are all finished; finished leads above it are
+    kept individually until the gap closes, so memory follows the number of
+    leads in flight or waiting for a retry, not the size of the campaign.
+    """
+
+    def __init__(self):
+        self.watermark = 0
+        self.finished: set = set()
+        self.pending: Dict[int, Tuple[int, float]] = {}  # lead -> (attempts made, retry due in epoch seconds)
+        self.counts: Counter = Counter()
+        self.attempts = 0
+
+    def is_finished(self, index: int) -> bool:
+        return index < self.watermark or index in self.finished
+
+    def apply(self, record: dict):
+        """Fold one outcome-log record into the state"""
+        index, attempt = record["lead"], record["attempt"]
+        if record["status"] == "dialing":
+            # In flight; if that is where a crash left it, the attempt counts and the lead is dialed again
+            self.attempts += 1
+            self.pending[index] = (attempt, 0.0)
+        elif record["final"]:
+            self.pending.pop(index, None)
+            self.counts[record["status"]] += 1
+            self.finished.add(index)
+            while self.watermark in self.finished:
+                self.finished.remove(self.watermark)
+                self.watermark += 1
+        else:
+            self.pending[index] = (attempt, record["retry_at"])
+
+    def to_dict(self) -> dict:
+        return {
+            "watermark": self.watermark,
+            "finished": sorted(self.finished),
+            "pending": {str(k): list(v) for k, v in self.pending.items()},
+            "counts": dict(self.counts),
+            "attempts": self.attempts,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CampaignState":
+        state = cls()
+        state.watermark = data["watermark"]
+        state.finished = set(data["finished"])
+        state.pending = {int(k): (v[0], v[1]) for k, v in data["pending"].items()}
+        state.counts = Counter(data["counts"])
+        state.attempts = data["attempts"]
+        return state
+
+
+class CampaignRunner:
+    """Dials a lead file with bounded concurrency, a call rate limit and retries with backoff.
+
+    Leads are pulled from the (streamed) lead iterator only when a dial slot
+    is free, so a file of any size is never held in memory. A lead whose
+    attempt ends in a RETRY_STATUSES result is dialed again after
+    `retry_delay * backoff**(attempt - 1)` seconds (with +-`jitter`), up to
+    `max_attempts` attempts; retries that are due go before fresh leads.
+
+    Every attempt is appended to the outcomes log (JSON lines) before it is
+    dialed and again with its result, so the log is the per-lead record and
+    the journal a crashed campaign resumes from. Each record is flushed as it
+    is written, and the "dialing" record is also fsynced (with `fsync`)
+    before the dial goes out; attempts starting together share one fsync. A
+    checkpoint of the folded state plus the log offset it covers is written
+    every `checkpoint_every` results, so resuming only replays the log's
+    tail. An attempt that was in flight during a crash counts as used and the
+    lead is dialed again. Settings a campaign cannot run with (no dial slots,
+    no attempts, a negative delay) raise ValueError here rather than in run().
+    """
+
+    def __init__(self, leads: Iterable[Lead], dial: Callable[[Lead], Awaitable[DialResult]], outcomes_path: str,
+                 checkpoint_path: Optional[str] = None, concurrency: int = 20, calls_per_second: float = 5.0,
+                 max_attempts: int = 3, retry_delay: float = 3600.0, backoff: float = 2.0, jitter: float = 0.1,
+                 dial_timeout: Optional[float] = None, checkpoint_every: int = 1000, fsync: bool = True,
+                 clock: Callable[[], float] = time.time):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        if retry_delay < 0 or backoff < 1 or not 0 <= jitter < 1:
+            raise ValueError("retry_delay must be >= 0, backoff >= 1 and jitter in [0, 1)")
+        self.dial = dial
+        self.outcomes_path = outcomes_path
+        self.checkpoint_path = checkpoint_path or outcomes_path + ".checkpoint"
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(calls_per_second)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.backoff = backoff
+        self.jitter = jitter
+        self.dial_timeout = dial_timeout
+        self.checkpoint_every = checkpoint_every
+        self.fsync = fsync
+        self.clock = clock
+        self.state = CampaignState()
+        self.status = "idle"
+        self.resumed = False
+        self.in_flight = 0
+        self.dialed = 0
+        self._leads = iter(leads)
+        self._exhausted = False
+        self._retries: List[Tuple[float, int, Lead, int]] = []
+        self._order = itertools.count()
+        self._log = None
+        self._since_checkpoint = 0
+        self._synced = 0  # log offset known to be on disk
+        self._sync: Optional[asyncio.Future] = None
+        self._started: Optional[float] = None
+        self._stopped: Optional[float] = None
+
+    async def run(self) -> dict:
+        """Dial every lead to a final outcome (resuming an earlier run if its files exist); returns stats()"""
+        self._restore()
+        self._log = open(self.outcomes_path, "ab")
+        self.status = "running"
+        self._started = time.monotonic()
+        running: set = set()
+        try:
+            while True:
+                while len(running) < self.concurrency:
+                    job = self._next_job()
+                    if job is None:
+                        break
+                    await self.limiter.acquire()
+                    running.add(asyncio.ensure_future(self._attempt(*job)))
+                if not running and self._exhausted and not self._retries:
+                    break
+                # With a free slot, wake up for the next retry coming due as well
+                timeout = None
+                if self._retries and len(running) < self.concurrency:
+                    timeout = max(0.0, self._retries[0][0] - self.clock())
+                if running:
+                    done, running = await asyncio.wait(running, timeout=timeout,
+                                                       return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+                else:
+                    await asyncio.sleep(timeout)
+            self.status = "finished"
+        except BaseException:
+            self.status = "stopped"
+            for task in running:
+                task.cancel()
+            raise
+        finally:
+            self._stopped = time.monotonic()
+            if self._sync is not None and not self._sync.done():
+                await asyncio.wait({self._sync})
+            self._checkpoint()
+            self._log.close()
+        return self.stats()
+
+    def _next_job(self) -> Optional[Tuple[Lead, int]]:
+        """The next attempt to dial: a retry that is due, otherwise the next unfinished lead from the file"""
+        if self._retries and self._retries[0][0] <= self.clock():
+            _, _, lead, attempt = heapq.heappop(self._retries)
+            return lead, attempt
+        for lead in self._leads:
+            if self.state.is_finished(lead.index):
+                continue
+            if not lead.phone_number or not lead.customer_name:
+                self._record(lead, 0, DialResult("invalid", detail="phone_number and customer_name are required"),
+                             final=True)
+                continue
+            pending = self.state.pending.get(lead.index)
+            if pending is None:
+                return lead, 1
+            # Resumed: carry on where the earlier run left this lead
+            attempts, due = pending
+            if attempts >= self.max_attempts:
+                self._record(lead, attempts, DialResult("failed", detail="last attempt interrupted"), final=True)
+            elif due <= self.clock():
+                return lead, attempts + 1
+            else:
+                self._schedule_retry(lead, attempts + 1, due)
+        self._exhausted = True
+        return None
+
+    def _schedule_retry(self, lead: Lead, attempt: int, due: float):
+        heapq.heappush(self._retries, (due, next(self._order), lead, attempt))
+
+    async def _attempt(self, lead: Lead, attempt: int):
+        self._append({"lead": lead.index, "attempt": attempt, "status": "dialing"})
+        self.dialed += 1
+        self.in_flight += 1
+        try:
+            # The customer must never be called without a durable record of it
+            await self._make_durable()
+            if self.dial_timeout:
+                result = await asyncio.wait_for(self.dial(lead), self.dial_timeout)
+            else:
+                result = await self.dial(lead)
+        except asyncio.TimeoutError:
+            result = DialResult("failed", detail="dial timed out")
+        except Exception as e:
+            logger.warning("Dialing lead %d failed: %s", lead.index, e)
+            result = DialResult("failed", detail=f"{type(e).__name__}: {e}")
+        finally:
+            self.in_flight -= 1
+        CAMPAIGN_CALLS.inc(result.status)
+
+        if result.status in RETRY_STATUSES and attempt < self.max_attempts:
+            delay = self.retry_delay * self.backoff ** (attempt - 1)
+            retry_at = self.clock() + delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+            self._schedule_retry(lead, attempt + 1, retry_at)
+            self._record(lead, attempt, result, final=False, retry_at=retry_at)
+        else:
+            self._record(lead, attempt, result, final=True)
+
+    def _record(self, lead: Lead, attempt: int, result: DialResult, final: bool, retry_at: Optional[float] = None):
+        record = {
+            "lead": lead.index,
+            "attempt": attempt,
+            "status": result.status,
+            "final": final,
+            "phone_number": lead.phone_number,
+            "customer_name": lead.customer_name,
+            "call_id": result.call_id,
+            "at": datetime.now().isoformat(timespec="seconds"),
+        }
+        if result.detail:
+            record["detail"] = result.detail
+        if retry_at is not None:
+            record["retry_at"] = round(retry_at, 3)
+        self._append(record)
+        self._since_checkpoint += 1
+        if self._since_checkpoint >= self.checkpoint_every:
+            self._checkpoint()
+
+    def _append(self, record: dict):
+        self._log.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+        # Handed to the OS at once, so a killed process loses nothing it has logged
+        self._log.flush()
+        self.state.apply(record)
+
+    async def _make_durable(self):
+        """Wait until everything logged so far is fsynced; callers arriving together share one fsync"""
+        if not self.fsync:
+            return
+        target = self._log.tell()
+        while self._synced < target:
+            if self._sync is None or self._sync.done():
+                self._sync = asyncio.ensure_future(self._fsync())
+            await asyncio.shield(self._sync)
+
+    async def _fsync(self):
+        covered = self._log.tell()
+        await asyncio.to_thread(os.fsync, self._log.fileno())
+        self._synced = max(self._synced, covered)
+
+    def _checkpoint(self):
+        """Make the log durable, then atomically record the state it amounts to"""
+        if self._log is None or self._log.closed:
+            return
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._synced = self._log.tell()
+        checkpoint = {"log_offset": self._synced, "state": self.state.to_dict()}
+        temporary = self.checkpoint_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.checkpoint_path)
+        self._since_checkpoint = 0
+
+    def _restore(self):
+        """Rebuild the state of an earlier run from its checkpoint and the log written after it"""
+        if not os.path.exists(self.outcomes_path):
+            return
+        offset = 0
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                checkpoint = json.load(f)
+            self.state = CampaignState.from_dict(checkpoint["state"])
+            offset = checkpoint["log_offset"]
+        with open(self.outcomes_path, "rb+") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Torn write from the crash: drop it, the attempt is redone
+                    f.seek(-len(line), os.SEEK_CUR)
+                    f.truncate()
+                    break
+                self.state.apply(json.loads(line))
+        self.resumed = True
+        logger.info("Resuming campaign from %s: %d leads finished, %d pending",
+                    self.outcomes_path, sum(self.state.counts.values()), len(self.state.pending))
+
+    def stats(self) -> dict:
+        elapsed = ((self._stopped or time.monotonic()) - self._started) if self._started else 0.0
+        return {
+            "status": self.status,
+            "resumed": self.resumed,
+            "finished": sum(self.state.counts.values()),
+            "outcomes": dict(self.state.counts),
+            "attempts": self.state.attempts,
+            "in_flight": self.in_flight,
+            "retries_waiting": len(self._retries),
+            "dialed_this_run": self.dialed,
+            "elapsed_s": round(elapsed, 3),
+            "calls_per_second": round(self.dialed / elapsed, 2) if elapsed else 0.0,
+            "outcomes_path": self.outcomes_path,
+        }
+
+
+def create_campaign_runner(leads_path: str, dial: Callable[[Lead], Awaitable[DialResult]], outcomes_path: str,
+                           **overrides) -> CampaignRunner:
+    """Build a runner for a lead file, with defaults from environment settings"""
+    settings = {
+        "concurrency": int(os.getenv("CAMPAIGN_CONCURRENCY", "20")),
+        "calls_per_second": float(os.getenv("CAMPAIGN_CALLS_PER_SECOND", "5")),
+        "max_attempts": int(os.getenv("CAMPAIGN_MAX_ATTEMPTS", "3")),
+        "retry_delay": float(os.getenv("CAMPAIGN_RETRY_DELAY_SECONDS", "3600")),
+    }
+    settings.update({k: v for k, v in overrides.items() if v is not None})
+    return CampaignRunner(read_leads(leads_path), dial, outcomes_path, **settings)
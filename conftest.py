@@ -0,0 +1,59 @@
+"""Shared fixtures for the offline tests: the app with speech and the RAG chain stubbed out"""
+import os
+
+import pytest
+
+# Scripts that drive a running server (python test_api.py); collected only when AGENT_URL points at one
+collect_ignore = [] if os.getenv("AGENT_URL") else ["test_api.py", "test_simulate.py"]
+
+
+class SilentVoice:
+    """VoiceService stand-in: every utterance is "spoken" at once, without audio"""
+
+    def text_to_speech(self, text):
+        return True
+
+    def speak_token_stream(self, tokens):
+        for _ in tokens:
+            pass
+        return True
+
+    def fallback_tts(self, text):
+        return True
+
+
+@pytest.fixture
+def silent_speech(monkeypatch):
+    """main.speech_pipeline speaking through SilentVoice; drained when the test ends"""
+    import main
+    from speech_pipeline import SpeechPipeline
+
+    pipeline = SpeechPipeline(SilentVoice(), max_workers=1, max_pending=1000)
+    monkeypatch.setattr(main, "speech_pipeline", pipeline)
+    yield pipeline
+    pipeline.shutdown(wait=True)
+
+
+@pytest.fixture
+def client(silent_speech):
+    """TestClient for main.app (without running its lifespan)"""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def install_chain(monkeypatch):
+    """Put a stand-in retrieval chain behind the RAG endpoints: RAG ready, no response cache"""
+    import main
+
+    def install(chain):
+        monkeypatch.setattr(main.llm_service, "rag_enabled", True)
+        monkeypatch.setattr(main.llm_service, "rag_state", "ready")
+        monkeypatch.setattr(main.llm_service, "retrieval_chain", chain)
+        monkeypatch.setattr(main.llm_service, "response_cache", None)
+        return chain
+
+    return install
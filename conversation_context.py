@@ -0,0 +1,198 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List
+
+from models import CallHistory
+
+# Words and punctuation; close enough to LLM tokenizers for budgeting and cost tracking
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+# Follow-ups lean on earlier turns ("and how long is it?"), so retrieval also uses the previous question
+_FOLLOW_UP_STARTS = ("and ", "what about", "how about", "also ", "but ", "so ", "then ", "ok ", "okay ")
+_REFERENCES = {"it", "its", "it's", "that", "this", "those", "these", "they", "them", "there", "one"}
+
+NO_HISTORY = "(This is the start of the conversation.)"
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count of a text"""
+    return len(_TOKEN.findall(text))
+
+
+def is_follow_up(message: str) -> bool:
+    """Whether a message only makes sense together with the previous question"""
+    text = message.lower().strip()
+    if text.startswith(_FOLLOW_UP_STARTS):
+        return True
+    words = re.findall(r"[a-z']+", text)
+    return len(words) <= 8 and any(w in _REFERENCES for w in words)
+
+
+def summary_line(entry: CallHistory, max_words: int = 25) -> str:
+    """One line for the rolling summary: the entry's first sentence, capped at max_words"""
+    first = _SENTENCE_END.split(entry.text.strip(), 1)[0]
+    words = first.split()
+    if len(words) > max_words:
+        first = " ".join(words[:max_words]) + " ..."
+    return f"{'Customer' if entry.sender == 'customer' else 'Agent'}: {first}"
+
+
+class ConversationContext:
+    """What the LLM sees of a call besides the current message"""
+
+    def __init__(self, summary: List[str], turns: List[CallHistory]):
+        self.summary = summary
+        self.turns = turns
+        self.prompt_tokens = 0  # filled in by the LLM service when it builds the prompt
+
+    def render(self) -> str:
+        if not self.summary and not self.turns:
+            return NO_HISTORY
+        parts = []
+        if self.summary:
+            parts.append("Earlier in the call (summary):\n" + "\n".join(self.summary))
+        if self.turns:
+            parts.append("Recent turns:\n" + "\n".join(
+                f"{'Customer' if h.sender == 'customer' else 'Agent'}: {h.text}" for h in self.turns
+            ))
+        return "\n\n".join(parts)
+
+    @property
+    def history_tokens(self) -> int:
+        return count_tokens(self.render()) if self.summary or self.turns else 0
+
+    def search_query(self, message: str) -> str:
+        """Retrieval query for the message, with the previous question prepended for follow-ups"""
+        if is_follow_up(message):
+            for entry in reversed(self.turns):
+                if entry.sender == "customer":
+                    return f"{entry.text} {message}"
+        return message
+
+    def usage(self) -> dict:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "history_tokens": self.history_tokens,
+            "window_turns": len(self.turns),
+            "summary_lines": len(self.summary),
+        }
+
+
+def select_window(entries: List[CallHistory], max_turns: int, token_budget: int) -> int:
+    """Index into entries where the recent window starts (newest turns that fit the budget)"""
+    start = len(entries)
+    tokens = 0
+    while start > 0 and len(entries) - start < max_turns:
+        cost = count_tokens(entries[start - 1].text) + 2  # plus the "Customer:" label
+        if tokens + cost > token_budget:
+            break
+        tokens += cost
+        start -= 1
+    return start
+
+
+class _SummaryState:
+    def __init__(self):
+        self.lines: List[str] = []
+        self.tokens = 0
+        self.upto = 0  # history entries already folded into the summary
+
+
+class ConversationMemory:
+    """Per-call rolling summary plus a token-budgeted window of recent turns.
+
+    Turns that fall out of the window are folded into the call's summary once,
+    so each turn only reads the not-yet-summarized tail of the history and the
+    summary is never rebuilt from scratch. The summary is kept under its own
+    token budget by dropping its oldest lines. Summaries live in a bounded
+    in-process LRU; a call whose summary was evicted (or that moved to another
+    worker) gets it rebuilt from the stored history on its next turn.
+    """
+
+    def __init__(self, call_store, max_turns: int = 6, token_budget: int = 400, summary_tokens: int = 150,
+                 max_calls: int = 10000):
+        self.call_store = call_store
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.max_calls = max_calls
+        self._lock = threading.Lock()
+        self._states: "OrderedDict[str, _SummaryState]" = OrderedDict()
+        self.entries_summarized = 0
+        self.turns = 0
+        self.prompt_tokens_total = 0
+        self.prompt_tokens_max = 0
+
+    def build(self, call_id: str) -> ConversationContext:
+        """Context for the next turn of a call (its history so far, excluding the new message)"""
+        with self._lock:
+            state = self._states.pop(call_id, None) or _SummaryState()
+            self._states[call_id] = state
+            while len(self._states) > self.max_calls:
+                self._states.popitem(last=False)
+
+        tail = self.call_store.get_history(call_id, offset=state.upto)
+        start = select_window(tail, self.max_turns, self.token_budget)
+        for entry in tail[:start]:
+            line = summary_line(entry)
+            state.lines.append(line)
+            state.tokens += count_tokens(line)
+        while state.lines and state.tokens > self.summary_tokens:
+            state.tokens -= count_tokens(state.lines.pop(0))
+        state.upto += start
+        with self._lock:
+            self.entries_summarized += start
+        return ConversationContext(list(state.lines), tail[start:])
+
+    def forget(self, call_id: str):
+        with self._lock:
+            self._states.pop(call_id, None)
+
+    def record(self, context: ConversationContext):
+        """Track prompt size of a turn that went to the LLM"""
+        if not context.prompt_tokens:
+            return
+        with self._lock:
+            self.turns += 1
+            self.prompt_tokens_total += context.prompt_tokens
+            self.prompt_tokens_max = max(self.prompt_tokens_max, context.prompt_tokens)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_turns": self.max_turns,
+                "token_budget": self.token_budget,
+                "summary_tokens": self.summary_tokens,
+                "calls_tracked": len(self._states),
+                "entries_summarized": self.entries_summarized,
+                "llm_turns": self.turns,
+                "prompt_tokens_mean": round(self.prompt_tokens_total / self.turns, 1) if self.turns else 0.0,
+                "prompt_tokens_max": self.prompt_tokens_max,
+            }
+
+
+def context_from_history(history: List[CallHistory], max_turns: int = 6, token_budget: int = 400,
+                         summary_tokens: int = 150) -> ConversationContext:
+    """One-off context from a full history list (no per-call state)"""
+    start = select_window(history, max_turns, token_budget)
+    lines, tokens = [], 0
+    for entry in reversed(history[:start]):
+        line = summary_line(entry)
+        tokens += count_tokens(line)
+        if tokens > summary_tokens:
+            break
+        lines.insert(0, line)
+    return ConversationContext(lines, history[start:])
+
+
+def create_conversation_memory(call_store) -> ConversationMemory:
+    """Build the conversation memory from environment settings"""
+    return ConversationMemory(
+        call_store,
+        max_turns=int(os.getenv("CONVERSATION_WINDOW_TURNS", "6")),
+        token_budget=int(os.getenv("CONVERSATION_TOKEN_BUDGET", "400")),
+        summary_tokens=int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "150"))
+    )
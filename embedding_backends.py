@@ -0,0 +1,215 @@
+"""Embedding backends for the RAG index and queries.
+
+EMBEDDING_BACKEND selects how all-MiniLM-L6-v2 runs on CPU:
+
+  torch      HuggingFaceEmbeddings (sentence-transformers on PyTorch, fp32)
+  onnx       the same model exported to ONNX, run by ONNX Runtime (fp32)
+  onnx-int8  the ONNX model with int8 dynamic quantization of its weights
+
+The ONNX backends never import torch. Their model directory (ONNX_MODEL_DIR)
+is prepared once with:
+
+    python -m embedding_backends --out models/all-MiniLM-L6-v2-onnx --quantize
+"""
+import argparse
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_MODEL_DIR = "models/all-MiniLM-L6-v2-onnx"
+HUB_REPO = "sentence-transformers/all-MiniLM-L6-v2"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+# Fixed query set for checking that a backend retrieves what fp32 PyTorch does
+RECALL_QUERIES = [
+    "How much does the bootcamp cost?",
+    "Is there a discount or a payment plan?",
+    "How long is the program?",
+    "How many hours per week do I need?",
+    "What topics does the curriculum cover?",
+    "Do you teach MLOps and deployment?",
+    "Will I build real projects?",
+    "Do I get a certificate at the end?",
+    "Do you help with job placement?",
+    "Who are the mentors?",
+    "Do I need programming experience?",
+    "Is it online or in person?",
+    "Can I get a refund?",
+    "What tools and frameworks will I learn?",
+    "Is there a community or support for students?",
+    "When does the next batch start?",
+]
+
+
+def mean_pool(hidden: np.ndarray, mask: np.ndarray, normalize: bool = True) -> np.ndarray:
+    """Sentence vectors from token states, averaged over real tokens like sentence-transformers does"""
+    weights = mask[..., None].astype(hidden.dtype)
+    vectors = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+    if normalize:
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    return vectors
+
+
+class OnnxEmbeddings(Embeddings):
+    """MiniLM on ONNX Runtime: a tokenizers fast tokenizer, one session, mean pooling.
+
+    Texts are sorted by length before batching so each batch pads to
+    similar lengths. Batches run on a pool of `workers` threads; each
+    session.run() uses `intra_op_threads` threads (0 lets ONNX Runtime pick),
+    so the embedding load uses at most workers * intra_op_threads cores.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, intra_op_threads: int = 0, workers: int = 1,
+                 batch_size: int = 32, max_length: int = 256, normalize: bool = True):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        path = os.path.join(model_dir, INT8_FILE if quantized else FP32_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"ONNX model not found: {path} (prepare it with python -m embedding_backends"
+                                    f" --out {model_dir}{' --quantize' if quantized else ''})")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+        self.normalize = normalize
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") if workers > 1 else None
+
+    def _embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(list(texts))
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, {name: feeds[name] for name in self.input_names})[0]
+        return mean_pool(hidden, mask, self.normalize)
+
+    def embed_array(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts as a (len(texts), dim) float32 array, in input order"""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = [[texts[i] for i in order[start:start + self.batch_size]]
+                   for start in range(0, len(order), self.batch_size)]
+        if self.pool is not None and len(batches) > 1:
+            results = list(self.pool.map(self._embed_batch, batches))
+        else:
+            results = [self._embed_batch(batch) for batch in batches]
+        vectors = np.empty((len(texts), results[0].shape[1]) if results else (0, 0), dtype=np.float32)
+        if results:
+            vectors[order] = np.concatenate(results)
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+
+
+def create_embeddings(model_name: str = "all-MiniLM-L6-v2", normalize: bool = True) -> Tuple[str, Embeddings]:
+    """Build the backend selected by EMBEDDING_BACKEND; returns (backend name, embeddings).
+
+    EMBEDDING_THREADS sets ONNX Runtime's intra-op threads (default 0, its
+    own choice) and EMBEDDING_WORKERS the batches run in parallel (default
+    1). An ONNX backend whose model cannot be loaded falls back to PyTorch
+    with a warning, so the server still starts.
+    """
+    backend = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+    if backend != "torch":
+        try:
+            return backend, OnnxEmbeddings(
+                os.getenv("ONNX_MODEL_DIR", ONNX_MODEL_DIR),
+                quantized=backend == "onnx-int8",
+                intra_op_threads=int(os.getenv("EMBEDDING_THREADS", "0")),
+                workers=int(os.getenv("EMBEDDING_WORKERS", "1")),
+                normalize=normalize,
+            )
+        except Exception as e:
+            logger.warning("Could not load the %s embeddings (%s); using PyTorch instead", backend, e)
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return "torch", HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': normalize}
+    )
+
+
+def quantize_model(model_dir: str) -> str:
+    """Write the int8 dynamically quantized copy of the fp32 model (needs the onnx package)"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    path = os.path.join(model_dir, INT8_FILE)
+    quantize_dynamic(os.path.join(model_dir, FP32_FILE), path, weight_type=QuantType.QInt8)
+    return path
+
+
+def prepare_onnx_model(model_dir: str = ONNX_MODEL_DIR, repo: str = HUB_REPO, quantize: bool = True) -> str:
+    """Fetch the ONNX export and tokenizer the sentence-transformers repo publishes, then quantize it"""
+    import shutil
+    from huggingface_hub import hf_hub_download
+
+    os.makedirs(model_dir, exist_ok=True)
+    for remote, local in (("onnx/model.onnx", FP32_FILE), (TOKENIZER_FILE, TOKENIZER_FILE)):
+        target = os.path.join(model_dir, local)
+        if not os.path.exists(target):
+            shutil.copyfile(hf_hub_download(repo, remote), target)
+    if quantize:
+        quantize_model(model_dir)
+    return model_dir
+
+
+def top_k(embeddings: Embeddings, texts: List[str], queries: Sequence[str] = RECALL_QUERIES,
+          k: int = 2) -> List[List[int]]:
+    """Indexes of the k texts FAISS returns for each query"""
+    from langchain_community.vectorstores import FAISS
+
+    store = FAISS.from_texts(texts, embeddings, metadatas=[{"i": i} for i in range(len(texts))])
+    return [[doc.metadata["i"] for doc in store.similarity_search(query, k=k)] for query in queries]
+
+
+def recall(expected: List[List[int]], actual: List[List[int]]) -> float:
+    """Share of the expected results that were also returned, over all queries"""
+    total = sum(len(e) for e in expected)
+    hits = sum(len(set(e) & set(a)) for e, a in zip(expected, actual))
+    return hits / total if total else 1.0
+
+
+def retrieval_recall(reference: Embeddings, candidate: Embeddings, texts: List[str],
+                     queries: Sequence[str] = RECALL_QUERIES, k: int = 2) -> float:
+    """Recall@k of a candidate backend against the reference (fp32) backend's FAISS results"""
+    return recall(top_k(reference, texts, queries, k), top_k(candidate, texts, queries, k))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=ONNX_MODEL_DIR, help="model directory (ONNX_MODEL_DIR)")
+    parser.add_argument("--repo", default=HUB_REPO)
+    parser.add_argument("--quantize", action="store_true", help="also write the int8 model")
+    args = parser.parse_args()
+    print("ONNX model ready in", prepare_onnx_model(args.out, args.repo, args.quantize))
+
+
+if __name__ == "__main__":
+    main_cli()
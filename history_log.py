@@ -0,0 +1,120 @@
+import math
+import threading
+from array import array
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from models import CallHistory
+
+# Sender is stored as an index into this tuple, one byte per entry
+SENDERS = ("agent", "customer")
+_SENDER_CODES = {sender: code for code, sender in enumerate(SENDERS)}
+
+# Responder and intent names, interned process-wide; code 0 is "not set"
+_NAMES: List[Optional[str]] = [None]
+_NAME_CODES = {None: 0}
+_NAMES_LOCK = threading.Lock()
+
+
+def _name_code(name: Optional[str]) -> int:
+    code = _NAME_CODES.get(name)
+    if code is None:
+        with _NAMES_LOCK:
+            code = _NAME_CODES.get(name)
+            if code is None:
+                code = len(_NAMES)
+                _NAMES.append(name)
+                _NAME_CODES[name] = code
+    return code
+
+
+def epoch_ms(timestamp: datetime) -> int:
+    # Truncated like isoformat(timespec="milliseconds"), so a stored time never moves forward
+    return round(timestamp.timestamp() * 1_000_000) // 1000
+
+
+def from_epoch_ms(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000.0)
+
+
+def history_row(sender: str, text: str, timestamp: datetime) -> dict:
+    """A history entry as returned by /conversation"""
+    return {"sender": sender, "text": text, "timestamp": timestamp.isoformat(timespec="milliseconds")}
+
+
+class HistoryLog:
+    """Append-only conversation history of one call, kept column by column.
+
+    Each entry costs a sender byte, an 8-byte epoch-ms timestamp, a few bytes
+    of reply metadata and a reference to its text, instead of a pydantic
+    model with its own dict and datetime. CallHistory objects are only built
+    for the entries read back.
+    """
+
+    __slots__ = ("_senders", "_times", "_texts", "_responders", "_intents", "_latencies")
+
+    def __init__(self, entries: Iterable[CallHistory] = ()):
+        self._senders = array("B")
+        self._times = array("q")
+        self._texts: List[str] = []
+        self._responders = array("H")
+        self._intents = array("H")
+        self._latencies = array("f")  # milliseconds as float32, NaN when not set
+        self.extend(entries)
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def append(self, sender: str, text: str, timestamp: datetime, responder: Optional[str] = None,
+               intent: Optional[str] = None, latency_ms: Optional[float] = None):
+        try:
+            code = _SENDER_CODES[sender]
+        except KeyError:
+            raise ValueError(f"Unknown sender: {sender!r}") from None
+        self._senders.append(code)
+        self._times.append(epoch_ms(timestamp))
+        self._texts.append(text)
+        self._responders.append(_name_code(responder))
+        self._intents.append(_name_code(intent))
+        self._latencies.append(math.nan if latency_ms is None else latency_ms)
+
+    def extend(self, entries: Iterable[CallHistory]):
+        for entry in entries:
+            self.append(entry.sender, entry.text, entry.timestamp, entry.responder, entry.intent, entry.latency_ms)
+
+    def entries(self, offset: int = 0, limit: Optional[int] = None) -> List[CallHistory]:
+        """A page of history as CallHistory objects, oldest first"""
+        end = self._end(offset, limit)
+        return [
+            CallHistory.model_construct(
+                sender=SENDERS[code], text=text, timestamp=from_epoch_ms(ms), responder=_NAMES[responder],
+                intent=_NAMES[intent], latency_ms=None if math.isnan(latency) else round(latency, 3)
+            )
+            for code, text, ms, responder, intent, latency in zip(
+                self._senders[offset:end], self._texts[offset:end], self._times[offset:end],
+                self._responders[offset:end], self._intents[offset:end], self._latencies[offset:end]
+            )
+        ]
+
+    def records(self, offset: int = 0, limit: Optional[int] = None) -> List[tuple]:
+        """A page of history as (sender, text, epoch ms, responder, intent, latency_ms) tuples"""
+        end = self._end(offset, limit)
+        return [
+            (SENDERS[code], text, ms, _NAMES[responder], _NAMES[intent],
+             None if math.isnan(latency) else round(latency, 3))
+            for code, text, ms, responder, intent, latency in zip(
+                self._senders[offset:end], self._texts[offset:end], self._times[offset:end],
+                self._responders[offset:end], self._intents[offset:end], self._latencies[offset:end]
+            )
+        ]
+
+    def rows(self, offset: int = 0, limit: Optional[int] = None) -> List[dict]:
+        """A page of history as JSON-ready dicts, without building CallHistory objects"""
+        end = self._end(offset, limit)
+        return [
+            history_row(SENDERS[code], text, from_epoch_ms(ms))
+            for code, text, ms in zip(self._senders[offset:end], self._texts[offset:end], self._times[offset:end])
+        ]
+
+    def _end(self, offset: int, limit: Optional[int]) -> int:
+        return len(self._texts) if limit is None else min(len(self._texts), offset + limit)
@@ -0,0 +1,120 @@
+import json
+import re
+from typing import Dict, FrozenSet, List, NamedTuple, Tuple
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+# Punctuation that separates words in caller utterances, including the dashes,
+# ellipsis and curly quotes that speech-to-text and phone keyboards produce;
+# str.replace per character plus str.split() tokenizes faster than a regex in CPython
+_SEPARATORS = ',.!?;:"()[]{}/-\u2010\u2013\u2014\u2026\u201c\u201d\u00ab\u00bb'
+
+# Typographic apostrophes, read as "'" so "that\u2019s" tokenizes like "that's"
+_APOSTROPHES = "\u2018\u2019\u02bc"
+
+_END_CALL = "__end_call__"
+
+
+class IntentMatch(NamedTuple):
+    intents: List[str]  # highest priority first
+    ends_call: bool
+
+    @property
+    def top(self):
+        return self.intents[0] if self.intents else None
+
+
+def _inflections(word: str) -> List[str]:
+    """A keyword plus its plural and common verb forms ("cost" -> "costs", "costing")"""
+    forms = [word, word + "s", word + "es", word + "ed", word + "ing"]
+    if word.endswith("e"):
+        forms += [word + "d", word[:-1] + "ing"]
+    return forms
+
+
+def _strip_possessives(tokens: List[str]) -> List[str]:
+    """Drop a trailing "'s" ("cost's" -> "cost", "that's" -> "that")"""
+    return [t[:-2] if t.endswith("'s") and len(t) > 2 else t for t in tokens]
+
+
+class IntentMatcher:
+    """Keyword intent rules compiled into word and phrase lookup tables.
+
+    A message is tokenized once and each word is looked up in the keyword
+    table, so one pass finds all matching intents (ordered by priority) and
+    whether the caller asked to end the call. Matching is on whole words, so
+    "yes" no longer fires inside "yesterday" (nor "time" inside "sometimes",
+    nor "cover" inside "uncovered"); a possessive "'s" is dropped first, so
+    "the cost's fine" still reads as "cost". Compounds the old substring scan
+    caught on purpose ("pricey", "timeline", "overtime") are listed as
+    keywords of their own in the intent table. A multi-word phrase claims the
+    words it spans, so "looking for work" reads as that phrase alone and not
+    also as the bare keyword "work".
+    """
+
+    def __init__(self, intents: List[dict], end_call_phrases: List[str]):
+        self.priorities: Dict[str, int] = {}
+        words: Dict[str, set] = {}
+        phrases: Dict[str, Dict[Tuple[str, ...], set]] = {}
+
+        def add(keyword: str, intent: str):
+            tokens = _strip_possessives(_TOKEN.findall(keyword.lower()))
+            if len(tokens) == 1:
+                for form in _inflections(tokens[0]):
+                    words.setdefault(form, set()).add(intent)
+            elif tokens:
+                # Multi-word phrases are indexed by their first word
+                phrases.setdefault(tokens[0], {}).setdefault(tuple(tokens[1:]), set()).add(intent)
+
+        for intent in intents:
+            self.priorities[intent["name"]] = intent.get("priority", 0)
+            for keyword in intent["keywords"]:
+                add(keyword, intent["name"])
+        for phrase in end_call_phrases:
+            add(phrase, _END_CALL)
+
+        self._words: Dict[str, FrozenSet[str]] = {w: frozenset(i) for w, i in words.items()}
+        self._phrases: Dict[str, List[Tuple[Tuple[str, ...], FrozenSet[str]]]] = {
+            first: [(rest, frozenset(i)) for rest, i in tails.items()] for first, tails in phrases.items()
+        }
+        self._phrase_starts = frozenset(self._phrases)
+
+    @classmethod
+    def from_file(cls, path: str) -> "IntentMatcher":
+        with open(path, "r", encoding="utf-8") as f:
+            table = json.load(f)
+        return cls(table["intents"], table.get("end_call_phrases", []))
+
+    def match(self, message: str) -> IntentMatch:
+        """Find all intents in a message in one pass"""
+        text = message.lower()
+        for apostrophe in _APOSTROPHES:
+            if apostrophe in text:
+                text = text.replace(apostrophe, "'")
+        for separator in _SEPARATORS:
+            if separator in text:
+                text = text.replace(separator, " ")
+        tokens = text.split()
+        if "'s" in text:
+            tokens = _strip_possessives(tokens)
+
+        found = set()
+        if not self._phrase_starts.isdisjoint(tokens):
+            spanned = set()
+            for i, token in enumerate(tokens):
+                for rest, hit in self._phrases.get(token, ()):
+                    if tuple(tokens[i + 1:i + 1 + len(rest)]) == rest:
+                        found |= hit
+                        spanned.update(range(i, i + 1 + len(rest)))
+            if spanned:
+                tokens = [token for i, token in enumerate(tokens) if i not in spanned]
+        for hit in map(self._words.get, tokens):
+            if hit:
+                found |= hit
+
+        if not found:
+            return IntentMatch([], False)
+        ends_call = _END_CALL in found
+        found.discard(_END_CALL)
+        intents = sorted(found, key=self.priorities.__getitem__, reverse=True)
+        return IntentMatch(intents, ends_call)
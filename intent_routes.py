@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+from intent_matcher import IntentMatcher
+
+
+def render_context(documents) -> str:
+    """Documents joined the way create_stuff_documents_chain fills {context}"""
+    return "\n\n".join(doc.page_content for doc in documents)
+
+
+class IntentRoutes:
+    """Fast path for RAG questions about the topics most calls ask about.
+
+    Intents with a "rag_query" in the intents file (price, schedule,
+    curriculum, career, certificate) get their retrieval done once, per
+    installed index, with that query. Their documents are rendered into the
+    prompt template ahead of time, so every question routed to an intent
+    sends the same prompt prefix (a provider-side prompt cache can reuse it)
+    and skips the embedding pass and the FAISS search. A question is routed
+    only when it matches exactly one such intent; anything else takes the
+    full retrieval chain.
+    """
+
+    def __init__(self, matcher: IntentMatcher, queries: Dict[str, str], k: int = 2):
+        self.matcher = matcher
+        self.queries = queries
+        self.k = k
+        self.contexts: Dict[str, list] = {}
+        self.chains: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.routed = {intent: 0 for intent in queries}
+        self.unrouted = 0
+
+    @classmethod
+    def from_file(cls, path: str, matcher: IntentMatcher, k: int = 2) -> "IntentRoutes":
+        with open(path, "r", encoding="utf-8") as f:
+            table = json.load(f)
+        return cls(matcher, {i["name"]: i["rag_query"] for i in table["intents"] if i.get("rag_query")}, k)
+
+    def build(self, search: Callable[[str, int], List], template: str, llm):
+        """Retrieve each intent's documents and build its chain with the context already in the prompt.
+
+        The chains take the retrieval chain's inputs and produce its output
+        shape ({"input", "context", "answer"}), streaming included.
+        """
+        from langchain.prompts import ChatPromptTemplate
+        from langchain_core.output_parsers import StrOutputParser
+        from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+
+        contexts, chains = {}, {}
+        for intent, query in self.queries.items():
+            documents = search(query, self.k)
+            # Braces in the documents are literal text, not template variables
+            context = render_context(documents).replace("{", "{{").replace("}", "}}")
+            prompt = ChatPromptTemplate.from_template(template.replace("{context}", context))
+            contexts[intent] = documents
+            chains[intent] = RunnablePassthrough.assign(
+                context=RunnableLambda(lambda inputs, documents=documents: documents)
+            ).assign(answer=prompt | llm | StrOutputParser())
+        # Swapped in whole, like the retrieval chain
+        self.contexts, self.chains = contexts, chains
+
+    def route(self, message: str) -> Optional[str]:
+        """The intent a question is routed to, or None for full retrieval"""
+        intents = [intent for intent in self.matcher.match(message).intents if intent in self.chains]
+        intent = intents[0] if len(intents) == 1 else None
+        with self._lock:
+            if intent is None:
+                self.unrouted += 1
+            else:
+                self.routed[intent] += 1
+        return intent
+
+    def chain_for(self, message: str):
+        """The precomputed chain for a question, or None"""
+        intent = self.route(message)
+        return self.chains.get(intent) if intent is not None else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            routed = dict(self.routed)
+            unrouted = self.unrouted
+        total = sum(routed.values()) + unrouted
+        return {
+            "intents": sorted(self.chains),
+            "routed": routed,
+            "unrouted": unrouted,
+            "routed_share": round(sum(routed.values()) / total, 4) if total else 0.0,
+        }
+
+
+def create_intent_routes(path: str, matcher: IntentMatcher) -> Optional[IntentRoutes]:
+    """Build the intent routes from the intents file (RAG_INTENT_ROUTES=off disables them)"""
+    if os.getenv("RAG_INTENT_ROUTES", "on").lower() in ("0", "off", "false", "no"):
+        return None
+    return IntentRoutes.from_file(path, matcher, k=int(os.getenv("RAG_INTENT_ROUTE_K", "2")))
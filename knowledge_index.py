@@ -0,0 +1,352 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Directory of knowledge-base documents (*.txt, *.md), one file per program/topic
+KNOWLEDGE_DIR = os.getenv("KNOWLEDGE_DIR", "knowledge_base")
+
+# Where the FAISS index and the chunk embedding cache are persisted
+RAG_INDEX_DIR = os.getenv("RAG_INDEX_DIR", "rag_index")
+
+MANIFEST_FILE = "manifest.json"
+INDEX_NAME = "index"
+SNAPSHOT_PREFIX = "snapshot-"
+# Unreferenced snapshots younger than this may still be being written by another process
+SNAPSHOT_GRACE_SECONDS = 300
+DOCUMENT_EXTENSIONS = (".txt", ".md")
+
+# Pseudo-document used when the knowledge directory is empty
+DEFAULT_DOCUMENT = "<default>"
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def knowledge_fingerprint(contents: Dict[str, str], config: dict) -> str:
+    """Hash the knowledge-base sources together with the splitter/embedding config"""
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8"))
+    for name in sorted(contents):
+        digest.update(b"\0" + name.encode("utf-8") + b"\0" + contents[name].encode("utf-8"))
+    return digest.hexdigest()
+
+
+def read_manifest(index_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(index_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_vector_store(index_dir: str, embeddings, fingerprint: Optional[str] = None):
+    """Load the saved FAISS store, optionally only if its fingerprint matches.
+
+    The index is memory-mapped read-only where FAISS supports it, so several
+    workers on one host share the pages instead of each holding a copy.
+    Returns None when there is nothing usable on disk.
+    """
+    for _ in range(2):
+        manifest = read_manifest(index_dir)
+        if not manifest or (fingerprint is not None and manifest.get("fingerprint") != fingerprint):
+            return None
+        try:
+            return _load_snapshot(os.path.join(index_dir, manifest.get("snapshot", "")), embeddings)
+        except OSError:
+            # Another process saved twice since the manifest was read; read the new one
+            continue
+    return None
+
+
+def _load_snapshot(snapshot_dir: str, embeddings):
+    import faiss
+    from langchain_community.vectorstores import FAISS
+
+    index_path = os.path.join(snapshot_dir, f"{INDEX_NAME}.faiss")
+    if not os.path.exists(index_path):
+        raise FileNotFoundError(index_path)
+    try:
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        index = faiss.read_index(index_path)
+    with open(os.path.join(snapshot_dir, f"{INDEX_NAME}.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def save_vector_store(vector_store, index_dir: str, fingerprint: str, config: dict, **extra):
+    """Persist a FAISS store with a manifest describing what it was built from.
+
+    The index files go into a new snapshot directory and the manifest naming
+    it is swapped in with os.replace(), so a reader in any process sees the old
+    index or the new one, never a mix, and concurrent savers cannot interleave
+    their files. The previous snapshot is kept for readers still loading it.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+    previous = (read_manifest(index_dir) or {}).get("snapshot")
+
+    snapshot_dir = tempfile.mkdtemp(prefix=SNAPSHOT_PREFIX, dir=index_dir)
+    vector_store.save_local(snapshot_dir, INDEX_NAME)
+
+    manifest = {
+        "fingerprint": fingerprint,
+        "config": config,
+        "chunks": vector_store.index.ntotal,
+        "created_at": time.time(),
+        "snapshot": os.path.basename(snapshot_dir),
+        **extra,
+    }
+    fd, tmp_path = tempfile.mkstemp(prefix=MANIFEST_FILE, suffix=".tmp", dir=index_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, manifest_path)
+    _prune_snapshots(index_dir, keep={manifest["snapshot"], previous})
+
+
+def _prune_snapshots(index_dir: str, keep: set):
+    """Remove snapshots no manifest points to any more (and the pre-snapshot layout's files)"""
+    for name in (f"{INDEX_NAME}.faiss", f"{INDEX_NAME}.pkl"):
+        try:
+            os.unlink(os.path.join(index_dir, name))
+        except FileNotFoundError:
+            pass
+    cutoff = time.time() - SNAPSHOT_GRACE_SECONDS
+    for name in os.listdir(index_dir):
+        path = os.path.join(index_dir, name)
+        if name.startswith(SNAPSHOT_PREFIX) and name not in keep:
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path)
+            except OSError:
+                pass
+        elif name.startswith(MANIFEST_FILE) and name.endswith(".tmp"):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+
+def cached_embeddings(embeddings, index_dir: str, namespace: str):
+    """Wrap an embeddings model with an on-disk cache of chunk embeddings.
+
+    A rebuild after a knowledge-base edit only embeds chunks whose text
+    changed; unchanged chunks are read back from the cache.
+    """
+    from langchain.embeddings import CacheBackedEmbeddings
+    from langchain.storage import LocalFileStore
+
+    store = LocalFileStore(os.path.join(index_dir, "embedding_cache"))
+    return CacheBackedEmbeddings.from_bytes_store(embeddings, store, namespace=namespace)
+
+
+class KnowledgeBase:
+    """A directory of documents indexed into FAISS with per-document chunk tracking.
+
+    refresh() compares each document's content hash with the manifest and only
+    re-embeds documents that were added or edited; chunks of edited and deleted
+    documents are removed from the index. Updates are applied to a copy of the
+    index and published with a single reference swap, so searches running
+    against the previous index are never blocked.
+    """
+
+    def __init__(self, embeddings, config: dict, docs_dir: str = KNOWLEDGE_DIR, index_dir: str = RAG_INDEX_DIR,
+                 default_content: str = "", splitter=None, use_embedding_cache: bool = True):
+        self.embeddings = embeddings
+        self.config = config
+        self.docs_dir = docs_dir
+        self.index_dir = index_dir
+        self.default_content = default_content
+        self.config_hash = knowledge_fingerprint({}, config)
+        namespace = ":".join(filter(None, (config.get("embedding_model", ""), config.get("embedding_backend"))))
+        self.chunk_embeddings = (
+            cached_embeddings(embeddings, index_dir, namespace) if use_embedding_cache else embeddings
+        )
+        if splitter is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+            splitter = RecursiveCharacterTextSplitter(
+                chunk_size=config["chunk_size"],
+                chunk_overlap=config["chunk_overlap"],
+                separators=config["separators"]
+            )
+        self.splitter = splitter
+
+        self.vector_store = None
+        self.documents: Dict[str, dict] = {}  # name -> {"hash", "chunk_ids"}
+        self.version: Optional[str] = None
+        self._refresh_lock = threading.Lock()
+
+    def scan(self) -> Dict[str, str]:
+        """Read every document in the knowledge directory"""
+        contents = {}
+        if os.path.isdir(self.docs_dir):
+            for root, _, files in os.walk(self.docs_dir):
+                for name in sorted(files):
+                    if not name.endswith(DOCUMENT_EXTENSIONS):
+                        continue
+                    path = os.path.join(root, name)
+                    with open(path, "r", encoding="utf-8") as f:
+                        contents[os.path.relpath(path, self.docs_dir).replace(os.sep, "/")] = f.read()
+        if not contents and self.default_content:
+            contents[DEFAULT_DOCUMENT] = self.default_content
+        return contents
+
+    def load_or_build(self) -> dict:
+        """Load the saved index (applying any document changes) or build it from scratch"""
+        started = time.perf_counter()
+        manifest = read_manifest(self.index_dir)
+        loaded = False
+        if manifest and manifest.get("config_hash") == self.config_hash and "documents" in manifest:
+            self.vector_store = load_vector_store(self.index_dir, self.embeddings)
+            self.documents = manifest["documents"]
+            self.version = manifest.get("fingerprint")
+            loaded = self.vector_store is not None
+
+        result = self.refresh()
+        if loaded:
+            result["source"] = "loaded" if result["mode"] == "unchanged" else "updated"
+        else:
+            result["source"] = "rebuilt"
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        return result
+
+    def refresh(self) -> dict:
+        """Re-index added, edited and deleted documents; returns what changed"""
+        with self._refresh_lock:
+            started = time.perf_counter()
+            contents = self.scan()
+            hashes = {name: content_hash(text) for name, text in contents.items()}
+
+            if self.vector_store is None:
+                mode = "full"
+                added, changed, removed = sorted(hashes), [], []
+            else:
+                mode = "incremental"
+                added = sorted(name for name in hashes if name not in self.documents)
+                changed = sorted(name for name in hashes
+                                 if name in self.documents and self.documents[name]["hash"] != hashes[name])
+                removed = sorted(name for name in self.documents if name not in hashes)
+                if not (added or changed or removed):
+                    return self._summary("unchanged", [], [], [], 0, 0, started)
+
+            documents = {name: info for name, info in self.documents.items() if name not in removed}
+            stale_ids = [cid for name in changed + removed for cid in self.documents[name]["chunk_ids"]]
+
+            texts, metadatas, ids = [], [], []
+            for name in added + changed:
+                chunks = self._split(name, contents[name])
+                chunk_ids = [f"{name}#{i}" for i in range(len(chunks))]
+                documents[name] = {"hash": hashes[name], "chunk_ids": chunk_ids}
+                texts += [c.page_content for c in chunks]
+                metadatas += [c.metadata for c in chunks]
+                ids += chunk_ids
+
+            # Embedding is the slow part, and it happens before touching any index
+            vectors = self.chunk_embeddings.embed_documents(texts) if texts else []
+
+            if mode == "full":
+                from langchain_community.vectorstores import FAISS
+                store = FAISS.from_embeddings(list(zip(texts, vectors)), self.embeddings, metadatas=metadatas, ids=ids)
+            else:
+                store = self._copy(self.vector_store)
+                if stale_ids:
+                    store.delete(stale_ids)
+                if texts:
+                    store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+
+            version = knowledge_fingerprint(contents, self.config)
+            save_vector_store(store, self.index_dir, version, self.config,
+                              config_hash=self.config_hash, documents=documents)
+
+            # Publish: readers holding the old store keep using it undisturbed
+            self.vector_store = store
+            self.documents = documents
+            self.version = version
+            return self._summary(mode, added, changed, removed, len(texts), len(stale_ids), started)
+
+    def _split(self, name: str, text: str):
+        from langchain.schema import Document
+
+        return self.splitter.split_documents([Document(page_content=text, metadata={"source": name})])
+
+    def _copy(self, store):
+        import faiss
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+
+        # clone_index also turns a read-only memory-mapped index into a writable one
+        return FAISS(
+            self.embeddings,
+            faiss.clone_index(store.index),
+            InMemoryDocstore(dict(store.docstore._dict)),
+            dict(store.index_to_docstore_id),
+        )
+
+    def _summary(self, mode: str, added: List[str], changed: List[str], removed: List[str],
+                 chunks_added: int, chunks_removed: int, started: float) -> dict:
+        return {
+            "mode": mode,
+            "added": added,
+            "changed": changed,
+            "removed": removed,
+            "chunks_added": chunks_added,
+            "chunks_removed": chunks_removed,
+            "chunks": self.vector_store.index.ntotal if self.vector_store is not None else 0,
+            "documents": len(self.documents),
+            "version": self.version,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+
+class KnowledgeWatcher:
+    """Polls the knowledge directory and calls on_change when any document changes"""
+
+    def __init__(self, docs_dir: str, interval: float, on_change):
+        self.docs_dir = docs_dir
+        self.interval = interval
+        self.on_change = on_change
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="knowledge-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _snapshot(self):
+        snapshot = {}
+        if os.path.isdir(self.docs_dir):
+            for root, _, files in os.walk(self.docs_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def _run(self):
+        last = self._snapshot()
+        while not self._stop.wait(self.interval):
+            current = self._snapshot()
+            if current != last:
+                last = current
+                try:
+                    self.on_change()
+                except Exception as e:
+                    logger.error("Knowledge reload failed: %s", e)
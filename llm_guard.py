@@ -0,0 +1,252 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import AsyncIterator, Callable, Optional
+
+
+class CircuitOpenError(Exception):
+    """The LLM circuit breaker is open, so the call was not attempted"""
+
+
+class LLMTimeoutError(TimeoutError):
+    """The LLM call missed its deadline"""
+
+
+class CircuitBreaker:
+    """Stops calling a failing backend for a while.
+
+    closed: calls go through; `failure_threshold` consecutive failures open it.
+    open: calls are rejected until `reset_seconds` have passed.
+    half_open: a single trial call goes through; its success closes the
+    breaker, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._trial_running = False
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.rejected = 0
+        self.last_failure: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now (a True in half_open claims the trial call)"""
+        with self._lock:
+            state = self._current_state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._state = "half_open"
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = "closed"
+            self._trial_running = False
+            self.consecutive_failures = 0
+
+    def record_failure(self, reason: str):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_failure = reason
+            if self._state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self._state != "open":
+                    self.times_opened += 1
+                self._state = "open"
+                self._opened_at = self.clock()
+            self._trial_running = False
+
+    def record_abandoned(self):
+        """The caller went away before the call finished; no verdict on the backend"""
+        with self._lock:
+            self._trial_running = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            return {
+                "state": state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_seconds": self.reset_seconds,
+                "retry_in_s": round(max(0.0, self._opened_at + self.reset_seconds - self.clock()), 3)
+                if state == "open" else 0.0,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "last_failure": self.last_failure,
+            }
+
+    def _current_state(self) -> str:
+        if self._state == "open" and self.clock() - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return self._state
+
+
+class LLMGuard:
+    """Deadline, circuit breaker and optional hedging around retrieval-chain calls.
+
+    Every call must finish within `timeout_seconds`; timeouts and errors count
+    towards opening the breaker, and while it is open calls fail fast with
+    CircuitOpenError so the caller can answer without the LLM. With
+    `hedge_after_seconds` set, an async call that is still running after that
+    long is duplicated and the first successful answer wins.
+    """
+
+    def __init__(self, breaker: CircuitBreaker, timeout_seconds: float = 8.0,
+                 hedge_after_seconds: Optional[float] = None):
+        self.breaker = breaker
+        self.timeout_seconds = timeout_seconds
+        self.hedge_after_seconds = hedge_after_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def invoke(self, chain, inputs: dict) -> dict:
+        """chain.invoke() with the deadline enforced from a worker thread"""
+        self._admit()
+        future = self._worker_pool().submit(chain.invoke, inputs)
+        try:
+            result = future.result(timeout=self.timeout_seconds)
+        except FutureTimeoutError:
+            # The worker finishes in the background; its result is discarded
+            raise self._timed_out() from None
+        except Exception as e:
+            self._failed(e)
+            raise
+        except BaseException:
+            self.breaker.record_abandoned()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def ainvoke(self, chain, inputs: dict) -> dict:
+        self._admit()
+        try:
+            result = await asyncio.wait_for(self._hedged(chain, inputs), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            raise self._timed_out() from None
+        except Exception as e:
+            self._failed(e)
+            raise
+        except BaseException:
+            self.breaker.record_abandoned()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def astream(self, chain, inputs: dict) -> AsyncIterator[dict]:
+        """chain.astream() with the deadline covering the whole stream"""
+        self._admit()
+        deadline = time.monotonic() + self.timeout_seconds
+        chunks = chain.astream(inputs).__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline - time.monotonic()))
+                except StopAsyncIteration:
+                    break
+                yield chunk
+        except asyncio.TimeoutError:
+            raise self._timed_out() from None
+        except Exception as e:
+            self._failed(e)
+            raise
+        except BaseException:
+            self.breaker.record_abandoned()
+            raise
+        finally:
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+        self.breaker.record_success()
+
+    def stats(self) -> dict:
+        return {
+            "timeout_seconds": self.timeout_seconds,
+            "hedge_after_seconds": self.hedge_after_seconds,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "breaker": self.breaker.stats(),
+        }
+
+    async def _hedged(self, chain, inputs: dict) -> dict:
+        if not self.hedge_after_seconds:
+            return await chain.ainvoke(inputs)
+        primary = asyncio.ensure_future(chain.ainvoke(inputs))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after_seconds)
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        hedge = asyncio.ensure_future(chain.ainvoke(inputs))
+        running = {primary, hedge}
+        error = None
+        try:
+            while running:
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (primary, hedge):
+                task.cancel()
+
+    def _admit(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM circuit breaker is open")
+        self.calls += 1
+
+    def _timed_out(self) -> LLMTimeoutError:
+        self.timeouts += 1
+        self.breaker.record_failure("timeout")
+        return LLMTimeoutError(f"LLM call exceeded {self.timeout_seconds}s")
+
+    def _failed(self, error: Exception):
+        self.errors += 1
+        self.breaker.record_failure(type(error).__name__)
+
+    def _worker_pool(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-call")
+            return self._executor
+
+
+def create_llm_guard() -> LLMGuard:
+    """Build the LLM guard from environment settings"""
+    hedge_after = float(os.getenv("RAG_LLM_HEDGE_AFTER_SECONDS", "0"))
+    return LLMGuard(
+        CircuitBreaker(
+            failure_threshold=int(os.getenv("RAG_BREAKER_FAILURES", "5")),
+            reset_seconds=float(os.getenv("RAG_BREAKER_RESET_SECONDS", "30"))
+        ),
+        timeout_seconds=float(os.getenv("RAG_LLM_TIMEOUT_SECONDS", "8")),
+        hedge_after_seconds=hedge_after or None
+    )
@@ -1,130 +1,336 @@
 import requests
+import asyncio
+import importlib.util
 import json
+import logging
 import os
-from typing import List
+import re
+import threading
+import time
+from typing import AsyncIterator, List, Optional
+from conversation_context import NO_HISTORY, ConversationContext, context_from_history, count_tokens
+from intent_matcher import IntentMatch, IntentMatcher
+from intent_routes import IntentRoutes, create_intent_routes
+from knowledge_index import KNOWLEDGE_DIR, KnowledgeBase, KnowledgeWatcher
+from llm_guard import CircuitOpenError, create_llm_guard
+from metrics import current_trace, record_stage, stage
+from query_batcher import QueryBatcher, create_query_batcher
+from response_cache import create_response_cache, normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+def llm_stage_timer(max_running: int = 1000):
+    """LangChain callback handler that records each LLM call as the "llm" stage of its request"""
+    from langchain_core.callbacks import BaseCallbackHandler
+    
+    class LLMStageTimer(BaseCallbackHandler):
+        run_inline = True  # called on the request's own task/thread, not an executor
+        
+        def __init__(self):
+            self._lock = threading.Lock()
+            self._running = {}
+        
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._start(run_id)
+        
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._start(run_id)
+        
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            self._finish(run_id)
+        
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._finish(run_id)
+        
+        def _start(self, run_id):
+            with self._lock:
+                self._running[run_id] = (time.perf_counter(), current_trace())
+                # Runs abandoned without an end/error callback must not pile up
+                while len(self._running) > max_running:
+                    self._running.pop(next(iter(self._running)))
+        
+        def _finish(self, run_id):
+            with self._lock:
+                started = self._running.pop(run_id, None)
+            if started is not None:
+                record_stage("llm", time.perf_counter() - started[0], started[1])
+    
+    return LLMStageTimer()
+
+# Keyword rules for the rule-based responder (see intents.json)
+INTENTS_FILE = os.getenv("INTENTS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents.json"))
+
+# LangChain, HuggingFace and FAISS take tens of seconds to import and load, so
+# they are imported lazily by LLMService.warm_up() instead of at module import
+_LANGCHAIN_PACKAGES = ["langchain", "langchain_community", "langchain_text_splitters", "langchain_groq", "faiss"]
+LANGCHAIN_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in _LANGCHAIN_PACKAGES)
 
-# Try to import LangChain components with better error handling
 try:
-    from langchain_text_splitters import RecursiveCharacterTextSplitter
-    from langchain_community.embeddings import HuggingFaceEmbeddings
-    from langchain_community.vectorstores import FAISS
-    from langchain.prompts import ChatPromptTemplate
-    from langchain_groq import ChatGroq
-    from langchain.chains.combine_documents import create_stuff_documents_chain
-    from langchain.chains.retrieval import create_retrieval_chain
-    from langchain.schema import Document
     from dotenv import load_dotenv
     
     # Load environment variables
     load_dotenv()
-    
-    LANGCHAIN_AVAILABLE = True
-    print(" LangChain components imported successfully")
-except ImportError as e:
-    LANGCHAIN_AVAILABLE = False
-    print(f" LangChain not available: {e}")
+except ImportError:
+    pass
 
 class LLMService:
+    # Canned rule-based replies, keyed by the intent that triggers them
+    FALLBACK_RESPONSES = {
+        "price": "I understand the cost concern! Let me share some great news - we're offering the AI Mastery Bootcamp at a special discount of $299 instead of the regular $499. That's 40% off! Plus, we offer payment plans and a 30-day money-back guarantee. Consider this: the average AI engineer salary is $120,000+ annually, so this investment pays for itself quickly!",
+        "time": "I totally understand - everyone's busy! That's why our AI Mastery Bootcamp is designed for working professionals. You only need 2-3 hours per week, with flexible scheduling including evening and weekend options. We also provide lifetime access to materials, so you can learn at your own pace. Many of our students completed it while working full-time!",
+        "experience": "That's fantastic - having some background will actually help you excel even more! Our AI Mastery Bootcamp is different because it focuses on the latest technologies like Large Language Models (LLMs), advanced MLOps, and real industry projects. Plus, you get job placement assistance and networking opportunities you won't find elsewhere. What specific AI area are you most experienced in?",
+        "not_interested": "No problem at all! I appreciate your time today. Before I go, can I ask what might make an AI course more appealing to you in the future? We're always improving our offerings. Either way, I wish you the best in your career journey!",
+        "interested": "Excellent! The AI Mastery Bootcamp is a comprehensive 12-week program covering everything from machine learning fundamentals to cutting-edge LLMs and computer vision. You'll work on real projects, get personal mentorship, and receive job placement assistance. We have a 95% job placement rate! The regular price is $499, but today it's just $299. Would you like to know more about the curriculum or career outcomes?",
+        "career": "Great question! Our job placement assistance is one of our strongest features. We have partnerships with 200+ companies actively hiring AI professionals. Our career support includes resume building, interview prep, portfolio development, and direct referrals. 95% of our graduates find AI roles within 6 months, with average starting salaries of $85,000-$120,000. Would you like to hear about specific success stories?",
+        "certificate": "Yes! You'll receive an industry-recognized certificate upon completion. Our certificate is valued by employers because it represents hands-on project experience, not just theoretical knowledge. You'll have a portfolio of real AI projects to showcase. Many of our graduates mention that their certificate and project portfolio were key factors in landing their AI roles!",
+        "curriculum": "Our curriculum is comprehensive and current! Week 1-3: AI/ML foundations, Week 4-6: Machine learning algorithms, Week 7-9: Deep learning and neural networks, Week 10-12: LLMs, computer vision, and MLOps. You'll work with Python, TensorFlow, PyTorch, and cloud platforms. Each week includes hands-on projects with real datasets. Would you like details about any specific topic?",
+        "default": "Thank you for your interest in AI! The AI Mastery Bootcamp is a 12-week comprehensive program that transforms beginners into AI professionals. We cover LLMs, computer vision, MLOps, and provide hands-on projects with job placement assistance. The regular price is $499, but we're offering it for $299 today - that's a $200 savings! What aspect of AI interests you most?",
+    }
+    
+    RAG_NO_ANSWER_REPLY = "I apologize, but I couldn't find specific information about that. Could you please rephrase your question or ask about our AI Mastery Bootcamp features, pricing, or curriculum?"
+    RAG_REPHRASE_REPLY = "I couldn't find specific information about that. Could you please rephrase your question?"
+    RAG_UNAVAILABLE_REPLY = "RAG system is not available. Please switch to Custom mode for responses."
+    
+    RAG_PROMPT_TEMPLATE = """
+            You are a professional AI Sales Agent for the AI Mastery Bootcamp. Provide concise, direct responses that are informative but brief.
+
+            RESPONSE GUIDELINES:
+            - Keep responses under 4 sentences maximum
+            - Be direct and to the point
+            - Focus on the most important information
+            - Include specific details when relevant
+            - Use the conversation so far to resolve follow-up questions; don't repeat what was already said
+            - End with a brief call-to-action if appropriate
+            - Be professional and helpful
+
+            COURSE CONTEXT:
+            {context}
+
+            CONVERSATION SO FAR:
+            {history}
+
+            Customer Question: {input}
+
+            Provide a brief, focused response (maximum 3-4 sentences) that directly addresses their question:
+            """
+    
     def __init__(self):
+        self.intent_matcher = IntentMatcher.from_file(INTENTS_FILE)
+        # Fixed part of every RAG prompt, for per-turn prompt-token counts
+        self._template_tokens = count_tokens(re.sub(r"\{\w+\}", "", self.RAG_PROMPT_TEMPLATE))
+        
         # Using free Hugging Face API as fallback
         self.api_url = "https://api-inference.huggingface.co/models/microsoft/DialoGPT-medium"
         self.headers = {"Authorization": "Bearer hf_dummy"}
-          # Initialize RAG system if LangChain is available
+        # RAG is built in the background by warm_up(); until then the RAG
+        # endpoints answer with the rule-based responder
         self.rag_enabled = False
         self.rag_error = None
+        self.rag_state = "idle"  # idle -> warming -> ready | failed
+        self.rag_timings = {}
+        self.rag_index = None
+        self.retrieval_chain = None
+        self.knowledge_base = None
+        self.knowledge_watcher = None
+        self.query_batcher: Optional[QueryBatcher] = None
+        # Questions about the common topics skip retrieval (RAG_INTENT_ROUTES=off disables)
+        self.intent_routes: Optional[IntentRoutes] = create_intent_routes(INTENTS_FILE, self.intent_matcher)
+        # Answers to repeated questions are served without the chain (RESPONSE_CACHE=off disables)
+        self.response_cache = create_response_cache()
+        # Deadline and circuit breaker around the LLM; while it is down, replies come from the rules
+        self.llm_guard = create_llm_guard()
+        self._warm_up_lock = threading.Lock()
+        # Admin reloads and the knowledge watcher each refresh and install; one at a time, so the
+        # index installed last is always the newest one
+        self._reload_lock = threading.Lock()
         
-        if LANGCHAIN_AVAILABLE:
+        if not LANGCHAIN_AVAILABLE:
+            self.rag_state = "failed"
+            self.rag_error = "LangChain packages not installed"
+    
+    def start_warm_up(self) -> threading.Thread:
+        """Build the RAG system on a background thread"""
+        thread = threading.Thread(target=self.warm_up, name="rag-warmup", daemon=True)
+        thread.start()
+        return thread
+    
+    def warm_up(self) -> bool:
+        """Import the RAG stack and build the index; safe to call more than once"""
+        with self._warm_up_lock:
+            if self.rag_state in ("ready", "failed"):
+                return self.rag_enabled
+            
+            self.rag_state = "warming"
+            started = time.perf_counter()
+            self.rag_timings = {"started_at": time.time()}
             try:
                 self._setup_rag_system()
+                self.rag_timings["total_s"] = round(time.perf_counter() - started, 3)
                 self.rag_enabled = True
-                print(" RAG system initialized successfully")
+                self.rag_state = "ready"
+                logger.info("RAG system initialized in %ss", self.rag_timings['total_s'])
             except Exception as e:
+                self.rag_timings["total_s"] = round(time.perf_counter() - started, 3)
                 self.rag_error = str(e)
-                print(f" RAG system failed to initialize: {e}")
-                print("Falling back to rule-based responses")
-        else:
-            self.rag_error = "LangChain packages not installed"
+                self.rag_state = "failed"
+                logger.warning("RAG system failed to initialize: %s; falling back to rule-based responses", e)
+            return self.rag_enabled
     
     def _setup_rag_system(self):
         """Setup RAG system with course knowledge base"""
         try:
-            # Load course information
-            knowledge_file = "ai_bootcamp_info.txt"
-            if os.path.exists(knowledge_file):
-                with open(knowledge_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-            else:
-                content = self._get_default_course_content()
+            started = time.perf_counter()
+            from embedding_backends import create_embeddings
+            from langchain.prompts import ChatPromptTemplate
+            from langchain_groq import ChatGroq
+            self.rag_timings["import_s"] = round(time.perf_counter() - started, 3)
             
-            print(f" Loaded knowledge base: {len(content)} characters")
+            # Everything that affects the index goes into its fingerprint
+            index_config = {
+                "chunk_size": 1000,
+                "chunk_overlap": 100,
+                "separators": ["\n\n", "\n", " ", ""],
+                "embedding_model": "all-MiniLM-L6-v2",
+                "normalize_embeddings": True
+            }
             
-            # Split text into chunks
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000, 
-                chunk_overlap=100,
-                separators=["\n\n", "\n", " ", ""]
-            )
-            documents = [Document(page_content=content)]
-            split_docs = splitter.split_documents(documents)
+            # Create embeddings and vector store with reduced model for faster loading
+            logger.info("Loading embeddings model...")
+            started = time.perf_counter()
+            # EMBEDDING_BACKEND picks PyTorch (default), ONNX Runtime or int8-quantized ONNX Runtime
+            backend, embeddings = create_embeddings(index_config["embedding_model"],
+                                                    index_config["normalize_embeddings"])
+            if backend != "torch":
+                # Its vectors differ slightly from PyTorch's: keep its index and embedding cache apart
+                index_config["embedding_backend"] = backend
+            self.rag_timings["embedding_backend"] = backend
+            self.rag_timings["embeddings_s"] = round(time.perf_counter() - started, 3)
+            # Concurrent queries share one embedding pass and one FAISS search (RAG_BATCHING=off disables)
+            self.query_batcher = create_query_batcher(embeddings.embed_documents)
             
-            print(f" Split into {len(split_docs)} chunks")
-              # Create embeddings and vector store with reduced model for faster loading
-            print(" Loading embeddings model...")
-            embeddings = HuggingFaceEmbeddings(
-                model_name="all-MiniLM-L6-v2",
-                model_kwargs={'device': 'cpu'},
-                encode_kwargs={'normalize_embeddings': True}
+            # One document per program in KNOWLEDGE_DIR; edits are re-indexed incrementally
+            self.knowledge_base = KnowledgeBase(
+                embeddings,
+                index_config,
+                default_content=self._get_default_course_content()
             )
+            result = self.knowledge_base.load_or_build()
+            logger.info("Knowledge base %s: %s documents, %s chunks in %ss",
+                        result['source'], result['documents'], result['chunks'], result['seconds'])
+            self.rag_timings["index_s"] = result["seconds"]
+            self._record_knowledge(result)
+            if self.response_cache is not None:
+                # Near-duplicate questions are matched with the same MiniLM embeddings
+                self.response_cache.embed = self.query_batcher.embed if self.query_batcher else embeddings.embed_query
             
-            print(" Creating vector store...")
-            self.vector_store = FAISS.from_documents(split_docs, embeddings)
-            # Use fewer retrieval results for more focused context
-            self.retriever = self.vector_store.as_retriever(search_kwargs={"k": 2})
-              # Enhanced prompt template for concise, focused responses
-            self.prompt = ChatPromptTemplate.from_template("""
-            You are a professional AI Sales Agent for the AI Mastery Bootcamp. Provide concise, direct responses that are informative but brief.
-
-            RESPONSE GUIDELINES:
-            - Keep responses under 4 sentences maximum
-            - Be direct and to the point
-            - Focus on the most important information
-            - Include specific details when relevant
-            - End with a brief call-to-action if appropriate
-            - Be professional and helpful
-
-            COURSE CONTEXT:
-            {context}
-
-            Customer Question: {input}
-
-            Provide a brief, focused response (maximum 3-4 sentences) that directly addresses their question:
-            """)
+            # Enhanced prompt template for concise, focused responses
+            self.prompt = ChatPromptTemplate.from_template(self.RAG_PROMPT_TEMPLATE)
             
             # Setup LLM with settings optimized for concise responses
             groq_api_key = os.getenv('GROQ_API_KEY')
             if groq_api_key:
-                print(" Initializing Groq LLM...")
+                logger.info("Initializing Groq LLM...")
                 self.llm = ChatGroq(
                     model="llama3-8b-8192", 
                     api_key=groq_api_key,
                     temperature=0.3,  # Lower temperature for more focused responses
-                    max_tokens=200    # Limit tokens for shorter responses
+                    max_tokens=200,   # Limit tokens for shorter responses
+                    timeout=self.llm_guard.timeout_seconds,
+                    max_retries=0,    # retries and hedging are up to llm_guard, within its deadline
+                    callbacks=[llm_stage_timer()]
                 )
                 
                 # Create QA Chain
-                document_chain = create_stuff_documents_chain(self.llm, self.prompt)
-                self.retrieval_chain = create_retrieval_chain(self.retriever, document_chain)
-                print("RAG chain created successfully")
+                self._install_vector_store(self.knowledge_base.vector_store)
+                logger.info("RAG chain created")
             else:
-                print(" No GROQ API key found")
+                logger.warning("No GROQ API key found")
                 self.llm = None
                 self.retrieval_chain = None
                 raise Exception("GROQ API key not found")
                 
         except Exception as e:
-            print(f" Error in RAG setup: {e}")
+            logger.error("Error in RAG setup: %s", e)
             raise e
     
+    def _install_vector_store(self, vector_store):
+        """Point the retrieval chain at a new index with a single reference swap"""
+        from langchain.chains.combine_documents import create_stuff_documents_chain
+        from langchain.chains.retrieval import create_retrieval_chain
+        from langchain_core.runnables import RunnableLambda
+        
+        # Use fewer retrieval results for more focused context
+        retriever = vector_store.as_retriever(search_kwargs={"k": 2})
+        document_chain = create_stuff_documents_chain(self.llm, self.prompt)
+        # Retrieve with the follow-up-aware search query; the prompt still gets the raw question
+        query = RunnableLambda(lambda inputs: inputs.get("search_query") or inputs["input"])
+        batcher = self.query_batcher
+        if batcher is not None:
+            # Search with the text the response cache embeds, so the batcher's vector LRU
+            # serves the retrieval after a cache miss instead of embedding a second string
+            batch_query = query | RunnableLambda(lambda text: normalize_query(text) or text)
+
+            async def asearch(text):
+                return await batcher.asearch(text, k=2)
+            search = batch_query | RunnableLambda(lambda text: batcher.search(text, k=2), afunc=asearch)
+        else:
+            def search_docs(text):
+                with stage("retrieval"):  # embedding included
+                    return retriever.invoke(text)
+            
+            async def asearch_docs(text):
+                with stage("retrieval"):
+                    return await retriever.ainvoke(text)
+            search = query | RunnableLambda(search_docs, afunc=asearch_docs)
+        chain = create_retrieval_chain(search, document_chain)
+        if self.intent_routes is not None:
+            # Each routed intent's documents, retrieved once per index
+            self.intent_routes.build(lambda text, k: vector_store.similarity_search(text, k=k),
+                                     self.RAG_PROMPT_TEMPLATE, self.llm)
+        # Requests already inside retrieval_chain.invoke() finish on the old index
+        self.vector_store = vector_store
+        self.retriever = retriever
+        if batcher is not None:
+            batcher.vector_store = vector_store
+        self.retrieval_chain = chain
+        if self.response_cache is not None:
+            self.response_cache.invalidate(self.knowledge_base.version if self.knowledge_base else None)
+    
+    def _record_knowledge(self, result: dict):
+        self.rag_index = {
+            "source": result.get("source", self.rag_index["source"] if self.rag_index else None),
+            "seconds": result["seconds"],
+            "chunks": result["chunks"],
+            "documents": result["documents"],
+            "fingerprint": result["version"],
+            "last_reload": {k: result[k] for k in ("mode", "added", "changed", "removed",
+                                                   "chunks_added", "chunks_removed", "seconds")}
+        }
+    
+    def reload_knowledge(self) -> dict:
+        """Re-index changed knowledge documents and swap in the updated index"""
+        if self.rag_state != "ready" or self.knowledge_base is None:
+            raise RuntimeError(f"RAG system is not ready (state: {self.rag_state})")
+        with self._reload_lock:
+            result = self.knowledge_base.refresh()
+            if result["mode"] != "unchanged":
+                self._install_vector_store(self.knowledge_base.vector_store)
+                logger.info("Knowledge base reloaded: +%d ~%d -%d documents in %ss", len(result['added']),
+                            len(result['changed']), len(result['removed']), result['seconds'])
+            self._record_knowledge(result)
+            return result
+    
+    def start_knowledge_watcher(self, interval: float):
+        """Reload the knowledge base whenever a file in KNOWLEDGE_DIR changes"""
+        def on_change():
+            if self.rag_state == "ready":
+                self.reload_knowledge()
+        
+        self.knowledge_watcher = KnowledgeWatcher(KNOWLEDGE_DIR, interval, on_change)
+        self.knowledge_watcher.start()
+        return self.knowledge_watcher
+    
     def _get_default_course_content(self):
         """Default course content if file is not found"""
         return """        AI Mastery Bootcamp - 12-week comprehensive AI training program
@@ -140,112 +346,238 @@ class LLMService:
         # Try RAG system first
         if self.rag_enabled and self.retrieval_chain:
             try:
-                response = self.retrieval_chain.invoke({'input': customer_message})
-                answer = response.get('answer', '').strip()
-                
-                # Clean up any unwanted tags
-                if "</think>" in answer:
-                    answer = answer.split("</think>")[-1].strip()
-                
+                answer = self._ask_chain(customer_message, context_from_history(conversation_history))
                 if answer and len(answer) > 5:  # Valid response
                     return answer
             except Exception as e:
-                print(f"RAG system error: {e}")
+                logger.error("RAG system error: %s", e)
         
         # Fallback to rule-based responses
         return self._get_fallback_response(customer_message)
     
-    def get_rag_response(self, customer_message: str) -> str:
-        """Force RAG system response only"""
+    @staticmethod
+    def _clean_answer(answer: str) -> str:
+        answer = answer.strip()
+        
+        # Clean up any unwanted tags
+        if "</think>" in answer:
+            answer = answer.split("</think>")[-1].strip()
+        return answer
+    
+    @staticmethod
+    def _concise(answer: str) -> str:
+        """Ensure response is concise (under 4 sentences)"""
+        sentences = answer.split('. ')
+        if len(sentences) > 4:
+            # Keep only first 3-4 sentences
+            answer = '. '.join(sentences[:3]) + '.'
+        return answer
+    
+    def _chain_inputs(self, customer_message: str, context: Optional[ConversationContext]) -> dict:
+        if context is None:
+            return {'input': customer_message, 'history': NO_HISTORY, 'search_query': customer_message}
+        return {
+            'input': customer_message,
+            'history': context.render(),
+            'search_query': context.search_query(customer_message)
+        }
+    
+    def _chain_for(self, inputs: dict):
+        """The intent's precomputed chain if the question routes to one, else the full retrieval chain"""
+        if self.intent_routes is not None and self.intent_routes.chains:
+            routed = self.intent_routes.chain_for(inputs['input'])
+            if routed is not None:
+                return routed
+        return self.retrieval_chain
+    
+    def _count_prompt_tokens(self, inputs: dict, documents, context: Optional[ConversationContext]):
+        """Record the approximate size of the prompt sent to the LLM"""
+        if context is None:
+            return
+        context.prompt_tokens = (
+            self._template_tokens
+            + count_tokens(inputs['history'])
+            + count_tokens(inputs['input'])
+            + sum(count_tokens(doc.page_content) for doc in documents or [])
+        )
+    
+    def _invoke_chain(self, inputs: dict, context: Optional[ConversationContext] = None) -> str:
+        response = self.llm_guard.invoke(self._chain_for(inputs), inputs)
+        self._count_prompt_tokens(inputs, response.get('context'), context)
+        return self._clean_answer(response.get('answer', ''))
+    
+    def _ask_chain(self, customer_message: str, context: Optional[ConversationContext] = None) -> str:
+        """Answer from the retrieval chain, reusing cached answers to the same question.
+        
+        The cache is keyed on the retrieval query, which for follow-ups
+        includes the question they follow up on.
+        """
+        inputs = self._chain_inputs(customer_message, context)
+        if self.response_cache is None:
+            return self._invoke_chain(inputs, context)
+        return self.response_cache.get_or_compute(inputs['search_query'], lambda _: self._invoke_chain(inputs, context))
+    
+    async def _aask_chain(self, customer_message: str, context: Optional[ConversationContext] = None) -> str:
+        """Async _ask_chain(): the Groq round-trip no longer holds the event loop"""
+        inputs = self._chain_inputs(customer_message, context)
+        pending = None
+        if self.response_cache is not None:
+            # The cache lookup may embed the question, which is CPU-bound
+            answer, pending = await asyncio.to_thread(self.response_cache.lookup, inputs['search_query'])
+            if answer is not None:
+                return answer
+        response = await self.llm_guard.ainvoke(self._chain_for(inputs), inputs)
+        self._count_prompt_tokens(inputs, response.get('context'), context)
+        answer = self._clean_answer(response.get('answer', ''))
+        if pending is not None:
+            self.response_cache.fill(pending, answer)
+        return answer
+    
+    def _rag_not_ready_reply(self, customer_message: str):
+        """Reply to use when the RAG chain cannot answer, or None if it can"""
         if self.rag_enabled and self.retrieval_chain:
-            try:
-                response = self.retrieval_chain.invoke({'input': customer_message})
-                answer = response.get('answer', '').strip()
-                
-                # Clean up any unwanted tags
-                if "</think>" in answer:
-                    answer = answer.split("</think>")[-1].strip()
-                
-                if answer and len(answer) > 5:  # Valid response
-                    return answer
-                else:
-                    return "I apologize, but I couldn't find specific information about that. Could you please rephrase your question or ask about our AI Mastery Bootcamp features, pricing, or curriculum?"
-            except Exception as e:
-                print(f"RAG system error: {e}")
-                return f"I'm experiencing some technical difficulties accessing the course information. Please try again or contact us directly at info@aimasterybootcamp.com"
-        else:
-            return "RAG system is not available. Please switch to Custom mode for responses."
+            return None
+        if self.rag_state in ("idle", "warming"):
+            # Serve rule-based answers until the background warm-up finishes
+            return self._get_fallback_response(customer_message)
+        return self.RAG_UNAVAILABLE_REPLY
+    
+    def _degraded_reply(self, customer_message: str, error: Exception) -> str:
+        """Rule-based reply for when the LLM failed, timed out or its circuit breaker is open"""
+        if not isinstance(error, CircuitOpenError):
+            logger.warning("RAG LLM call failed (%r); answering from the rules", error)
+        return self._get_fallback_response(customer_message)
+    
+    def get_rag_response(self, customer_message: str, context: Optional[ConversationContext] = None) -> str:
+        """Force RAG system response only"""
+        reply = self._rag_not_ready_reply(customer_message)
+        if reply is not None:
+            return reply
+        try:
+            answer = self._ask_chain(customer_message, context)
+        except Exception as e:
+            return self._degraded_reply(customer_message, e)
+        return answer if answer and len(answer) > 5 else self.RAG_NO_ANSWER_REPLY
+    
+    async def aget_rag_response(self, customer_message: str, context: Optional[ConversationContext] = None) -> str:
+        """Async get_rag_response()"""
+        reply = self._rag_not_ready_reply(customer_message)
+        if reply is not None:
+            return reply
+        try:
+            answer = await self._aask_chain(customer_message, context)
+        except Exception as e:
+            return self._degraded_reply(customer_message, e)
+        return answer if answer and len(answer) > 5 else self.RAG_NO_ANSWER_REPLY
+    
+    async def astream_rag_response(self, customer_message: str,
+                                   context: Optional[ConversationContext] = None) -> AsyncIterator[str]:
+        """Yield the RAG answer as text deltas while the LLM generates it.
+        
+        Cached answers and fallback replies arrive as a single delta. The
+        complete answer is cached once the stream finishes.
+        """
+        reply = self._rag_not_ready_reply(customer_message)
+        if reply is not None:
+            yield reply
+            return
+        
+        inputs = self._chain_inputs(customer_message, context)
+        pending = None
+        if self.response_cache is not None:
+            answer, pending = await asyncio.to_thread(self.response_cache.lookup, inputs['search_query'])
+            if answer is not None:
+                yield answer
+                return
+        
+        answer = ""
+        emitted = 0
+        try:
+            async for chunk in self.llm_guard.astream(self._chain_for(inputs), inputs):
+                if 'context' in chunk:
+                    self._count_prompt_tokens(inputs, chunk['context'], context)
+                answer += chunk.get('answer', '')
+                # Hold back "<think>...</think>" reasoning until it is closed
+                if answer.lstrip().startswith("<think>") and "</think>" not in answer:
+                    continue
+                visible = self._clean_answer(answer) if "</think>" in answer else answer.strip()
+                if len(visible) > emitted:
+                    yield visible[emitted:]
+                    emitted = len(visible)
+        except Exception as e:
+            # Text already sent cannot be taken back; otherwise answer from the rules
+            reply = self._degraded_reply(customer_message, e)
+            if not emitted:
+                yield reply
+            return
+        
+        answer = self._clean_answer(answer)
+        if not answer or len(answer) <= 5:
+            if not emitted:
+                yield self.RAG_NO_ANSWER_REPLY
+            return
+        if pending is not None:
+            self.response_cache.fill(pending, answer)
     
     def get_rag_status(self) -> dict:
         """Get the status of the RAG system"""
+        if self.rag_state == "ready":
+            message = "RAG system ready"
+        elif self.rag_state in ("idle", "warming"):
+            message = "RAG system is warming up; using rule-based responses until it is ready"
+        else:
+            message = f"RAG system not available: {self.rag_error}"
         return {
             "available": self.rag_enabled,
+            "state": self.rag_state,
             "error": self.rag_error,
-            "message": "RAG system ready" if self.rag_enabled else f"RAG system not available: {self.rag_error}"
+            "timings": self.rag_timings,
+            "index": self.rag_index,
+            "batching": self.query_batcher.stats() if self.query_batcher else None,
+            "intent_routes": self.intent_routes.stats() if self.intent_routes else None,
+            "llm": self.llm_guard.stats(),
+            "message": message
         }
     
-    def generate_rag_response(self, customer_message: str) -> str:
+    def generate_rag_response(self, customer_message: str, context: Optional[ConversationContext] = None) -> str:
         """Generate concise response using only RAG system"""
-        if not self.rag_enabled or not self.retrieval_chain:
-            return f"RAG system is not available. Please switch to Custom mode for responses."
-        
+        reply = self._rag_not_ready_reply(customer_message)
+        if reply is not None:
+            return reply
         try:
-            response = self.retrieval_chain.invoke({'input': customer_message})
-            answer = response.get('answer', '').strip()
-            
-            # Clean up any unwanted tags
-            if "</think>" in answer:
-                answer = answer.split("</think>")[-1].strip()
-            
-            # Ensure response is concise (under 4 sentences)
-            if answer:
-                sentences = answer.split('. ')
-                if len(sentences) > 4:
-                    # Keep only first 3-4 sentences
-                    answer = '. '.join(sentences[:3]) + '.'
-                return answer
-            else:
-                return "I couldn't find specific information about that. Could you please rephrase your question?"
-                
+            answer = self._ask_chain(customer_message, context)
+        except Exception as e:
+            return self._degraded_reply(customer_message, e)
+        return self._concise(answer) if answer else self.RAG_REPHRASE_REPLY
+    
+    async def agenerate_rag_response(self, customer_message: str,
+                                     context: Optional[ConversationContext] = None) -> str:
+        """Async generate_rag_response()"""
+        reply = self._rag_not_ready_reply(customer_message)
+        if reply is not None:
+            return reply
+        try:
+            answer = await self._aask_chain(customer_message, context)
         except Exception as e:
-            return f"Sorry, I encountered an error: {str(e)}"
+            return self._degraded_reply(customer_message, e)
+        return self._concise(answer) if answer else self.RAG_REPHRASE_REPLY
+    
+    def classify(self, customer_message: str) -> IntentMatch:
+        """Match intents and end-call phrases in a single pass"""
+        return self.intent_matcher.match(customer_message)
+    
+    def get_intent_response(self, match: IntentMatch) -> str:
+        """Canned reply for the highest-priority matched intent"""
+        return self.FALLBACK_RESPONSES.get(match.top, self.FALLBACK_RESPONSES["default"])
     
     def _get_fallback_response(self, customer_message: str) -> str:
         """Fallback responses for common scenarios"""
-        message_lower = customer_message.lower()
-        
-        # Enhanced objection handling with course-specific details
-        if any(word in message_lower for word in ["expensive", "cost", "price", "money", "afford"]):
-            return "I understand the cost concern! Let me share some great news - we're offering the AI Mastery Bootcamp at a special discount of $299 instead of the regular $499. That's 40% off! Plus, we offer payment plans and a 30-day money-back guarantee. Consider this: the average AI engineer salary is $120,000+ annually, so this investment pays for itself quickly!"
-        
-        if any(word in message_lower for word in ["time", "busy", "schedule", "work"]):
-            return "I totally understand - everyone's busy! That's why our AI Mastery Bootcamp is designed for working professionals. You only need 2-3 hours per week, with flexible scheduling including evening and weekend options. We also provide lifetime access to materials, so you can learn at your own pace. Many of our students completed it while working full-time!"
-        
-        if any(word in message_lower for word in ["already", "took", "course", "learned", "experience"]):
-            return "That's fantastic - having some background will actually help you excel even more! Our AI Mastery Bootcamp is different because it focuses on the latest technologies like Large Language Models (LLMs), advanced MLOps, and real industry projects. Plus, you get job placement assistance and networking opportunities you won't find elsewhere. What specific AI area are you most experienced in?"
-        
-        if any(word in message_lower for word in ["not interested", "no thanks", "goodbye", "not now"]):
-            return "No problem at all! I appreciate your time today. Before I go, can I ask what might make an AI course more appealing to you in the future? We're always improving our offerings. Either way, I wish you the best in your career journey!"
-        
-        if any(word in message_lower for word in ["tell me more", "details", "interested", "yes", "learn", "course"]):
-            return "Excellent! The AI Mastery Bootcamp is a comprehensive 12-week program covering everything from machine learning fundamentals to cutting-edge LLMs and computer vision. You'll work on real projects, get personal mentorship, and receive job placement assistance. We have a 95% job placement rate! The regular price is $499, but today it's just $299. Would you like to know more about the curriculum or career outcomes?"
-        
-        if any(word in message_lower for word in ["job", "career", "employment", "hire", "work"]):
-            return "Great question! Our job placement assistance is one of our strongest features. We have partnerships with 200+ companies actively hiring AI professionals. Our career support includes resume building, interview prep, portfolio development, and direct referrals. 95% of our graduates find AI roles within 6 months, with average starting salaries of $85,000-$120,000. Would you like to hear about specific success stories?"
-        
-        if any(word in message_lower for word in ["certificate", "certification", "credential"]):
-            return "Yes! You'll receive an industry-recognized certificate upon completion. Our certificate is valued by employers because it represents hands-on project experience, not just theoretical knowledge. You'll have a portfolio of real AI projects to showcase. Many of our graduates mention that their certificate and project portfolio were key factors in landing their AI roles!"
-        
-        if any(word in message_lower for word in ["curriculum", "syllabus", "topics", "learn", "cover"]):
-            return "Our curriculum is comprehensive and current! Week 1-3: AI/ML foundations, Week 4-6: Machine learning algorithms, Week 7-9: Deep learning and neural networks, Week 10-12: LLMs, computer vision, and MLOps. You'll work with Python, TensorFlow, PyTorch, and cloud platforms. Each week includes hands-on projects with real datasets. Would you like details about any specific topic?"
-        
-        # Default enthusiastic response
-        return "Thank you for your interest in AI! The AI Mastery Bootcamp is a 12-week comprehensive program that transforms beginners into AI professionals. We cover LLMs, computer vision, MLOps, and provide hands-on projects with job placement assistance. The regular price is $499, but we're offering it for $299 today - that's a $200 savings! What aspect of AI interests you most?"
+        return self.get_intent_response(self.classify(customer_message))
+    
+    def get_canned_responses(self) -> List[str]:
+        """All fixed replies the rule-based responder can give"""
+        return list(self.FALLBACK_RESPONSES.values())
     
     def should_end_call(self, message: str) -> bool:
         """Determine if the call should end"""
-        end_phrases = [
-            "not interested", "no thanks", "goodbye", "stop calling", 
-            "remove me", "don't call", "not now", "maybe later"
-        ]
-        return any(phrase in message.lower() for phrase in end_phrases)
+        return self.classify(message).ends_call
@@ -0,0 +1,48 @@
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from metrics import request_id_var
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp each record with the ID of the request being served ("-" outside requests)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+
+def setup_logging(level: Optional[str] = None) -> QueueListener:
+    """Route log records through a queue so request handlers never block on console writes.
+
+    Records are only enqueued on the calling thread; a QueueListener thread
+    formats and writes them. The level comes from LOG_LEVEL (default INFO).
+    Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler()
+    output.setFormatter(logging.Formatter(LOG_FORMAT))
+    records: "queue.SimpleQueue" = queue.SimpleQueue()
+    handler = QueueHandler(records)
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    root.addHandler(handler)
+
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(_listener.stop)
+    return _listener
@@ -1,15 +1,86 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request, WebSocket
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from models import CallStart, CallResponse, Call, CallHistory
+from audio_stream import AudioSession, RecognizerBusyError, create_recognition_pool, decode_wav
+from call_session import CallSession, create_synthesis_executor
+from campaign import CampaignRunner, DialResult, Lead, create_campaign_runner
+from log_setup import setup_logging
+from metrics import REGISTRY, TracingMiddleware, recent_traces
+from models import CallStart, CallResponse, Call, CallHistory, CampaignStart
 from llm_service import LLMService
 from voice_service import VoiceService
+from speech_pipeline import create_speech_pipeline
+from call_store import create_call_store
+from conversation_context import create_conversation_memory
+from transcript_export import iter_rows, ndjson_chunks
+from turn_pipeline import (CallEndedError, CallNotFoundError, ConciseRagResponder, RagResponder, Responder,
+                           RuleResponder, TurnPipeline)
+import asyncio
+import hmac
+import json
+import logging
+import os
+import re
+import speech_recognition as sr
+import threading
+import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Optional
 
-app = FastAPI(title="AI Voice Sales Agent")
+# Log records are queued and written by a background thread, tagged with the request ID
+setup_logging()
+logger = logging.getLogger(__name__)
+
+async def sweep_call_store(interval: float):
+    """Drop calls past their TTL or retention every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await run_in_threadpool(call_store.evict_expired)
+        except Exception as e:
+            logger.warning("Call store sweep failed: %s", e)
+            continue
+        if removed:
+            logger.info("Evicted %d expired calls", removed)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve rule-based replies immediately; RAG switches on once warm-up finishes
+    llm_service.start_warm_up()
+    
+    # Pre-render the canned replies so they play without hitting gTTS
+    threading.Thread(
+        target=voice_service.warm_cache,
+        args=(llm_service.get_canned_responses(),),
+        name="tts-warmup",
+        daemon=True
+    ).start()
+    
+    # Optionally pick up knowledge-base edits without an admin call
+    watch_interval = float(os.getenv("KNOWLEDGE_WATCH_INTERVAL", "0"))
+    if watch_interval > 0:
+        llm_service.start_knowledge_watcher(watch_interval)
+    
+    # Expired calls are also dropped when touched; the sweep catches the ones nobody touches again
+    sweep_interval = float(os.getenv("CALL_SWEEP_INTERVAL_SECONDS", "60"))
+    sweeper = asyncio.ensure_future(sweep_call_store(sweep_interval)) if sweep_interval > 0 else None
+    yield
+    if sweeper is not None:
+        sweeper.cancel()
+    if llm_service.knowledge_watcher is not None:
+        llm_service.knowledge_watcher.stop()
+    # Running campaigns checkpoint as they stop and resume when started again with the same ID
+    for task in campaign_tasks.values():
+        task.cancel()
+    speech_pipeline.shutdown()
+    call_synthesis.shutdown(wait=False)
+    call_store.close()
+
+app = FastAPI(title="AI Voice Sales Agent", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -19,13 +90,56 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Request IDs, per-route metrics and per-stage traces (outermost, so it times everything)
+app.add_middleware(TracingMiddleware)
 
-# In-memory storage
-calls_db: Dict[str, Call] = {}
+# Call sessions (in-memory with TTL by default, CALL_STORE=sqlite for durable storage)
+call_store = create_call_store()
 
 # Services
 llm_service = LLMService()
 voice_service = VoiceService()
+speech_pipeline = create_speech_pipeline(voice_service)
+# Audio from browsers is recognized here, off the event loop; the server needs no microphone
+recognition_pool = create_recognition_pool(voice_service.transcribe)
+# Sentences of WebSocket call replies are synthesized here and sent to the browser
+call_synthesis = create_synthesis_executor()
+# Outbound campaigns: outcome logs and checkpoints live here
+CAMPAIGN_DIR = os.getenv("CAMPAIGN_DIR", "campaigns")
+# Lead files can only be read from here
+CAMPAIGN_LEADS_DIR = os.getenv("CAMPAIGN_LEADS_DIR", "leads")
+# A campaign call with no new turn for this long is hung up, freeing its dial slot
+CAMPAIGN_CALL_IDLE_SECONDS = float(os.getenv("CAMPAIGN_CALL_IDLE_SECONDS", "120"))
+CAMPAIGN_CALL_POLL_SECONDS = 1.0
+campaigns: Dict[str, CampaignRunner] = {}
+campaign_tasks: Dict[str, asyncio.Task] = {}
+MAX_AUDIO_UPLOAD_BYTES = int(os.getenv("MAX_AUDIO_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+
+# Every respond endpoint runs the same turn pipeline with its own responder
+responders = {
+    "rules": RuleResponder(llm_service),
+    "rag": RagResponder(llm_service),
+    "rag_only": ConciseRagResponder(llm_service),
+}
+turn_pipeline = TurnPipeline(
+    call_store,
+    classify=llm_service.classify,
+    # Looked up per turn so the speech pipeline can be swapped (benchmarks, tests)
+    speak=lambda call_id, text: speech_pipeline.submit(call_id, text),
+    speak_stream=lambda call_id: speech_pipeline.submit_stream(call_id),
+    speech_status=lambda call_id: speech_pipeline.get_status(call_id),
+    # RAG prompts carry a rolling summary plus the last few turns of the call
+    memory=create_conversation_memory(call_store)
+)
+
+REGISTRY.gauge("voice_agent_tts_pending", "Replies waiting to be spoken",
+               lambda: speech_pipeline.stats()["pending"])
+REGISTRY.gauge("voice_agent_llm_breaker_state", "LLM circuit breaker state (0 closed, 1 half-open, 2 open)",
+               lambda: ("closed", "half_open", "open").index(llm_service.llm_guard.breaker.state))
+REGISTRY.gauge("voice_agent_stt_pending", "Utterances waiting for speech recognition",
+               lambda: recognition_pool.stats()["pending"])
+REGISTRY.gauge("voice_agent_rag_ready", "1 once the RAG system is ready",
+               lambda: 1 if llm_service.rag_state == "ready" else 0)
 
 @app.post("/start-call")
 async def start_call(call_data: CallStart):
@@ -46,142 +160,270 @@ async def start_call(call_data: CallStart):
         )]
     )
     
-    calls_db[call_id] = call
-      # Play the first message
-    if not voice_service.text_to_speech(first_message):
-        voice_service.fallback_tts(first_message)
+    call_store.create(call)
+    # Play the first message in the background
+    speech = speech_pipeline.submit(call_id, first_message)
     
     return {
         "call_id": call_id,
         "message": f"Calling {call_data.customer_name}...",
-        "first_message": first_message
+        "first_message": first_message,
+        "speech_status": speech["state"]
     }
 
+async def run_turn(call_id: str, message: str, responder: Responder, idempotency_key: Optional[str]) -> dict:
+    try:
+        return await turn_pipeline.run(call_id, message, responder, idempotency_key)
+    except CallNotFoundError:
+        raise HTTPException(status_code=404, detail="Call not found")
+    except CallEndedError:
+        raise HTTPException(status_code=400, detail="Call has ended")
+
 @app.post("/respond/{call_id}")
-async def respond_to_call(call_id: str, response: CallResponse):
+async def respond_to_call(call_id: str, response: CallResponse, idempotency_key: Optional[str] = Header(default=None)):
     """Process customer response and generate reply using custom rules"""
-    if call_id not in calls_db:
+    return await run_turn(call_id, response.message, responders["rules"], idempotency_key)
+
+@app.post("/respond-rag/{call_id}")
+async def respond_to_call_rag(call_id: str, response: CallResponse, idempotency_key: Optional[str] = Header(default=None)):
+    """Process customer response and generate reply using RAG system"""
+    return await run_turn(call_id, response.message, responders["rag"], idempotency_key)
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/respond-rag/{call_id}/stream")
+async def respond_to_call_rag_stream(
+    call_id: str,
+    response: CallResponse,
+    idempotency_key: Optional[str] = Header(default=None)
+):
+    """Stream the RAG reply as server-sent events: "token" deltas, then "done" """
+    turn = turn_pipeline.stream(call_id, response.message, responders["rag"], idempotency_key)
+    # Pull the first event here so unknown/ended calls still get a plain HTTP error
+    try:
+        first = await turn.__anext__()
+    except CallNotFoundError:
         raise HTTPException(status_code=404, detail="Call not found")
-    
-    call = calls_db[call_id]
-    
-    if not call.is_active:
+    except CallEndedError:
         raise HTTPException(status_code=400, detail="Call has ended")
     
-    # Add customer message to history
-    customer_history = CallHistory(
-        sender="customer",
-        text=response.message,
-        timestamp=datetime.now()
-    )
-    call.history.append(customer_history)
+    async def events():
+        # The full reply is added to history when the turn finishes
+        yield sse_event(*first)
+        async for event, data in turn:
+            yield sse_event(event, data)
     
-    # Generate AI response using fallback rules
-    ai_reply = llm_service._get_fallback_response(response.message)
-    should_end = llm_service.should_end_call(response.message)
-    
-    # Add AI response to history
-    agent_history = CallHistory(
-        sender="agent",
-        text=ai_reply,
-        timestamp=datetime.now()
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    call.history.append(agent_history)
-    
-    if should_end:
-        call.is_active = False
-    
-    # Play AI response
-    voice_service.text_to_speech(ai_reply)
-    
-    return {
-        "reply": ai_reply,
-        "should_end_call": should_end
-    }
 
-@app.post("/respond-rag/{call_id}")
-async def respond_to_call_rag(call_id: str, response: CallResponse):
-    """Process customer response and generate reply using RAG system"""
-    if call_id not in calls_db:
+def audio_responder(mode: str) -> Responder:
+    if mode not in ("rules", "rag"):
+        raise HTTPException(status_code=400, detail="mode must be 'rules' or 'rag'")
+    return responders[mode]
+
+async def read_capped_body(request: Request, limit: int) -> bytes:
+    """Request body, rejected with 413 as soon as it is known to exceed `limit` bytes.
+
+    A declared Content-Length is checked before anything is read; a chunked or
+    understated upload is cut off once the running total passes the limit.
+    """
+    declared = request.headers.get("content-length")
+    if declared is not None:
+        if not declared.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid Content-Length")
+        if int(declared) > limit:
+            raise HTTPException(status_code=413, detail="Audio upload too large")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise HTTPException(status_code=413, detail="Audio upload too large")
+    return bytes(body)
+
+@app.post("/respond-audio/{call_id}")
+async def respond_to_audio(
+    call_id: str,
+    request: Request,
+    mode: str = "rules",
+    idempotency_key: Optional[str] = Header(default=None)
+):
+    """Answer a recorded customer utterance uploaded as a WAV file (request body)"""
+    responder = audio_responder(mode)
+    call = call_store.get(call_id)
+    if call is None:
         raise HTTPException(status_code=404, detail="Call not found")
-    
-    call = calls_db[call_id]
-    
     if not call.is_active:
         raise HTTPException(status_code=400, detail="Call has ended")
     
-    # Add customer message to history
-    customer_history = CallHistory(
-        sender="customer",
-        text=response.message,
-        timestamp=datetime.now()
+    body = await read_capped_body(request, MAX_AUDIO_UPLOAD_BYTES)
+    try:
+        # Parsing and resampling a long recording is CPU work: keep it off the event loop
+        pcm = await run_in_threadpool(decode_wav, body)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=f"Expected a WAV file ({e})")
+    
+    try:
+        customer_speech = await recognition_pool.transcribe(pcm)
+    except sr.UnknownValueError:
+        return {"customer_said": None, "message": "Could not understand"}
+    except RecognizerBusyError:
+        raise HTTPException(status_code=503, detail="Speech recognition is busy, try again")
+    except sr.RequestError as e:
+        logger.warning("Speech recognition failed: %s", e)
+        raise HTTPException(status_code=502, detail="Speech recognition unavailable")
+    
+    result = await run_turn(call_id, customer_speech, responder, idempotency_key)
+    return {"customer_said": customer_speech, **result}
+
+async def reject_audio_socket(websocket: WebSocket, call_id: str, mode: str, sample_rate: int) -> bool:
+    """Send an error event and close the socket when the call or the parameters are not usable"""
+    call = call_store.get(call_id)
+    error = None
+    if call is None:
+        error = "Call not found"
+    elif not call.is_active:
+        error = "Call has ended"
+    elif mode not in ("rules", "rag"):
+        error = "mode must be 'rules' or 'rag'"
+    elif not 8000 <= sample_rate <= 96000:
+        error = "sample_rate must be between 8000 and 96000"
+    if error:
+        await websocket.send_json({"type": "error", "detail": error})
+        await websocket.close(code=1008)
+        return True
+    return False
+
+@app.websocket("/ws/audio/{call_id}")
+async def audio_socket(websocket: WebSocket, call_id: str, mode: str = "rules", sample_rate: int = 16000):
+    """Stream caller audio from the browser: 16-bit mono PCM in, JSON transcript/reply events out"""
+    await websocket.accept()
+    if await reject_audio_socket(websocket, call_id, mode, sample_rate):
+        return
+    
+    session = AudioSession(
+        recognition_pool,
+        respond=lambda text: turn_pipeline.run(call_id, text, responders[mode]),
+        send=websocket.send_json,
+        sample_rate=sample_rate
     )
-    call.history.append(customer_history)
-      # Generate AI response using RAG system
-    ai_reply = llm_service.get_rag_response(response.message)
-    should_end = llm_service.should_end_call(response.message)
-    
-    # Add AI response to history
-    agent_history = CallHistory(
-        sender="agent",
-        text=ai_reply,
-        timestamp=datetime.now()
+    await session.serve(websocket)
+    if not session.disconnected:
+        await websocket.close()
+
+@app.websocket("/ws/call/{call_id}")
+async def call_socket(websocket: WebSocket, call_id: str, mode: str = "rules", sample_rate: int = 16000):
+    """Full-duplex call: caller PCM in; streamed reply text, MP3 sentences and barge-in events out"""
+    await websocket.accept()
+    if await reject_audio_socket(websocket, call_id, mode, sample_rate):
+        return
+    
+    responder = responders[mode]
+    session = CallSession(
+        recognition_pool,
+        stream_turn=lambda text: turn_pipeline.stream(call_id, text, responder, server_speech=False),
+        record_interrupted=lambda text, partial: turn_pipeline.record_interrupted(call_id, text, partial, responder),
+        synthesize=voice_service.synthesize,
+        send=websocket.send_json,
+        send_audio=websocket.send_bytes,
+        sample_rate=sample_rate,
+        executor=call_synthesis
     )
-    call.history.append(agent_history)
-    
-    if should_end:
-        call.is_active = False
-    
-    # Play AI response
-    voice_service.text_to_speech(ai_reply)
-    
-    return {
-        "reply": ai_reply,
-        "should_end_call": should_end
-    }
+    # A fresh call has only the greeting so far: say it in the browser too
+    if call_store.history_length(call_id) == 1:
+        session.greet(call_store.get_history(call_id, offset=0, limit=1)[0].text)
+    await session.serve(websocket)
+    if not session.disconnected:
+        await websocket.close()
 
 @app.get("/conversation/{call_id}")
-async def get_conversation(call_id: str):
-    """Get full conversation history"""
-    if call_id not in calls_db:
+async def get_conversation(
+    call_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    since: Optional[int] = Query(None, ge=0),
+    if_none_match: Optional[str] = Header(default=None)
+):
+    """Get conversation history, one page at a time.
+
+    Pollers pass the previous response's cursor as since= to get only the
+    entries added after it, and its ETag as If-None-Match to get a 304 while
+    nothing has changed. The 304 is only sent once the cursor has caught up
+    with the history, so a client paging through a backlog always gets the
+    entries it has not seen yet.
+    """
+    call = call_store.get(call_id)
+    if call is None:
         raise HTTPException(status_code=404, detail="Call not found")
     
-    call = calls_db[call_id]
-    
-    history = [
-        {
-            "sender": h.sender,
-            "text": h.text,
-            "timestamp": h.timestamp.isoformat()
-        }
-        for h in call.history
-    ]
-    
-    return {
+    total = call_store.history_length(call_id)
+    if since is not None:
+        offset = since
+    # History is append-only, so its length and the call state identify what a page can contain
+    etag = f'"{total}-{int(call.is_active)}"'
+    if (offset >= total and if_none_match
+            and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers={"ETag": etag})
+    history = call_store.history_rows(call_id, offset=offset, limit=limit)
+    next_offset = offset + len(history)
+    
+    return JSONResponse({
         "call_id": call_id,
         "customer_name": call.customer_name,
         "phone_number": call.phone_number,
         "is_active": call.is_active,
-        "history": history
-    }
+        "history": history,
+        "offset": offset,
+        "limit": limit,
+        "total": total,
+        "next_offset": next_offset if next_offset < total else None,
+        "cursor": next_offset
+    }, headers={"ETag": etag})
+
+@app.get("/speech-status/{call_id}")
+async def get_speech_status(call_id: str):
+    """Get background text-to-speech status for a call"""
+    if call_id not in call_store:
+        raise HTTPException(status_code=404, detail="Call not found")
+    
+    status = speech_pipeline.get_status(call_id)
+    if status is None:
+        status = {"call_id": call_id, "state": "idle", "pending": 0, "error": None}
+    return status
+
+@app.get("/tts-cache/stats")
+async def get_tts_cache_stats():
+    """Get audio cache hit, miss and eviction counters"""
+    if voice_service.audio_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **voice_service.audio_cache.stats()}
+
+@app.get("/response-cache/stats")
+async def get_response_cache_stats():
+    """Get RAG response cache hit-rate counters"""
+    if llm_service.response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **llm_service.response_cache.stats()}
 
 @app.get("/simulate-call/{call_id}")
 async def simulate_call(call_id: str):
     """Simulate a voice call with speech recognition"""
-    if call_id not in calls_db:
+    call = call_store.get(call_id)
+    if call is None:
         raise HTTPException(status_code=404, detail="Call not found")
     
-    call = calls_db[call_id]
-    
     if not call.is_active:
         return {"message": "Call has ended", "customer_said": "Error occurred"}
     
-    print(" Starting speech recognition...")
+    logger.info("Starting speech recognition...")
     
-    # Listen for customer response with longer timeout
-    customer_speech = voice_service.speech_to_text(timeout=5)
+    # Listen for customer response with longer timeout; the microphone blocks, so keep it off the event loop
+    customer_speech = await run_in_threadpool(voice_service.speech_to_text, 5)
     
-    print(f" Speech result: {customer_speech}")
+    logger.info("Speech result: %s", customer_speech)
     
     # Always return the speech result, even if it's an error
     if customer_speech in ["No response", "Could not understand", "Error occurred"]:
@@ -192,8 +434,7 @@ async def simulate_call(call_id: str):
         }
     
     # Process the response
-    response = CallResponse(message=customer_speech)
-    result = await respond_to_call(call_id, response)
+    result = await run_turn(call_id, customer_speech, responders["rules"], None)
     
     return {
         "customer_said": customer_speech,
@@ -210,53 +451,154 @@ async def root():
 async def api_info():
     return {"message": "AI Voice Sales Agent API", "docs": "/docs"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: per-stage latency histograms, request and turn counters"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/traces")
+async def get_traces(limit: int = Query(default=50, ge=1, le=500), request_id: Optional[str] = None):
+    """Per-stage timings of recent requests, newest first (filter with ?request_id=)"""
+    return {"traces": recent_traces(limit, request_id)}
+
 @app.get("/rag-status")
 async def get_rag_status():
     """Get RAG system status"""
-    return llm_service.get_rag_status()
+    return {**llm_service.get_rag_status(), "conversation": turn_pipeline.memory.stats()}
+
+def check_admin_token(x_admin_token: Optional[str]):
+    """Admin routes fail closed: disabled until ADMIN_TOKEN is set, then only for that token"""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=503, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), admin_token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.post("/admin/reload-knowledge")
+async def reload_knowledge(x_admin_token: str = Header(default=None)):
+    """Re-index added, edited and deleted knowledge-base documents"""
+    check_admin_token(x_admin_token)
+    
+    try:
+        # Embedding runs off the event loop; RAG requests keep using the old index until the swap
+        return await run_in_threadpool(llm_service.reload_knowledge)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+async def open_campaign_call(lead: Lead) -> str:
+    """Create the call session for a lead and queue its greeting; returns the call ID"""
+    result = await start_call(CallStart(phone_number=lead.phone_number, customer_name=lead.customer_name))
+    return result["call_id"]
+
+async def wait_for_call_end(call_id: str, idle_seconds: float) -> DialResult:
+    """Wait until a campaign call ends, hanging it up after idle_seconds without a new history entry.
+
+    The call is "answered" if the customer said anything, otherwise "no_answer"
+    (which the campaign retries).
+    """
+    length, changed = call_store.history_length(call_id), time.monotonic()
+    while True:
+        call = call_store.get(call_id)
+        if call is None or not call.is_active:
+            break
+        current = call_store.history_length(call_id)
+        if current != length:
+            length, changed = current, time.monotonic()
+        elif time.monotonic() - changed >= idle_seconds:
+            call_store.end_call(call_id, datetime.now())
+            break
+        await asyncio.sleep(CAMPAIGN_CALL_POLL_SECONDS)
+    # Only the greeting means nobody answered
+    if call_store.history_length(call_id) > 1:
+        return DialResult("answered", call_id=call_id)
+    return DialResult("no_answer", call_id=call_id, detail="no reply before the idle timeout")
+
+async def dial_lead(lead: Lead) -> DialResult:
+    """Place one campaign call and hold its dial slot until the call is over.
+
+    No telephony provider is wired in: the call session is created and its
+    greeting queued, ready for the customer's side of the conversation. The
+    call ends like any other or is hung up after CAMPAIGN_CALL_IDLE_SECONDS of
+    silence, so at most the campaign's concurrency of its calls are open.
+    """
+    call_id = await open_campaign_call(lead)
+    return await wait_for_call_end(call_id, CAMPAIGN_CALL_IDLE_SECONDS)
+
+def resolve_leads_path(leads_path: str) -> str:
+    """The lead file's real path, which must be inside CAMPAIGN_LEADS_DIR"""
+    root = os.path.realpath(CAMPAIGN_LEADS_DIR)
+    path = os.path.realpath(os.path.join(root, leads_path))
+    if os.path.commonpath([root, path]) != root:
+        raise HTTPException(status_code=400, detail="leads_path must be a file in CAMPAIGN_LEADS_DIR")
+    return path
+
+@app.get("/admin/export")
+async def export_transcripts(x_admin_token: str = Header(default=None)):
+    """Every call's transcript as NDJSON, one row per history entry, streamed in chunks"""
+    check_admin_token(x_admin_token)
+    # A sync iterator, so Starlette reads the store from its thread pool
+    return StreamingResponse(ndjson_chunks(iter_rows(call_store)), media_type="application/x-ndjson")
+
+@app.post("/admin/campaigns")
+async def start_campaign(campaign: CampaignStart, x_admin_token: str = Header(default=None)):
+    """Dial a lead file in the background (or resume an earlier campaign with its campaign_id)"""
+    check_admin_token(x_admin_token)
+    campaign_id = campaign.campaign_id or uuid.uuid4().hex
+    if not re.fullmatch(r"[\w-]{1,64}", campaign_id):
+        raise HTTPException(status_code=400, detail="campaign_id may only contain letters, digits, _ and -")
+    if campaign_id in campaign_tasks and not campaign_tasks[campaign_id].done():
+        raise HTTPException(status_code=409, detail="Campaign is already running")
+    leads_path = resolve_leads_path(campaign.leads_path)
+    if not os.path.isfile(leads_path):
+        raise HTTPException(status_code=400, detail="Lead file not found")
+    
+    os.makedirs(CAMPAIGN_DIR, exist_ok=True)
+    try:
+        runner = create_campaign_runner(
+            leads_path, dial_lead, os.path.join(CAMPAIGN_DIR, f"{campaign_id}.outcomes.jsonl"),
+            concurrency=campaign.concurrency,
+            calls_per_second=campaign.calls_per_second,
+            max_attempts=campaign.max_attempts,
+            retry_delay=campaign.retry_delay_seconds
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    campaigns[campaign_id] = runner
+    task = asyncio.ensure_future(runner.run())
+    
+    def report_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Campaign %s failed: %s", campaign_id, task.exception())
+    
+    task.add_done_callback(report_failure)
+    campaign_tasks[campaign_id] = task
+    return {"campaign_id": campaign_id, "outcomes_path": runner.outcomes_path}
+
+@app.get("/admin/campaigns/{campaign_id}")
+async def campaign_status(campaign_id: str, x_admin_token: str = Header(default=None)):
+    """Progress and outcome counts of a campaign started since the server came up"""
+    check_admin_token(x_admin_token)
+    runner = campaigns.get(campaign_id)
+    if runner is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return {"campaign_id": campaign_id, **runner.stats()}
+
+@app.post("/admin/campaigns/{campaign_id}/stop")
+async def stop_campaign(campaign_id: str, x_admin_token: str = Header(default=None)):
+    """Stop dialing; the campaign checkpoints and can be resumed later with the same campaign_id"""
+    check_admin_token(x_admin_token)
+    task = campaign_tasks.get(campaign_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    task.cancel()
+    await asyncio.wait({task})
+    return {"campaign_id": campaign_id, **campaigns[campaign_id].stats()}
 
 @app.post("/rag-respond/{call_id}")
-async def rag_respond_to_call(call_id: str, response: CallResponse):
+async def rag_respond_to_call(call_id: str, response: CallResponse, idempotency_key: Optional[str] = Header(default=None)):
     """Process customer response using RAG system only"""
-    if call_id not in calls_db:
-        raise HTTPException(status_code=404, detail="Call not found")
-    
-    call = calls_db[call_id]
-    
-    if not call.is_active:
-        raise HTTPException(status_code=400, detail="Call has ended")
-    
-    # Add customer message to history
-    customer_history = CallHistory(
-        sender="customer",
-        text=response.message,
-        timestamp=datetime.now()
-    )
-    call.history.append(customer_history)
-    
-    # Generate RAG response
-    ai_reply = llm_service.generate_rag_response(response.message)
-    should_end = llm_service.should_end_call(response.message)
-      # Add AI response to history
-    agent_history = CallHistory(
-        sender="agent",
-        text=ai_reply,
-        timestamp=datetime.now()
-    )
-    call.history.append(agent_history)
-    
-    if should_end:
-        call.is_active = False
-        call.end_time = datetime.now()
-    
-    # Play AI response
-    voice_service.text_to_speech(ai_reply)
-    
-    return {
-        "reply": ai_reply,
-        "should_end_call": should_end
-    }
+    return await run_turn(call_id, response.message, responders["rag_only"], idempotency_key)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    uvicorn.run(app, host="0.0.0.0", port=8000)
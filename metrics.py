@@ -0,0 +1,314 @@
+import bisect
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond rule matching up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Set per HTTP request by TracingMiddleware; copied into tasks and worker threads that serve it
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_trace_var: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+
+_enabled = os.getenv("METRICS", "on").lower() not in ("0", "off", "false", "no")
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(flag: bool):
+    """Switch instrumentation on or off at runtime (METRICS=off starts with it off)"""
+    global _enabled
+    _enabled = flag
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in values]
+        return lines
+
+
+class Histogram:
+    """Bucketed distribution per label combination (buckets in seconds)"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # Per label combination: non-cumulative bucket counts (last one is +Inf), sum, count
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            series = self._series.get(labels)
+            return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback at scrape time (queue depths, breaker state)"""
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            lines.append(f"{self.name} {_format_value(self.read())}")
+        except Exception:
+            pass  # a broken reader should not break the whole scrape
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics exposed at /metrics, in registration order"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, read: Callable[[], float]) -> Gauge:
+        """Register a gauge, replacing one of the same name (the reader may point at a new object)"""
+        gauge = Gauge(name, help, read)
+        with self._lock:
+            self._metrics[name] = gauge
+        return gauge
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "voice_agent_stage_seconds", "Time spent in each stage of a turn", ("stage",)
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "voice_agent_http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "voice_agent_http_request_seconds", "HTTP request latency by route", ("method", "route")
+)
+
+
+class Trace:
+    """Stage timings of one HTTP request, including background work it started (speech)"""
+
+    __slots__ = ("request_id", "name", "started_at", "duration_ms", "spans")
+
+    def __init__(self, request_id: str, name: str):
+        self.request_id = request_id
+        self.name = name
+        self.started_at = time.time()
+        self.duration_ms: Optional[float] = None
+        self.spans: List[Tuple[str, float]] = []
+
+    def add(self, stage: str, seconds: float):
+        self.spans.append((stage, seconds))
+
+    def to_dict(self) -> dict:
+        return {
+            "request_id": self.request_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "stages": [{"stage": stage, "ms": round(seconds * 1000, 3)} for stage, seconds in list(self.spans)],
+        }
+
+
+_recent_traces: Deque[Trace] = deque(maxlen=int(os.getenv("TRACE_BUFFER", "200")))
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace_var.get()
+
+
+def recent_traces(limit: int = 50, request_id: Optional[str] = None) -> List[dict]:
+    """Most recent finished requests first"""
+    traces = [t for t in reversed(_recent_traces) if request_id is None or t.request_id == request_id]
+    return [t.to_dict() for t in traces[:limit]]
+
+
+def record_stage(name: str, seconds: float, trace: Optional[Trace] = None):
+    """Record a stage duration in the histogram and in the request's trace"""
+    if not _enabled:
+        return
+    STAGE_SECONDS.observe(seconds, name)
+    trace = trace or _trace_var.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+class _StageTimer:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_stage(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NoTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+def stage(name: str):
+    """Time a block as one turn stage: `with stage("intent_match"): ...`"""
+    return _StageTimer(name) if _enabled else _NO_TIMER
+
+
+class TracingMiddleware:
+    """ASGI middleware: request ID, per-route request metrics and a trace per request.
+
+    The request ID comes from an incoming X-Request-ID header or is generated,
+    is returned in the X-Request-ID response header and is attached to every
+    log record and stage timing made while serving the request.
+    """
+
+    # Scrapes and trace reads would only push real requests out of the trace buffer
+    UNTRACED = ("/metrics", "/traces")
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _enabled:
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        # Not uuid4(): os.urandom can cost ~0.1 ms per call and the ID needs no secrecy
+        request_id = request_id or f"{random.getrandbits(64):016x}"
+        trace = Trace(request_id, f"{scope['method']} {scope['path']}")
+        id_token = request_id_var.set(request_id)
+        trace_token = _trace_var.set(trace)
+        status = 500
+        header = (b"x-request-id", request_id.encode("latin-1"))
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", ()), header]}
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.inc(scope["method"], route, str(status))
+            HTTP_SECONDS.observe(elapsed, scope["method"], route)
+            trace.duration_ms = round(elapsed * 1000, 3)
+            if scope["path"] not in self.UNTRACED:
+                _recent_traces.append(trace)
+            _trace_var.reset(trace_token)
+            request_id_var.reset(id_token)
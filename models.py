@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 
@@ -13,6 +13,10 @@ class CallHistory(BaseModel):
     sender: str  # "agent" or "customer"
     text: str
     timestamp: datetime
+    # Set on agent replies by the turn pipeline, for analytics
+    responder: Optional[str] = None  # responder class, e.g. "RuleResponder"
+    intent: Optional[str] = None  # top intent of the customer message, None if nothing matched
+    latency_ms: Optional[float] = None  # customer message -> reply ready
 
 class Call(BaseModel):
     call_id: str
@@ -22,3 +26,11 @@ class Call(BaseModel):
     is_active: bool = True
     start_time: datetime = datetime.now()
     end_time: Optional[datetime] = None
+
+class CampaignStart(BaseModel):
+    leads_path: str  # CSV or JSONL lead file in CAMPAIGN_LEADS_DIR on the server
+    campaign_id: Optional[str] = None  # an earlier campaign's ID resumes it
+    concurrency: Optional[int] = Field(default=None, gt=0)
+    calls_per_second: Optional[float] = Field(default=None, gt=0)
+    max_attempts: Optional[int] = Field(default=None, ge=1)
+    retry_delay_seconds: Optional[float] = Field(default=None, ge=0)
@@ -0,0 +1,182 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from metrics import current_trace, record_stage
+
+_STOP = object()
+
+
+def search_by_vectors(vector_store, vectors, k: int) -> list:
+    """FAISS similarity_search_by_vector() for many query vectors with one index.search() call"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if getattr(vector_store, "_normalize_L2", False):
+        import faiss
+        faiss.normalize_L2(vectors)
+    _, indices = vector_store.index.search(vectors, k)
+    return [
+        [vector_store.docstore.search(vector_store.index_to_docstore_id[i]) for i in row if i != -1]
+        for row in indices
+    ]
+
+
+class QueryBatcher:
+    """Embeds and searches concurrent RAG queries in micro-batches.
+
+    Queries that arrive within `window_ms` of the first one in a batch (up to
+    `max_batch`) are embedded with a single embed_documents() call and looked
+    up with a single FAISS search, on one worker thread, instead of one
+    batch-size-1 forward pass and search per request. Query vectors are kept
+    in a small LRU keyed by the exact text, so an embed() followed by a search()
+    of the same string embeds it once; LLMService searches with the
+    normalize_query() text the response cache embeds to get that reuse after a
+    cache miss. Searches use whichever `vector_store` is installed when their
+    batch runs.
+    """
+
+    def __init__(self, embed_many: Callable[[List[str]], List[List[float]]], window_ms: float = 3.0,
+                 max_batch: int = 32, max_vectors: int = 1024):
+        self.embed_many = embed_many
+        self.window_s = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.max_vectors = max_vectors
+        self.vector_store = None
+        self._queue: "queue.Queue" = queue.Queue()
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()  # only touched by the worker
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.queries = 0
+        self.embedded = 0
+        self.largest_batch = 0
+
+    def embed(self, text: str) -> List[float]:
+        """Embedding of one query, computed together with other pending queries"""
+        return self._submit(text, 0).result()
+
+    def search(self, text: str, k: int = 4) -> list:
+        """The k documents most similar to the query"""
+        return self._submit(text, k).result()
+
+    async def aembed(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self._submit(text, 0))
+
+    async def asearch(self, text: str, k: int = 4) -> list:
+        return await asyncio.wrap_future(self._submit(text, k))
+
+    def close(self):
+        """Stop the worker once the queries already queued are answered"""
+        with self._start_lock:
+            if self._thread is not None:
+                self._queue.put(_STOP)
+                self._thread.join()
+                self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": round(self.window_s * 1000, 3),
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "queries": self.queries,
+            "embedded": self.embedded,
+            "mean_batch": round(self.queries / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+        }
+
+    def _submit(self, text: str, k: int) -> Future:
+        """Queue a query; k == 0 asks for its embedding only"""
+        future = Future()
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+                self._thread.start()
+            self._queue.put((text, k, future, current_trace()))
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = False
+            deadline = time.perf_counter() + self.window_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch):
+        # Callers that gave up (a cancelled request) are dropped from the batch
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        self.batches += 1
+        self.queries += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            started = time.perf_counter()
+            vectors = self._vectors_for([text for text, _, _, _ in batch])
+            embedded = time.perf_counter()
+            searches = [item for item in batch if item[1] > 0]
+            found = {}
+            if searches:
+                vector_store = self.vector_store
+                if vector_store is None:
+                    raise RuntimeError("No vector store installed")
+                k = max(k for _, k, _, _ in searches)
+                matrix = np.stack([vectors[text] for text, _, _, _ in searches])
+                for (_, _, future, _), docs in zip(searches, search_by_vectors(vector_store, matrix, k)):
+                    found[future] = docs
+            searched = time.perf_counter()
+        except Exception as e:
+            for _, _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for text, k, future, trace in batch:
+            # Every query in the batch waited for the whole batch
+            record_stage("embedding", embedded - started, trace)
+            if k > 0:
+                record_stage("retrieval", searched - embedded, trace)
+            future.set_result(found[future][:k] if k > 0 else vectors[text].tolist())
+
+    def _vectors_for(self, texts: List[str]) -> dict:
+        missing = [text for text in dict.fromkeys(texts) if text not in self._vectors]
+        if missing:
+            for text, vector in zip(missing, self.embed_many(missing)):
+                self._vectors[text] = np.asarray(vector, dtype=np.float32)
+            self.embedded += len(missing)
+        vectors = {}
+        for text in texts:
+            self._vectors.move_to_end(text)
+            vectors[text] = self._vectors[text]
+        while len(self._vectors) > self.max_vectors:
+            self._vectors.popitem(last=False)
+        return vectors
+
+
+def create_query_batcher(embed_many: Callable[[List[str]], List[List[float]]]) -> Optional[QueryBatcher]:
+    """Build the query batcher from environment settings (RAG_BATCHING=off disables it)"""
+    if os.getenv("RAG_BATCHING", "on").lower() in ("0", "off", "false", "no"):
+        return None
+    return QueryBatcher(
+        embed_many,
+        window_ms=float(os.getenv("RAG_BATCH_WINDOW_MS", "3")),
+        max_batch=int(os.getenv("RAG_BATCH_MAX_SIZE", "32"))
+    )
@@ -0,0 +1,200 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # semantic matching needs numpy; exact matching works without it
+    np = None
+
+_NON_WORD = re.compile(r"[^a-z0-9$%' ]+")
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace ("What's the PRICE?" -> "what's the price")"""
+    text = _NON_WORD.sub(" ", text.lower().replace("’", "'"))
+    return " ".join(text.split())
+
+
+class PendingAnswer(NamedTuple):
+    key: str
+    vector: Optional[object]
+    version: object
+
+
+class _Entry(NamedTuple):
+    answer: str
+    vector: Optional[object]
+    created: float
+
+
+class ResponseCache:
+    """LRU cache of RAG answers keyed by the caller's question.
+
+    A lookup first tries the normalized question text, then (when an embedding
+    function is set) the most similar cached question above `threshold` cosine
+    similarity, so "how much is it" and "how much does it cost" share an
+    answer. Entries expire after `ttl_seconds`, and invalidate() drops every
+    entry when the knowledge base changes.
+    """
+
+    def __init__(self, embed: Optional[Callable[[str], List[float]]] = None, threshold: float = 0.92,
+                 ttl_seconds: float = 3600, max_entries: int = 1000):
+        self.embed = embed
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version = None
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()  # oldest first
+        self._matrix = None  # stacked entry vectors, rebuilt lazily after changes
+        self._matrix_keys: List[str] = []
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get_or_compute(self, query: str, compute: Callable[[str], str]) -> str:
+        """Return a cached answer for the query, or compute, cache and return a new one.
+
+        Empty answers and exceptions from compute are not cached.
+        """
+        answer, pending = self.lookup(query)
+        if answer is not None:
+            return answer
+        answer = compute(query)
+        self.fill(pending, answer)
+        return answer
+
+    def lookup(self, query: str) -> Tuple[Optional[str], Optional[PendingAnswer]]:
+        """Find a cached answer; on a miss, the returned PendingAnswer is passed to fill()
+
+        Split from get_or_compute() so async callers can await the computation.
+        """
+        key = normalize_query(query)
+        with self._lock:
+            version = self.version
+            entry = self._lookup_exact(key)
+        if entry is not None:
+            return entry.answer, None
+
+        vector = self._embed(key)
+        if vector is not None:
+            with self._lock:
+                entry = self._lookup_similar(vector)
+            if entry is not None:
+                return entry.answer, None
+
+        with self._lock:
+            self.misses += 1
+        return None, PendingAnswer(key, vector, version)
+
+    def fill(self, pending: Optional[PendingAnswer], answer: str):
+        """Cache the answer computed after a miss"""
+        if not answer or pending is None:
+            return
+        with self._lock:
+            # Drop answers computed against a knowledge base that has since changed
+            if self.version == pending.version:
+                self._store(pending.key, _Entry(answer, pending.vector, time.monotonic()))
+
+    def invalidate(self, version=None):
+        """Forget every cached answer, e.g. after the knowledge base was re-indexed"""
+        with self._lock:
+            self.version = version
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "hits": hits,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "semantic": self.embed is not None and np is not None,
+                "threshold": self.threshold,
+            }
+
+    def _embed(self, key: str):
+        if self.embed is None or np is None or not key:
+            return None
+        vector = np.asarray(self.embed(key), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _expired(self, entry: _Entry) -> bool:
+        return time.monotonic() - entry.created > self.ttl_seconds
+
+    def _lookup_exact(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry):
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        self.exact_hits += 1
+        return entry
+
+    def _lookup_similar(self, vector) -> Optional[_Entry]:
+        if self._matrix is None:
+            self._matrix_keys = [k for k, e in self._entries.items() if e.vector is not None]
+            if not self._matrix_keys:
+                return None
+            self._matrix = np.stack([self._entries[k].vector for k in self._matrix_keys])
+
+        scores = self._matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        key = self._matrix_keys[best]
+        entry = self._entries[key]
+        if self._expired(entry):
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        self.semantic_hits += 1
+        return entry
+
+    def _store(self, key: str, entry: _Entry):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        if entry.vector is not None:
+            self._matrix = None
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        if entry.vector is not None:
+            self._matrix = None
+
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """Build the RAG response cache from environment settings (RESPONSE_CACHE=off disables it)"""
+    if os.getenv("RESPONSE_CACHE", "on").lower() in ("0", "off", "false", "no"):
+        return None
+    return ResponseCache(
+        threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92")),
+        ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+        max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+    )
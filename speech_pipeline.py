@@ -0,0 +1,177 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, Optional, Tuple, Union
+
+from metrics import record_stage
+from speech_streaming import StreamAborted, TokenStream
+
+logger = logging.getLogger(__name__)
+
+
+class SpeechPipeline:
+    """Background text-to-speech so request handlers never wait on synthesis or playback.
+
+    Utterances are queued per call and drained by a bounded thread pool. Replies
+    for the same call are always spoken in order; different calls are
+    synthesized in parallel (playback itself is serialized by VoiceService).
+    A reply still being generated can be queued with submit_stream(): its
+    first sentence is spoken while the LLM writes the rest, and the worker
+    speaking it stays busy until the stream is closed.
+    """
+
+    def __init__(self, voice_service, max_workers: int = 2, max_pending: int = 64,
+                 max_tracked_calls: int = 10000):
+        self.voice_service = voice_service
+        self.max_pending = max_pending
+        self.max_tracked_calls = max_tracked_calls
+        # max_workers=0 keeps the old behaviour of speaking inline in the caller
+        self.executor = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+            if max_workers > 0 else None
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        # Per call: (text or token stream, request context, time queued); the context carries the request's trace
+        self._queues: Dict[str, Deque[Tuple[Union[str, TokenStream], contextvars.Context, float]]] = {}
+        self._status: "OrderedDict[str, dict]" = OrderedDict()
+
+    def submit(self, call_id: str, text: str) -> dict:
+        """Queue text to be spoken for a call and return its speech status immediately"""
+        if self.executor is None:
+            self._update(call_id, state="queued", text=text, pending=1)
+            self._speak(call_id, text)
+            return self.get_status(call_id)
+
+        if not self._enqueue(call_id, text):
+            # Too much audio backlog - show the text instead of making callers wait
+            logger.warning("Speech queue full, skipping audio for call %s", call_id)
+            self.voice_service.fallback_tts(text)
+            self._update(call_id, state="dropped", text=text, error="speech queue full")
+        return self.get_status(call_id)
+
+    def submit_stream(self, call_id: str) -> Optional[TokenStream]:
+        """Queue a reply that is still being generated: push its tokens into the stream, then close() it.
+
+        Returns None when its speech could not start before the reply is
+        complete (inline speaking, or a full queue); submit() the whole reply then.
+        """
+        if self.executor is None:
+            return None
+        stream = TokenStream()
+        return stream if self._enqueue(call_id, stream) else None
+
+    def _enqueue(self, call_id: str, item: Union[str, TokenStream]) -> bool:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+            queue = self._queues.get(call_id)
+            schedule = queue is None
+            if schedule:
+                queue = self._queues[call_id] = deque()
+            queue.append((item, contextvars.copy_context(), time.perf_counter()))
+            pending_for_call = len(queue)
+
+        self._update(call_id, state="queued", text=item if isinstance(item, str) else "", pending=pending_for_call)
+        if schedule:
+            self.executor.submit(self._drain, call_id)
+        return True
+
+    def get_status(self, call_id: str) -> Optional[dict]:
+        """Get the latest speech status for a call"""
+        with self._lock:
+            status = self._status.get(call_id)
+            return dict(status) if status else None
+
+    def stats(self) -> dict:
+        """Get pipeline-wide queue statistics"""
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "active_calls": len(self._queues),
+                "max_pending": self.max_pending,
+            }
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting work and release the worker threads"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _drain(self, call_id: str):
+        while True:
+            with self._lock:
+                queue = self._queues[call_id]
+                if not queue:
+                    del self._queues[call_id]
+                    return
+                text, context, queued_at = queue.popleft()
+            try:
+                # Log records and stage timings are attributed to the request that queued the reply
+                context.run(self._speak_queued, call_id, text, queued_at)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+    def _speak_queued(self, call_id: str, item: Union[str, TokenStream], queued_at: float):
+        record_stage("tts_queue_wait", time.perf_counter() - queued_at)
+        if isinstance(item, TokenStream):
+            self._speak_stream(call_id, item)
+        else:
+            self._speak(call_id, item)
+
+    def _speak_stream(self, call_id: str, stream: TokenStream):
+        self._update(call_id, state="speaking", text=stream.text)
+        try:
+            spoken = self.voice_service.speak_token_stream(stream)
+        except StreamAborted:
+            spoken = False
+        except Exception as e:
+            spoken = False
+            logger.error("Speech pipeline error: %s", e)
+        if stream.aborted:
+            # The turn failed part-way; its reply was never recorded
+            self._update(call_id, state="cancelled", text=stream.text, error=None)
+            return
+        self._finish(call_id, stream.text, spoken)
+
+    def _speak(self, call_id: str, text: str):
+        self._update(call_id, state="speaking", text=text)
+        try:
+            spoken = self.voice_service.text_to_speech(text)
+        except Exception as e:
+            spoken = False
+            logger.error("Speech pipeline error: %s", e)
+        self._finish(call_id, text, spoken)
+
+    def _finish(self, call_id: str, text: str, spoken: bool):
+        if spoken:
+            self._update(call_id, state="done", text=text, error=None)
+        else:
+            self.voice_service.fallback_tts(text)
+            self._update(call_id, state="failed", text=text, error="text-to-speech failed")
+
+    def _update(self, call_id: str, **fields):
+        with self._lock:
+            status = self._status.pop(call_id, None) or {"call_id": call_id, "error": None}
+            status.update(fields)
+            if "pending" not in fields:
+                queue = self._queues.get(call_id)
+                status["pending"] = len(queue) if queue else 0
+            status["updated_at"] = time.time()
+            self._status[call_id] = status
+            while len(self._status) > self.max_tracked_calls:
+                self._status.popitem(last=False)
+
+
+def create_speech_pipeline(voice_service) -> SpeechPipeline:
+    """Build the speech pipeline from environment settings"""
+    return SpeechPipeline(
+        voice_service,
+        max_workers=int(os.getenv("TTS_WORKERS", "2")),
+        max_pending=int(os.getenv("TTS_MAX_PENDING", "64")),
+    )
@@ -0,0 +1,192 @@
+import contextvars
+import logging
+import queue
+import re
+import threading
+import time
+from typing import Callable, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# A sentence ends at . ! or ? (optionally followed by quotes/brackets) and whitespace.
+# Requiring whitespace keeps prices like "$1.5" and decimals intact.
+_SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]*\s+')
+
+# Fragments shorter than this are merged into the next sentence so we don't
+# pay a synthesis round-trip for "Yes!" on its own
+MIN_SENTENCE_CHARS = 20
+
+_DONE = object()
+
+
+def split_sentences(text: str, min_chars: int = MIN_SENTENCE_CHARS) -> List[str]:
+    """Split a reply into sentence-sized chunks for incremental synthesis"""
+    sentences = []
+    pending = ""
+    for part in _SENTENCE_END.split(text.strip()):
+        part = part.strip()
+        if not part:
+            continue
+        pending = f"{pending} {part}" if pending else part
+        if len(pending) >= min_chars:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences and len(pending) < min_chars:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+class SentenceSplitter:
+    """Incremental sentence chunking of streamed text (push tokens as they arrive, flush at the end)"""
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def push(self, token: str) -> List[str]:
+        """Sentences completed by this token"""
+        self.buffer += token
+        # Only cut at boundaries followed by whitespace, so the last sentence
+        # stays buffered until we know it is really finished
+        sentences = []
+        last_cut = 0
+        for match in _SENTENCE_END.finditer(self.buffer):
+            if match.end() - last_cut >= self.min_chars:
+                sentence = self.buffer[last_cut:match.end()].strip()
+                if sentence:
+                    sentences.append(sentence)
+                last_cut = match.end()
+        self.buffer = self.buffer[last_cut:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """The unfinished last sentence, if any"""
+        rest, self.buffer = self.buffer.strip(), ""
+        return rest or None
+
+
+class StreamAborted(Exception):
+    """The producer of a TokenStream gave up; nothing more, not even buffered text, should be spoken"""
+
+
+class TokenStream:
+    """Tokens handed from a producer (a streamed LLM reply) to a consumer thread (speech), in order.
+
+    Iterating blocks for the next token and ends at close(); after abort()
+    it raises StreamAborted instead, dropping the tokens not consumed yet. A
+    stream can be iterated once.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue" = queue.Queue()
+        self._parts: List[str] = []
+        self.closed = False
+        self.aborted = False
+
+    def push(self, token: str):
+        self._parts.append(token)
+        self._queue.put(token)
+
+    def close(self):
+        self.closed = True
+        self._queue.put(_DONE)
+
+    def abort(self):
+        self.closed = self.aborted = True
+        self._queue.put(_DONE)
+
+    @property
+    def text(self) -> str:
+        """Everything pushed so far"""
+        return "".join(self._parts)
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            token = self._queue.get()
+            if self.aborted:
+                raise StreamAborted()
+            if token is _DONE:
+                return
+            yield token
+
+
+def sentences_from_tokens(tokens: Iterable[str], min_chars: int = MIN_SENTENCE_CHARS) -> Iterator[str]:
+    """Re-chunk a token stream (e.g. streamed LLM output) into complete sentences"""
+    splitter = SentenceSplitter(min_chars)
+    for token in tokens:
+        yield from splitter.push(token)
+    rest = splitter.flush()
+    if rest:
+        yield rest
+
+
+def speak_pipelined(chunks: Iterable[str], synthesize: Callable[[str], Optional[bytes]],
+                    play: Callable[[bytes], bool], lookahead: int = 1) -> dict:
+    """Synthesize chunk N+1 while chunk N is playing.
+
+    Synthesis runs on a helper thread feeding a bounded queue; playback happens
+    on the calling thread. Returns timings for time-to-first-audio and total.
+    """
+    started = time.perf_counter()
+    audio_queue: "queue.Queue" = queue.Queue(maxsize=max(1, lookahead))
+    stop = threading.Event()
+    result = {"chunks": 0, "played": 0, "failed": 0, "first_audio_s": None, "total_s": None, "ok": False}
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                audio_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if stop.is_set():
+                    return
+                result["chunks"] += 1
+                try:
+                    audio = synthesize(chunk)
+                except Exception as e:
+                    logger.error("TTS error: %s", e)
+                    audio = None
+                if audio is None:
+                    result["failed"] += 1
+                    continue
+                if not put(audio):
+                    return
+        except StreamAborted:
+            pass
+        except Exception as e:
+            # The chunk source itself failed (e.g. a broken token stream)
+            logger.error("Speech stream error: %s", e)
+            result["failed"] += 1
+        finally:
+            put(_DONE)
+
+    # Synthesis runs in the caller's context so its timings land in the same request trace
+    producer = threading.Thread(target=contextvars.copy_context().run, args=(produce,), name="tts-stream", daemon=True)
+    producer.start()
+    try:
+        while True:
+            audio = audio_queue.get()
+            if audio is _DONE:
+                break
+            if result["first_audio_s"] is None:
+                result["first_audio_s"] = time.perf_counter() - started
+            if not play(audio):
+                result["failed"] += 1
+                break
+            result["played"] += 1
+    finally:
+        stop.set()
+        producer.join(timeout=1.0)
+
+    result["total_s"] = time.perf_counter() - started
+    result["ok"] = result["played"] > 0 and result["failed"] == 0
+    return result
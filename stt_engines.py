@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+import speech_recognition as sr
+
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Sample rate the local engines are fed (and the bundled WAV fixtures use)
+SAMPLE_RATE = 16000
+
+
+class STTEngine(ABC):
+    """Speech-to-text backend used by VoiceService.
+
+    transcribe() raises sr.UnknownValueError when nothing intelligible was
+    said and sr.RequestError when the backend itself fails, like the
+    speech_recognition recognizers, so callers handle every engine the same way.
+    """
+
+    name = "engine"
+
+    @abstractmethod
+    def transcribe(self, audio: sr.AudioData) -> str:
+        ...
+
+
+class GoogleSTT(STTEngine):
+    """Google's free web speech API (one network round-trip per utterance)"""
+
+    name = "google"
+
+    def __init__(self, recognizer: Optional[sr.Recognizer] = None, language: str = "en-US"):
+        self.recognizer = recognizer or sr.Recognizer()
+        self.language = language
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        return self.recognizer.recognize_google(audio, language=self.language)
+
+
+class VoskSTT(STTEngine):
+    """Offline Kaldi recognizer (pip install vosk, plus a model directory from alphacephei.com/vosk/models).
+
+    The model is loaded once; each utterance gets its own lightweight
+    KaldiRecognizer, so concurrent transcriptions are safe.
+    """
+
+    name = "vosk"
+
+    def __init__(self, model_path: str):
+        import vosk
+
+        vosk.SetLogLevel(-1)
+        if not os.path.isdir(model_path):
+            raise FileNotFoundError(f"Vosk model directory not found: {model_path}")
+        self._vosk = vosk
+        self.model = vosk.Model(model_path)
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        pcm = audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2)
+        try:
+            recognizer = self._vosk.KaldiRecognizer(self.model, SAMPLE_RATE)
+            recognizer.AcceptWaveform(pcm)
+            text = json.loads(recognizer.FinalResult()).get("text", "").strip()
+        except Exception as e:
+            raise sr.RequestError(f"vosk transcription failed: {e}") from e
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class WhisperSTT(STTEngine):
+    """Offline Whisper on CPU through CTranslate2 (pip install faster-whisper).
+
+    Runs the int8-quantized model by default; the weights are downloaded on
+    first use and cached by huggingface_hub.
+    """
+
+    name = "whisper"
+
+    def __init__(self, model_size: str = "tiny.en", compute_type: str = "int8", language: str = "en",
+                 cpu_threads: int = 0):
+        from faster_whisper import WhisperModel
+        import numpy as np
+
+        self._np = np
+        self.language = language
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        pcm = audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2)
+        samples = self._np.frombuffer(pcm, dtype=self._np.int16).astype(self._np.float32) / 32768.0
+        try:
+            segments, _ = self.model.transcribe(samples, language=self.language, beam_size=1)
+            text = "".join(segment.text for segment in segments).strip()
+        except Exception as e:
+            raise sr.RequestError(f"whisper transcription failed: {e}") from e
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class AmbientCalibration:
+    """Ambient-noise calibration of a recognizer, reused across turns.
+
+    adjust_for_ambient_noise() listens to `duration` seconds of background
+    noise to set the energy threshold. The result is kept for
+    `refresh_seconds` (0 recalibrates before every listen); in between, the
+    recognizer's dynamic threshold keeps following slow changes in noise.
+    """
+
+    def __init__(self, recognizer: sr.Recognizer, refresh_seconds: float = 300.0, duration: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.recognizer = recognizer
+        self.refresh_seconds = refresh_seconds
+        self.duration = duration
+        self.clock = clock
+        self.calibrated_at: Optional[float] = None
+        self.calibrations = 0
+
+    def calibrate(self, source, force: bool = False) -> bool:
+        """Calibrate on `source` unless a recent calibration is still valid; returns whether it ran"""
+        now = self.clock()
+        if not force and self.calibrated_at is not None and now - self.calibrated_at < self.refresh_seconds:
+            return False
+        with stage("stt_calibration"):
+            self.recognizer.adjust_for_ambient_noise(source, duration=self.duration)
+        self.calibrated_at = now
+        self.calibrations += 1
+        logger.debug("Calibrated energy threshold: %s", self.recognizer.energy_threshold)
+        return True
+
+    def invalidate(self):
+        """Force a fresh calibration before the next listen (e.g. after switching microphones)"""
+        self.calibrated_at = None
+
+
+def create_stt_engine(recognizer: Optional[sr.Recognizer] = None) -> STTEngine:
+    """Build the engine selected by STT_ENGINE (google, vosk or whisper).
+
+    A local engine is usually chosen to keep caller audio on the server, so
+    one whose package or model is missing stops the server from starting
+    instead of quietly sending audio to Google. STT_FALLBACK_TO_GOOGLE=on opts
+    into falling back to Google with a warning. Any other load failure is
+    raised as it is.
+    """
+    name = os.getenv("STT_ENGINE", "google").lower()
+    language = os.getenv("STT_LANGUAGE", "en-US")
+    if name not in ("google", "vosk", "whisper"):
+        raise ValueError(f"Unknown STT_ENGINE: {name}")
+    try:
+        if name == "vosk":
+            return VoskSTT(os.getenv("VOSK_MODEL_PATH", "models/vosk-model-small-en-us-0.15"))
+        if name == "whisper":
+            return WhisperSTT(
+                model_size=os.getenv("WHISPER_MODEL", "tiny.en"),
+                compute_type=os.getenv("WHISPER_COMPUTE_TYPE", "int8"),
+                language=language.split("-")[0],
+            )
+    except (ImportError, FileNotFoundError) as e:
+        if os.getenv("STT_FALLBACK_TO_GOOGLE", "off").lower() not in ("1", "on", "true", "yes"):
+            raise RuntimeError(f"STT_ENGINE={name} could not be loaded ({e}); install it, or set "
+                               f"STT_FALLBACK_TO_GOOGLE=on to send audio to Google instead") from e
+        logger.warning("Could not load the %s speech recognizer (%s); using Google instead", name, e)
+    return GoogleSTT(recognizer, language)
@@ -1,9 +1,12 @@
+import os
+
 import requests
-import json
+
+BASE_URL = os.getenv("AGENT_URL", "http://localhost:8000")
 
 def test_api():
     """Test the API endpoints"""
-    base_url = "http://localhost:8000"
+    base_url = BASE_URL
     
     print(" Testing AI Voice Sales Agent API...")
     
@@ -0,0 +1,218 @@
+"""Offline tests for browser audio: VAD, resampling, the audio WebSocket and WAV uploads"""
+import asyncio
+import audioop
+import io
+import os
+import threading
+import wave
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from audio_stream import SAMPLE_RATE, AudioSession, PCMResampler, RecognitionPool, VoiceActivityDetector, decode_wav
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "benchmarks", "fixtures", "stt", "utterance_3s.wav")
+
+
+def fixture_pcm() -> bytes:
+    with open(FIXTURE, "rb") as f:
+        return decode_wav(f.read())
+
+
+def silence(seconds: float) -> bytes:
+    return b"\0\0" * int(seconds * SAMPLE_RATE)
+
+
+def to_wav(pcm: bytes, rate: int = SAMPLE_RATE, channels: int = 1, width: int = 2) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(channels)
+        out.setsampwidth(width)
+        out.setframerate(rate)
+        out.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class ScriptedRecognizer:
+    """Stands in for the STT engine: answers utterances with a fixed script"""
+
+    def __init__(self, *texts):
+        self.texts = list(texts)
+        self.durations = []
+
+    def __call__(self, audio):
+        self.durations.append(len(audio.frame_data) / (audio.sample_rate * audio.sample_width))
+        return self.texts.pop(0)
+
+
+def test_vad_splits_a_stream_into_utterances():
+    speech = fixture_pcm()
+    vad = VoiceActivityDetector()
+    stream = silence(0.5) + speech + silence(1.0) + speech + silence(1.0)
+    events = []
+    for i in range(0, len(stream), 640):  # 20ms chunks, as a browser would send them
+        events += vad.feed(stream[i:i + 640])
+
+    kinds = [e.kind for e in events]
+    assert kinds == ["speech_start", "utterance", "speech_start", "utterance"]
+    for event in events[1::2]:
+        seconds = len(event.audio) / (2 * SAMPLE_RATE)
+        assert 2.5 < seconds < 3.8  # the clip's speech plus padding, without the long silences
+
+
+def test_vad_discards_clicks_and_flushes_speech_in_progress():
+    vad = VoiceActivityDetector()
+    click = audioop.mul(fixture_pcm()[8000:8000 + 3200], 2, 1.0)  # 100ms burst
+    assert [e.kind for e in vad.feed(silence(0.5) + click + silence(1.0))] == ["speech_start", "discarded"]
+
+    assert [e.kind for e in vad.feed(silence(0.3) + fixture_pcm()[:32000])] == ["speech_start"]
+    assert vad.flush().kind == "utterance"
+    assert vad.flush() is None
+
+
+def test_resampler_and_wav_decoding():
+    speech = fixture_pcm()
+    upsampled, _ = audioop.ratecv(speech, 2, 1, SAMPLE_RATE, 48000, None)
+    resampler = PCMResampler(48000)
+    # Odd-sized chunks split samples between messages
+    converted = b"".join(resampler.convert(upsampled[i:i + 1001]) for i in range(0, len(upsampled), 1001))
+    assert abs(len(converted) - len(speech)) <= 4
+
+    stereo = audioop.tostereo(upsampled, 2, 1, 1)
+    assert abs(len(decode_wav(to_wav(stereo, rate=48000, channels=2))) - len(speech)) <= 4
+    with pytest.raises(ValueError):
+        decode_wav(b"not a wav file")
+
+
+def test_8_bit_wavs_are_decoded_as_unsigned_samples():
+    speech = fixture_pcm()
+    unsigned = audioop.bias(audioop.lin2lin(speech, 2, 1), 1, 128)
+    assert decode_wav(to_wav(b"\x80" * 1600, width=1)) == silence(0.1)
+    decoded = decode_wav(to_wav(unsigned, width=1))
+    assert len(decoded) == len(speech)
+    # Within 8-bit quantization of the original, not shifted by half the range
+    assert audioop.rms(audioop.add(decoded, audioop.mul(speech, 2, -1), 2), 2) < 256
+
+
+def test_session_runs_vad_off_the_event_loop():
+    class RecordingVAD(VoiceActivityDetector):
+        def feed(self, pcm):
+            threads.append(threading.get_ident())
+            return super().feed(pcm)
+
+    async def stream():
+        sent = []
+
+        async def send(event):
+            sent.append(event)
+
+        session = AudioSession(None, None, send, vad=RecordingVAD())
+        chunk = silence(0.3) + fixture_pcm() + silence(1.0)
+        for i in range(0, len(chunk), 640):
+            await session.feed(chunk[i:i + 640])
+        return sent
+
+    threads = []
+    events = asyncio.run(stream())
+    assert [e["type"] for e in events] == ["speech_start", "speech_end"]
+    assert threads and threading.get_ident() not in threads
+
+
+def use_recognizer(monkeypatch, recognizer):
+    pool = RecognitionPool(recognizer, max_workers=2)
+    monkeypatch.setattr(main, "recognition_pool", pool)
+    return pool
+
+
+def start_call(client) -> str:
+    return client.post("/start-call", json={"customer_name": "Test", "phone_number": "1"}).json()["call_id"]
+
+
+def test_websocket_turns_streamed_audio_into_replies(client, monkeypatch):
+    recognizer = ScriptedRecognizer("How much does it cost?", "No thanks, goodbye")
+    use_recognizer(monkeypatch, recognizer)
+    call_id = start_call(client)
+
+    # The browser streams at its own rate; the server resamples to 16 kHz
+    speech, _ = audioop.ratecv(fixture_pcm(), 2, 1, SAMPLE_RATE, 48000, None)
+    pause = b"\0\0" * 48000
+    stream = speech + pause + speech + pause
+    events = []
+    with client.websocket_connect(f"/ws/audio/{call_id}?sample_rate=48000") as ws:
+        for i in range(0, len(stream), 1920):
+            ws.send_bytes(stream[i:i + 1920])
+        while not events or events[-1]["type"] != "call_ended":
+            events.append(ws.receive_json())
+
+    kinds = [e["type"] for e in events if e["type"] not in ("speech_start", "speech_end")]
+    assert kinds == ["transcript", "reply", "transcript", "reply", "call_ended"]
+    replies = [e for e in events if e["type"] == "reply"]
+    assert replies[0]["should_end_call"] is False and replies[1]["should_end_call"] is True
+    assert all(2.5 < d < 3.8 for d in recognizer.durations)
+
+    history = client.get(f"/conversation/{call_id}").json()["history"]
+    assert [h["text"] for h in history[1::2]] == ["How much does it cost?", "No thanks, goodbye"]
+
+
+def test_websocket_answers_speech_in_progress_on_stop(client, monkeypatch):
+    use_recognizer(monkeypatch, ScriptedRecognizer("Tell me about the curriculum"))
+    call_id = start_call(client)
+
+    with client.websocket_connect(f"/ws/audio/{call_id}") as ws:
+        ws.send_bytes(silence(0.3) + fixture_pcm())
+        ws.send_json({"type": "stop"})
+        events = []
+        while not events or events[-1]["type"] != "reply":
+            events.append(ws.receive_json())
+    assert events[-1]["reply"]
+
+
+def test_websocket_rejects_unknown_calls(client):
+    with client.websocket_connect("/ws/audio/no-such-call") as ws:
+        assert ws.receive_json() == {"type": "error", "detail": "Call not found"}
+
+
+def test_wav_upload_runs_a_turn(client, monkeypatch):
+    use_recognizer(monkeypatch, ScriptedRecognizer("Do I get a certificate?"))
+    call_id = start_call(client)
+
+    r = client.post(f"/respond-audio/{call_id}", content=to_wav(fixture_pcm()),
+                    headers={"Content-Type": "audio/wav"})
+    assert r.status_code == 200
+    assert r.json()["customer_said"] == "Do I get a certificate?"
+    assert r.json()["reply"]
+
+    assert client.post(f"/respond-audio/{call_id}", content=b"garbage").status_code == 415
+    assert client.post("/respond-audio/no-such-call", content=to_wav(fixture_pcm())).status_code == 404
+
+
+
+class StreamedUpload:
+    """Request stand-in that records how much of its body the handler pulled"""
+
+    def __init__(self, chunks, headers=None):
+        self.chunks = chunks
+        self.headers = headers or {}
+        self.read = 0
+
+    async def stream(self):
+        for chunk in self.chunks:
+            self.read += len(chunk)
+            yield chunk
+
+
+def test_oversized_uploads_are_refused_before_they_are_read(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_AUDIO_UPLOAD_BYTES", 1000)
+    call_id = start_call(client)
+    assert client.post(f"/respond-audio/{call_id}", content=b"\0" * 1001).status_code == 413
+    assert client.post(f"/respond-audio/{call_id}", content=b"\0" * 1000).status_code == 415
+
+    declared = StreamedUpload([b"\0" * 400] * 50, {"content-length": "20000"})
+    chunked = StreamedUpload([b"\0" * 400] * 50)  # no Content-Length: the running total catches it
+    for upload in (declared, chunked):
+        with pytest.raises(HTTPException) as refused:
+            asyncio.run(main.read_capped_body(upload, 1000))
+        assert refused.value.status_code == 413
+    assert declared.read == 0 and chunked.read == 1200
+    assert asyncio.run(main.read_capped_body(StreamedUpload([b"ab", b"c"]), 1000)) == b"abc"
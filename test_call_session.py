@@ -0,0 +1,202 @@
+"""Offline tests for the full-duplex call session: streamed replies, agent audio and barge-in"""
+import asyncio
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+import main
+from audio_stream import SAMPLE_RATE, RecognitionPool, decode_wav
+from call_session import CallSession
+from call_store import MemoryCallStore
+from intent_matcher import IntentMatcher
+from llm_service import INTENTS_FILE
+from models import Call
+from speech_streaming import split_sentences
+from turn_pipeline import Responder, TurnPipeline
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "benchmarks", "fixtures", "stt", "utterance_3s.wav")
+
+
+def fixture_pcm() -> bytes:
+    with open(FIXTURE, "rb") as f:
+        return decode_wav(f.read())
+
+
+def silence(seconds: float) -> bytes:
+    return b"\0\0" * int(seconds * SAMPLE_RATE)
+
+
+class TokenResponder(Responder):
+    """Streams a fixed reply word by word, like an LLM; notes whether the stream was closed early"""
+
+    def __init__(self, text="Great question. The course costs 499 dollars. It includes mentoring too.",
+                 delay=0.005):
+        self.words = text.split(" ")
+        self.delay = delay
+        self.closed_early = 0
+
+    async def reply(self, message, match, context):
+        return " ".join(self.words)
+
+    async def stream(self, message, match, context):
+        sent = 0
+        try:
+            for i, word in enumerate(self.words):
+                await asyncio.sleep(self.delay)
+                sent += 1
+                yield word if i == 0 else " " + word
+        finally:
+            if sent < len(self.words):
+                self.closed_early += 1
+
+
+class Harness:
+    """A CallSession wired to a real turn pipeline, with the events and audio it sent"""
+
+    def __init__(self, responder, *texts):
+        store = MemoryCallStore()
+        store.create(Call(call_id="call-1", customer_name="Test", phone_number="1", start_time=datetime.now()))
+        self.spoken = []
+        self.pipeline = TurnPipeline(
+            store,
+            classify=IntentMatcher.from_file(INTENTS_FILE).match,
+            speak=lambda call_id, text: self.spoken.append(text) or {"state": "queued"},
+            speech_status=lambda call_id: None
+        )
+        texts = list(texts)
+        self.pool = RecognitionPool(lambda audio: texts.pop(0), max_workers=1)
+        self.events, self.audio = [], []
+        self.session = CallSession(
+            self.pool,
+            stream_turn=lambda text: self.pipeline.stream("call-1", text, responder, server_speech=False),
+            record_interrupted=lambda text, partial: self.pipeline.record_interrupted(
+                "call-1", text, partial, responder),
+            synthesize=lambda sentence: sentence.encode(),
+            send=self._send,
+            send_audio=self._send_audio
+        )
+
+    async def _send(self, event):
+        self.events.append(event)
+
+    async def _send_audio(self, audio):
+        self.audio.append(audio)
+
+    async def say(self, pcm: bytes):
+        for i in range(0, len(pcm), 640):
+            await self.session.feed(pcm[i:i + 640])
+            await asyncio.sleep(0)
+
+    async def wait_for(self, kind: str, count: int = 1):
+        while sum(e["type"] == kind for e in self.events) < count:
+            await asyncio.sleep(0.005)
+
+    def kinds(self):
+        return [e["type"] for e in self.events if e["type"] not in ("speech_start", "speech_end", "token")]
+
+    def history(self):
+        return [h.text for h in self.pipeline.call_store.get_history("call-1")]
+
+
+def test_reply_streams_tokens_and_sentence_audio():
+    harness = Harness(TokenResponder(), "How much does it cost?")
+
+    async def scenario():
+        answering = asyncio.ensure_future(harness.session.answer())
+        await harness.say(fixture_pcm() + silence(1.0))
+        await harness.wait_for("reply")
+        harness.session.stop()
+        await answering
+
+    asyncio.run(scenario())
+    harness.pool.shutdown()
+    tokens = "".join(e["text"] for e in harness.events if e["type"] == "token")
+    assert tokens == "Great question. The course costs 499 dollars. It includes mentoring too."
+    kinds = harness.kinds()
+    # The first sentence is already audio while the rest of the reply is being generated
+    assert kinds[:2] == ["transcript", "audio"] and kinds[-1] == "audio" and "reply" in kinds
+    assert b" ".join(harness.audio).decode() == tokens and len(harness.audio) == kinds.count("audio") > 1
+    # Played by the client, not by the server's speakers
+    reply = next(e for e in harness.events if e["type"] == "reply")
+    assert harness.spoken == [] and reply["speech_status"] == "client"
+    assert len(harness.session.turn_taking) == 1 and harness.session.agent_speaking
+
+
+def test_caller_speech_cuts_the_agent_off():
+    responder = TokenResponder(delay=0.05)
+    harness = Harness(responder, "How much does it cost?", "Sorry, is there a payment plan?")
+
+    async def scenario():
+        answering = asyncio.ensure_future(harness.session.answer())
+        await harness.say(fixture_pcm() + silence(1.0))
+        await harness.wait_for("token")
+        await harness.say(fixture_pcm() + silence(1.0))  # talks over the reply
+        await harness.wait_for("reply")
+        harness.session.stop()
+        await answering
+
+    asyncio.run(scenario())
+    harness.pool.shutdown()
+    assert harness.kinds()[:3] == ["transcript", "barge_in", "transcript"]
+    assert responder.closed_early == 1 and harness.session.barge_ins == 1
+    history = harness.history()
+    assert history[0] == "How much does it cost?"
+    assert history[1].endswith(" …") and len(history[1]) < len(" ".join(responder.words))
+    assert history[2] == "Sorry, is there a payment plan?"
+
+
+def test_speech_after_playback_is_not_a_barge_in():
+    harness = Harness(TokenResponder(), "How much does it cost?", "Okay, tell me more")
+
+    async def scenario():
+        answering = asyncio.ensure_future(harness.session.answer())
+        await harness.say(fixture_pcm() + silence(1.0))
+        await harness.wait_for("reply")
+        while harness.session._reply is not None and not harness.session._reply.done():
+            await asyncio.sleep(0.005)
+        assert harness.session.agent_speaking  # the client is still playing
+        harness.session.control({"type": "playback_done"})
+        await harness.say(fixture_pcm() + silence(1.0))
+        await harness.wait_for("reply", 2)
+        harness.session.stop()
+        await answering
+
+    asyncio.run(scenario())
+    harness.pool.shutdown()
+    assert "barge_in" not in harness.kinds()
+    assert harness.session.turns == 2 and not any(h.endswith("…") for h in harness.history())
+
+
+@pytest.fixture
+def client(client, monkeypatch):
+    monkeypatch.setattr(main.voice_service, "synthesize", lambda text: b"mp3:" + text.encode())
+    monkeypatch.setattr(main, "recognition_pool", RecognitionPool(lambda audio: "No thanks, goodbye"))
+    yield client
+    main.recognition_pool.shutdown()
+
+
+def test_websocket_call_greets_then_answers(client):
+    call_id = client.post("/start-call", json={"customer_name": "Test", "phone_number": "1"}).json()["call_id"]
+    greeting = client.get(f"/conversation/{call_id}").json()["history"][0]["text"]
+
+    events, audio = [], []
+    with client.websocket_connect(f"/ws/call/{call_id}") as ws:
+        assert ws.receive_json()["type"] == "audio"
+        audio.append(ws.receive_bytes())
+        ws.send_bytes(fixture_pcm() + silence(1.0))  # talks over the rest of the greeting
+        while not events or events[-1]["type"] != "call_ended":
+            message = ws.receive()
+            if message.get("bytes") is not None:
+                audio.append(message["bytes"])
+            else:
+                events.append(json.loads(message["text"]))
+
+    assert audio[0] == b"mp3:" + split_sentences(greeting)[0].encode()
+    reply = next(e for e in events if e["type"] == "reply")
+    assert reply["should_end_call"] is True and events[-1]["type"] == "call_ended"
+    assert audio[-1] == b"mp3:" + split_sentences(reply["reply"])[-1].encode()
+
+    with client.websocket_connect("/ws/call/no-such-call") as ws:
+        assert ws.receive_json() == {"type": "error", "detail": "Call not found"}
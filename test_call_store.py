@@ -0,0 +1,239 @@
+"""Offline tests for the call-store backends (no server needed)"""
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from call_store import MemoryCallStore, RedisCallStore, SQLiteCallStore
+from history_log import HistoryLog
+from models import Call, CallHistory
+
+
+def make_call(call_id="call-1"):
+    return Call(
+        call_id=call_id,
+        customer_name="Test Customer",
+        phone_number="+1234567890",
+        start_time=datetime.now(),
+        history=[CallHistory(sender="agent", text="Hi there", timestamp=datetime.now())]
+    )
+
+
+def turn(i):
+    return [
+        CallHistory(sender="customer", text=f"question {i}", timestamp=datetime.now()),
+        CallHistory(sender="agent", text=f"answer {i}", timestamp=datetime.now()),
+    ]
+
+
+@pytest.fixture
+def fake_redis_server():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryCallStore()
+    elif request.param == "sqlite":
+        store = SQLiteCallStore(str(tmp_path / "calls.db"))
+        yield store
+        store.close()
+    else:
+        fakeredis = pytest.importorskip("fakeredis")
+        yield RedisCallStore(client=fakeredis.FakeRedis(server=fakeredis.FakeServer()))
+
+
+def test_create_get_and_page_history(store):
+    store.create(make_call())
+    for i in range(3):
+        store.append_history("call-1", turn(i))
+
+    call = store.get("call-1")
+    assert call.customer_name == "Test Customer"
+    assert call.is_active
+    assert store.history_length("call-1") == 7
+    page = store.get_history("call-1", offset=1, limit=2)
+    assert [h.text for h in page] == ["question 0", "answer 0"]
+    assert store.get("missing") is None
+
+
+def test_history_rows_are_json_ready(store):
+    store.create(make_call())
+    store.append_history("call-1", turn(0))
+    rows = store.history_rows("call-1", offset=1)
+    assert [(r["sender"], r["text"]) for r in rows] == [("customer", "question 0"), ("agent", "answer 0")]
+    assert datetime.fromisoformat(rows[0]["timestamp"]) <= datetime.now()
+    assert store.history_rows("call-1", offset=3) == [] and store.history_rows("missing") == []
+
+
+def test_history_log_keeps_entries_in_columns():
+    started = datetime(2024, 5, 1, 9, 30, 15, 123456)
+    log = HistoryLog([CallHistory(sender="agent", text="Hi there", timestamp=started)])
+    log.append("customer", "question 0", started)
+    assert len(log) == 2
+    entries = log.entries(offset=1)
+    assert entries[0].sender == "customer" and entries[0].text == "question 0"
+    assert entries[0].timestamp == started.replace(microsecond=123000)  # epoch milliseconds
+    assert log.rows(limit=1) == [{"sender": "agent", "text": "Hi there", "timestamp": "2024-05-01T09:30:15.123"}]
+    with pytest.raises(ValueError):
+        log.append("supervisor", "hello", started)
+
+
+def test_end_call_transitions_once(store):
+    store.create(make_call())
+    assert store.end_call("call-1") is True
+    assert store.end_call("call-1") is False
+    call = store.get("call-1")
+    assert not call.is_active
+    assert call.end_time is not None
+
+
+def test_append_to_unknown_call_fails(store):
+    with pytest.raises(KeyError):
+        store.append_history("missing", turn(0))
+
+
+def test_concurrent_turns_keep_every_entry(store):
+    store.create(make_call())
+    threads = [threading.Thread(target=store.append_history, args=("call-1", turn(i))) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert store.history_length("call-1") == 41
+
+
+def test_memory_store_evicts_least_recently_active():
+    store = MemoryCallStore(max_calls=2)
+    for i in range(3):
+        store.create(make_call(f"call-{i}"))
+    assert store.get("call-0") is None
+    assert store.count() == 2
+    assert store.evictions == 1
+
+
+def test_memory_store_expires_idle_calls():
+    store = MemoryCallStore(ttl_seconds=0.05)
+    store.create(make_call())
+    assert store.get("call-1") is not None
+    time.sleep(0.1)
+    assert store.get("call-1") is None
+    assert store.evict_expired() == 1
+
+
+def test_expired_calls_cannot_be_revived_before_the_sweep():
+    store = MemoryCallStore(ttl_seconds=0.05)
+    store.create(make_call())
+    store.append_turn("call-1", "turn-0", turn(0), {"reply": "answer 0"})
+    time.sleep(0.1)
+    with pytest.raises(KeyError):
+        store.append_history("call-1", turn(1))
+    assert store.end_call("call-1") is False
+    assert store.get_turn("call-1", "turn-0") is None
+    assert store.get_history("call-1") == []
+    assert store.history_rows("call-1") == []
+    assert store.history_length("call-1") == 0
+    assert store.get("call-1") is None
+    assert store.evict_expired() == 1
+
+
+def test_sqlite_store_deletes_calls_past_retention(tmp_path):
+    store = SQLiteCallStore(str(tmp_path / "calls.db"), retention_seconds=3600)
+    for i in range(5):
+        store.create(make_call(f"call-{i}"))
+        store.append_turn(f"call-{i}", "turn-1", turn(0), {"reply": "answer 0"})
+    store._conn.execute("UPDATE calls SET last_activity = ? WHERE call_id != 'call-4'", (time.time() - 7200,))
+    store._conn.commit()
+
+    assert store.evict_expired(batch_size=2) == 4
+    assert list(store.call_ids()) == ["call-4"] and store.history_length("call-4") == 3
+    assert store._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0] == 3
+    assert store._conn.execute("SELECT COUNT(*) FROM turns").fetchone()[0] == 1
+    assert SQLiteCallStore(str(tmp_path / "other.db")).evict_expired() == 0  # no retention: keep everything
+    store.close()
+
+
+def test_redis_activity_index_is_trimmed(fake_redis_server):
+    fakeredis = pytest.importorskip("fakeredis")
+    store = RedisCallStore(client=fakeredis.FakeRedis(server=fake_redis_server), ttl_seconds=60)
+    store.create(make_call("call-old"))
+    store.create(make_call("call-new"))
+    store.client.zadd(store._activity_key, {"call-old": time.time() - 120})  # idle past the TTL
+
+    assert list(store.call_ids()) == ["call-new"] and store.count() == 1
+    assert store.evict_expired() == 1
+    assert store.client.zcard(store._activity_key) == 1
+
+
+def test_app_sweeps_the_call_store(monkeypatch):
+    import asyncio
+
+    import main
+
+    store = MemoryCallStore(ttl_seconds=0.01)
+    store.create(make_call())
+    monkeypatch.setattr(main, "call_store", store)
+
+    async def sweep_briefly():
+        sweeper = asyncio.ensure_future(main.sweep_call_store(0.02))
+        await asyncio.sleep(0.1)
+        sweeper.cancel()
+
+    asyncio.run(sweep_briefly())
+    assert store.evictions == 1 and store.count() == 0
+
+
+def test_redis_workers_share_state(fake_redis_server):
+    fakeredis = pytest.importorskip("fakeredis")
+    # Two stores on one server behave like two uvicorn workers
+    worker_a = RedisCallStore(client=fakeredis.FakeRedis(server=fake_redis_server))
+    worker_b = RedisCallStore(client=fakeredis.FakeRedis(server=fake_redis_server))
+
+    worker_a.create(make_call())
+    worker_b.append_history("call-1", turn(0))
+    assert worker_a.history_length("call-1") == 3
+
+    results = []
+    stores = [worker_a, worker_b] * 5
+    threads = [threading.Thread(target=lambda s=s: results.append(s.end_call("call-1"))) for s in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results.count(True) == 1
+    assert not worker_b.get("call-1").is_active
+
+
+def test_turn_is_recorded_once_per_key(store):
+    store.create(make_call())
+    first, created = store.append_turn("call-1", "key-1", turn(0), {"reply": "answer 0"})
+    assert created and first == {"reply": "answer 0"}
+
+    again, created = store.append_turn("call-1", "key-1", turn(1), {"reply": "answer 1"})
+    assert not created and again == {"reply": "answer 0"}
+    assert store.history_length("call-1") == 3
+    assert store.get_turn("call-1", "key-1") == {"reply": "answer 0"}
+    assert store.get_turn("call-1", "key-2") is None
+
+    with pytest.raises(KeyError):
+        store.append_turn("missing", "key-1", turn(0), {"reply": "answer 0"})
+
+
+def test_concurrent_retries_record_one_turn(store):
+    store.create(make_call())
+    results = []
+    threads = [
+        threading.Thread(target=lambda i=i: results.append(
+            store.append_turn("call-1", "key-1", turn(i), {"reply": f"answer {i}"})))
+        for i in range(10)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [created for _, created in results].count(True) == 1
+    assert len({r["reply"] for r, _ in results}) == 1
+    assert store.history_length("call-1") == 3
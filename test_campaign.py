@@ -0,0 +1,223 @@
+"""Offline tests for the outbound campaign runner: streamed leads, retries, limits and resuming"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from call_store import MemoryCallStore
+from campaign import CampaignRunner, DialResult, read_leads
+
+
+def write_leads(path, count, broken=()):
+    with open(path, "w") as f:
+        for i in range(count):
+            row = {} if i in broken else {"phone_number": f"+1555{i:07d}", "customer_name": f"Lead {i}"}
+            f.write(json.dumps(row) + "\n")
+    return str(path)
+
+
+def outcomes(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class ScriptedDialer:
+    """Answers on the attempt given by `answer_on(lead index)`; tracks concurrency and dial order"""
+
+    def __init__(self, answer_on=lambda index: 1, delay=0.001):
+        self.answer_on = answer_on
+        self.delay = delay
+        self.attempts = Counter()
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, lead):
+        self.attempts[lead.index] += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.delay)
+        self.running -= 1
+        if self.attempts[lead.index] < self.answer_on(lead.index):
+            return DialResult("no_answer")
+        return DialResult("answered", call_id=f"call-{lead.index}")
+
+
+def test_leads_are_streamed_from_csv_and_jsonl(tmp_path):
+    csv_path = tmp_path / "leads.csv"
+    csv_path.write_text("customer_name,phone_number,notes\nAda,+1,vip\n,+2,\n\"Lovelace, A.\",+3,\n")
+    leads = read_leads(str(csv_path))
+    assert next(leads) == (0, "+1", "Ada")  # a generator: nothing beyond this row has been read
+    assert list(leads) == [(1, "+2", ""), (2, "+3", "Lovelace, A.")]
+
+    jsonl_path = tmp_path / "leads.jsonl"
+    jsonl_path.write_text('{"phone_number": "+1", "customer_name": "Ada"}\n\nnot json\n')
+    assert list(read_leads(str(jsonl_path))) == [(0, "+1", "Ada"), (1, "", "")]
+
+    with pytest.raises(ValueError):
+        read_leads(str(tmp_path / "leads.xlsx"))
+
+
+def test_no_answers_are_retried_with_backoff_up_to_max_attempts(tmp_path):
+    leads = write_leads(tmp_path / "leads.jsonl", 40, broken={7})
+    # Lead i answers on attempt i % 4 + 1; with 3 attempts, every fourth lead never does
+    dialer = ScriptedDialer(answer_on=lambda index: index % 4 + 1)
+    runner = CampaignRunner(read_leads(leads), dialer, str(tmp_path / "out.jsonl"), concurrency=5,
+                            calls_per_second=0, max_attempts=3, retry_delay=0.01, backoff=2.0)
+    stats = asyncio.run(runner.run())
+
+    assert stats["status"] == "finished" and stats["finished"] == 40
+    assert stats["outcomes"] == {"answered": 30, "no_answer": 9, "invalid": 1}
+    assert dialer.max_running <= 5
+    assert max(dialer.attempts.values()) == 3 and 7 not in dialer.attempts
+
+    final = [r for r in outcomes(tmp_path / "out.jsonl") if r.get("final")]
+    assert sorted(r["lead"] for r in final) == list(range(40))
+    retried = [r for r in outcomes(tmp_path / "out.jsonl") if r["status"] == "no_answer" and not r["final"]]
+    assert all(r["retry_at"] > 0 for r in retried)
+
+
+def test_rate_limit_spaces_out_dials(tmp_path):
+    leads = write_leads(tmp_path / "leads.jsonl", 6)
+    runner = CampaignRunner(read_leads(leads), ScriptedDialer(), str(tmp_path / "out.jsonl"), concurrency=6,
+                            calls_per_second=50)
+    stats = asyncio.run(runner.run())
+    assert stats["elapsed_s"] >= 5 / 50 * 0.9
+
+
+def test_resumes_after_a_crash_without_redialing_finished_leads(tmp_path):
+    leads = write_leads(tmp_path / "leads.jsonl", 200)
+    log = str(tmp_path / "out.jsonl")
+    first = ScriptedDialer(answer_on=lambda index: 2 if index % 10 == 0 else 1, delay=0.002)
+
+    async def crash():
+        runner = CampaignRunner(read_leads(leads), first, log, concurrency=8, calls_per_second=0,
+                                retry_delay=0.01, checkpoint_every=25)
+        task = asyncio.ensure_future(runner.run())
+        while runner.state.counts["answered"] < 90:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        await asyncio.wait({task})
+
+    asyncio.run(crash())
+    finished_before = {r["lead"] for r in outcomes(log) if r.get("final")}
+    with open(log, "a") as f:
+        f.write('{"lead": 199, "attempt": 1, "sta')  # torn write
+
+    second = ScriptedDialer()
+    runner = CampaignRunner(read_leads(leads), second, log, concurrency=8, calls_per_second=0, retry_delay=0.01)
+    stats = asyncio.run(runner.run())
+
+    assert stats["resumed"] and stats["finished"] == 200 and stats["outcomes"] == {"answered": 200}
+    assert not finished_before & set(second.attempts)
+    final = Counter(r["lead"] for r in outcomes(log) if r.get("final"))
+    assert set(final) == set(range(200)) and set(final.values()) == {1}
+
+
+KILLED_RUN = """
+import asyncio, os, random, sys
+from campaign import CampaignRunner, DialResult, read_leads
+
+leads, log, ledger, kill_after = sys.argv[1], sys.argv[2], open(sys.argv[3], "a"), int(sys.argv[4])
+dials = 0
+
+async def dial(lead):
+    global dials
+    dials += 1
+    if dials > kill_after:
+        os._exit(1)  # no finally blocks, no final checkpoint, nothing flushed on the way out
+    await asyncio.sleep(random.uniform(0, 0.003))
+    ledger.write(f"{lead.index}\\n")  # the telephony side: this customer was called
+    ledger.flush()
+    return DialResult("answered")
+
+asyncio.run(CampaignRunner(read_leads(leads), dial, log, concurrency=20, calls_per_second=0).run())
+"""
+
+
+def test_killed_process_does_not_redial_finished_leads(tmp_path):
+    leads = write_leads(tmp_path / "leads.jsonl", 300)
+    log, ledger = str(tmp_path / "out.jsonl"), tmp_path / "dialed.txt"
+    killed = subprocess.run([sys.executable, "-c", KILLED_RUN, leads, log, str(ledger), "152"],
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert killed.returncode == 1
+    called = {int(line) for line in ledger.read_text().split()}
+    assert len(called) > 100
+
+    second = ScriptedDialer()
+    stats = asyncio.run(CampaignRunner(read_leads(leads), second, log, concurrency=20, calls_per_second=0).run())
+    assert stats["resumed"] and stats["finished"] == 300
+    assert not called & set(second.attempts)  # only the calls in flight at the kill are placed again
+    assert len(called) + len(second.attempts) <= 300 + 20
+
+
+def test_campaign_calls_end_and_hold_their_dial_slot(tmp_path, monkeypatch, silent_speech):
+    monkeypatch.setattr(main, "CAMPAIGN_DIR", str(tmp_path / "campaigns"))
+    monkeypatch.setattr(main, "CAMPAIGN_LEADS_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "CAMPAIGN_CALL_IDLE_SECONDS", 0.05)
+    monkeypatch.setattr(main, "CAMPAIGN_CALL_POLL_SECONDS", 0.005)
+    monkeypatch.setattr(main, "call_store", MemoryCallStore())
+    monkeypatch.setattr(main.turn_pipeline, "call_store", main.call_store)
+    leads = write_leads(tmp_path / "leads.jsonl", 20)
+    runner = CampaignRunner(read_leads(leads), main.dial_lead, str(tmp_path / "out.jsonl"), concurrency=4,
+                            calls_per_second=0, max_attempts=1)
+
+    async def campaign():
+        """Even-numbered leads pick up and say goodbye; the others never say a word"""
+        task = asyncio.ensure_future(runner.run())
+        answered, most_open = set(), 0
+        while not task.done():
+            open_calls = [main.call_store.get(call_id) for call_id in main.call_store.call_ids()]
+            open_calls = [call for call in open_calls if call.is_active]
+            most_open = max(most_open, len(open_calls))
+            for call in open_calls:
+                if int(call.phone_number[-7:]) % 2 == 0 and call.call_id not in answered:
+                    answered.add(call.call_id)
+                    await main.turn_pipeline.run(call.call_id, "No thanks, goodbye", main.responders["rules"])
+            await asyncio.sleep(0.002)
+        return task.result(), most_open
+
+    stats, most_open = asyncio.run(campaign())
+
+    assert stats["outcomes"] == {"answered": 10, "no_answer": 10}
+    assert most_open <= 4
+    calls = [main.call_store.get(call_id) for call_id in main.call_store.call_ids()]
+    assert len(calls) == 20 and not any(call.is_active for call in calls)
+
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    client = TestClient(main.app, headers={"X-Admin-Token": "secret"})
+    assert client.post("/admin/campaigns", json={"leads_path": "nope.jsonl"}).status_code == 400
+    bad = tmp_path / "leads.txt"
+    bad.write_text("")
+    assert client.post("/admin/campaigns", json={"leads_path": "leads.txt"}).status_code == 400
+    outside = tmp_path.parent / "outside.jsonl"
+    outside.write_text("")
+    for path in ("../outside.jsonl", str(outside), "/etc/passwd"):
+        response = client.post("/admin/campaigns", json={"leads_path": path})
+        assert response.status_code == 400 and "CAMPAIGN_LEADS_DIR" in response.json()["detail"]
+    assert client.get("/admin/campaigns/unknown").status_code == 404
+
+
+def test_settings_that_cannot_run_are_rejected_up_front(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "CAMPAIGN_DIR", str(tmp_path / "campaigns"))
+    monkeypatch.setattr(main, "CAMPAIGN_LEADS_DIR", str(tmp_path))
+    write_leads(tmp_path / "leads.jsonl", 3)
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    client = TestClient(main.app, headers={"X-Admin-Token": "secret"})
+    for setting in ({"concurrency": 0}, {"calls_per_second": 0}, {"max_attempts": 0},
+                    {"retry_delay_seconds": -1}, {"concurrency": -5}):
+        response = client.post("/admin/campaigns", json={"leads_path": "leads.jsonl", **setting})
+        assert response.status_code == 422, setting
+
+    # Bad environment defaults fail when the runner is built, which the endpoint reports as a 400
+    monkeypatch.setenv("CAMPAIGN_CONCURRENCY", "0")
+    response = client.post("/admin/campaigns", json={"leads_path": "leads.jsonl"})
+    assert response.status_code == 400 and "concurrency" in response.json()["detail"]
+    for settings in ({"concurrency": 0}, {"max_attempts": 0}, {"retry_delay": -1}):
+        with pytest.raises(ValueError):
+            CampaignRunner([], None, str(tmp_path / "log.jsonl"), **settings)
@@ -0,0 +1,101 @@
+"""Offline tests for conversation-aware RAG prompts (stub LLM, no server needed)"""
+from datetime import datetime
+
+import pytest
+
+import main
+from call_store import MemoryCallStore
+from conversation_context import (ConversationMemory, context_from_history, count_tokens, is_follow_up,
+                                  select_window)
+from models import Call, CallHistory
+
+
+def entry(sender, text):
+    return CallHistory(sender=sender, text=text, timestamp=datetime.now())
+
+
+class RecordingChain:
+    """Retrieval-chain stand-in that records what it was asked"""
+
+    def __init__(self):
+        self.inputs = []
+
+    async def ainvoke(self, inputs):
+        self.inputs.append(inputs)
+        return {"context": [], "answer": f"Here is what I know about: {inputs['input']}"}
+
+
+def test_follow_up_detection():
+    assert is_follow_up("and how long is it?")
+    assert is_follow_up("What about the certificate?")
+    assert not is_follow_up("How much does the AI bootcamp cost?")
+
+
+def test_window_respects_turns_and_token_budget():
+    history = [entry("customer", "word " * 10) for _ in range(10)]
+    assert select_window(history, max_turns=4, token_budget=1000) == 6
+    assert select_window(history, max_turns=10, token_budget=25) == 8  # 12 tokens per entry
+    assert select_window([entry("agent", "word " * 100)], max_turns=4, token_budget=50) == 1
+
+
+def test_summary_is_built_incrementally():
+    store = MemoryCallStore()
+    store.create(Call(call_id="call-1", customer_name="Test", phone_number="1", start_time=datetime.now()))
+    memory = ConversationMemory(store, max_turns=4, token_budget=1000, summary_tokens=60)
+
+    offsets = []
+    get_history = store.get_history
+    store.get_history = lambda call_id, offset=0, limit=None: offsets.append(offset) or get_history(call_id, offset, limit)
+
+    for i in range(10):
+        context = memory.build("call-1")
+        assert len(context.turns) == min(2 * i, 4)
+        assert sum(count_tokens(line) for line in context.summary) <= 60
+        store.append_history("call-1", [entry("customer", f"Question {i}?"), entry("agent", f"Answer {i}.")])
+
+    # Each turn only read the part of the history not yet folded into the summary
+    assert offsets == [0, 0, 0, 0, 2, 4, 6, 8, 10, 12]
+    assert memory.entries_summarized == 14
+    assert context.summary[-1] == "Agent: Answer 6."
+
+
+def test_context_from_history_matches_window():
+    history = [entry("customer", f"Question {i}?") for i in range(8)]
+    context = context_from_history(history, max_turns=3)
+    assert [h.text for h in context.turns] == ["Question 5?", "Question 6?", "Question 7?"]
+    assert context.summary[0] == "Customer: Question 0?"
+
+
+@pytest.fixture
+def client(client, install_chain):
+    client.chain = install_chain(RecordingChain())
+    return client
+
+
+def test_follow_up_question_gets_history_and_context_aware_retrieval(client):
+    call_id = client.post("/start-call", json={"customer_name": "Test", "phone_number": "1"}).json()["call_id"]
+    client.post(f"/respond-rag/{call_id}", json={"message": "How much is the AI bootcamp?"})
+    r = client.post(f"/respond-rag/{call_id}", json={"message": "And how long is it?"})
+
+    inputs = client.chain.inputs[-1]
+    assert inputs["input"] == "And how long is it?"
+    assert inputs["search_query"] == "How much is the AI bootcamp? And how long is it?"
+    assert "Customer: How much is the AI bootcamp?" in inputs["history"]
+    assert "Here is what I know about: How much is the AI bootcamp?" in inputs["history"]
+
+    usage = r.json()["usage"]
+    assert usage["prompt_tokens"] > usage["history_tokens"] > 0
+    assert usage["window_turns"] == 3  # greeting, first question and answer
+
+
+def test_prompt_tokens_stay_bounded_in_long_calls(client):
+    call_id = client.post("/start-call", json={"customer_name": "Test", "phone_number": "1"}).json()["call_id"]
+    prompt_tokens = []
+    for i in range(30):
+        r = client.post(f"/respond-rag/{call_id}", json={"message": f"Tell me about module number {i} of the course"})
+        prompt_tokens.append(r.json()["usage"]["prompt_tokens"])
+
+    memory = main.turn_pipeline.memory
+    bound = main.llm_service._template_tokens + memory.token_budget + memory.summary_tokens + 60
+    assert max(prompt_tokens) <= bound
+    assert prompt_tokens[-1] - prompt_tokens[10] < 20
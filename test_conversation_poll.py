@@ -0,0 +1,58 @@
+"""Offline tests for polling /conversation with cursors and ETags (no server needed)"""
+from datetime import datetime
+
+import main
+from models import CallHistory
+
+
+def test_poll_fetches_only_new_turns_and_304s_when_unchanged(client):
+    call_id = client.post("/start-call", json={"customer_name": "Test", "phone_number": "1"}).json()["call_id"]
+
+    first = client.get(f"/conversation/{call_id}", params={"since": 0})
+    assert len(first.json()["history"]) == 1 and first.json()["cursor"] == 1
+    etag = first.headers["etag"]
+
+    unchanged = client.get(f"/conversation/{call_id}", params={"since": 1}, headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304 and unchanged.content == b""
+
+    main.call_store.append_history(call_id, [CallHistory(sender="customer", text="How much is it?",
+                                                         timestamp=datetime.now())])
+    changed = client.get(f"/conversation/{call_id}", params={"since": 1}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert [h["text"] for h in changed.json()["history"]] == ["How much is it?"]
+    assert changed.json()["cursor"] == 2 and changed.json()["total"] == 2
+
+    # Ending the call changes the ETag even though no entry was added
+    main.call_store.end_call(call_id)
+    ended = client.get(f"/conversation/{call_id}", params={"since": 2},
+                       headers={"If-None-Match": f'W/{changed.headers["etag"]}'})
+    assert ended.status_code == 200 and ended.json()["history"] == [] and ended.json()["is_active"] is False
+
+
+def test_offset_paging_still_works(client):
+    call_id = client.post("/start-call", json={"customer_name": "Test", "phone_number": "1"}).json()["call_id"]
+    main.call_store.append_history(call_id, [
+        CallHistory(sender="customer", text=f"question {i}", timestamp=datetime.now()) for i in range(3)
+    ])
+    page = client.get(f"/conversation/{call_id}", params={"offset": 1, "limit": 2}).json()
+    assert [h["text"] for h in page["history"]] == ["question 0", "question 1"]
+    assert page["next_offset"] == 3 and page["total"] == 4
+    assert client.get("/conversation/no-such-call").status_code == 404
+
+
+def test_paging_with_an_etag_still_returns_unseen_entries(client):
+    call_id = client.post("/start-call", json={"customer_name": "Test", "phone_number": "1"}).json()["call_id"]
+    main.call_store.append_history(call_id, [
+        CallHistory(sender="customer", text=f"question {i}", timestamp=datetime.now()) for i in range(5)
+    ])
+
+    seen, since, etag = [], 0, None
+    while True:
+        headers = {"If-None-Match": etag} if etag else {}
+        page = client.get(f"/conversation/{call_id}", params={"since": since, "limit": 2}, headers=headers)
+        if page.status_code == 304:
+            break
+        assert page.status_code == 200
+        seen += [h["text"] for h in page.json()["history"]]
+        since, etag = page.json()["cursor"], page.headers["etag"]
+    assert seen[1:] == [f"question {i}" for i in range(5)] and since == 6
@@ -0,0 +1,105 @@
+"""Offline tests for the ONNX Runtime embedding backends (a tiny synthetic encoder, no model download)"""
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+pytest.importorskip("faiss")
+onnx = pytest.importorskip("onnx")
+
+from embedding_backends import (FP32_FILE, RECALL_QUERIES, TOKENIZER_FILE, OnnxEmbeddings, create_embeddings,
+                                mean_pool, quantize_model, retrieval_recall)
+
+TEXTS = [
+    "The bootcamp costs $499, today only $299 with a payment plan",
+    "Twelve weeks, two to three hours per week, fully online",
+    "Curriculum: Python, machine learning, deep learning, MLOps and deployment",
+    "Every student builds real projects for a portfolio",
+    "A certificate of completion is awarded at the end",
+    "Job placement assistance, interview practice and resume reviews",
+    "Mentors are industry engineers; there is a student community",
+    "No programming experience required; a refund is possible in the first week",
+]
+
+
+def build_model(directory, dim=32, seed=0):
+    """Word-level tokenizer plus an encoder of embedding lookup -> MatMul -> Relu -> MatMul"""
+    from onnx import TensorProto, helper, numpy_helper
+    from tokenizers import Tokenizer, models, pre_tokenizers
+
+    words = sorted({w for text in TEXTS + RECALL_QUERIES for w in text.lower().replace("?", " ").split()})
+    vocab = {"[PAD]": 0, "[UNK]": 1, **{w: i + 2 for i, w in enumerate(words)}}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.save(os.path.join(directory, TOKENIZER_FILE))
+
+    rng = np.random.default_rng(seed)
+    table = rng.standard_normal((len(vocab), dim)).astype(np.float32)
+    w1 = rng.standard_normal((dim, 4 * dim)).astype(np.float32) / np.sqrt(dim)
+    w2 = rng.standard_normal((4 * dim, dim)).astype(np.float32) / np.sqrt(4 * dim)
+    graph = helper.make_graph(
+        [helper.make_node("Gather", ["table", "input_ids"], ["tokens"]),
+         helper.make_node("MatMul", ["tokens", "w1"], ["inner"]),
+         helper.make_node("Relu", ["inner"], ["active"]),
+         helper.make_node("MatMul", ["active", "w2"], ["last_hidden_state"])],
+        "encoder",
+        [helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["batch", "seq"]),
+         helper.make_tensor_value_info("attention_mask", TensorProto.INT64, ["batch", "seq"])],
+        [helper.make_tensor_value_info("last_hidden_state", TensorProto.FLOAT, ["batch", "seq", dim])],
+        [numpy_helper.from_array(table, "table"), numpy_helper.from_array(w1, "w1"),
+         numpy_helper.from_array(w2, "w2")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)], ir_version=8)
+    onnx.save(model, os.path.join(directory, FP32_FILE))
+    return vocab, table, w1, w2
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    build_model(str(tmp_path))
+    return str(tmp_path)
+
+
+def test_vectors_are_mean_pooled_over_real_tokens_only(model_dir):
+    vocab, table, w1, w2 = build_model(model_dir)
+    embeddings = OnnxEmbeddings(model_dir, batch_size=3, workers=2)
+    text = "how much does the bootcamp cost"
+    hidden = np.maximum(table[[vocab[w] for w in text.split()]] @ w1, 0) @ w2
+    expected = hidden.mean(axis=0) / np.linalg.norm(hidden.mean(axis=0))
+
+    np.testing.assert_allclose(embeddings.embed_query(text), expected, rtol=1e-4, atol=1e-5)
+    vectors = embeddings.embed_documents(TEXTS + [text])  # padded next to longer texts, across 3 batches
+    np.testing.assert_allclose(vectors[-1], expected, rtol=1e-4, atol=1e-5)
+    np.testing.assert_allclose(vectors, [embeddings.embed_query(t) for t in TEXTS + [text]], rtol=1e-4, atol=1e-5)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    embeddings.close()
+
+
+def test_mean_pool_ignores_padding():
+    hidden = np.array([[[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]]], dtype=np.float32)
+    np.testing.assert_allclose(mean_pool(hidden, np.array([[1, 1, 0]]), normalize=False), [[2.0, 0.0]])
+
+
+def test_int8_model_retrieves_what_fp32_does(model_dir):
+    pytest.importorskip("langchain_community")
+    quantize_model(model_dir)
+    fp32 = OnnxEmbeddings(model_dir)
+    int8 = OnnxEmbeddings(model_dir, quantized=True, intra_op_threads=1)
+    assert os.path.getsize(os.path.join(model_dir, "model_int8.onnx")) < os.path.getsize(
+        os.path.join(model_dir, FP32_FILE))
+    assert retrieval_recall(fp32, int8, TEXTS, k=2) >= 0.9
+    assert retrieval_recall(fp32, fp32, TEXTS, k=2) == 1.0
+
+
+def test_backend_selection(monkeypatch, model_dir):
+    monkeypatch.setenv("ONNX_MODEL_DIR", model_dir)
+    monkeypatch.setenv("EMBEDDING_BACKEND", "onnx")
+    monkeypatch.setenv("EMBEDDING_THREADS", "1")
+    backend, embeddings = create_embeddings()
+    assert backend == "onnx" and isinstance(embeddings, OnnxEmbeddings)
+
+    monkeypatch.setenv("EMBEDDING_BACKEND", "tensorflow")
+    with pytest.raises(ValueError):
+        create_embeddings()
@@ -0,0 +1,103 @@
+"""Offline tests for the transcript export and the analytics job over it"""
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+from call_store import MemoryCallStore, SQLiteCallStore
+from models import Call, CallHistory
+from transcript_export import export, iter_rows, ndjson_chunks, read_ndjson
+
+START = datetime(2024, 5, 1, 9, 0, 0)
+
+
+def reply(text, responder, intent, latency_ms, seconds):
+    return CallHistory(sender="agent", text=text, timestamp=START + timedelta(seconds=seconds),
+                       responder=responder, intent=intent, latency_ms=latency_ms)
+
+
+def said(text, seconds):
+    return CallHistory(sender="customer", text=text, timestamp=START + timedelta(seconds=seconds))
+
+
+def fill(store):
+    """Three calls: one converts, one hangs up, one is still going"""
+    scripts = {
+        "call-a": [said("How much is it?", 1), reply("It is $299.", "RuleResponder", "price", 2.0, 2),
+                   said("I'm interested", 3), reply("Great!", "RuleResponder", "interested", 1.5, 4)],
+        "call-b": [said("Tell me about the curriculum", 1), reply("It covers ...", "RagResponder", None, 800.0, 3),
+                   said("Not for me, bye", 4), reply("Thanks for your time.", "RuleResponder", "not_interested",
+                                                     1.0, 5)],
+        "call-c": [said("Hmm", 1), reply("Could you tell me more?", "RuleResponder", None, 1.0, 2)],
+    }
+    for call_id, entries in scripts.items():
+        store.create(Call(call_id=call_id, customer_name="Test", phone_number="1", start_time=START,
+                          history=[CallHistory(sender="agent", text="Hi", timestamp=START)]))
+        store.append_history(call_id, entries)
+        if call_id != "call-c":
+            store.end_call(call_id, START + timedelta(seconds=10))
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryCallStore()
+    else:
+        store = SQLiteCallStore(str(tmp_path / "calls.db"))
+        yield store
+        store.close()
+
+
+def test_rows_carry_call_metadata_and_reply_details(store):
+    fill(store)
+    rows = list(iter_rows(store, page_size=2))  # pages smaller than a call
+    assert len(rows) == 3 + 4 + 4 + 2
+    assert [r["seq"] for r in rows if r["call_id"] == "call-a"] == [0, 1, 2, 3, 4]
+    price = next(r for r in rows if r["intent"] == "price")
+    assert price["responder"] == "RuleResponder" and price["latency_ms"] == 2.0 and price["sender"] == "agent"
+    assert price["call_active"] is False and price["call_end"] - price["call_start"] == 10000
+
+    data = b"".join(ndjson_chunks(rows, chunk_rows=4))
+    assert list(read_ndjson(io.BytesIO(data))) == rows
+
+
+def test_parquet_export_feeds_the_analytics_job(tmp_path):
+    pytest.importorskip("pyarrow")
+    pytest.importorskip("pandas")
+    from analytics import analyze, load
+
+    store = MemoryCallStore()
+    fill(store)
+    path = str(tmp_path / "calls.parquet")
+    assert export(iter_rows(store), path, chunk_rows=5) == 13
+    assert export(iter_rows(store), str(tmp_path / "calls.ndjson")) == 13
+
+    for source in (path, str(tmp_path / "calls.ndjson")):
+        report = analyze(load(source))
+        assert report["calls"] == 3 and report["turns"] == 5 and report["ended_calls"] == 2
+        assert report["conversion_rate"] == round(1 / 3, 4) and report["hang_up_rate"] == round(1 / 3, 4)
+        assert report["turns_per_call"]["max"] == 2
+        assert report["fallback_intents"] == {"default": 1, "price": 1, "interested": 1, "not_interested": 1}
+        assert report["latency_ms"]["RagResponder"]["count"] == 1
+        assert report["latency_ms"]["RuleResponder"]["p50"] == 1.25  # 1.0, 1.0, 1.5, 2.0
+
+
+def test_export_endpoint_streams_recorded_turns(client, monkeypatch):
+    monkeypatch.setattr(main, "call_store", MemoryCallStore())
+    monkeypatch.setattr(main.turn_pipeline, "call_store", main.call_store)
+    call_id = client.post("/start-call", json={"customer_name": "Test", "phone_number": "1"}).json()["call_id"]
+    client.post(f"/respond/{call_id}", json={"message": "How much does it cost?"})
+    main.speech_pipeline.shutdown(wait=True)
+
+    assert client.get("/admin/export").status_code == 503  # admin routes are off without ADMIN_TOKEN
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    assert client.get("/admin/export").status_code == 403
+    assert client.get("/admin/export", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    response = client.get("/admin/export", headers={"X-Admin-Token": "secret"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["sender"] for r in rows] == ["agent", "customer", "agent"]
+    assert rows[2]["responder"] == "RuleResponder" and rows[2]["intent"] == "price"
+    assert rows[2]["latency_ms"] >= 0 and rows[0]["responder"] is None
@@ -0,0 +1,95 @@
+"""Offline tests for the compiled keyword intent matcher against the substring rules it replaced"""
+import pytest
+
+from benchmarks.bench_intents import legacy_reply_and_end, make_corpus
+from intent_matcher import IntentMatcher
+from llm_service import INTENTS_FILE
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return IntentMatcher.from_file(INTENTS_FILE)
+
+
+@pytest.mark.parametrize("message", [
+    "How much does it cost?",
+    "the cost's fine",
+    "That's too pricey",
+    "What's the timeline?",
+    "I work overtime most weeks",
+    "I'm busy with work",
+    "Will you help me find a job?",
+    "Do I get a certificate at the end",
+    "Yes, tell me more about the details",
+    "I already took a course on this",
+    "What topics does it cover",
+    "No thanks, goodbye",
+    "Don't call me again",
+    "Maybe later, I'm not interested",
+    "Hello there",
+])
+def test_matches_what_the_substring_rules_did(matcher, message):
+    intent, ends_call = legacy_reply_and_end(message)
+    match = matcher.match(message)
+    assert (match.top or "default", match.ends_call) == (intent, ends_call)
+
+
+def test_agrees_with_the_substring_rules_on_the_benchmark_corpus(matcher):
+    corpus = make_corpus(2000)
+    matches = map(matcher.match, corpus)
+    same = sum(legacy_reply_and_end(message) == (match.top or "default", match.ends_call)
+               for message, match in zip(corpus, matches))
+    assert same / len(corpus) >= 0.97
+
+
+@pytest.mark.parametrize("message, legacy_intent", [
+    ("I was there yesterday", "interested"),  # "yes"
+    ("sometimes", "time"),
+    ("That part is uncovered", "curriculum"),  # "cover"
+])
+def test_keywords_no_longer_fire_inside_other_words(matcher, message, legacy_intent):
+    assert legacy_reply_and_end(message)[0] == legacy_intent
+    assert matcher.match(message).top is None
+
+
+def test_possessive_s_is_dropped_from_messages_and_keywords():
+    matcher = IntentMatcher([{"name": "price", "keywords": ["cost"]},
+                             {"name": "company", "keywords": ["company's plan"]}], ["that's all"])
+    assert matcher.match("The cost's fine").intents == ["price"]
+    assert matcher.match("What is the company plan").intents == ["company"]
+    assert matcher.match("That’s all, thanks").ends_call
+    assert matcher.match("It's s").intents == []
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("I work nights", "time"),
+    ("I'm busy with work", "time"),
+    ("I'm looking for work", "career"),
+    ("I've been out of work since March", "career"),
+    ("Can it help me find work in AI", "career"),
+])
+def test_bare_work_is_about_time_and_job_hunting_phrases_are_about_career(matcher, message, intent):
+    assert matcher.match(message).top == intent
+
+
+def test_phrases_claim_the_words_they_span():
+    matcher = IntentMatcher([{"name": "time", "priority": 2, "keywords": ["work"]},
+                             {"name": "career", "priority": 1, "keywords": ["looking for work"]}], [])
+    assert matcher.match("looking for work").intents == ["career"]
+    assert matcher.match("looking for work, but work is busy").intents == ["time", "career"]
+
+
+@pytest.mark.parametrize("message", [
+    "The price\u2014is it negotiable?",
+    "price\u2013wise, what are we talking",
+    "\u201cprice\u201d is my worry\u2026",
+    "what\u2018s the price\u2026",
+])
+def test_unicode_punctuation_separates_words(matcher, message):
+    assert matcher.match(message).top == "price"
+
+
+def test_typographic_apostrophes_read_as_plain_ones(matcher):
+    assert matcher.match("Don\u2018t call me").ends_call
+    assert matcher.match("Don\u02bct call me").ends_call
+    assert matcher.match("the cost\u2019s fine").top == "price"
@@ -0,0 +1,105 @@
+"""Offline tests for the intent-routed RAG fast path (fake embeddings and LLM, no model download)"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+from langchain.prompts import ChatPromptTemplate
+from langchain.schema import Document
+from langchain_community.chat_models.fake import FakeListChatModel
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from intent_routes import IntentRoutes, create_intent_routes
+from llm_service import INTENTS_FILE, LLMService
+
+PROMPTS = []
+
+
+class RecordingChat(FakeListChatModel):
+    """Fake chat model that keeps the prompts it was sent"""
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        PROMPTS.append(messages[0].content)
+        return super()._call(messages, stop, run_manager, **kwargs)
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Fake embeddings that count query embeddings (one per full retrieval)"""
+
+    queries: int = 0
+
+    def embed_query(self, text):
+        self.queries += 1
+        return super().embed_query(text)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("RAG_BATCHING", "off")
+    PROMPTS.clear()
+    embeddings = CountingEmbedding(size=16)
+    texts = ["Price: $499, today $299", "12 weeks, 2-3 hours per week", "Certificate on completion",
+             "Mentors from industry", "Job placement assistance"]
+    vector_store = FAISS.from_documents([Document(page_content=t) for t in texts], embeddings)
+    service = LLMService()
+    service.llm = RecordingChat(responses=["The bootcamp costs $299 today, down from $499."])
+    service.prompt = ChatPromptTemplate.from_template(service.RAG_PROMPT_TEMPLATE)
+    service.response_cache = None
+    service._install_vector_store(vector_store)
+    service.rag_enabled = True
+    service.rag_state = "ready"
+    embeddings.queries = 0
+    service.embeddings = embeddings
+    return service
+
+
+def prefix(prompt: str) -> str:
+    return prompt.split("CONVERSATION SO FAR:")[0]
+
+
+def test_routed_questions_skip_retrieval_and_share_a_prompt_prefix(service):
+    routes = service.intent_routes
+    assert set(routes.chains) == {"price", "time", "career", "certificate", "curriculum"}
+
+    assert service.get_rag_response("How much does it cost?").startswith("The bootcamp costs")
+    assert service.get_rag_response("Is the price negotiable, can I afford it?").startswith("The bootcamp costs")
+    assert service.embeddings.queries == 0  # no embedding pass, no FAISS search
+    assert len(PROMPTS) == 2 and prefix(PROMPTS[0]) == prefix(PROMPTS[1])
+    documents = routes.contexts["price"]
+    assert len(documents) == 2 and all(doc.page_content in PROMPTS[0] for doc in documents)
+    assert routes.stats()["routed"]["price"] == 2
+
+
+def test_other_questions_take_full_retrieval(service):
+    service.get_rag_response("Who are the mentors?")  # no routed intent
+    service.get_rag_response("What does it cost and do I get a certificate?")  # two routed intents
+    assert service.embeddings.queries == 2
+    stats = service.intent_routes.stats()
+    assert stats["unrouted"] == 2 and stats["routed_share"] == 0.0
+
+
+def test_routed_answers_stream(service):
+    async def collect():
+        return [delta async for delta in service.astream_rag_response("Do I get a certificate?")]
+
+    deltas = asyncio.run(collect())
+    assert "".join(deltas) == "The bootcamp costs $299 today, down from $499." and len(deltas) > 1
+    assert service.embeddings.queries == 0
+
+
+def test_braces_in_documents_stay_literal():
+    PROMPTS.clear()
+    routes = IntentRoutes(LLMService().intent_matcher, {"price": "How much is it?"})
+    routes.build(lambda text, k: [Document(page_content="Price: {special offer} $299")],
+                 LLMService.RAG_PROMPT_TEMPLATE, RecordingChat(responses=["It is $299."]))
+    result = routes.chains["price"].invoke({"input": "How much?", "history": "(none)", "search_query": "How much?"})
+    assert result["answer"] == "It is $299." and result["context"][0].page_content.startswith("Price")
+    assert "Price: {special offer} $299" in PROMPTS[0]
+
+
+def test_routes_can_be_switched_off(monkeypatch):
+    monkeypatch.setenv("RAG_INTENT_ROUTES", "off")
+    assert create_intent_routes(INTENTS_FILE, LLMService().intent_matcher) is None
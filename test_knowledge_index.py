@@ -0,0 +1,190 @@
+"""Offline tests for the persisted RAG index (fake embeddings, no model download)"""
+import os
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+from langchain.schema import Document
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+import knowledge_index
+from knowledge_index import KnowledgeBase, knowledge_fingerprint, load_vector_store, read_manifest, save_vector_store
+
+CONFIG = {"chunk_size": 1000, "embedding_model": "fake"}
+
+
+def build(texts):
+    return FAISS.from_documents([Document(page_content=t) for t in texts], DeterministicFakeEmbedding(size=16))
+
+
+def test_fingerprint_tracks_content_and_config():
+    base = knowledge_fingerprint({"kb.txt": "price is $299"}, CONFIG)
+    assert base == knowledge_fingerprint({"kb.txt": "price is $299"}, dict(CONFIG))
+    assert base != knowledge_fingerprint({"kb.txt": "price is $499"}, CONFIG)
+    assert base != knowledge_fingerprint({"kb.txt": "price is $299"}, dict(CONFIG, chunk_size=500))
+
+
+def test_saved_index_loads_only_for_matching_fingerprint(tmp_path):
+    store = build(["The bootcamp costs $299.", "It runs for 12 weeks."])
+    save_vector_store(store, str(tmp_path), "abc", CONFIG)
+    assert read_manifest(str(tmp_path))["chunks"] == 2
+
+    embeddings = DeterministicFakeEmbedding(size=16)
+    assert load_vector_store(str(tmp_path), embeddings, "other") is None
+
+    loaded = load_vector_store(str(tmp_path), embeddings, "abc")
+    assert loaded.index.ntotal == 2
+    assert loaded.similarity_search("It runs for 12 weeks.", k=1)[0].page_content == "It runs for 12 weeks."
+
+
+def test_missing_index_is_not_loaded(tmp_path):
+    assert load_vector_store(str(tmp_path), DeterministicFakeEmbedding(size=16), "abc") is None
+
+
+def test_readers_never_see_a_half_saved_index(tmp_path):
+    index_dir = str(tmp_path)
+    stores = {"a": build([f"A chunk {i}" for i in range(2)]), "b": build([f"B chunk {i}" for i in range(5)])}
+    save_vector_store(stores["a"], index_dir, "a", CONFIG)
+    done = threading.Event()
+
+    def saver(name):
+        while not done.is_set():
+            save_vector_store(stores[name], index_dir, name, CONFIG)
+
+    savers = [threading.Thread(target=saver, args=(name,)) for name in stores]
+    for t in savers:
+        t.start()
+    try:
+        for _ in range(200):
+            loaded = load_vector_store(index_dir, DeterministicFakeEmbedding(size=16))
+            texts = [doc.page_content for doc in loaded.docstore._dict.values()]
+            assert loaded.index.ntotal == len(texts) in (2, 5)
+            assert len({text[0] for text in texts}) == 1
+    finally:
+        done.set()
+        for t in savers:
+            t.join()
+
+
+def test_superseded_snapshots_and_the_old_layout_are_removed(tmp_path, monkeypatch):
+    index_dir = str(tmp_path)
+    store = build(["The bootcamp costs $299."])
+    store.save_local(index_dir, "index")  # layout from before snapshots
+    with open(os.path.join(index_dir, "manifest.json"), "w") as f:
+        f.write('{"fingerprint": "old", "chunks": 1}')
+    assert load_vector_store(index_dir, DeterministicFakeEmbedding(size=16), "old").index.ntotal == 1
+
+    monkeypatch.setattr(knowledge_index, "SNAPSHOT_GRACE_SECONDS", -1)
+    for version in ("v1", "v2", "v3"):
+        save_vector_store(store, index_dir, version, CONFIG)
+    snapshots = sorted(name for name in os.listdir(index_dir) if name.startswith("snapshot-"))
+    assert read_manifest(index_dir)["snapshot"] in snapshots and len(snapshots) == 2  # current and previous
+    assert not os.path.exists(os.path.join(index_dir, "index.faiss"))
+    assert load_vector_store(index_dir, DeterministicFakeEmbedding(size=16), "v3").index.ntotal == 1
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Fake embeddings that record how many chunks were embedded"""
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def make_kb(docs_dir, index_dir, embeddings):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=40, chunk_overlap=0)
+    return KnowledgeBase(embeddings, CONFIG, docs_dir=str(docs_dir), index_dir=str(index_dir),
+                         splitter=splitter, use_embedding_cache=False)
+
+
+def test_knowledge_base_reindexes_only_changed_documents(tmp_path):
+    docs = tmp_path / "kb"
+    docs.mkdir()
+    (docs / "bootcamp.txt").write_text("The AI bootcamp costs $299.\n\nIt runs for 12 weeks.")
+    (docs / "data.md").write_text("The data course costs $199.")
+    embeddings = CountingEmbedding(size=16)
+    kb = make_kb(docs, tmp_path / "index", embeddings)
+
+    assert kb.load_or_build()["mode"] == "full"
+    assert kb.vector_store.index.ntotal == 3
+    first_version = kb.version
+
+    # Add, edit and delete one document each
+    (docs / "cloud.txt").write_text("The cloud course costs $149.")
+    (docs / "data.md").write_text("The data course costs $249.")
+    (docs / "bootcamp.txt").unlink()
+    old_store = kb.vector_store
+    embeddings.embedded = 0
+    result = kb.refresh()
+
+    assert result["mode"] == "incremental"
+    assert (result["added"], result["changed"], result["removed"]) == (["cloud.txt"], ["data.md"], ["bootcamp.txt"])
+    assert embeddings.embedded == 2
+    assert kb.vector_store.index.ntotal == 2
+    assert kb.version != first_version
+    # The previous index is left intact for requests still using it
+    assert old_store.index.ntotal == 3
+    texts = {d.page_content for d in kb.vector_store.similarity_search("course", k=5)}
+    assert texts == {"The cloud course costs $149.", "The data course costs $249."}
+    assert kb.refresh()["mode"] == "unchanged"
+
+
+def test_knowledge_base_resumes_from_saved_index(tmp_path):
+    docs = tmp_path / "kb"
+    docs.mkdir()
+    (docs / "bootcamp.txt").write_text("The AI bootcamp costs $299.")
+    make_kb(docs, tmp_path / "index", CountingEmbedding(size=16)).load_or_build()
+
+    (docs / "cloud.txt").write_text("The cloud course costs $149.")
+    embeddings = CountingEmbedding(size=16)
+    kb = make_kb(docs, tmp_path / "index", embeddings)
+    result = kb.load_or_build()
+
+    assert result["source"] == "updated"
+    assert result["added"] == ["cloud.txt"]
+    assert embeddings.embedded == 1
+    assert kb.vector_store.index.ntotal == 2
+    # Removing a chunk works on the memory-mapped index loaded from disk
+    (docs / "bootcamp.txt").unlink()
+    assert kb.refresh()["chunks"] == 1
+
+
+def test_concurrent_reloads_install_the_newest_index(tmp_path, monkeypatch):
+    from llm_service import LLMService
+
+    docs = tmp_path / "kb"
+    docs.mkdir()
+    (docs / "bootcamp.txt").write_text("The AI bootcamp costs $299.")
+    service = LLMService()
+    service.knowledge_base = make_kb(docs, tmp_path / "index", CountingEmbedding(size=16))
+    service.knowledge_base.load_or_build()
+    service.rag_state = "ready"
+
+    installing, installed = threading.Event(), []
+
+    def install(store):
+        if not installing.is_set():  # the first reload is slow to install its index
+            installing.set()
+            time.sleep(0.3)
+        installed.append(store)
+
+    monkeypatch.setattr(service, "_install_vector_store", install)
+    (docs / "bootcamp.txt").write_text("The AI bootcamp costs $399.")
+    first = threading.Thread(target=service.reload_knowledge)
+    first.start()
+    assert installing.wait(5)
+    (docs / "bootcamp.txt").write_text("The AI bootcamp costs $499.")
+    service.reload_knowledge()  # e.g. the watcher firing while an admin reload is installing
+    first.join()
+
+    assert installed[-1] is service.knowledge_base.vector_store
+    assert installed[-1].similarity_search("bootcamp", k=1)[0].page_content == "The AI bootcamp costs $499."
+    assert service.rag_index["fingerprint"] == service.knowledge_base.version
@@ -0,0 +1,144 @@
+"""Offline tests for LLM deadlines, the circuit breaker, hedging and rule-based degradation (fake LLM)"""
+import asyncio
+import time
+
+import pytest
+
+import main
+from llm_guard import CircuitBreaker, LLMGuard, LLMTimeoutError
+
+
+class FakeLLMChain:
+    """Retrieval-chain stand-in with injected latency and errors.
+
+    `delays` and `errors` are consumed one per call; calls beyond them are
+    fast and succeed.
+    """
+
+    def __init__(self, delays=(), errors=()):
+        self.delays = list(delays)
+        self.errors = list(errors)
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        delay = self.delays.pop(0) if self.delays else 0.0
+        error = self.errors.pop(0) if self.errors else None
+        return self.calls, delay, error
+
+    def invoke(self, inputs):
+        call, delay, error = self._next()
+        time.sleep(delay)
+        if error:
+            raise error
+        return {"context": [], "answer": f"LLM answer #{call} to: {inputs['input']}"}
+
+    async def ainvoke(self, inputs):
+        call, delay, error = self._next()
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return {"context": [], "answer": f"LLM answer #{call} to: {inputs['input']}"}
+
+    async def astream(self, inputs):
+        call, delay, error = self._next()
+        yield {"context": []}
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        yield {"answer": f"LLM answer #{call} to: {inputs['input']}"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_rejects_and_recovers_through_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=10, clock=clock)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure("timeout")
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now = 10
+    assert breaker.state == "half_open"
+    assert breaker.allow()          # the trial call
+    assert not breaker.allow()      # only one at a time
+    breaker.record_failure("RuntimeError")
+    assert breaker.state == "open" and breaker.times_opened == 2
+
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.consecutive_failures == 0
+    assert breaker.stats()["rejected"] == 2
+
+
+def test_deadline_bounds_slow_calls():
+    guard = LLMGuard(CircuitBreaker(failure_threshold=5), timeout_seconds=0.05)
+    chain = FakeLLMChain(delays=[1.0, 1.0])
+
+    async def scenario():
+        with pytest.raises(LLMTimeoutError):
+            await guard.ainvoke(chain, {"input": "hi"})
+
+    started = time.perf_counter()
+    asyncio.run(scenario())
+    with pytest.raises(LLMTimeoutError):
+        guard.invoke(chain, {"input": "hi"})
+    assert time.perf_counter() - started < 0.5
+    assert guard.timeouts == 2 and guard.breaker.consecutive_failures == 2
+
+
+def test_hedged_call_returns_the_faster_answer():
+    guard = LLMGuard(CircuitBreaker(), timeout_seconds=2, hedge_after_seconds=0.05)
+    chain = FakeLLMChain(delays=[1.0, 0.0])
+
+    started = time.perf_counter()
+    result = asyncio.run(guard.ainvoke(chain, {"input": "hi"}))
+    assert result["answer"].startswith("LLM answer #2")
+    assert time.perf_counter() - started < 0.5
+    assert guard.hedges == 1 and guard.hedge_wins == 1
+
+
+@pytest.fixture
+def client(client, install_chain, monkeypatch):
+    guard = LLMGuard(CircuitBreaker(failure_threshold=2, reset_seconds=60), timeout_seconds=0.05)
+    monkeypatch.setattr(main.llm_service, "llm_guard", guard)
+    client.chain = install_chain(FakeLLMChain())
+    return client
+
+
+def test_failing_llm_degrades_to_rule_based_replies_and_opens_breaker(client):
+    rule_reply = main.llm_service._get_fallback_response("How much does it cost?")
+    client.chain.errors = [RuntimeError("secret upstream detail")]
+    client.chain.delays = [0.0, 1.0]
+    call_id = client.post("/start-call", json={"customer_name": "Test", "phone_number": "1"}).json()["call_id"]
+
+    replies = [client.post(f"/rag-respond/{call_id}", json={"message": "How much does it cost?"}).json()["reply"]
+               for _ in range(2)]
+    assert replies == [rule_reply, rule_reply]  # an error, then a timeout; no error text leaks
+
+    status = client.get("/rag-status").json()["llm"]
+    assert status["breaker"]["state"] == "open"
+    assert status["timeouts"] == 1 and status["errors"] == 1
+
+    # While open, the LLM is not called at all
+    r = client.post(f"/respond-rag/{call_id}/stream", json={"message": "How much does it cost?"})
+    assert rule_reply in r.text
+    assert client.chain.calls == 2
+    assert client.get("/rag-status").json()["llm"]["breaker"]["rejected"] == 1
+
+
+def test_stream_timeout_falls_back_before_any_text(client):
+    client.chain.delays = [1.0]
+    call_id = client.post("/start-call", json={"customer_name": "Test", "phone_number": "1"}).json()["call_id"]
+    r = client.post(f"/respond-rag/{call_id}/stream", json={"message": "Do I get a certificate?"})
+    assert main.llm_service._get_fallback_response("Do I get a certificate?") in r.text
+    assert "LLM answer" not in r.text
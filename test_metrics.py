@@ -0,0 +1,94 @@
+"""Offline tests for /metrics, request tracing and queue-based logging"""
+import asyncio
+import logging
+import queue
+from logging.handlers import QueueHandler
+
+import pytest
+
+import main
+from log_setup import RequestIdFilter
+from metrics import STAGE_SECONDS, MetricsRegistry, record_stage, request_id_var
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("demo_requests_total", "Requests", ("route",))
+    latency = registry.histogram("demo_seconds", "Latency", ("stage",), buckets=(0.01, 0.1))
+    requests.inc('/say "hi"')
+    requests.inc('/say "hi"', amount=2)
+    for value in (0.005, 0.05, 0.05, 3.0):
+        latency.observe(value, "llm")
+    registry.gauge("demo_pending", "Pending", lambda: 4)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE demo_requests_total counter" in lines
+    assert 'demo_requests_total{route="/say \\"hi\\""} 3.0' in lines
+    assert 'demo_seconds_bucket{stage="llm",le="0.01"} 1' in lines
+    assert 'demo_seconds_bucket{stage="llm",le="0.1"} 3' in lines
+    assert 'demo_seconds_bucket{stage="llm",le="+Inf"} 4' in lines
+    assert 'demo_seconds_count{stage="llm"} 4' in lines
+    assert "demo_pending 4.0" in lines
+
+
+def test_turn_stages_are_traced_under_the_request_id(client):
+    call_id = client.post("/start-call", json={"customer_name": "Test", "phone_number": "1"}).json()["call_id"]
+    r = client.post(f"/respond/{call_id}", json={"message": "How much does it cost?"},
+                    headers={"X-Request-ID": "req-trace-1"})
+    assert r.headers["x-request-id"] == "req-trace-1"
+    generated = client.post("/start-call", json={"customer_name": "Test", "phone_number": "2"})
+    assert len(generated.headers["x-request-id"]) == 16
+    main.speech_pipeline.shutdown(wait=True)  # let the worker speak the reply
+
+    trace = client.get("/traces", params={"request_id": "req-trace-1"}).json()["traces"][0]
+    stages = [s["stage"] for s in trace["stages"]]
+    assert stages[:3] == ["intent_match", "reply", "history_append"]
+    # Recorded on the TTS worker thread, attributed to the request that queued the reply
+    assert "tts_queue_wait" in stages
+    assert trace["duration_ms"] > 0
+
+
+def test_metrics_endpoint_exposes_stages_routes_and_turns(client):
+    call_id = client.post("/start-call", json={"customer_name": "Test", "phone_number": "1"}).json()["call_id"]
+    client.post(f"/respond/{call_id}", json={"message": "Tell me about the curriculum"})
+
+    r = client.get("/metrics")
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = r.text
+    assert 'voice_agent_stage_seconds_count{stage="intent_match"}' in body
+    assert 'voice_agent_http_requests_total{method="POST",route="/respond/{call_id}",status="200"}' in body
+    assert 'voice_agent_turns_total{responder="RuleResponder",outcome="answered"}' in body
+    assert "voice_agent_llm_breaker_state 0.0" in body
+
+
+def test_log_records_carry_the_request_id():
+    records = queue.SimpleQueue()
+    handler = QueueHandler(records)
+    handler.addFilter(RequestIdFilter())
+    logger = logging.getLogger("test_metrics.request_id")
+    logger.addHandler(handler)
+    logger.propagate = False
+
+    token = request_id_var.set("req-42")
+    logger.warning("inside a request")
+    request_id_var.reset(token)
+    logger.warning("outside")
+    assert [records.get().request_id, records.get().request_id] == ["req-42", "-"]
+
+
+def test_llm_calls_are_recorded_as_a_stage():
+    fake = pytest.importorskip("langchain_community.chat_models.fake")
+    from llm_service import llm_stage_timer
+
+    llm = fake.FakeListChatModel(responses=["The bootcamp costs $299."], callbacks=[llm_stage_timer()])
+    before = STAGE_SECONDS.count("llm")
+    llm.invoke("How much is it?")
+    asyncio.run(llm.ainvoke("How much is it?"))
+    assert STAGE_SECONDS.count("llm") == before + 2
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr("metrics._enabled", False)
+    before = STAGE_SECONDS.count("disabled_stage")
+    record_stage("disabled_stage", 0.1)
+    assert STAGE_SECONDS.count("disabled_stage") == before
@@ -0,0 +1,102 @@
+"""Offline tests for micro-batched query embedding and retrieval (fake embeddings)"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+from langchain.prompts import ChatPromptTemplate
+from langchain.schema import Document
+from langchain_community.chat_models.fake import FakeListChatModel
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from llm_service import LLMService
+from query_batcher import QueryBatcher
+from response_cache import ResponseCache
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Fake embeddings that record the size of every embed_documents() call"""
+
+    calls: list = []
+
+    def embed_documents(self, texts):
+        self.calls.append(len(texts))
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def store():
+    texts = [f"Program {i} costs ${100 + i} and runs for {i + 4} weeks." for i in range(20)]
+    return FAISS.from_documents([Document(page_content=t) for t in texts], DeterministicFakeEmbedding(size=16))
+
+
+@pytest.fixture
+def batcher(store):
+    embeddings = CountingEmbeddings(size=16, calls=[])
+    batcher = QueryBatcher(embeddings.embed_documents, window_ms=20, max_batch=16)
+    batcher.vector_store = store
+    batcher.calls = embeddings.calls
+    yield batcher
+    batcher.close()
+
+
+def test_concurrent_queries_share_one_batch_and_match_unbatched_search(store, batcher):
+    queries = [f"Program {i} costs ${100 + i} and runs for {i + 4} weeks." for i in range(12)]
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.asearch(q, k=3) for q in queries))
+
+    results = asyncio.run(scenario())
+    for query, docs in zip(queries, results):
+        assert [d.page_content for d in docs] == [d.page_content for d in store.similarity_search(query, k=3)]
+    assert batcher.calls == [12]
+    assert batcher.stats()["batches"] == 1
+
+
+def test_max_batch_splits_large_bursts(batcher):
+    batcher.max_batch = 5
+
+    async def scenario():
+        await asyncio.gather(*(batcher.asearch(f"question {i}", k=1) for i in range(12)))
+
+    asyncio.run(scenario())
+    assert batcher.calls == [5, 5, 2]
+    assert batcher.stats()["largest_batch"] == 5
+
+
+def test_embedding_is_reused_by_the_search_for_the_same_query(batcher):
+    vector = batcher.embed("How much is the AI bootcamp?")
+    docs = batcher.search("How much is the AI bootcamp?", k=2)
+    assert len(vector) == 16 and len(docs) == 2
+    assert batcher.calls == [1]
+
+
+def test_errors_reach_every_waiting_caller(batcher):
+    batcher.vector_store = None
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.asearch(f"q{i}") for i in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(scenario()))
+    # Embedding-only requests do not need an index
+    assert len(batcher.embed("still works")) == 16
+
+
+def test_cache_miss_and_retrieval_embed_the_question_once(store, batcher):
+    service = LLMService()
+    service.llm = FakeListChatModel(responses=["The bootcamp costs $299 today."])
+    service.prompt = ChatPromptTemplate.from_template(service.RAG_PROMPT_TEMPLATE)
+    service.intent_routes = None
+    service.query_batcher = batcher
+    service.response_cache = ResponseCache(embed=batcher.embed)
+    service._install_vector_store(store)
+    service.rag_enabled = True
+    service.rag_state = "ready"
+
+    assert asyncio.run(service.aget_rag_response("What's the PRICE of Program 3?"))
+    assert service.response_cache.stats()["misses"] == 1
+    assert batcher.calls == [1]
+    assert batcher.stats()["embedded"] == 1
@@ -0,0 +1,79 @@
+"""Offline tests for the async and streaming RAG paths (stubbed chain, no server needed)"""
+import json
+
+import pytest
+
+
+class StubChain:
+    """Retrieval-chain stand-in that streams a fixed answer word by word"""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = 0
+
+    async def ainvoke(self, inputs):
+        self.calls += 1
+        return {"input": inputs["input"], "answer": self.answer}
+
+    async def astream(self, inputs):
+        self.calls += 1
+        yield {"input": inputs["input"]}
+        yield {"context": []}
+        for word in self.answer.split(" "):
+            yield {"answer": word + " "}
+
+
+@pytest.fixture
+def client(client, install_chain):
+    client.chain = install_chain(StubChain("The bootcamp costs $299 today. It runs for 12 weeks."))
+    return client
+
+
+def start_call(client):
+    return client.post("/start-call", json={"customer_name": "Test", "phone_number": "1"}).json()["call_id"]
+
+
+def parse_events(body):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_async_rag_endpoint_uses_ainvoke(client):
+    call_id = start_call(client)
+    r = client.post(f"/respond-rag/{call_id}", json={"message": "How much is it?"})
+    assert r.json()["reply"] == client.chain.answer
+
+
+def test_stream_sends_tokens_then_records_history(client):
+    call_id = start_call(client)
+    r = client.post(f"/respond-rag/{call_id}/stream", json={"message": "How much is it?"})
+    assert r.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_events(r.text)
+    tokens = [data["text"] for event, data in events if event == "token"]
+    assert len(tokens) > 1
+    assert events[-1][0] == "done"
+    assert events[-1][1]["reply"] == "".join(tokens) == client.chain.answer
+
+    history = client.get(f"/conversation/{call_id}").json()["history"]
+    assert [h["text"] for h in history[-2:]] == ["How much is it?", client.chain.answer]
+
+
+def test_stream_ends_call_on_goodbye(client):
+    call_id = start_call(client)
+    r = client.post(f"/respond-rag/{call_id}/stream", json={"message": "Not interested, goodbye"})
+    assert parse_events(r.text)[-1][1]["should_end_call"] is True
+    assert client.get(f"/conversation/{call_id}").json()["is_active"] is False
+
+
+def test_stream_retry_replays_without_calling_the_llm(client):
+    call_id = start_call(client)
+    headers = {"Idempotency-Key": "turn-1"}
+    first = parse_events(client.post(f"/respond-rag/{call_id}/stream", json={"message": "Price?"}, headers=headers).text)
+    retry = parse_events(client.post(f"/respond-rag/{call_id}/stream", json={"message": "Price?"}, headers=headers).text)
+    assert retry[-1][1]["reply"] == first[-1][1]["reply"]
+    assert retry[-1][1]["replayed"] is True
+    assert client.chain.calls == 1
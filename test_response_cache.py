@@ -0,0 +1,101 @@
+"""Offline tests for the RAG response cache (stubbed chain, no LLM or model download)"""
+import time
+
+import pytest
+
+from llm_service import LLMService
+from response_cache import ResponseCache, normalize_query
+
+pytest.importorskip("numpy")
+
+VOCABULARY = ["price", "cost", "much", "how", "weeks", "long", "certificate", "job"]
+SYNONYMS = {"costs": "cost", "pricing": "price"}
+
+
+def fake_embed(text):
+    """Bag-of-words over a tiny vocabulary, so rephrasings land close together"""
+    words = [SYNONYMS.get(w, w) for w in text.split()]
+    return [float(words.count(v)) for v in VOCABULARY]
+
+
+class CountingChain:
+    """Stand-in for the retrieval chain that counts LLM invocations"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, inputs):
+        self.calls += 1
+        return {"answer": f"Answer #{self.calls} to: {inputs['input']}"}
+
+
+@pytest.fixture
+def service():
+    service = LLMService()
+    service.rag_enabled = True
+    service.rag_state = "ready"
+    service.retrieval_chain = CountingChain()
+    service.response_cache = ResponseCache(embed=fake_embed, threshold=0.9)
+    return service
+
+
+def test_normalize_query():
+    assert normalize_query("  What's the PRICE?! ") == "what's the price"
+
+
+def test_exact_repeat_skips_the_llm(service):
+    first = service.get_rag_response("How much is it?")
+    assert service.get_rag_response("how much is it") == first
+    assert service.generate_rag_response("HOW MUCH IS IT!!") == first
+    assert service.retrieval_chain.calls == 1
+    stats = service.response_cache.stats()
+    assert stats["exact_hits"] == 2 and stats["misses"] == 1
+
+
+def test_near_duplicate_uses_semantic_match(service):
+    first = service.get_rag_response("how much does it cost")
+    assert service.get_rag_response("how much does the course costs") == first
+    assert service.get_rag_response("how long is it in weeks") != first
+    assert service.retrieval_chain.calls == 2
+    assert service.response_cache.stats()["semantic_hits"] == 1
+
+
+def test_entries_expire_and_evict():
+    calls = []
+    cache = ResponseCache(ttl_seconds=0.05, max_entries=2)
+    compute = lambda q: calls.append(q) or f"answer to {q}"
+
+    cache.get_or_compute("price", compute)
+    time.sleep(0.1)
+    cache.get_or_compute("price", compute)
+    assert len(calls) == 2 and cache.stats()["expirations"] == 1
+
+    cache.get_or_compute("weeks", compute)
+    cache.get_or_compute("job", compute)
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 2
+
+
+def test_knowledge_base_change_invalidates(service):
+    service.get_rag_response("how much is it")
+    service.response_cache.invalidate("new-version")
+    service.get_rag_response("how much is it")
+    assert service.retrieval_chain.calls == 2
+    assert service.response_cache.stats()["invalidations"] == 1
+
+
+def test_answer_computed_across_an_invalidation_is_not_cached():
+    cache = ResponseCache()
+
+    def compute(query):
+        cache.invalidate("v2")  # the index was swapped while the LLM was answering
+        return "stale answer"
+
+    assert cache.get_or_compute("price", compute) == "stale answer"
+    assert cache.stats()["entries"] == 0
+
+
+def test_failed_answers_are_not_cached(service):
+    service.retrieval_chain.invoke = lambda inputs: {"answer": ""}
+    service.get_rag_response("how much is it")
+    assert service.response_cache.stats()["entries"] == 0
@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 """Test the simulate voice endpoint"""
 
-import requests
 import json
+import os
+
+import requests
+
+BASE_URL = os.getenv("AGENT_URL", "http://localhost:8000")
 
 def test_simulate_endpoint():
     print("Testing simulate voice endpoint...")
@@ -14,7 +18,7 @@ def test_simulate_endpoint():
     }
     
     print("1. Starting a call...")
-    start_response = requests.post("http://localhost:8001/start-call", json=start_data)
+    start_response = requests.post(f"{BASE_URL}/start-call", json=start_data)
     
     if start_response.status_code == 200:
         call_data = start_response.json()
@@ -25,7 +29,7 @@ def test_simulate_endpoint():
         print("\n2. Testing simulate voice endpoint...")
         print("   This will try to capture your voice...")
         
-        simulate_response = requests.get(f"http://localhost:8001/simulate-call/{call_id}")
+        simulate_response = requests.get(f"{BASE_URL}/simulate-call/{call_id}")
         
         if simulate_response.status_code == 200:
             result = simulate_response.json()
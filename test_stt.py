@@ -0,0 +1,138 @@
+"""Offline tests for the pluggable speech-to-text engines and cached noise calibration"""
+import os
+
+import pytest
+import speech_recognition as sr
+
+from stt_engines import AmbientCalibration, GoogleSTT, STTEngine, VoskSTT, create_stt_engine
+from voice_service import VoiceService
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "benchmarks", "fixtures", "stt", "utterance_3s.wav")
+
+
+class RecordingEngine(STTEngine):
+    name = "recording"
+
+    def __init__(self, text="how much does it cost"):
+        self.text = text
+        self.heard = []
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        self.heard.append(len(audio.frame_data) / (audio.sample_rate * audio.sample_width))
+        if not self.text:
+            raise sr.UnknownValueError()
+        return self.text
+
+
+class CountingRecognizer(sr.Recognizer):
+    def __init__(self):
+        super().__init__()
+        self.adjustments = 0
+
+    def adjust_for_ambient_noise(self, source, duration=1):
+        self.adjustments += 1
+
+
+def test_calibration_is_reused_until_it_expires():
+    now = [0.0]
+    recognizer = CountingRecognizer()
+    calibration = AmbientCalibration(recognizer, refresh_seconds=300, clock=lambda: now[0])
+
+    assert calibration.calibrate(source=None)
+    now[0] = 299
+    assert not calibration.calibrate(source=None)
+    now[0] = 300
+    assert calibration.calibrate(source=None)
+    assert calibration.calibrate(source=None, force=True)
+    calibration.invalidate()
+    assert calibration.calibrate(source=None)
+    assert recognizer.adjustments == 4
+
+
+def test_zero_refresh_calibrates_before_every_listen():
+    recognizer = CountingRecognizer()
+    calibration = AmbientCalibration(recognizer, refresh_seconds=0)
+    for _ in range(3):
+        calibration.calibrate(source=None)
+    assert recognizer.adjustments == 3
+
+
+def test_engine_selection(monkeypatch):
+    monkeypatch.delenv("STT_ENGINE", raising=False)
+    assert isinstance(create_stt_engine(), GoogleSTT)
+
+    # A local engine that cannot load (package or model missing) stops startup...
+    monkeypatch.setenv("STT_ENGINE", "vosk")
+    monkeypatch.setenv("VOSK_MODEL_PATH", "/nonexistent/vosk-model")
+    with pytest.raises(RuntimeError, match="STT_FALLBACK_TO_GOOGLE"):
+        create_stt_engine()
+    # ...unless falling back to Google was asked for
+    monkeypatch.setenv("STT_FALLBACK_TO_GOOGLE", "on")
+    assert isinstance(create_stt_engine(), GoogleSTT)
+
+    monkeypatch.setenv("STT_ENGINE", "telepathy")
+    with pytest.raises(ValueError):
+        create_stt_engine()
+
+
+class FakeVosk:
+    """Stands in for the vosk module: recognizers return `result` or raise `error`"""
+
+    def __init__(self, result='{"text": ""}', error=None):
+        self.result, self.error = result, error
+
+    def KaldiRecognizer(self, model, rate):
+        if self.error:
+            raise self.error
+        recognizer = type("Recognizer", (), {})()
+        recognizer.AcceptWaveform = lambda pcm: True
+        recognizer.FinalResult = lambda: self.result
+        return recognizer
+
+
+def test_other_load_failures_are_not_masked_by_the_fallback(monkeypatch):
+    def broken_model(self, model_path):
+        raise RuntimeError("corrupt model")
+
+    monkeypatch.setattr(VoskSTT, "__init__", broken_model)
+    monkeypatch.setenv("STT_ENGINE", "vosk")
+    monkeypatch.setenv("STT_FALLBACK_TO_GOOGLE", "on")
+    with pytest.raises(RuntimeError, match="corrupt model"):
+        create_stt_engine()
+
+
+def test_vosk_backend_failures_are_request_errors():
+    with sr.AudioFile(FIXTURE) as source:
+        audio = sr.Recognizer().record(source)
+    engine = VoskSTT.__new__(VoskSTT)
+    engine.model = object()
+
+    engine._vosk = FakeVosk('{"text": "how much does it cost"}')
+    assert engine.transcribe(audio) == "how much does it cost"
+    engine._vosk = FakeVosk('{"text": ""}')
+    with pytest.raises(sr.UnknownValueError):
+        engine.transcribe(audio)
+    for vosk in (FakeVosk(error=RuntimeError("Failed to create a recognizer")), FakeVosk("not json")):
+        engine._vosk = vosk
+        with pytest.raises(sr.RequestError):
+            engine.transcribe(audio)
+
+
+def test_speech_to_text_uses_the_engine_and_calibrates_once():
+    engine = RecordingEngine()
+    voice = VoiceService(stt_engine=engine)
+    voice.recognizer = CountingRecognizer()
+    # Replaying the same clip, the threshold learned from the first phrase would swallow the second
+    voice.recognizer.dynamic_energy_threshold = False
+    voice.calibration.recognizer = voice.recognizer
+    voice.speech_enabled = True
+
+    for _ in range(2):
+        voice.microphone = sr.AudioFile(FIXTURE)  # stands in for the microphone
+        assert voice.speech_to_text(timeout=1) == "how much does it cost"
+    assert voice.recognizer.adjustments == 1
+    assert len(engine.heard) == 2 and engine.heard[0] > 0.5
+
+    engine.text = ""
+    voice.microphone = sr.AudioFile(FIXTURE)
+    assert voice.speech_to_text(timeout=1) == "Could not understand"
@@ -0,0 +1,65 @@
+"""Offline tests for the content-addressed TTS audio cache"""
+import os
+
+from tts_cache import AudioCache
+
+
+def clip(n: int, size: int = 100) -> bytes:
+    return bytes([n % 256]) * size
+
+
+def test_miss_then_memory_hit_then_disk_hit(tmp_path):
+    cache = AudioCache(str(tmp_path), max_memory_bytes=1000)
+    assert cache.get("Hello there") is None
+    path = cache.put("Hello there", clip(1))
+    assert os.path.basename(path) == AudioCache.make_key("Hello there") + ".mp3"
+
+    assert cache.get("Hello there") == clip(1)  # from memory
+    assert cache.get("Hello there", voice="co.uk") is None  # another voice is another clip
+
+    restarted = AudioCache(str(tmp_path), max_memory_bytes=1000)
+    assert restarted.get("Hello there") == clip(1)  # from disk, then kept in memory
+    assert restarted.get("Hello there") == clip(1)
+    assert cache.stats()["memory_hits"] == 1 and cache.stats()["misses"] == 2
+    assert restarted.stats()["disk_hits"] == 1 and restarted.stats()["memory_hits"] == 1
+
+
+def test_memory_hits_do_not_touch_disk(tmp_path, monkeypatch):
+    cache = AudioCache(str(tmp_path))
+    cache.put("Hi", clip(1))
+    touched = []
+    monkeypatch.setattr(os, "utime", lambda path, *args, **kwargs: touched.append(path))
+    for _ in range(5):
+        assert cache.get("Hi") == clip(1)
+    assert touched == []
+
+    cache._memory.clear()
+    cache._memory_bytes = 0
+    assert cache.get("Hi") == clip(1)
+    assert touched == [cache.path_for(AudioCache.make_key("Hi"))]
+
+
+def test_disk_size_bound_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(str(tmp_path), max_disk_bytes=300, max_memory_bytes=1000)
+    for n in range(3):
+        cache.put(f"line {n}", clip(n))
+    assert cache.get("line 0") == clip(0)  # a memory hit still counts as a use
+    cache.put("line 3", clip(3))
+
+    assert not cache.contains("line 1")
+    assert not os.path.exists(cache.path_for(AudioCache.make_key("line 1")))
+    assert all(cache.contains(f"line {n}") for n in (0, 2, 3))
+    assert cache.stats()["evictions"] == 1 and cache.stats()["disk_bytes"] == 300
+
+
+def test_restart_restores_size_and_recency(tmp_path):
+    cache = AudioCache(str(tmp_path), max_disk_bytes=300)
+    for n in range(3):
+        path = cache.put(f"line {n}", clip(n))
+        os.utime(path, (1000 + n, 1000 + n))
+    open(os.path.join(str(tmp_path), "interrupted.part"), "wb").close()
+
+    restarted = AudioCache(str(tmp_path), max_disk_bytes=200)
+    assert restarted.stats()["entries"] == 2 and restarted.stats()["disk_bytes"] == 200
+    assert not restarted.contains("line 0")
+    assert not os.path.exists(os.path.join(str(tmp_path), "interrupted.part"))
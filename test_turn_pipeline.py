@@ -0,0 +1,174 @@
+"""Offline tests for the shared turn pipeline: idempotent retries, per-call ordering and streamed speech"""
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from call_store import MemoryCallStore
+from intent_matcher import IntentMatcher
+from llm_service import INTENTS_FILE
+from models import Call
+from speech_pipeline import SpeechPipeline
+from speech_streaming import sentences_from_tokens
+from turn_pipeline import CallEndedError, CallNotFoundError, Responder, TurnPipeline
+
+
+class SlowResponder(Responder):
+    """Counts invocations and tracks how many run at once"""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+
+    async def reply(self, message, match, context):
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.delay)
+        self.running -= 1
+        return f"reply #{self.calls} to {message}"
+
+
+@pytest.fixture
+def pipeline():
+    store = MemoryCallStore()
+    store.create(Call(call_id="call-1", customer_name="Test", phone_number="1", start_time=datetime.now()))
+    spoken = []
+    pipeline = TurnPipeline(
+        store,
+        classify=IntentMatcher.from_file(INTENTS_FILE).match,
+        speak=lambda call_id, text: spoken.append(text) or {"state": "queued"},
+        speech_status=lambda call_id: {"state": "done"}
+    )
+    pipeline.spoken = spoken
+    return pipeline
+
+
+def test_retry_with_same_key_returns_stored_reply(pipeline):
+    responder = SlowResponder()
+
+    async def scenario():
+        first = await pipeline.run("call-1", "How much is it?", responder, "key-1")
+        retry = await pipeline.run("call-1", "How much is it?", responder, "key-1")
+        return first, retry
+
+    first, retry = asyncio.run(scenario())
+    assert retry["reply"] == first["reply"]
+    assert retry["replayed"] is True
+    assert responder.calls == 1
+    assert pipeline.spoken == [first["reply"]]
+    assert pipeline.call_store.history_length("call-1") == 2
+
+
+def test_simultaneous_retries_run_the_turn_once(pipeline):
+    responder = SlowResponder()
+
+    async def scenario():
+        return await asyncio.gather(*(pipeline.run("call-1", "Tell me more", responder, "key-1") for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len({r["reply"] for r in results}) == 1
+    assert responder.calls == 1
+    assert pipeline.call_store.history_length("call-1") == 2
+
+
+def test_turns_on_one_call_are_serialized(pipeline):
+    responder = SlowResponder()
+
+    async def scenario():
+        await asyncio.gather(*(pipeline.run("call-1", f"question {i}", responder) for i in range(5)))
+
+    asyncio.run(scenario())
+    assert responder.max_running == 1
+    texts = [h.text for h in pipeline.call_store.get_history("call-1")]
+    # Each customer message is directly followed by its own reply
+    for customer, agent in zip(texts[::2], texts[1::2]):
+        assert agent.endswith(f"to {customer}")
+
+
+def test_retry_of_the_goodbye_turn_after_call_ended(pipeline):
+    responder = SlowResponder()
+
+    async def scenario():
+        first = await pipeline.run("call-1", "Not interested, goodbye", responder, "bye")
+        retry = await pipeline.run("call-1", "Not interested, goodbye", responder, "bye")
+        with pytest.raises(CallEndedError):
+            await pipeline.run("call-1", "Wait, one more thing", responder, "other")
+        with pytest.raises(CallNotFoundError):
+            await pipeline.run("missing", "Hello", responder)
+        return first, retry
+
+    first, retry = asyncio.run(scenario())
+    assert first["should_end_call"] and retry["should_end_call"]
+    assert retry["reply"] == first["reply"]
+    assert len(pipeline._locks) == 0
+
+
+class TwoSentenceResponder(Responder):
+    """Streams two sentences with an LLM-like pause between them, optionally failing after the first"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.finished = False
+
+    async def reply(self, message, match, context):
+        raise AssertionError("streamed turns use stream()")
+
+    async def stream(self, message, match, context):
+        for token in ("The bootcamp ", "costs $299 ", "today. "):
+            yield token
+        await asyncio.sleep(0.3)
+        if self.fail:
+            yield "It runs "
+            raise RuntimeError("LLM connection lost")
+        for token in ("It runs for ", "twelve weeks."):
+            yield token
+        self.finished = True
+
+
+class SentenceVoice:
+    """Records each sentence it would speak, and whether the reply had finished by then"""
+
+    def __init__(self, responder):
+        self.responder = responder
+        self.heard = []
+
+    def speak_token_stream(self, tokens):
+        for sentence in sentences_from_tokens(tokens):
+            self.heard.append((sentence, self.responder.finished))
+        return True
+
+    def fallback_tts(self, text):
+        return True
+
+
+@pytest.mark.parametrize("fail", [False, True])
+def test_streamed_reply_is_spoken_while_it_is_generated(pipeline, fail):
+    responder = TwoSentenceResponder(fail)
+    voice = SentenceVoice(responder)
+    speech = SpeechPipeline(voice, max_workers=1)
+    pipeline.speak_stream = speech.submit_stream
+    pipeline.speech_status = speech.get_status
+
+    async def scenario():
+        return [event async for event in pipeline.stream("call-1", "How much is it?", responder)]
+
+    if fail:
+        with pytest.raises(RuntimeError):
+            asyncio.run(scenario())
+    else:
+        events = asyncio.run(scenario())
+        assert events[-1][1]["reply"] == "The bootcamp costs $299 today. It runs for twelve weeks."
+    speech.shutdown(wait=True)
+
+    # The first sentence reached speech before the LLM had written the second
+    assert voice.heard[0] == ("The bootcamp costs $299 today.", False)
+    assert pipeline.spoken == []  # not queued a second time as a whole reply
+    if fail:
+        assert voice.heard == [("The bootcamp costs $299 today.", False)]  # not the half sentence after it
+        assert speech.get_status("call-1")["state"] == "cancelled"
+    else:
+        assert voice.heard[1] == ("It runs for twelve weeks.", True)
+        assert speech.get_status("call-1")["state"] == "done"
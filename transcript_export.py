@@ -0,0 +1,161 @@
+"""Bulk export of every call's transcript to NDJSON or Parquet.
+
+One row per history entry, with the call's metadata repeated on each row so
+the file can be loaded straight into a DataFrame. Calls are read one at a
+time and their history page by page, and rows are written in chunks, so
+memory stays flat however many calls there are.
+
+Usage:
+    python -m transcript_export --out calls.parquet                    # from the CALL_STORE backend
+    python -m transcript_export --input export.ndjson --out calls.parquet  # convert a /admin/export download
+"""
+import argparse
+import json
+import sys
+from itertools import islice
+from typing import IO, Iterable, Iterator, List, Optional
+
+from call_store import CallStore, create_call_store
+from history_log import epoch_ms
+
+FORMATS = ("ndjson", "parquet")
+
+# Column order of an exported row
+COLUMNS = ("call_id", "customer_name", "phone_number", "call_active", "call_start", "call_end",
+           "seq", "sender", "text", "timestamp", "responder", "intent", "latency_ms")
+
+
+def iter_rows(store: CallStore, page_size: int = 500) -> Iterator[dict]:
+    """Every history entry of every call in the store, call by call and oldest first"""
+    for call_id in store.call_ids():
+        call = store.get(call_id)
+        if call is None:  # ended and evicted since its ID was listed
+            continue
+        head = {
+            "call_id": call_id,
+            "customer_name": call.customer_name,
+            "phone_number": call.phone_number,
+            "call_active": call.is_active,
+            "call_start": epoch_ms(call.start_time),
+            "call_end": epoch_ms(call.end_time) if call.end_time else None,
+        }
+        offset = 0
+        while True:
+            page = store.history_records(call_id, offset=offset, limit=page_size)
+            for seq, (sender, text, timestamp, responder, intent, latency_ms) in enumerate(page, offset):
+                yield {
+                    **head,
+                    "seq": seq,
+                    "sender": sender,
+                    "text": text,
+                    "timestamp": timestamp,
+                    "responder": responder,
+                    "intent": intent,
+                    "latency_ms": latency_ms,
+                }
+            if len(page) < page_size:
+                break
+            offset += page_size
+
+
+def chunks(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ndjson_chunks(rows: Iterable[dict], chunk_rows: int = 5000) -> Iterator[bytes]:
+    """Rows encoded as NDJSON, chunk_rows lines per chunk (the body of GET /admin/export)"""
+    for chunk in chunks(rows, chunk_rows):
+        yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in chunk).encode("utf-8")
+
+
+def read_ndjson(f: IO[bytes]) -> Iterator[dict]:
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("call_id", pa.string()),
+        ("customer_name", pa.string()),
+        ("phone_number", pa.string()),
+        ("call_active", pa.bool_()),
+        ("call_start", pa.timestamp("ms")),
+        ("call_end", pa.timestamp("ms")),
+        ("seq", pa.int32()),
+        ("sender", pa.dictionary(pa.int8(), pa.string())),
+        ("text", pa.string()),
+        ("timestamp", pa.timestamp("ms")),
+        ("responder", pa.dictionary(pa.int16(), pa.string())),
+        ("intent", pa.dictionary(pa.int16(), pa.string())),
+        ("latency_ms", pa.float32()),
+    ])
+
+
+def write_parquet(rows: Iterable[dict], path: str, chunk_rows: int = 50000) -> int:
+    """Write rows to a Parquet file, one row group per chunk; returns the number of rows"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)") from None
+
+    schema = parquet_schema()
+    written = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for chunk in chunks(rows, chunk_rows):
+            columns = {name: [row[name] for row in chunk] for name in COLUMNS}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            written += len(chunk)
+    return written
+
+
+def write_ndjson(rows: Iterable[dict], path: str, chunk_rows: int = 5000) -> int:
+    """Write rows to an NDJSON file; returns the number of rows"""
+    written = 0
+    with open(path, "wb") as f:
+        for data in ndjson_chunks(rows, chunk_rows):
+            f.write(data)
+            written += data.count(b"\n")  # JSON escapes newlines inside strings
+    return written
+
+
+def export(rows: Iterable[dict], path: str, fmt: Optional[str] = None, chunk_rows: Optional[int] = None) -> int:
+    """Write rows to path as NDJSON or Parquet (picked from the extension unless fmt is given)"""
+    fmt = fmt or ("parquet" if path.endswith(".parquet") else "ndjson")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "parquet":
+        return write_parquet(rows, path, chunk_rows or 50000)
+    return write_ndjson(rows, path, chunk_rows or 5000)
+
+
+def main_cli(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="output file (.parquet or .ndjson)")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the --out extension")
+    parser.add_argument("--input", help="an NDJSON export to convert, instead of reading the call store")
+    parser.add_argument("--chunk-rows", type=int)
+    args = parser.parse_args(argv)
+
+    if args.input:
+        with open(args.input, "rb") as f:
+            count = export(read_ndjson(f), args.out, args.format, args.chunk_rows)
+    else:
+        store = create_call_store()
+        try:
+            count = export(iter_rows(store), args.out, args.format, args.chunk_rows)
+        finally:
+            store.close()
+    print(f"wrote {count} rows to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main_cli()
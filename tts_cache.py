@@ -0,0 +1,191 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class AudioCache:
+    """Content-addressed cache of synthesized speech.
+
+    Clips are stored on disk as <sha256(lang, voice, text)>.mp3 and bounded by
+    total size, evicting the least recently used clip first. The hottest clips
+    are also kept in a small in-memory LRU so repeated replies never touch disk.
+    A clip's mtime, which restores the LRU order after a restart, is refreshed
+    on disk hits and writes only; memory hits just reorder the in-process LRU.
+    """
+
+    def __init__(self, cache_dir: str = "tts_cache", max_disk_bytes: int = 200 * 1024 * 1024,
+                 max_memory_bytes: int = 16 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self._lock = threading.Lock()
+        self._disk: "OrderedDict[str, int]" = OrderedDict()  # key -> size, oldest first
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._disk_bytes = 0
+        self._memory_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(text: str, lang: str = "en", voice: str = "com") -> str:
+        """Hash the inputs that determine the rendered audio"""
+        return hashlib.sha256(f"{lang}\0{voice}\0{text}".encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    def get(self, text: str, lang: str = "en", voice: str = "com") -> Optional[bytes]:
+        """Return cached audio bytes, or None on a miss"""
+        key = self.make_key(text, lang, voice)
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                self.memory_hits += 1
+                return data
+            on_disk = key in self._disk
+
+        if on_disk:
+            try:
+                with open(self.path_for(key), "rb") as f:
+                    data = f.read()
+            except OSError:
+                data = None
+            with self._lock:
+                if data is None:
+                    self._forget(key)
+                else:
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    self._remember(key, data)
+                    self.disk_hits += 1
+            if data is not None:
+                try:
+                    os.utime(self.path_for(key))  # outside the lock: memory hits never wait on it
+                except OSError:
+                    pass
+                return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text: str, data: bytes, lang: str = "en", voice: str = "com") -> str:
+        """Store rendered audio and return its path on disk"""
+        key = self.make_key(text, lang, voice)
+        path = self.path_for(key)
+
+        # Write to a temp file first so readers never see a partial clip
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if key in self._disk:
+                self._disk_bytes -= self._disk[key]
+            self._disk[key] = len(data)
+            self._disk.move_to_end(key)
+            self._disk_bytes += len(data)
+            self._remember(key, data)
+            self._evict_disk()
+        return path
+
+    def contains(self, text: str, lang: str = "en", voice: str = "com") -> bool:
+        key = self.make_key(text, lang, voice)
+        with self._lock:
+            return key in self._disk
+
+    def stats(self) -> dict:
+        """Get hit, miss and eviction counters"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+            }
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".part"):
+                # Left behind by an interrupted write
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+                continue
+            if not name.endswith(".mp3"):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name[:-4], st.st_size))
+
+        # Least recently used first, so eviction order survives restarts
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        with self._lock:
+            self._evict_disk()
+
+    def _remember(self, key: str, data: bytes):
+        if len(data) > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old)
+
+    def _forget(self, key: str):
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+        data = self._memory.pop(key, None)
+        if data is not None:
+            self._memory_bytes -= len(data)
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key = next(iter(self._disk))
+            self._forget(key)
+            self.evictions += 1
+            try:
+                os.unlink(self.path_for(key))
+            except OSError:
+                pass
+
+
+def create_audio_cache() -> Optional[AudioCache]:
+    """Build the audio cache from environment settings (TTS_CACHE=off disables it)"""
+    if os.getenv("TTS_CACHE", "on").lower() in ("0", "off", "false", "no"):
+        return None
+    return AudioCache(
+        cache_dir=os.getenv("TTS_CACHE_DIR", "tts_cache"),
+        max_disk_bytes=int(float(os.getenv("TTS_CACHE_MAX_MB", "200")) * 1024 * 1024),
+        max_memory_bytes=int(float(os.getenv("TTS_CACHE_MEMORY_MB", "16")) * 1024 * 1024),
+    )
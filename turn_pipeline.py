@@ -0,0 +1,281 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+
+from call_store import CallStore
+from conversation_context import ConversationContext, ConversationMemory
+from intent_matcher import IntentMatch
+from metrics import REGISTRY, stage
+from models import CallHistory
+from speech_streaming import TokenStream
+
+TURNS = REGISTRY.counter("voice_agent_turns_total", "Customer turns by responder and outcome", ("responder", "outcome"))
+
+
+class CallNotFoundError(LookupError):
+    pass
+
+
+class CallEndedError(Exception):
+    pass
+
+
+class Responder(ABC):
+    """Produces the agent's reply to one customer message"""
+
+    # Whether the reply depends on earlier turns (the pipeline only builds context for these)
+    uses_context = False
+
+    @abstractmethod
+    async def reply(self, message: str, match: IntentMatch, context: Optional[ConversationContext]) -> str:
+        """The complete reply"""
+
+    async def stream(self, message: str, match: IntentMatch,
+                     context: Optional[ConversationContext]) -> AsyncIterator[str]:
+        """The reply as text deltas; responders without streaming send it whole"""
+        yield await self.reply(message, match, context)
+
+
+class RuleResponder(Responder):
+    """Canned reply for the matched intent (POST /respond)"""
+
+    def __init__(self, llm_service):
+        self.llm_service = llm_service
+
+    async def reply(self, message: str, match: IntentMatch, context: Optional[ConversationContext]) -> str:
+        return self.llm_service.get_intent_response(match)
+
+
+class RagResponder(Responder):
+    """Retrieval-augmented reply (POST /respond-rag)"""
+
+    uses_context = True
+
+    def __init__(self, llm_service):
+        self.llm_service = llm_service
+
+    async def reply(self, message: str, match: IntentMatch, context: Optional[ConversationContext]) -> str:
+        return await self.llm_service.aget_rag_response(message, context)
+
+    async def stream(self, message: str, match: IntentMatch,
+                     context: Optional[ConversationContext]) -> AsyncIterator[str]:
+        async for delta in self.llm_service.astream_rag_response(message, context):
+            yield delta
+
+
+class ConciseRagResponder(Responder):
+    """RAG-only reply trimmed to a few sentences (POST /rag-respond)"""
+
+    uses_context = True
+
+    def __init__(self, llm_service):
+        self.llm_service = llm_service
+
+    async def reply(self, message: str, match: IntentMatch, context: Optional[ConversationContext]) -> str:
+        return await self.llm_service.agenerate_rag_response(message, context)
+
+
+class _CallLocks:
+    """One asyncio.Lock per call, dropped again once nobody holds or waits for it"""
+
+    def __init__(self):
+        self._locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+    async def acquire(self, call_id: str) -> asyncio.Lock:
+        lock, users = self._locks.get(call_id, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[call_id] = (lock, users + 1)
+        try:
+            await lock.acquire()
+        except BaseException:
+            self._release_user(call_id)
+            raise
+        return lock
+
+    def release(self, call_id: str, lock: asyncio.Lock):
+        lock.release()
+        self._release_user(call_id)
+
+    def _release_user(self, call_id: str):
+        lock, users = self._locks[call_id]
+        if users <= 1:
+            del self._locks[call_id]
+        else:
+            self._locks[call_id] = (lock, users - 1)
+
+    def __len__(self):
+        return len(self._locks)
+
+
+class TurnPipeline:
+    """Runs one customer turn: reply, history, end-of-call and speech.
+
+    Every respond endpoint goes through here with its own Responder. Turns on
+    the same call run one at a time in arrival order. A turn sent with an
+    idempotency key is recorded together with its result, so a client retry
+    with the same key gets the stored reply back without running the
+    responder or speaking it again.
+    """
+
+    def __init__(self, call_store: CallStore, classify: Callable[[str], IntentMatch],
+                 speak: Callable[[str, str], dict], speech_status: Callable[[str], Optional[dict]],
+                 memory: Optional[ConversationMemory] = None,
+                 speak_stream: Optional[Callable[[str], Optional[TokenStream]]] = None):
+        self.call_store = call_store
+        self.memory = memory
+        self.classify = classify
+        self.speak = speak
+        # Streamed replies are fed to server-side speech token by token when this is set
+        self.speak_stream = speak_stream
+        self.speech_status = speech_status
+        self._locks = _CallLocks()
+        self.replays = 0
+
+    async def run(self, call_id: str, message: str, responder: Responder,
+                  idempotency_key: Optional[str] = None) -> dict:
+        """Process a turn and return its result"""
+        result = None
+        # Run the generator to the end so the call lock is released before returning
+        async for event, data in self.stream(call_id, message, responder, idempotency_key, streaming=False):
+            if event == "done":
+                result = data
+        return result
+
+    async def stream(self, call_id: str, message: str, responder: Responder,
+                     idempotency_key: Optional[str] = None, streaming: bool = True, server_speech: bool = True):
+        """Process a turn, yielding ("token", {"text"}) events and then ("done", result).
+
+        CallNotFoundError / CallEndedError are raised before the first event.
+        With server_speech=False the reply is not queued for server-side speech
+        (the caller's client plays it, as in a WebSocket call session). A
+        streamed reply goes to speak_stream as it is generated, so its first
+        sentence is spoken before the LLM has finished the rest.
+        """
+        lock = await self._locks.acquire(call_id)
+        speech_stream = None
+        try:
+            call = self.call_store.get(call_id)
+            if call is None:
+                raise CallNotFoundError(call_id)
+
+            # A retry is answered from the stored result, even if that turn ended the call
+            if idempotency_key:
+                stored = self.call_store.get_turn(call_id, idempotency_key)
+                if stored is not None:
+                    TURNS.inc(type(responder).__name__, "replayed")
+                    yield "token", {"text": stored["reply"]}
+                    yield "done", self._replay(call_id, stored)
+                    return
+
+            if not call.is_active:
+                raise CallEndedError(call_id)
+            started = time.perf_counter()
+
+            # Record customer message
+            customer_history = CallHistory(
+                sender="customer",
+                text=message,
+                timestamp=datetime.now()
+            )
+            # One intent scan covers the rule-based reply and the end-of-call check
+            with stage("intent_match"):
+                match = self.classify(message)
+            # Summary plus recent turns, built before this turn is added to history
+            context = None
+            if self.memory and responder.uses_context:
+                with stage("conversation_context"):
+                    context = self.memory.build(call_id)
+
+            with stage("reply"):
+                if streaming:
+                    if server_speech and self.speak_stream is not None:
+                        speech_stream = self.speak_stream(call_id)
+                    parts = []
+                    async for delta in responder.stream(message, match, context):
+                        parts.append(delta)
+                        if speech_stream is not None:
+                            speech_stream.push(delta)
+                        yield "token", {"text": delta}
+                    ai_reply = "".join(parts)
+                    if speech_stream is not None:
+                        speech_stream.close()
+                else:
+                    ai_reply = await responder.reply(message, match, context)
+            if not streaming:
+                yield "token", {"text": ai_reply}
+
+            agent_history = CallHistory(
+                sender="agent",
+                text=ai_reply,
+                timestamp=datetime.now(),
+                responder=type(responder).__name__,
+                intent=match.top,
+                latency_ms=round((time.perf_counter() - started) * 1000, 3)
+            )
+            result = {"reply": ai_reply, "should_end_call": match.ends_call}
+            if context is not None:
+                # Prompt size per turn, to watch LLM cost and latency (0 when no LLM call was made)
+                result["usage"] = context.usage()
+                self.memory.record(context)
+            with stage("history_append"):
+                if idempotency_key:
+                    stored, created = self.call_store.append_turn(
+                        call_id, idempotency_key, [customer_history, agent_history], result
+                    )
+                else:
+                    self.call_store.append_history(call_id, [customer_history, agent_history])
+                    created = True
+            if not created:
+                # Another worker finished the same retry first; its reply is the one on record
+                TURNS.inc(type(responder).__name__, "replayed")
+                yield "done", self._replay(call_id, stored)
+                return
+            TURNS.inc(type(responder).__name__, "ended_call" if match.ends_call else "answered")
+
+            if match.ends_call:
+                self.call_store.end_call(call_id)
+                if self.memory is not None:
+                    self.memory.forget(call_id)
+
+            if not server_speech:
+                yield "done", {**result, "speech_status": "client"}
+                return
+            if speech_stream is not None:
+                # Already being spoken sentence by sentence
+                speech = self.speech_status(call_id) or {"state": "queued"}
+            else:
+                # Play AI response in the background
+                speech = self.speak(call_id, ai_reply)
+            yield "done", {**result, "speech_status": speech["state"]}
+        finally:
+            if speech_stream is not None and not speech_stream.closed:
+                speech_stream.abort()
+            self._locks.release(call_id, lock)
+
+    async def record_interrupted(self, call_id: str, message: str, partial_reply: str, responder: Responder):
+        """Record a turn the caller cut off (barge-in) before its reply was complete.
+
+        The customer message is kept so later turns have it as context; the
+        reply is stored as far as it got, marked with a trailing ellipsis.
+        """
+        lock = await self._locks.acquire(call_id)
+        try:
+            call = self.call_store.get(call_id)
+            if call is None or not call.is_active:
+                return
+            entries = [CallHistory(sender="customer", text=message, timestamp=datetime.now())]
+            if partial_reply.strip():
+                entries.append(CallHistory(sender="agent", text=partial_reply.strip() + " …", timestamp=datetime.now(),
+                                           responder=type(responder).__name__))
+            self.call_store.append_history(call_id, entries)
+            TURNS.inc(type(responder).__name__, "interrupted")
+        finally:
+            self._locks.release(call_id, lock)
+
+    def _replay(self, call_id: str, stored: dict) -> dict:
+        self.replays += 1
+        status = self.speech_status(call_id)
+        return {**stored, "speech_status": status["state"] if status else "done", "replayed": True}
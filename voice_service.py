@@ -1,115 +1,215 @@
+import io
+import logging
 import os
-import tempfile
+import threading
+from typing import Iterable, List, Optional
 from gtts import gTTS
 import pygame
 import speech_recognition as sr
+from metrics import REGISTRY, stage
+from stt_engines import AmbientCalibration, STTEngine, create_stt_engine
+from tts_cache import AudioCache, create_audio_cache
+from speech_streaming import StreamAborted, sentences_from_tokens, speak_pipelined, split_sentences
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_LOOKUPS = REGISTRY.counter("voice_agent_tts_cache_total", "Audio cache lookups by result", ("result",))
 
 class VoiceService:
-    def __init__(self):
+    def __init__(self, audio_cache: Optional[AudioCache] = None, stt_engine: Optional[STTEngine] = None):
+        # gTTS language and accent (top-level domain) used for every utterance
+        self.tts_lang = os.getenv("TTS_LANG", "en")
+        self.tts_voice = os.getenv("TTS_VOICE", "com")
+        self.audio_cache = audio_cache if audio_cache is not None else create_audio_cache()
+        # Speak long replies sentence by sentence so the first sentence plays sooner
+        self.streaming = os.getenv("TTS_STREAMING", "on").lower() not in ("0", "off", "false", "no")
+        
         # Initialize pygame mixer for audio playback
-        pygame.mixer.init()
+        try:
+            pygame.mixer.init()
+            self.audio_enabled = True
+        except Exception as e:
+            logger.warning("Audio playback not available: %s", e)
+            self.audio_enabled = False
+        
+        # pygame.mixer.music is a single global channel, so playback is serialized
+        self._playback_lock = threading.Lock()
         
         # Initialize speech recognition
         self.recognizer = sr.Recognizer()
+        self.stt_engine = stt_engine if stt_engine is not None else create_stt_engine(self.recognizer)
+        # Ambient-noise calibration is reused across turns instead of costing a second of every listen
+        self.calibration = AmbientCalibration(
+            self.recognizer,
+            refresh_seconds=float(os.getenv("STT_CALIBRATION_REFRESH_SECONDS", "300")),
+            duration=float(os.getenv("STT_CALIBRATION_SECONDS", "1.0")),
+        )
         try:
             self.microphone = sr.Microphone()
             self.speech_enabled = True
-            print(" Speech recognition initialized")
+            logger.info("Speech recognition initialized (%s engine)", self.stt_engine.name)
         except Exception as e:
-            print(f" Speech recognition not available: {e}")
+            logger.warning("Speech recognition not available: %s", e)
             self.speech_enabled = False
     
     def text_to_speech(self, text: str) -> bool:
         """Convert text to speech and play it"""
         try:
-            print(f" Speaking: {text[:50]}...")
+            logger.info("Speaking: %s...", text[:50])
             
-            # Create TTS object
-            tts = gTTS(text=text, lang='en')
+            if self.streaming:
+                sentences = split_sentences(text)
+                if len(sentences) > 1:
+                    return self.speak_stream(sentences)
             
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmp:
-                temp_filename = tmp.name
-                tts.save(temp_filename)
+            audio = self.synthesize(text)
+            if audio is None:
+                logger.warning("Text-to-speech not working, but text response is available")
+                return False
             
+            played = self.play_audio(audio)
+            if played:
+                logger.info("Speech completed")
+            return played
+            
+        except Exception as e:
+            logger.error("TTS error: %s; text response is still available", e)
+            return False
+    
+    def synthesize(self, text: str) -> Optional[bytes]:
+        """Synthesize text to MP3 bytes, reusing cached audio when available"""
+        if self.audio_cache is not None:
+            cached = self.audio_cache.get(text, self.tts_lang, self.tts_voice)
+            TTS_CACHE_LOOKUPS.inc("hit" if cached is not None else "miss")
+            if cached is not None:
+                return cached
+        
+        try:
+            with stage("tts_synthesis"):
+                # Create TTS object
+                tts = gTTS(text=text, lang=self.tts_lang, tld=self.tts_voice)
+                buffer = io.BytesIO()
+                tts.write_to_fp(buffer)
+                audio = buffer.getvalue()
+        except Exception as e:
+            logger.error("TTS error: %s", e)
+            return None
+        
+        if self.audio_cache is not None:
+            try:
+                self.audio_cache.put(text, audio, self.tts_lang, self.tts_voice)
+            except OSError as e:
+                logger.warning("Could not cache audio: %s", e)
+        return audio
+    
+    def play_audio(self, audio: bytes) -> bool:
+        """Play MP3 bytes, blocking the calling thread until playback finishes"""
+        if not self.audio_enabled:
+            logger.warning("Audio playback not available")
+            return False
+        
+        with self._playback_lock, stage("tts_playback"):
             # Load and play the audio
-            pygame.mixer.music.load(temp_filename)
+            pygame.mixer.music.load(io.BytesIO(audio), "mp3")
             pygame.mixer.music.play()
             
             # Wait for playback to finish
             while pygame.mixer.music.get_busy():
                 pygame.time.wait(100)
             
-            # Clean up the temporary file
+            pygame.mixer.music.unload()
+        return True
+    
+    def speak_stream(self, chunks: Iterable[str]) -> bool:
+        """Speak text chunks, synthesizing the next chunk while the current one plays"""
+        result = speak_pipelined(chunks, self.synthesize, self.play_audio)
+        if result["ok"]:
+            logger.info("Speech completed (%d chunks, first audio after %.2fs)",
+                        result['played'], result['first_audio_s'])
+        else:
+            logger.warning("Text-to-speech not working, but text response is available")
+        return result["ok"]
+    
+    def speak_token_stream(self, tokens: Iterable[str]) -> bool:
+        """Speak streamed LLM output, starting as soon as the first sentence is complete"""
+        if not self.streaming:
             try:
-                os.unlink(temp_filename)
-            except:
-                pass  # Ignore cleanup errors
-                
-            print(" Speech completed")
-            return True
-            
-        except Exception as e:
-            print(f" TTS Error: {e}")
-            print(" Text-to-speech not working, but text response is available")
-            return False
+                return self.text_to_speech("".join(tokens))
+            except StreamAborted:
+                return False
+        return self.speak_stream(sentences_from_tokens(tokens))
+    
+    def warm_cache(self, texts: List[str]) -> int:
+        """Pre-render phrases into the audio cache, returning how many were synthesized"""
+        if self.audio_cache is None:
+            return 0
+        
+        # Cache the same units that playback will ask for
+        if self.streaming:
+            texts = [sentence for text in texts for sentence in split_sentences(text)]
+        
+        rendered = 0
+        for text in texts:
+            if self.audio_cache.contains(text, self.tts_lang, self.tts_voice):
+                continue
+            if self.synthesize(text) is not None:
+                rendered += 1
+        logger.info("Audio cache warm-up finished: %d new clips", rendered)
+        return rendered
     
     def speech_to_text(self, timeout=5) -> str:
         """Convert speech to text"""
         if not self.speech_enabled:
-            print(" Speech recognition not available")
+            logger.warning("Speech recognition not available")
             return "Speech recognition not available"
             
         try:
-            print(f" Listening for {timeout} seconds...")
-            print(" Please speak now! Speak CLEARLY and LOUDLY!")
+            logger.info("Listening for %s seconds... Please speak now! Speak CLEARLY and LOUDLY!", timeout)
             
             with self.microphone as source:
-                # Adjust for ambient noise with more time
-                print("🔧 Adjusting for ambient noise...")
-                self.recognizer.adjust_for_ambient_noise(source, duration=1.0)
-                
-                # Set energy threshold dynamically
-                print(f" Current energy threshold: {self.recognizer.energy_threshold}")
+                if self.calibration.calibrate(source):
+                    logger.info("Adjusted for ambient noise")
                 
                 # Listen for audio with longer phrase limit
-                print(" Listening... (speak clearly into your microphone)")
+                logger.info("Listening... (speak clearly into your microphone)")
                 audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=10)
             
-            print(" Processing speech with Google Speech Recognition...")
-            text = self.recognizer.recognize_google(audio)
-            print(f" Successfully recognized: '{text}'")
+            logger.info("Processing speech with the %s recognizer...", self.stt_engine.name)
+            text = self.transcribe(audio)
+            logger.info("Successfully recognized: '%s'", text)
             return text
             
         except sr.WaitTimeoutError:
-            print(" No speech detected within timeout")
-            print(" Try speaking louder or closer to your microphone")
+            logger.info("No speech detected within timeout; try speaking louder or closer to your microphone")
             return "No response"
         except sr.UnknownValueError:
-            print(" Could not understand the audio")
-            print(" Try speaking more clearly or check your microphone")
+            logger.info("Could not understand the audio; try speaking more clearly or check your microphone")
             return "Could not understand"
         except sr.RequestError as e:
-            print(f" Could not request results from Google Speech Recognition service; {e}")
-            print(" Check your internet connection")
+            logger.error("Could not get results from the %s speech recognizer: %s", self.stt_engine.name, e)
             return "Error occurred"
         except Exception as e:
-            print(f" STT Error: {e}")
+            logger.error("STT error: %s", e)
             return "Error occurred"
     
+    def transcribe(self, audio: sr.AudioData) -> str:
+        """Recognize recorded audio with the configured engine (raises sr.UnknownValueError / sr.RequestError)"""
+        with stage("stt"):
+            return self.stt_engine.transcribe(audio)
+    
     def test_tts(self) -> bool:
         """Test if text-to-speech is working"""
         try:
             test_text = "Testing voice system"
             return self.text_to_speech(test_text)
         except Exception as e:
-            print(f"TTS test failed: {e}")
+            logger.error("TTS test failed: %s", e)
             return False
     
     def fallback_tts(self, text: str) -> bool:
         """Fallback TTS using system beep"""
         try:
-            print(f"[VOICE]: {text}")
+            logger.info("[VOICE]: %s", text)
             # Try system beep as audio feedback
             return True
         except: